@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+#### Backtest ####
+# Replays the candlestick history stored by the candle cache through a trading policy and prints the profit, number
+# of trades and drawdown. The parameters default to the values in bitbot.config.
+#
+#   python3 Backtest.py --coin XRP --policy policy.BollingerPolicy --start 2018-01-01 --end 2019-01-01 --fetch
+#
+# With --sweep a grid of BollingerPolicy parameters is evaluated instead and a ranked table is printed. Each grid
+# option takes a comma separated list of values or a start:stop:step range (stop included). Use --option=value
+# when the first value is negative.
+#
+#   python3 Backtest.py --sweep --measurement-periods 10:50:10 --sell-safety-thresholds 0.2:2:0.2 --output sweep.csv
+
+import sys, time, argparse, datetime, csv
+from lib import Bitbot_CDO
+from lib.Backtester import Backtester, formatReport
+from lib.ParameterSweep import ParameterSweep, formatTable
+from lib.CandleCache import CandleCache
+from lib.Poloniex import poloniex
+from lib.HttpTransport import createTransport
+from lib.RequestScheduler import createRequestScheduler
+from lib.PolicyEnsemble import createPolicy
+from lib.TraderThread import getSubjectCurrencies
+from Bitbot import getConfigurations
+
+# parseDate
+#   - Purpose:
+#       Convert a YYYY-MM-DD string from the command line into a UNIX timestamp.
+def parseDate(dateString):
+    return datetime.datetime.strptime(dateString, "%Y-%m-%d").timestamp()
+
+# parseValues
+#   - Purpose:
+#       Convert a grid option into a list of numbers. Accepts "a,b,c" or "start:stop:step" (stop included).
+def parseValues(valueString, valueType=float):
+    if ':' in valueString:
+        start, stop, step = [float(value) for value in valueString.split(':')]
+        count = int(round((stop - start) / step)) + 1
+        return [valueType(round(start + step * i, 10)) for i in range(0, count)]
+    return [valueType(value) for value in valueString.split(',')]
+
+# parseArguments
+#   - Purpose:
+#       Read the command line options. Anything not given falls back to bitbot.config.
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Replay stored candlesticks through a Bitbot trading policy.")
+    parser.add_argument('--coin', default=None, help="The cryptocurrency to trade against BTC (default: first crypto_coin)")
+    parser.add_argument('--policy', default=None, help="The policy module to load (default: policy_file)")
+    parser.add_argument('--period', default=None, type=int, help="The candlestick period in seconds (default: candlestick_period)")
+    parser.add_argument('--start', default=None, help="First day to replay as YYYY-MM-DD (default: all stored candles, or one year with --fetch)")
+    parser.add_argument('--end', default=None, help="Last day to replay as YYYY-MM-DD (default: all stored candles)")
+    parser.add_argument('--fee', default=None, type=float, help="Fee taken from every order as a fraction (default: backtest_fee)")
+    parser.add_argument('--fetch', action='store_true', help="Download the missing candles from Poloniex before replaying")
+    parser.add_argument('--sweep', action='store_true', help="Evaluate a grid of BollingerPolicy parameters")
+    parser.add_argument('--measurement-periods', default=None, help="Grid of measurement_period values (default: measurement_period)")
+    parser.add_argument('--sell-safety-thresholds', default=None, help="Grid of sell_safety_threshold values (default: sell_safety_threshold)")
+    parser.add_argument('--upper-gradients', default=None, help="Grid of upper_band_sma_minimum_gradient values (default: upper_band_sma_minimum_gradient)")
+    parser.add_argument('--lower-gradients', default=None, help="Grid of lower_band_sma_minimum_gradient values (default: lower_band_sma_minimum_gradient)")
+    parser.add_argument('--top', default=20, type=int, help="Number of sweep results to print")
+    parser.add_argument('--output', default=None, help="Write every sweep result to this CSV file")
+    return parser.parse_args()
+
+# loadCandles
+#   - Purpose:
+#       Read the candles between --start and --end from the candle cache, downloading the missing ones with --fetch.
+#   - Returns:
+#       A list of candle dictionaries ordered by date.
+def loadCandles(options, currencyPair, candlePeriod):
+    endDate = parseDate(options.end) if options.end else time.time()
+    if options.start:
+        startDate = parseDate(options.start)
+    elif options.fetch:
+        startDate = endDate - 365 * 86400
+    else:
+        startDate = 0
+
+    if options.fetch:
+        candleCache = CandleCache(poloniex(Bitbot_CDO.api_key, Bitbot_CDO.api_secret, createTransport(), createRequestScheduler()), getattr(Bitbot_CDO, 'candle_cache_dir', None))
+        return candleCache.getCandles(currencyPair, candlePeriod, startDate, endDate)
+    candleCache = CandleCache(None, getattr(Bitbot_CDO, 'candle_cache_dir', None))
+    return [candle for candle in candleCache.getAllCandles(currencyPair, candlePeriod) if startDate <= candle['date'] <= endDate]
+
+# runSweep
+#   - Purpose:
+#       Evaluate the parameter grid given on the command line and print the ranked results.
+def runSweep(options, currencyPair, candles, candlePeriod, fee):
+    measurementPeriods = parseValues(options.measurement_periods or Bitbot_CDO.measurement_period, int)
+    sellSafetyThresholds = parseValues(options.sell_safety_thresholds or Bitbot_CDO.sell_safety_threshold)
+    upperGradients = parseValues(options.upper_gradients or Bitbot_CDO.upper_band_sma_minimum_gradient)
+    lowerGradients = parseValues(options.lower_gradients or Bitbot_CDO.lower_band_sma_minimum_gradient)
+
+    sweep = ParameterSweep(candles, candlePeriod, Bitbot_CDO.period_unit, fee)
+    runStart = time.perf_counter()
+    results = sweep.run(measurementPeriods, sellSafetyThresholds, upperGradients, lowerGradients)
+    runTime = time.perf_counter() - runStart
+
+    print("BollingerPolicy sweep on %s (%d second candles, fee %.2f%%)" % (currencyPair, candlePeriod, fee * 100.0))
+    print(formatTable(results, options.top))
+    print("%d combinations in %.2f seconds" % (len(results), runTime))
+
+    if options.output:
+        with open(options.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    return 0
+
+# Begin main
+def main():
+    getConfigurations()
+    options = parseArguments()
+
+    currencyPair = 'BTC_' + (options.coin or getSubjectCurrencies()[0])
+    policyClass = createPolicy(options.policy or Bitbot_CDO.policy_file, waitForAll=True)
+    candlePeriod = options.period or int(Bitbot_CDO.candlestick_period)
+    fee = options.fee if options.fee is not None else float(getattr(Bitbot_CDO, 'backtest_fee', 0.002))
+    candles = loadCandles(options, currencyPair, candlePeriod)
+    if not candles:
+        print("No stored candles for %s at period %d. Use --fetch to download them." % (currencyPair, candlePeriod))
+        return 1
+
+    if options.sweep:
+        return runSweep(options, currencyPair, candles, candlePeriod, fee)
+
+    backtester = Backtester(policyClass, currencyPair, candles, candlePeriod, Bitbot_CDO.measurement_period,
+                            Bitbot_CDO.period_unit, fee)
+    runStart = time.perf_counter()
+    report = backtester.run()
+    runTime = time.perf_counter() - runStart
+
+    print("Backtest of %s on %s (%d second candles, fee %.2f%%)" % (policyClass.__name__, currencyPair, candlePeriod, fee * 100.0))
+    print(formatReport(report))
+    print("Replay time      : %.2f seconds" % (runTime))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+#### Benchmark ####
+# Times the indicator math of the policies, the decoding of exchange responses by the poloniex client and whole
+# trader ticks against an in-process stub exchange at several history sizes. The results can be saved and compared
+# with the results of another version so a slowdown shows before it is deployed.
+#
+#   python3 Benchmark.py --output before.json
+#   python3 Benchmark.py --compare before.json --threshold 0.1
+#
+# With --compare the exit status is 1 if any benchmark got slower than the threshold allows. --verify first checks that
+# the streaming indicators the policies trade on give the same values as the calculations they replaced, and exits
+# with status 1 if one does not.
+#
+#   python3 Benchmark.py --verify --sizes 100,1000
+
+import sys, fnmatch, argparse
+from lib.Benchmark import runBenchmarks, getEnvironment, saveResults, loadResults, compareResults, formatResult, formatComparison
+from benchmarks import getBenchmarks, getChecks
+from Bitbot import getConfigurations
+
+# parseArguments
+#   - Purpose:
+#       Read the command line options.
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Benchmark the Bitbot policies, poloniex client and trader tick.")
+    parser.add_argument('--sizes', default='100,1000,10000', help="Comma separated history sizes in candlesticks (default: 100,1000,10000)")
+    parser.add_argument('--filter', default=None, help="Only run the benchmarks whose name matches this pattern (i.e. 'trader.*')")
+    parser.add_argument('--min-time', default=0.2, type=float, help="Least number of seconds one repeat takes (default: 0.2)")
+    parser.add_argument('--repeat', default=5, type=int, help="Number of timed repeats of every benchmark (default: 5)")
+    parser.add_argument('--output', default=None, help="Save the results to this JSON file")
+    parser.add_argument('--compare', default=None, help="Compare the results with a JSON file saved by --output")
+    parser.add_argument('--threshold', default=0.1, type=float, help="Slowdown counted as a regression as a fraction (default: 0.1)")
+    parser.add_argument('--verify', action='store_true', help="Check the streaming indicators against the calculations they replaced first")
+    return parser.parse_args()
+
+# Begin main
+def main():
+    getConfigurations()
+    options = parseArguments()
+
+    sizes = [int(size) for size in options.sizes.split(',')]
+    checks = [check for check in getChecks(sizes)
+              if options.verify and (options.filter is None or fnmatch.fnmatch(check[0], options.filter))]
+    benchmarks = [benchmark for benchmark in getBenchmarks(sizes)
+                  if options.filter is None or fnmatch.fnmatch(benchmark.name, options.filter)]
+    if not benchmarks and not checks:
+        print("No benchmark matches %s" % (options.filter))
+        return 1
+
+    if checks:
+        print("{:<48} {:>12} {:>12}".format('Check', 'Difference', 'Result'))
+        failed = 0
+        for name, check, tolerance in checks:
+            difference = check()
+            failed += difference > tolerance
+            print("{:<48} {:>12.3g} {:>12}".format(name, difference, 'ok' if difference <= tolerance else 'FAILED'), flush=True)
+        if failed:
+            print("%d checks differ by more than their tolerance" % (failed))
+            return 1
+        if not benchmarks:
+            return 0
+        print("")
+
+    environment = getEnvironment()
+    print("Python %s, NumPy %s, pandas %s, commit %s" % (environment['python'], environment.get('numpy'),
+                                                        environment.get('pandas'), environment.get('commit')))
+    print("{:<48} {:>12} {:>12} {:>9}".format('Benchmark', 'Median', 'Best', 'Stdev'))
+    results = runBenchmarks(benchmarks, options.min_time, options.repeat, lambda key, result: print(formatResult(key, result), flush=True))
+
+    if options.output:
+        saveResults(options.output, results, environment)
+        print("Results saved to %s" % (options.output))
+
+    if options.compare:
+        baseline = loadResults(options.compare)
+        comparison = compareResults(baseline['results'], results, options.threshold)
+        print("")
+        print("Compared with %s (commit %s)" % (options.compare, baseline['environment'].get('commit')))
+        print(formatComparison(comparison))
+        regressions = [key for key, before, after, change, regressed in comparison if regressed]
+        if regressions:
+            print("%d benchmarks are more than %.0f%% slower" % (len(regressions), options.threshold * 100.0))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
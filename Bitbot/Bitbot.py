@@ -1,23 +1,26 @@
 #!/usr/bin/env python3
 
-import os, sys, queue, threading, time, datetime, curses, signal
+import time
+# The startup report is timed from here, before the modules below are imported
+__START_TIME__ = time.perf_counter()
+
+# The trader, exchange client and printer modules are imported by main once the configuration says which are used, so
+# curses is only loaded in visual mode. The policies of policy_file are loaded by the TraderThread.
+import os, sys, signal, argparse
 from lib import Bitbot_CDO
-from lib.PrinterThread import PrinterThread
-from lib.TraderThread import TraderThread
-from threading import Thread
 from configparser import ConfigParser
-from policy.BollingerPolicy import BollingerPolicy
-from lib.Poloniex import poloniex
+from lib.RequestScheduler import createRequestScheduler
+from lib.StatusBus import StatusBus
+from lib.Metrics import createMetricsExporter
+from lib.Profiler import Profiler, StartupTimer
+from lib.PolicyEnsemble import shutdownPools
 
 # Globals
-# Fill the queue with lists of this format (key, value)
 __KEY_Q__ = 113
 __KEY_Y__ = 121
 __KEY_N__ = 110
-printQueue = queue.Queue(10)        
-printQueueLock = threading.Lock()
-removeQueue = queue.Queue(10)
-removeQueueLock = threading.Lock()
+# The threads publish what should be printed on the status bus as (key, value) pairs
+statusBus = StatusBus()
 thread_dict = {"PrinterThread":0, "TraderThread":1}
 poloniexAPI = None
 
@@ -38,21 +41,43 @@ def getConfigurations():
         print("Error reading properties from bitbot.config: %s" % (str(e)))
         exit(1)
 
-#   sendToQueue
-#       - Purpose:
-#           Add a key and message if present to one of the printerThreads queue's.
-def sendToQueue(queue, lock, key, mesg=None):
-    lock.acquire()
-    if mesg == None:
-        # For remove queue
-        queue.put(key)
-    else:
-        # For print queue
-        queue.put((key, mesg))
-    lock.release()
+# parseArguments
+#   - Purpose:
+#       Read the command line options.
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Trade cryptocurrencies on Poloniex with a Bitbot trading policy.")
+    parser.add_argument('--profile', action='store_true', help="Time every phase of the trader loop and write a report at shutdown")
+    parser.add_argument('--profile-ticks', default=0, type=int, help="Also run cProfile for this many ticks (default: 0)")
+    parser.add_argument('--profile-output', default='./log/profile.txt', help="The file the profile report is written to (default: ./log/profile.txt)")
+    return parser.parse_args()
+
+# shutdown
+#   - Purpose:
+#       Stop the threads, the policy pools and the metrics exporter and write the profile report if the trader was profiled.
+def shutdown(printerT, traderT, metricsExporter, profiler, profileOutput):
+    if printerT is not None:
+        printerT.stop()
+    traderT.stop()
+    if printerT is not None:
+        printerT.join()
+        print('Printer thread stopped')
+    traderT.join()
+    print('Trader thread stopped')
+    shutdownPools()
+    if metricsExporter is not None:
+        metricsExporter.stop()
+    if profiler is not None:
+        try:
+            profiler.writeReport(profileOutput)
+            print('Profile written to %s' % (profileOutput))
+        except Exception as e:
+            print("Error writing the profile report: %s" % (str(e)))
 
 # Begin main
 def main(): 
+    startup = StartupTimer(__START_TIME__)
+    startup.mark('imports')
+    arguments = parseArguments()
     print("Starting Bitbot...")
 
     # Get the API key and secret from the properties file
@@ -60,14 +85,39 @@ def main():
         getConfigurations()
     except Exception as e:
         print('Error reading bitbot.conf: %s' % (str(e)))
-    poloniexAPI = poloniex(Bitbot_CDO.api_key, Bitbot_CDO.api_secret)
-    enable_visual_mode = bool(Bitbot_CDO.enable_visual_mode)
+    startup.mark('configuration')
+    use_asyncio_trader = getattr(Bitbot_CDO, 'use_asyncio_trader', 'False') == 'True'
+    if use_asyncio_trader:
+        from lib.AsyncTraderThread import AsyncTraderThread as traderClass
+        from lib.AsyncPoloniex import asyncPoloniex
+        from lib.AsyncTransport import createAsyncTransport
+        poloniexAPI = asyncPoloniex(Bitbot_CDO.api_key, Bitbot_CDO.api_secret, createAsyncTransport(), createRequestScheduler())
+    else:
+        from lib.TraderThread import TraderThread as traderClass
+        from lib.Poloniex import poloniex
+        from lib.HttpTransport import createTransport
+        poloniexAPI = poloniex(Bitbot_CDO.api_key, Bitbot_CDO.api_secret, createTransport(), createRequestScheduler())
+    startup.mark('exchange client')
+    enable_visual_mode = getattr(Bitbot_CDO, 'enable_visual_mode', 'True') != 'False'
+    profiler = Profiler(arguments.profile_ticks) if arguments.profile else None
+    printerT = None
+
+    # Serve or write the metrics if it is configured
+    metricsExporter = createMetricsExporter()
+    if metricsExporter is not None:
+        try:
+            metricsExporter.start()
+        except Exception as e:
+            print("Error could not start the metrics exporter: %s" % (str(e)))
+            metricsExporter = None
+    startup.mark('metrics exporter')
 
     # Start the printer thread
     if enable_visual_mode:
         try:
             print('Starting Printer Thread...')
-            printerT = PrinterThread(thread_dict["PrinterThread"], "PrinterThread", printQueue, printQueueLock, removeQueue, removeQueueLock)
+            from lib.PrinterThread import PrinterThread
+            printerT = PrinterThread(thread_dict["PrinterThread"], "PrinterThread", statusBus)
             printerT.start()
             # Wait for thread to inintialize screen so nobody uses it before it's made.
             while not printerT.screenIsReady():
@@ -75,13 +125,15 @@ def main():
         except Exception as e:
             print("Error could not start printer thread: %s" % (str(e)))
             return 1
+        startup.mark('printer')
     else:
         sys.stdout = open(os.devnull, 'w')
     
     # Start the trader thread 
     try:
         print('Starting Trader Thread...')
-        traderT = TraderThread(thread_dict["TraderThread"], "TraderThread", printQueue, printQueueLock, removeQueue, removeQueueLock, poloniexAPI)
+        traderT = traderClass(thread_dict["TraderThread"], "TraderThread", statusBus, poloniexAPI, profiler, startup)
+        startup.mark('trader')
         traderT.start()
     except Exception as e:
        print("Error could not start trader thread: %s" % (str(e)))
@@ -89,31 +141,36 @@ def main():
 
     #startTime = datetime.datetime.now().replace(microsecond=0)
     # While loop waiting for key presses 
+    try:
+        waitForQuit(printerT, enable_visual_mode)
+    except KeyboardInterrupt:
+        pass
+    shutdown(printerT, traderT, metricsExporter, profiler, arguments.profile_output)
+    return 0
+
+#   waitForQuit
+#       - Purpose:
+#           Wait until the user confirms they want to quit with 'q' and 'y'. Without the screen, wait for Ctrl+C.
+def waitForQuit(printerT, enable_visual_mode):
     while True:
-        if enable_visual_mode:
-            sendToQueue(printQueue, printQueueLock, PrinterThread.USER_INPUT_KEY, "Press \'q\' to quit")
+        if not enable_visual_mode:
+            time.sleep(1)
+        else:
+            statusBus.publish(printerT.USER_INPUT_KEY, "Press \'q\' to quit")
             keypress = printerT.getChar()
             # The quit key was pressed
             if keypress == __KEY_Q__:
-                sendToQueue(printQueue, printQueueLock, PrinterThread.USER_INPUT_KEY, "Are you sure you want to quit? (y\\n)")
+                statusBus.publish(printerT.USER_INPUT_KEY, "Are you sure you want to quit? (y\\n)")
                 # Double check the user wants to exit
                 while True:
                     keypress = printerT.getChar()
                     if keypress == __KEY_Y__:  
-                        # Kill the other threads
-                        printerT.stop()
-                        traderT.stop()
-                        printerT.join()
-                        print('Printer thread stopped')
-                        traderT.join()
-                        print('Trader thread stopped')
-                        return 0
+                        return
                     elif keypress == __KEY_N__:
-                        sendToQueue(printQueue, printQueueLock, PrinterThread.USER_INPUT_KEY, "Press \'q\' to quit")
+                        statusBus.publish(printerT.USER_INPUT_KEY, "Press \'q\' to quit")
                         break
                     elif keypress != 0:
-                        sendToQueue(printQueue, printQueueLock, PrinterThread.USER_INPUT_KEY, "Are you sure you want to quit? Select \'y\' or \'n\'")
-
-main()
-
+                        statusBus.publish(printerT.USER_INPUT_KEY, "Are you sure you want to quit? Select \'y\' or \'n\'")
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#### Optimize ####
+# Searches the bitbot.config parameters of a policy for the values which would have traded the stored candlestick
+# history best, using every CPU core (see lib/Optimizer.py). The parameters searched and their ranges are the
+# policy's PARAMETER_SPACE, which --param can change or extend with key=low:high or key=a,b,c. The candles are read
+# as in Backtest.py.
+#
+#   python3 Optimize.py --coin XRP --policy policy.BollingerPolicy --trials 128 --folds 4
+#   python3 Optimize.py --method random --param measurement_period=10:30 --param period_unit=HOURS,DAYS
+#
+# The best values are printed as a bitbot.config section. --write-config changes them in config/bitbot.config (or
+# the file given) keeping its' comments.
+
+import sys, time, argparse, csv
+from lib import Bitbot_CDO
+from lib.Optimizer import Optimizer, getParameterSpace, formatTable, formatConfigSection, writeConfigSection
+from lib.PolicyEnsemble import createPolicy
+from lib.TraderThread import getSubjectCurrencies
+from Backtest import loadCandles
+from Bitbot import getConfigurations
+
+# parseSpace
+#   - Purpose:
+#       Convert a --param option into a parameter space entry. "key=low:high" is a range (of ints if both are ints)
+#       and "key=a,b,c" a list of values.
+#   - Returns:
+#       A tuple of the key and its' range or values.
+def parseSpace(option):
+    key, separator, values = option.partition('=')
+    if not separator or not values:
+        raise argparse.ArgumentTypeError("Expected key=low:high or key=a,b,c, got %s" % (option))
+    if ':' in values:
+        low, high = values.split(':', 1)
+        if low.lstrip('-').isdigit() and high.lstrip('-').isdigit():
+            return (key.strip().lower(), (int(low), int(high)))
+        return (key.strip().lower(), (float(low), float(high)))
+    return (key.strip().lower(), [value.strip() for value in values.split(',')])
+
+# parseArguments
+#   - Purpose:
+#       Read the command line options. Anything not given falls back to bitbot.config.
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Search the parameters of a Bitbot trading policy over stored candlesticks.")
+    parser.add_argument('--coin', default=None, help="The cryptocurrency to trade against BTC (default: first crypto_coin)")
+    parser.add_argument('--policy', default=None, help="The policy module(s) to optimize (default: policy_file)")
+    parser.add_argument('--period', default=None, type=int, help="The candlestick period in seconds (default: candlestick_period)")
+    parser.add_argument('--start', default=None, help="First day of history as YYYY-MM-DD (default: all stored candles, or one year with --fetch)")
+    parser.add_argument('--end', default=None, help="Last day of history as YYYY-MM-DD (default: all stored candles)")
+    parser.add_argument('--fee', default=None, type=float, help="Fee taken from every order as a fraction (default: backtest_fee)")
+    parser.add_argument('--fetch', action='store_true', help="Download the missing candles from Poloniex first")
+    parser.add_argument('--method', default='halving', choices=('halving', 'random'), help="Successive halving or a random search on every fold (default: halving)")
+    parser.add_argument('--trials', default=64, type=int, help="Number of candidates, the first being the current config (default: 64)")
+    parser.add_argument('--eta', default=2, type=int, help="Successive halving keeps 1/eta of the candidates each round (default: 2)")
+    parser.add_argument('--folds', default=4, type=int, help="Number of walk-forward folds (default: 4)")
+    parser.add_argument('--train-blocks', default=3, type=int, help="Blocks of candles each fold trains on before its' test block (default: 3)")
+    parser.add_argument('--param', default=[], action='append', type=parseSpace, help="Search key=low:high or key=a,b,c (repeatable)")
+    parser.add_argument('--workers', default=None, type=int, help="Number of processes (default: one per CPU core)")
+    parser.add_argument('--seed', default=None, type=int, help="Seed of the random candidates")
+    parser.add_argument('--top', default=10, type=int, help="Number of results to print")
+    parser.add_argument('--output', default=None, help="Write every result to this CSV file")
+    parser.add_argument('--section', default=None, help="The bitbot.config section of the result (default: the policy name)")
+    parser.add_argument('--write-config', default=None, nargs='?', const='config/bitbot.config', help="Write the best values into bitbot.config")
+    return parser.parse_args()
+
+# Begin main
+def main():
+    getConfigurations()
+    options = parseArguments()
+
+    currencyPair = 'BTC_' + (options.coin or getSubjectCurrencies()[0])
+    policyFile = options.policy or Bitbot_CDO.policy_file
+    policy = createPolicy(policyFile, waitForAll=True)
+    candlePeriod = options.period or int(Bitbot_CDO.candlestick_period)
+    fee = options.fee if options.fee is not None else float(getattr(Bitbot_CDO, 'backtest_fee', 0.002))
+    space = getParameterSpace(policy)
+    space.update(dict(options.param))
+    section = options.section or (policy.__name__ if not hasattr(policy, 'getMembers') else 'PolicyEnsemble')
+    candles = loadCandles(options, currencyPair, candlePeriod)
+    if not candles:
+        print("No stored candles for %s at period %d. Use --fetch to download them." % (currencyPair, candlePeriod))
+        return 1
+
+    try:
+        optimizer = Optimizer(policyFile, currencyPair, candles, candlePeriod, space, options.folds, options.train_blocks, fee,
+                              options.workers, options.seed)
+    except ValueError as e:
+        print("Cannot optimize %s on %s: %s" % (policy.__name__, currencyPair, str(e)))
+        return 1
+    try:
+        runStart = time.perf_counter()
+        if options.method == 'random':
+            results = optimizer.randomSearch(options.trials)
+        else:
+            results = optimizer.successiveHalving(options.trials, options.eta)
+        runTime = time.perf_counter() - runStart
+        walkForwardProfit, folds = optimizer.getWalkForward()
+    finally:
+        optimizer.close()
+
+    if not results:
+        print("No candidate of %s could be run on every block of %s." % (policy.__name__, currencyPair))
+        return 1
+
+    keys = sorted(space.keys())
+    print("Optimization of %s on %s (%d second candles, fee %.2f%%, %d folds)" % (policy.__name__, currencyPair, candlePeriod, fee * 100.0, options.folds))
+    print(formatTable(results, keys, options.top))
+    print("%d candidates in %.2f seconds" % (len(results), runTime))
+    print("")
+    for fold, parameters, trainProfit, testProfit in folds:
+        print("Fold %d: train %8.2f%%  test %8.2f%%  %s" % (fold + 1, trainProfit, testProfit, ' '.join('%s=%s' % (key, parameters[key]) for key in keys)))
+    print("Walk-forward test profit: %.2f%%" % (walkForwardProfit))
+    print("")
+
+    best = dict((key, results[0][key]) for key in keys)
+    print(formatConfigSection(section, best))
+    if options.write_config:
+        writeConfigSection(options.write_config, section, best)
+        print("Written to %s" % (options.write_config))
+
+    if options.output:
+        with open(options.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
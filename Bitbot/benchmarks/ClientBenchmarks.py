@@ -0,0 +1,66 @@
+#### ClientBenchmarks ####
+# Benchmarks of the poloniex client decoding responses through api_query. A StaticTransport answers every request
+# with a prepared body so only the client is timed: building the request, the JSON decoding and the metrics.
+
+import json, random
+from lib.Benchmark import Benchmark
+from lib.Poloniex import poloniex
+from benchmarks.IndicatorBenchmarks import makeCloses
+
+# Number of markets in the ticker Poloniex returns
+TICKER_PAIRS = 120
+
+class StaticTransport(object):
+    """Answers every request with the same body."""
+
+    def __init__(self, body):
+        self.__body__ = body
+
+    def request(self, method, path, body=None, headers=None):
+        return self.__body__
+
+    def close(self):
+        pass
+
+# makeTickerBody
+#   - Purpose:
+#       Build a returnTicker response body with the fields Poloniex sends for every market.
+def makeTickerBody(pairs=TICKER_PAIRS, seed=0):
+    generator = random.Random(seed)
+    ticker = {}
+    for pairId in range(1, pairs + 1):
+        price = generator.uniform(1e-7, 0.1)
+        ticker['BTC_C%03d' % (pairId)] = {'id' : pairId, 'last' : '%.8f' % (price), 'lowestAsk' : '%.8f' % (price * 1.001),
+                                           'highestBid' : '%.8f' % (price * 0.999), 'percentChange' : '%.8f' % (generator.uniform(-0.1, 0.1)),
+                                           'baseVolume' : '%.8f' % (generator.uniform(0, 500)), 'quoteVolume' : '%.8f' % (generator.uniform(0, 1e7)),
+                                           'isFrozen' : '0', 'high24hr' : '%.8f' % (price * 1.05), 'low24hr' : '%.8f' % (price * 0.95)}
+    return json.dumps(ticker).encode('utf-8')
+
+# makeChartDataBody
+#   - Purpose:
+#       Build a returnChartData response body of a number of candles.
+def makeChartDataBody(size, period=300):
+    candles = []
+    for i, close in enumerate(makeCloses(size)):
+        candles.append({'date' : 1500000000 + i * period, 'high' : close * 1.001, 'low' : close * 0.999, 'open' : close,
+                        'close' : close, 'volume' : 1.5, 'quoteVolume' : 1.5 / close, 'weightedAverage' : close})
+    return json.dumps(candles).encode('utf-8')
+
+def setupTicker():
+    client = poloniex('API_KEY', 'API_SECRET', StaticTransport(makeTickerBody()))
+    return lambda: client.api_query('returnTicker')
+
+def setupChartData(size):
+    client = poloniex('API_KEY', 'API_SECRET', StaticTransport(makeChartDataBody(size)))
+    return lambda: client.returnChartData('BTC_XRP', 1500000000, 1500000000 + size * 300, 300)
+
+# getBenchmarks
+#   - Parameters:
+#       * (sizes) The numbers of candles in the returnChartData responses
+#   - Returns:
+#       A list of Benchmark.
+def getBenchmarks(sizes):
+    benchmarks = [Benchmark('client.returnTicker', setupTicker, TICKER_PAIRS)]
+    for size in sizes:
+        benchmarks.append(Benchmark('client.returnChartData', lambda size=size: setupChartData(size), size))
+    return benchmarks
@@ -0,0 +1,148 @@
+#### IndicatorBenchmarks ####
+# Benchmarks of the indicator math of the policies: the Bollinger bands of BollingerPolicy and its' helpers, and the
+# zone calculation of ZonePolicy.shouldBuy, and the streaming and batch indicators of the Indicators module. The candlesticks are a seeded random walk so every run sees the same
+# prices.
+#
+# The checks (getChecks) compare the bands of RollingBollinger, which BollingerPolicy trades on, with the pandas
+# calculation of BollingerPolicy.__getBollingerBands__ on the same seeded candles.
+
+import random
+import pandas as pd
+from lib.Benchmark import Benchmark
+from lib.Backtester import NullStatusBus
+from lib.CandleSeries import CandleSeries
+from lib import Indicators
+from lib.RollingBollinger import RollingBollinger
+from lib.PolicyContext import PolicyContext
+from policy.BollingerPolicy import BollingerPolicy
+from policy.ZonePolicy import ZonePolicy
+
+# makeCloses
+#   - Purpose:
+#       Generate the closing prices of a number of candlesticks.
+#   - Returns:
+#       A list of floats around 0.0001 BTC.
+def makeCloses(size, seed=0):
+    generator = random.Random(seed)
+    price = 0.0001
+    closes = []
+    for i in range(size):
+        price *= 1.0 + generator.gauss(0.0, 0.01)
+        closes.append(price)
+    return closes
+
+def setupBollingerBands(size):
+    closes = makeCloses(size)
+    period = max(2, size // 2)
+    return lambda: BollingerPolicy.__getBollingerBands__(closes, period)
+
+def setupMakeNormalArray(size):
+    dataframe = pd.DataFrame(makeCloses(size)).rolling(window=max(2, size // 2)).mean()
+    return lambda: BollingerPolicy.__makeNormalArray__(dataframe)
+
+def setupAmplifyGradient():
+    # Gradients from -5e-7 to 5e-7, the size the band slopes of pairs priced in satoshis have
+    gradients = [step * 1e-9 for step in range(-500, 500, 7)]
+    def amplifyAll():
+        for gradient in gradients:
+            BollingerPolicy.__amplifyGradient__(gradient)
+    return amplifyAll
+
+def setupZoneShouldBuy(size):
+    closes = makeCloses(size)
+    candlesticks = CandleSeries(size)
+    for index, close in enumerate(closes):
+        candlesticks.append((index * 300, close, close, close, close, 0.0))
+    context = PolicyContext('BTC_XRP', 300, size, 'MINUTES', candlesticks, NullStatusBus())
+    priceCharts = {'BTC_XRP' : {'last' : str(closes[-1])}}
+    dates = [len(closes) * 300]
+    # A new candle every call, replacing the oldest one, so the zones are updated as they are when a candle arrives
+    def shouldBuy():
+        close = closes[dates[0] // 300 % size]
+        candlesticks.append((dates[0], close, close, close, close, 0.0))
+        dates[0] += 300
+        context.setTicker(priceCharts, '0.0', '0.0')
+        return ZonePolicy.shouldBuy(context)
+    # The zones of the first call are calculated from the whole window
+    shouldBuy()
+    return shouldBuy
+
+def setupIndicatorBatch(size):
+    closes = makeCloses(size)
+    def computeAll():
+        Indicators.sma(closes, 20)
+        Indicators.rollingStd(closes, 20)
+        Indicators.ema(closes, 20)
+        Indicators.rsi(closes, 14)
+        Indicators.macd(closes)
+        Indicators.atr(closes, closes, closes, 14)
+    return computeAll
+
+def setupIndicatorAppend():
+    # One candle added to each streaming indicator, the work a policy does per new candle
+    closes = makeCloses(1000)
+    indicators = [Indicators.RollingStats(20), Indicators.EMA(20), Indicators.RSI(14), Indicators.MACD()]
+    for close in closes:
+        for indicator in indicators:
+            indicator.append(close)
+    atr = Indicators.ATR(14)
+    def appendAll():
+        for indicator in indicators:
+            indicator.append(0.0001)
+        atr.append(0.00011, 0.00009, 0.0001)
+    return appendAll
+
+# checkRollingBollinger
+#   - Purpose:
+#       Stream seeded candles through a RollingBollinger the way the trader does (each candle is first seen while it
+#       is still forming and then with its' final close, and the series drops its' oldest candles once it is full) and
+#       compare the bands after every candle with BollingerPolicy.__getBollingerBands__ of all the closes.
+#   - Parameters:
+#       * (size) The number of candlesticks the series holds. Twice as many are streamed.
+#       * (seed) The seed of the random walk
+#   - Returns:
+#       (float) The largest difference between the two, relative to the value of the band.
+def checkRollingBollinger(size, seed=0):
+    closes = makeCloses(size * 2, seed)
+    period = max(2, size // 2)
+    expected = BollingerPolicy.__getBollingerBands__(closes, period)
+    candlesticks = CandleSeries(size)
+    bollinger = RollingBollinger(period)
+    generator = random.Random(seed + 1)
+    largest = 0.0
+    for index, close in enumerate(closes):
+        date = index * 300
+        forming = close * (1.0 + generator.gauss(0.0, 0.005))
+        candlesticks.append((date, forming, forming, forming, forming, 0.0))
+        bollinger.update(candlesticks, date, 300)
+        candlesticks.replaceLast((date, close, close, close, close, 0.0))
+        bands = bollinger.update(candlesticks, date, 300)
+        if index < period - 1:
+            continue
+        for key in ('sma', 'upperband', 'lowerband'):
+            value = expected[key][index - period + 1]
+            largest = max(largest, abs(bands[key][-1] - value) / abs(value))
+    return largest
+
+# getChecks
+#   - Parameters:
+#       * (sizes) The numbers of candlesticks to run the checks with
+#   - Returns:
+#       A list of (name, function, tolerance) where function returns the largest relative difference found.
+def getChecks(sizes):
+    return [('rollingBollinger[%d]' % (size), lambda size=size: checkRollingBollinger(size), 1e-9) for size in sizes]
+
+# getBenchmarks
+#   - Parameters:
+#       * (sizes) The numbers of candlesticks to run the benchmarks with
+#   - Returns:
+#       A list of Benchmark.
+def getBenchmarks(sizes):
+    benchmarks = [Benchmark('bollinger.amplifyGradient', setupAmplifyGradient),
+                  Benchmark('indicators.append', setupIndicatorAppend)]
+    for size in sizes:
+        benchmarks.append(Benchmark('bollinger.getBollingerBands', lambda size=size: setupBollingerBands(size), size))
+        benchmarks.append(Benchmark('bollinger.makeNormalArray', lambda size=size: setupMakeNormalArray(size), size))
+        benchmarks.append(Benchmark('zone.shouldBuy', lambda size=size: setupZoneShouldBuy(size), size))
+        benchmarks.append(Benchmark('indicators.batch', lambda size=size: setupIndicatorBatch(size), size))
+    return benchmarks
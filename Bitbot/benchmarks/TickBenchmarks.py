@@ -0,0 +1,91 @@
+#### TickBenchmarks ####
+# Benchmarks of a whole TraderThread tick against a StubMarket served in-process by a LoopbackTransport: the ticker
+# fetch, the state check when orders are pending, every pair consulting BollingerPolicy and the status publish,
+# without the sleeps of the loop. The history size is the number of candlesticks handed to the policy.
+#
+# Setting up a tick benchmark overwrites Bitbot_CDO with a testing mode configuration, so these run after the other
+# benchmarks.
+
+import tempfile, os
+from lib import Bitbot_CDO
+from lib.Benchmark import Benchmark
+from lib.Poloniex import poloniex
+from lib.StatusBus import StatusBus
+from lib.PrinterThread import PrinterThread
+from lib.StubExchange import StubMarket, LoopbackTransport
+from lib.TraderThread import TraderThread
+
+# The coins traded by the tick benchmarks (all of them are served by the StubMarket)
+COINS = ['XRP', 'ETH', 'LTC', 'XMR', 'DASH', 'STR', 'DOGE', 'BCH']
+CANDLE_PERIOD = 300
+
+# Temporary directory of the candle cache and log shared by the tick benchmarks of a run
+__directory__ = None
+
+def getDirectory():
+    global __directory__
+    if __directory__ is None:
+        __directory__ = tempfile.mkdtemp(prefix='bitbot-benchmark-')
+    return __directory__
+
+# configure
+#   - Purpose:
+#       Point Bitbot_CDO at a trader which never places real orders, does not follow the push feed and keeps its'
+#       candle cache and log in a temporary directory. period_unit MINUTES makes the history twice the measurement
+#       period in candles.
+def configure(size, pairs, directory):
+    Bitbot_CDO.testing_mode = 'True'
+    Bitbot_CDO.enable_push_feed = 'False'
+    Bitbot_CDO.policy_file = 'policy.BollingerPolicy'
+    Bitbot_CDO.crypto_coin = ','.join(COINS[:pairs])
+    Bitbot_CDO.period_unit = 'MINUTES'
+    Bitbot_CDO.measurement_period = str(max(2, size // 2))
+    Bitbot_CDO.candlestick_period = str(CANDLE_PERIOD)
+    Bitbot_CDO.candle_cache_dir = os.path.join(directory, 'cache')
+    Bitbot_CDO.bitbot_log = os.path.join(directory, 'bitbot.log')
+
+# setupTick
+#   - Purpose:
+#       Create a TraderThread trading against a StubMarket and tick it once so the candlesticks are cached.
+#   - Parameters:
+#       * (size) The number of candlesticks each pair hands to its' policy
+#       * (pairs) The number of pairs traded
+#       * (refreshCandles) Refresh the candlesticks of every pair from the candle cache on every tick
+#   - Returns:
+#       A function running one tick.
+def setupTick(size, pairs, refreshCandles=False):
+    configure(size, pairs, getDirectory())
+    statusBus = StatusBus()
+    poloniexAPI = poloniex('API_KEY', 'API_SECRET', LoopbackTransport(StubMarket()))
+    trader = TraderThread(0, 'TraderThread', statusBus, poloniexAPI)
+    pairTraders = trader.__pair_traders__
+    state = {'accountBalances' : trader.__checkState__()}
+
+    # The same steps as one iteration of TraderThread.run
+    def tick():
+        if refreshCandles:
+            for pairTrader in pairTraders:
+                pairTrader.__next_candle_refresh__ = 0.0
+        priceCharts = poloniexAPI.returnTicker()
+        if any(pairTrader.ordersArePending() for pairTrader in pairTraders):
+            state['accountBalances'] = trader.__updateOrders__()
+        trader.__tickPairs__(priceCharts, pairTraders)
+        state['accountBalances'] = trader.getAccountCache().getBalances() or state['accountBalances']
+        statusBus.publish(PrinterThread.TICKER_KEY, state['accountBalances'])
+
+    tick()
+    return tick
+
+# getBenchmarks
+#   - Parameters:
+#       * (sizes) The numbers of candlesticks each pair hands to its' policy
+#   - Returns:
+#       A list of Benchmark.
+def getBenchmarks(sizes):
+    benchmarks = []
+    for size in sizes:
+        benchmarks.append(Benchmark('trader.tick', lambda size=size: setupTick(size, 4), size))
+        benchmarks.append(Benchmark('trader.tickWithCandleRefresh', lambda size=size: setupTick(size, 4, True), size))
+    for pairs in (1, 8):
+        benchmarks.append(Benchmark('trader.tick.pairs%d' % (pairs), lambda pairs=pairs: setupTick(1000, pairs), 1000))
+    return benchmarks
@@ -0,0 +1,27 @@
+#### benchmarks ####
+# The benchmarks run by Benchmark.py. Every module has a getBenchmarks(sizes) function returning its' Benchmarks, and
+# may have a getChecks(sizes) function returning numeric checks run with --verify.
+
+from benchmarks import IndicatorBenchmarks, ClientBenchmarks, TickBenchmarks
+
+# The tick benchmarks change Bitbot_CDO so they come last
+MODULES = [IndicatorBenchmarks, ClientBenchmarks, TickBenchmarks]
+
+# getBenchmarks
+#   - Returns:
+#       Every Benchmark of the suite at the given history sizes.
+def getBenchmarks(sizes):
+    benchmarks = []
+    for module in MODULES:
+        benchmarks.extend(module.getBenchmarks(sizes))
+    return benchmarks
+
+# getChecks
+#   - Returns:
+#       Every numeric check of the suite at the given history sizes, as (name, function, tolerance).
+def getChecks(sizes):
+    checks = []
+    for module in MODULES:
+        if hasattr(module, 'getChecks'):
+            checks.extend(module.getChecks(sizes))
+    return checks
@@ -0,0 +1,117 @@
+#### AccountCache ####
+# Holds the latest balances of the account in the format of returnCompleteBalances (the available balance and the
+# balance held by open orders of every currency) so the state check, the reconciliation of the order tracker and the
+# orders all read the one copy instead of fetching returnBalances and returnCompleteBalances separately. An order is
+# placed without first waiting on a balance request as long as the copy is younger than account_cache_max_age.
+#
+# The copy is written through by the OrderTracker: placing an order moves its' balance from available to onOrders and
+# every fill pays for it out of onOrders and credits what it bought. An order that fails invalidates the copy, so the
+# next one fetches the balances again. The btcValue of a currency is only updated when the balances are fetched.
+
+import threading, time
+from lib import Bitbot_CDO
+from lib.Amounts import roundAmount
+
+class AccountCache(object):
+
+#   __init__
+#       - Parameters:
+#           * (poloniexAPI) A poloniex class used to fetch the balances
+#           * (maxAge) Seconds the balances are used for before they are fetched again
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, poloniexAPI, maxAge=60.0):
+        self.__poloniexAPI__ = poloniexAPI
+        self.__max_age__ = float(maxAge)
+        self.__lock__ = threading.RLock()
+        self.__balances__ = None        # currency -> [available, onOrders, btcValue], None until fetched
+        self.__fetched__ = None
+
+#   isStale
+#       - Returns:
+#           (bool) True if the balances have not been fetched, were invalidated or are older than the maximum age.
+    def isStale(self):
+        with self.__lock__:
+            return self.__fetched__ is None or time.monotonic() - self.__fetched__ > self.__max_age__
+
+#   refresh
+#       - Purpose:
+#           Fetch the balances if they are stale (or always if forced). Callers using the asyncio client fetch them
+#           themselves and pass them to setCompleteBalances instead.
+    def refresh(self, force=False):
+        if force or self.isStale():
+            self.setCompleteBalances(self.__poloniexAPI__.returnCompleteBalances())
+
+#   setCompleteBalances
+#       - Parameters:
+#           * (response) The dictionary returned by returnCompleteBalances
+    def setCompleteBalances(self, response):
+        if 'error' in response:
+            raise Exception("returnCompleteBalances failed: %s" % (response['error']))
+        balances = dict((currency, [float(balance['available']), float(balance['onOrders']), float(balance['btcValue'])])
+                        for currency, balance in response.items())
+        with self.__lock__:
+            self.__balances__ = balances
+            self.__fetched__ = time.monotonic()
+
+#   invalidate
+#       - Purpose:
+#           Make the next read fetch the balances again (i.e. an order failed so the copy may be wrong).
+    def invalidate(self):
+        with self.__lock__:
+            self.__fetched__ = None
+
+#   adjust
+#       - Purpose:
+#           Write a change of the balance of a currency through to the copy. Nothing is changed before the balances
+#           have been fetched.
+#       - Parameters:
+#           * (currency) The currency e.g. "BTC"
+#           * (available) The change of the available balance
+#           * (onOrders) The change of the balance held by open orders
+    def adjust(self, currency, available=0.0, onOrders=0.0):
+        with self.__lock__:
+            if self.__balances__ is None:
+                return
+            balance = self.__balances__.setdefault(currency, [0.0, 0.0, 0.0])
+            # Balances are kept to the 8 decimals of the exchange so rounding leaves no dust which would look like a
+            # balance. The changes are already rounded as the exchange rounds them (see OrderTracker.__applyTrade__),
+            # so this only removes the error of the float addition.
+            balance[0] = max(0.0, roundAmount(balance[0] + available))
+            balance[1] = max(0.0, roundAmount(balance[1] + onOrders))
+
+#   getCompleteBalances
+#       - Purpose:
+#           Return the balances, fetching them first if they are stale.
+#       - Returns:
+#           A dictionary in the format of returnCompleteBalances.
+    def getCompleteBalances(self):
+        self.refresh()
+        return self.peekCompleteBalances()
+
+#   peekCompleteBalances
+#       - Returns:
+#           The balances held in the format of returnCompleteBalances without fetching them, or None if they have
+#           never been fetched.
+    def peekCompleteBalances(self):
+        with self.__lock__:
+            if self.__balances__ is None:
+                return None
+            return dict((currency, {'available' : '%.8f' % (available), 'onOrders' : '%.8f' % (onOrders), 'btcValue' : '%.8f' % (btcValue)})
+                        for currency, (available, onOrders, btcValue) in self.__balances__.items())
+
+#   getBalances
+#       - Returns:
+#           A dictionary of currency -> available balance in the format of returnBalances without fetching it, or
+#           None if the balances have never been fetched.
+    def getBalances(self):
+        with self.__lock__:
+            if self.__balances__ is None:
+                return None
+            return dict((currency, '%.8f' % (balance[0])) for currency, balance in self.__balances__.items())
+
+# createAccountCache
+#   - Purpose:
+#       Build an AccountCache from the account_cache_max_age configuration.
+def createAccountCache(poloniexAPI):
+    return AccountCache(poloniexAPI, float(getattr(Bitbot_CDO, 'account_cache_max_age', 60.0)))
@@ -0,0 +1,43 @@
+#### Amounts ####
+# Poloniex keeps every balance, rate and amount to 8 decimals (1 satoshi for BTC). The functions here are the one
+# place Bitbot rounds to them, so the orders PairTrader places, the balances the AccountCache keeps and the balances
+# the stub exchange holds are all rounded the same way. A fill costs its' getTradeTotal and credits its' getProceeds
+# on the stub exchange and in the AccountCache alike, so the cached balances stay equal to the exchange's.
+
+import math
+
+# floorAmount
+#   - Purpose:
+#       Round a rate, amount or balance down to 8 decimals. The product is rounded first so a value which is exact to
+#       8 decimals is not taken down by the error of the multiplication.
+#   - Returns:
+#       (float) The value rounded down.
+def floorAmount(value):
+    return math.floor(round(float(value) * 1e8, 4)) / 1e8
+
+# roundAmount
+#   - Returns:
+#       (float) The value rounded to the nearest 8 decimals.
+def roundAmount(value):
+    return round(float(value) * 1e8) / 1e8
+
+# getTradeTotal
+#   - Purpose:
+#       Work out what a trade costs (or pays before the fee): the rate times the amount to the nearest 8 decimals,
+#       which is the total the exchange lists for the trade. It is also what a buy order holds while it is open.
+#   - Returns:
+#       (float) The total in the principal currency.
+def getTradeTotal(rate, amount):
+    return roundAmount(float(rate) * float(amount))
+
+# getProceeds
+#   - Purpose:
+#       Work out what a fill credits: what was received less the fee, rounded down as the exchange never credits
+#       more than it took the fee from.
+#   - Parameters:
+#       * (received) The amount of the coin a buy received, or the total a sell received
+#       * (fee) The fee as a fraction
+#   - Returns:
+#       (float) The amount credited.
+def getProceeds(received, fee):
+    return floorAmount(float(received) * (1.0 - float(fee)))
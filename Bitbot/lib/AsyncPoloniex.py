@@ -0,0 +1,51 @@
+#### AsyncPoloniex ####
+# The asyncio version of the poloniex client. It has every method of poloniex, but api_query is a coroutine so each
+# method returns an awaitable (i.e. await asyncPoloniexAPI.returnTicker()) and independent requests can be sent
+# together with asyncio.gather.
+#
+# Signed requests carry a nonce which the exchange requires to be greater than the last one it saw. The nonce is
+# taken and the request written to its' connection under a lock, so the requests leave in nonce order while their
+# responses are still awaited concurrently. Requests sent on different connections can still reach the exchange out
+# of order; a request rejected for its' nonce was not carried out and is signed again with a new nonce once.
+
+import asyncio, time
+from lib.Poloniex import poloniex
+from lib.AsyncTransport import AsyncHttpTransport
+
+class asyncPoloniex(poloniex):
+
+    def __init__(self, APIKey, Secret, transport=None, scheduler=None):
+        super(asyncPoloniex, self).__init__(APIKey, Secret, transport if transport is not None else AsyncHttpTransport(), scheduler)
+        self.sign_lock = None
+
+    async def api_query(self, command, req=None):
+        start = time.perf_counter()
+        try:
+            if self.scheduler is not None:
+                response = await self.scheduler.callAsync(command, req, lambda: self.send_query(command, req))
+            else:
+                response = await self.send_query(command, req)
+        except Exception:
+            self.record_query(command, start, None)
+            raise
+        self.record_query(command, start, response)
+        return response
+
+    # Sends a request, signing it again once if the exchange rejected its' nonce.
+    async def send_query(self, command, req=None):
+        response = await self.send_request(command, req)
+        if isinstance(response, dict) and str(response.get('error', '')).startswith('Nonce must be greater'):
+            response = await self.send_request(command, req)
+        return response
+
+    # Sends one request and decodes its' response. Signed requests are written in nonce order.
+    async def send_request(self, command, req=None):
+        if command in self.PUBLIC_COMMANDS:
+            exchange = await self.transport.send(*self.build_request(command, req))
+        else:
+            # The lock is created here so it belongs to the event loop running the client.
+            if self.sign_lock is None:
+                self.sign_lock = asyncio.Lock()
+            async with self.sign_lock:
+                exchange = await self.transport.send(*self.build_request(command, req))
+        return self.parse_response(command, await self.transport.receive(exchange))
@@ -0,0 +1,274 @@
+#### AsyncTraderThread ####
+# This class is a TraderThread which runs its' pairs on an asyncio event loop with the asyncPoloniex client. The
+# requests that do not depend on each other are sent together each tick:
+#
+#   - The ticker, the status of the tracked orders that are due a check (or the account state, returnCompleteBalances
+#     and returnOpenOrders, when it has to be reconciled) and the candlesticks of every pair that is due a refresh.
+#   - The orders of every pair whose policy said to buy or sell, after one shared returnCompleteBalances if the
+#     balances of the account cache are stale.
+#
+# A tick therefore takes about as long as the slowest of its' requests instead of their sum, and any number of
+# pairs are hosted by the one thread. Enabled with use_asyncio_trader in bitbot.config.
+#
+# The push feed (enable_push_feed) is not followed: the ticker is polled every action_interval as if it were disabled,
+# and an error saying so is published at startup.
+
+import asyncio, datetime, time
+from lib.PrinterThread import PrinterThread
+from lib import Bitbot_CDO
+from lib import Metrics
+from lib.TraderThread import TraderThread, getAllocations
+
+class AsyncTraderThread(TraderThread):
+
+    __follows_push_feed__ = False
+
+#   run
+#       - Purpose:
+#           The thread entry point. Runs the event loop until the thread is stopped.
+    def run(self):
+        return asyncio.run(self.__main__())
+
+#   __main__
+#       - Purpose:
+#           The trading loop. Does the same as TraderThread.run but sends the requests of a tick concurrently.
+    async def __main__(self):
+
+        print('Trader running...')
+        startTime = datetime.datetime.now().replace(microsecond=0)
+        accountBalances = {}
+
+        # Check user account balances and determine whether each pair starts by selling or buying. Check if there are open orders.
+        try:
+            accountBalances = await self.__checkState__()
+        except Exception as e:
+            self.statusBus.publish("Error", "Error connecting to Poloniex account: %s" % (str(e)))
+            return 4
+
+        self.statusBus.publish("Coin", ', '.join([pairTrader.getSubjectCurrency() for pairTrader in self.__pair_traders__]))
+        self.__startup__.mark('account state')
+
+        try:
+            # Begin main loop
+            loopStart = None
+            while not self._stop_event.is_set():
+                previousStart, loopStart = loopStart, time.monotonic()
+                if previousStart is not None:
+                    Metrics.registry.observe('bitbot_loop_period_seconds', loopStart - previousStart)
+                self.__profiler__.startTick()
+
+                # Fetch the ticker, the state of the orders if some are pending and the candlesticks that are due together.
+                pending = any(pairTrader.ordersArePending() for pairTrader in self.__pair_traders__)
+                checkState = pending and self.__stateCheckIsDue__()
+                pollOrders = pending and not checkState and self.__order_tracker__.isDue()
+                refreshing = [pairTrader for pairTrader in self.__pair_traders__ if pairTrader.candlesAreDue()]
+                requests = [self.__poloniexAPI__.returnTicker()]
+                if checkState:
+                    requests.append(self.__checkState__())
+                elif pollOrders:
+                    requests.append(self.__pollOrders__())
+                requests.extend(self.__refreshCandles__(pairTrader) for pairTrader in refreshing)
+                # The requests overlap, so the state check and candle refresh are timed as part of the ticker fetch.
+                with self.__profiler__.phase('ticker fetch'):
+                    results = await asyncio.gather(*requests, return_exceptions=True)
+
+                priceCharts = results[0]
+                if isinstance(priceCharts, Exception):
+                    self.__reportError__('Error retrieving poloniex ticker feed: %s' % (str(priceCharts)))
+                    priceCharts = None
+                if checkState or pollOrders:
+                    if isinstance(results[1], Exception):
+                        self.__reportError__('Error retrieving open orders: %s' % (str(results[1])))
+                    elif checkState:
+                        accountBalances = results[1]
+
+                # Pairs whose candlesticks could not be refreshed sit this tick out, as in TraderThread.
+                skipped = set()
+                for pairTrader, result in zip(refreshing, results[len(results) - len(refreshing):]):
+                    if isinstance(result, Exception):
+                        pairTrader.reportError('Error retrieving %s candlesticks: %s' % (pairTrader.getCurrencyPair(), str(result)))
+                        skipped.add(pairTrader)
+
+                if priceCharts is not None:
+                    await self.__tick__(priceCharts, skipped)
+                    accountBalances = self.__account_cache__.getBalances() or accountBalances
+                    with self.__profiler__.phase('status publish'):
+                        self.statusBus.publish(PrinterThread.TICKER_KEY, accountBalances)
+                Metrics.registry.observe('bitbot_tick_seconds', time.monotonic() - loopStart)
+                self.__profiler__.endTick()
+                self.__reportStartup__()
+
+                # Sleep in short steps so the thread quits sleeping when the user wants to quit the program. Orders
+                # due a check are polled in between so a fill is noticed before the next tick.
+                for i in range(0, self.__request_interval__):
+                    if self._stop_event.is_set():
+                        break
+                    uptime = datetime.datetime.now().replace(microsecond=0) - startTime
+                    self.statusBus.publish("Uptime", uptime)
+                    if self.__order_tracker__.isDue() and not self.__stateCheckIsDue__():
+                        try:
+                            with self.__profiler__.phase('state check'):
+                                await self.__pollOrders__()
+                            self.statusBus.publish(PrinterThread.TICKER_KEY, self.__account_cache__.getBalances())
+                        except Exception as e:
+                            self.__Logger__.writeEvent('error', 'Error retrieving open orders: %s' % (str(e)))
+                    with self.__profiler__.phase('sleep'):
+                        await asyncio.sleep(1)
+        finally:
+            self.__poloniexAPI__.transport.close()
+        return 0
+
+#   __tick__
+#       - Purpose:
+#           Consult the policy of every pair and place the orders they ask for concurrently.
+#       - Parameters:
+#           * (priceCharts) The dictionary returned by returnTicker
+#           * (skipped) The pairs which should not trade this tick
+    async def __tick__(self, priceCharts, skipped):
+        # The available BTC is split evenly between the pairs that are looking to buy, as the TraderThread does
+        buyingPairs = self.__getBuyingPairs__()
+
+        actions = []
+        for pairTrader in self.__pair_traders__:
+            if pairTrader in skipped:
+                continue
+            try:
+                action = pairTrader.decide(priceCharts)
+            except Exception as e:
+                self.__reportError__('Error trading %s: %s' % (pairTrader.getCurrencyPair(), str(e)))
+                continue
+            actions.append((pairTrader, action))
+
+        ordering = [(pairTrader, action) for pairTrader, action in actions if action is not None]
+        if ordering:
+            if bool(Bitbot_CDO.testing_mode):
+                results = [None] * len(ordering)
+            else:
+                try:
+                    with self.__profiler__.phase('order submission'):
+                        completeBalances = await self.__fetchOrderState__([pairTrader for pairTrader, action in ordering], priceCharts)
+                        available = float(completeBalances[self.__principalCurrency__]['available'])
+                        allocations = getAllocations(buyingPairs, available, available)
+                        orders = [pairTrader.getOrder(priceCharts, completeBalances, allocations.get(pairTrader, 1.0)) for pairTrader, action in ordering]
+                        receipts = await asyncio.gather(*[getattr(self.__poloniexAPI__, command)(currencyPair, rate, amount, immediateOrCancel=immediateOrCancel)
+                                                          for command, currencyPair, rate, amount, immediateOrCancel in orders],
+                                                        return_exceptions=True)
+                    results = []
+                    for (pairTrader, action), order, receipt in zip(ordering, orders, receipts):
+                        try:
+                            if isinstance(receipt, Exception):
+                                raise receipt
+                            command, currencyPair, rate, amount, immediateOrCancel = order
+                            results.append(self.__order_tracker__.track(currencyPair, command, rate, amount, receipt))
+                        except Exception as e:
+                            results.append(e)
+                except Exception as e:
+                    results = [e] * len(ordering)
+
+            for (pairTrader, action), result in zip(ordering, results):
+                if isinstance(result, Exception):
+                    pairTrader.orderFailed(action, result)
+                else:
+                    pairTrader.orderPlaced(action)
+            self.__updatePairs__()
+
+        with self.__profiler__.phase('status publish'):
+            for pairTrader, action in actions:
+                if pairTrader.ordersArePending() or action is None:
+                    pairTrader.publishStatus()
+
+#   __fetchOrderState__
+#       - Purpose:
+#           Fetch the complete balances if the account cache is stale together with the stale order books of the
+#           pairs about to place orders when order book execution is enabled. A book that cannot be fetched leaves
+#           its' pair ordering at the last price.
+#       - Returns:
+#           The complete balances of the account cache in the format of returnCompleteBalances.
+    async def __fetchOrderState__(self, pairTraders, priceCharts):
+        orderBooks = self.__order_books__
+        stalePairs = []
+        if orderBooks is not None:
+            stalePairs = [pairTrader.getCurrencyPair() for pairTrader in pairTraders
+                          if orderBooks.isStale(pairTrader.getCurrencyPair(), priceCharts[pairTrader.getCurrencyPair()])]
+        requests = [self.__poloniexAPI__.returnOrderBook(currencyPair, orderBooks.getDepth()) for currencyPair in stalePairs]
+        fetchBalances = self.__account_cache__.isStale()
+        if fetchBalances:
+            requests.append(self.__poloniexAPI__.returnCompleteBalances())
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        if fetchBalances:
+            if isinstance(results[-1], Exception):
+                raise results[-1]
+            self.__account_cache__.setCompleteBalances(results[-1])
+        for currencyPair, response in zip(stalePairs, results):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                orderBooks.setBook(currencyPair, response)
+            except Exception as e:
+                self.__reportError__('Error retrieving %s order book: %s' % (currencyPair, str(e)))
+        return self.__account_cache__.peekCompleteBalances()
+
+#   __pollOrders__
+#       - Purpose:
+#           Check the tracked orders which are due together: their status first, then the trades of the ones which
+#           closed or filled further. The pairs whose orders finished update their state from the tracked balances.
+    async def __pollOrders__(self):
+        orderTracker = self.__order_tracker__
+        due = orderTracker.getDueOrders()
+        statuses = await asyncio.gather(*[self.__poloniexAPI__.returnOrderStatus(orderNumber) for orderNumber in due], return_exceptions=True)
+        changed = []
+        for orderNumber, status in zip(due, statuses):
+            try:
+                if isinstance(status, Exception):
+                    raise status
+                if orderTracker.applyStatus(orderNumber, status):
+                    changed.append(orderNumber)
+            except Exception as e:
+                self.__Logger__.writeEvent('error', 'Error checking order %s: %s' % (orderNumber, str(e)))
+
+        trades = await asyncio.gather(*[self.__poloniexAPI__.returnOrderTrades(orderNumber) for orderNumber in changed], return_exceptions=True)
+        for orderNumber, orderTrades in zip(changed, trades):
+            try:
+                if isinstance(orderTrades, Exception):
+                    raise orderTrades
+                orderTracker.applyTrades(orderNumber, orderTrades)
+            except Exception as e:
+                self.__Logger__.writeEvent('error', 'Error checking order %s: %s' % (orderNumber, str(e)))
+        self.__updatePairs__()
+
+#   __refreshCandles__
+#       - Purpose:
+#           Download the candlesticks a pair is missing from the candle cache concurrently and hand the pair its'
+#           refreshed history.
+    async def __refreshCandles__(self, pairTrader):
+        pairTrader.startCandleRefresh()
+        currencyPair = pairTrader.getCurrencyPair()
+        candlePeriod = int(Bitbot_CDO.candlestick_period)
+        startDate, endDate = pairTrader.getCandleRange()
+        downloadRanges = self.__candleCache__.getDownloadRanges(currencyPair, candlePeriod, startDate, endDate)
+        chartData = await asyncio.gather(*[self.__poloniexAPI__.returnChartData(currencyPair, int(downloadRange[0]), int(downloadRange[1]), candlePeriod)
+                                           for downloadRange in downloadRanges])
+        for downloadRange, history in zip(downloadRanges, chartData):
+            self.__candleCache__.addChartData(currencyPair, candlePeriod, downloadRange, history)
+        pairTrader.setCandleSticks(self.__candleCache__.getStoredCandles(currencyPair, candlePeriod, startDate, endDate))
+
+#   __checkState__
+#       - Purpose:
+#           Fetch the account balances and the open orders of every market together and let each pair decide whether
+#           it should be selling or buying and whether its' orders have cleared. The balances are stored in the
+#           account cache and the order tracker is reconciled with the open orders.
+#       - Return:
+#           The account balances dictionary in the format of returnBalances.
+    async def __checkState__(self):
+        completeBalances, openOrders = await asyncio.gather(self.__poloniexAPI__.returnCompleteBalances(),
+                                                            self.__poloniexAPI__.returnOpenOrders('all'))
+        self.__account_cache__.setCompleteBalances(completeBalances)
+        accountBalances = self.__account_cache__.getBalances()
+        self.__order_tracker__.reconcile(openOrders)
+        for pairTrader in self.__pair_traders__:
+            pairTrader.updateState(accountBalances, openOrders)
+        return accountBalances
+
+    def __reportError__(self, mesg):
+        self.statusBus.publish("Error", mesg)
+        self.__Logger__.writeEvent('error', mesg)
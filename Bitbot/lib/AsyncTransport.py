@@ -0,0 +1,235 @@
+#### AsyncTransport ####
+# The asyncio version of HttpTransport. Requests are HTTP/1.1 over asyncio streams so any number of them can be in
+# flight at once on one event loop, each on its' own keep-alive connection. Idle connections are kept in a pool and
+# reused. Sending a request and reading its' response are separate steps (send/receive) so the async poloniex client
+# can write its' signed requests in nonce order and then wait for all of the responses together.
+
+import asyncio, ssl, gzip, zlib
+from urllib.parse import urlsplit
+from lib import Bitbot_CDO
+from lib.HttpTransport import TransportError
+
+class AsyncHttpTransport(object):
+
+    # Errors raised when a pooled connection was closed by the server while it sat idle. The request is sent again
+    # on a new connection.
+    __STALE_CONNECTION_ERRORS__ = (asyncio.IncompleteReadError, ConnectionResetError, ConnectionAbortedError,
+                                   BrokenPipeError)
+
+#   __init__
+#       - Parameters:
+#           * (baseUrl) Scheme, host and optional port of the exchange (i.e. https://poloniex.com)
+#           * (connectTimeout) Seconds allowed to open a connection
+#           * (readTimeout) Seconds allowed to wait for a response once the request has been sent
+#           * (poolSize) The most idle connections kept open for reuse
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, baseUrl='https://poloniex.com', connectTimeout=5.0, readTimeout=15.0, poolSize=4):
+        url = urlsplit(baseUrl)
+        self.__scheme__ = url.scheme
+        self.__host__ = url.hostname
+        self.__port__ = url.port or (443 if url.scheme == 'https' else 80)
+        self.__base_path__ = url.path.rstrip('/')
+        self.__connect_timeout__ = float(connectTimeout)
+        self.__read_timeout__ = float(readTimeout)
+        self.__pool_size__ = int(poolSize)
+        self.__pool__ = []
+        self.__ssl_context__ = ssl.create_default_context() if url.scheme == 'https' else None
+
+#   request
+#       - Purpose:
+#           Send a request over a pooled connection and return the response body.
+#       - Parameters:
+#           * (method) 'GET' or 'POST'
+#           * (path) The path and query string (i.e. /public?command=returnTicker)
+#           * (body) The request body as bytes or None
+#           * (headers) A dictionary of extra request headers
+#       - Returns:
+#           (bytes) The decompressed response body.
+    async def request(self, method, path, body=None, headers=None):
+        exchange = await self.send(method, path, body, headers)
+        return await self.receive(exchange)
+
+#   send
+#       - Purpose:
+#           Write a request to a pooled connection without waiting for the response.
+#       - Returns:
+#           An exchange to pass to receive.
+    async def send(self, method, path, body=None, headers=None):
+        requestBytes = self.__encode__(method, path, body, headers)
+        connection, reused = await self.__getConnection__()
+        try:
+            connection[1].write(requestBytes)
+            await connection[1].drain()
+        except self.__STALE_CONNECTION_ERRORS__:
+            self.__closeConnection__(connection)
+            if not reused:
+                raise
+            connection, reused = await self.__newConnection__(), False
+            try:
+                connection[1].write(requestBytes)
+                await connection[1].drain()
+            except BaseException:
+                self.__closeConnection__(connection)
+                raise
+        except BaseException:
+            self.__closeConnection__(connection)
+            raise
+        return (connection, reused, requestBytes)
+
+#   receive
+#       - Purpose:
+#           Read the response of a request written by send.
+#       - Returns:
+#           (bytes) The decompressed response body.
+    async def receive(self, exchange):
+        connection, reused, requestBytes = exchange
+        try:
+            response = await asyncio.wait_for(self.__readResponse__(connection[0]), self.__read_timeout__)
+        except self.__STALE_CONNECTION_ERRORS__:
+            self.__closeConnection__(connection)
+            if not reused:
+                raise
+            connection = await self.__newConnection__()
+            try:
+                connection[1].write(requestBytes)
+                await connection[1].drain()
+                response = await asyncio.wait_for(self.__readResponse__(connection[0]), self.__read_timeout__)
+            except BaseException:
+                self.__closeConnection__(connection)
+                raise
+        except BaseException:
+            self.__closeConnection__(connection)
+            raise
+
+        status, reason, responseBody, willClose = response
+        if willClose:
+            self.__closeConnection__(connection)
+        else:
+            self.__releaseConnection__(connection)
+
+        if status >= 400:
+            raise TransportError(status, reason, responseBody.decode('utf-8', 'replace'))
+        return responseBody
+
+#   close
+#       - Purpose:
+#           Close every idle connection in the pool.
+    def close(self):
+        pool = self.__pool__
+        self.__pool__ = []
+        for connection in pool:
+            self.__closeConnection__(connection)
+
+#   __encode__
+#       - Returns:
+#           (bytes) The request line, headers and body.
+    def __encode__(self, method, path, body, headers):
+        requestHeaders = {'Host' : self.__host__, 'Accept-Encoding' : 'gzip, deflate', 'Connection' : 'keep-alive'}
+        if body is not None:
+            requestHeaders['Content-Type'] = 'application/x-www-form-urlencoded'
+            requestHeaders['Content-Length'] = str(len(body))
+        if headers:
+            requestHeaders.update(headers)
+
+        lines = ["%s %s HTTP/1.1" % (method, self.__base_path__ + path)]
+        lines.extend("%s: %s" % (name, value) for name, value in requestHeaders.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+#   __readResponse__
+#       - Purpose:
+#           Read one whole response so the connection can be reused.
+#       - Returns:
+#           A tuple of (status, reason, body, willClose).
+    async def __readResponse__(self, reader):
+        while True:
+            statusLine = await reader.readline()
+            if not statusLine:
+                raise ConnectionResetError("Connection closed by the server")
+            parts = statusLine.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            version, status, reason = parts[0], int(parts[1]), parts[2] if len(parts) > 2 else ''
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, separator, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            # Skip interim responses (100 Continue)
+            if status >= 200:
+                break
+
+        connectionHeader = headers.get('connection', '').lower()
+        willClose = connectionHeader == 'close' or (version == 'HTTP/1.0' and connectionHeader != 'keep-alive')
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip(), 16)
+                if size == 0:
+                    # Trailer headers end with an empty line
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            responseBody = b''.join(chunks)
+        elif 'content-length' in headers:
+            responseBody = await reader.readexactly(int(headers['content-length']))
+        else:
+            responseBody = await reader.read()
+            willClose = True
+
+        encoding = headers.get('content-encoding', '')
+        if encoding == 'gzip':
+            responseBody = gzip.decompress(responseBody)
+        elif encoding == 'deflate':
+            responseBody = zlib.decompress(responseBody)
+        return (status, reason, responseBody, willClose)
+
+#   __getConnection__
+#       - Returns:
+#           A tuple of (connection, reused). The most recently used idle connection is preferred as it is the least
+#           likely to have been closed by the server. Connections the server has already closed are dropped.
+    async def __getConnection__(self):
+        while self.__pool__:
+            connection = self.__pool__.pop()
+            if connection[0].at_eof() or connection[1].is_closing():
+                self.__closeConnection__(connection)
+                continue
+            return (connection, True)
+        return (await self.__newConnection__(), False)
+
+#   __newConnection__
+#       - Purpose:
+#           Open a connection with the connect timeout. asyncio disables Nagle's algorithm on TCP connections.
+#       - Returns:
+#           A (reader, writer) tuple.
+    async def __newConnection__(self):
+        if self.__ssl_context__ is not None:
+            return await asyncio.wait_for(asyncio.open_connection(self.__host__, self.__port__, ssl=self.__ssl_context__,
+                                                                  server_hostname=self.__host__), self.__connect_timeout__)
+        return await asyncio.wait_for(asyncio.open_connection(self.__host__, self.__port__), self.__connect_timeout__)
+
+    def __releaseConnection__(self, connection):
+        if len(self.__pool__) < self.__pool_size__:
+            self.__pool__.append(connection)
+        else:
+            self.__closeConnection__(connection)
+
+    def __closeConnection__(self, connection):
+        connection[1].close()
+
+# createAsyncTransport
+#   - Purpose:
+#       Build an AsyncHttpTransport from the same api_url, http_connect_timeout, http_read_timeout and http_pool_size
+#       configurations as createTransport.
+#   - Returns:
+#       An AsyncHttpTransport.
+def createAsyncTransport():
+    return AsyncHttpTransport(getattr(Bitbot_CDO, 'api_url', 'https://poloniex.com'),
+                              float(getattr(Bitbot_CDO, 'http_connect_timeout', 5.0)),
+                              float(getattr(Bitbot_CDO, 'http_read_timeout', 15.0)),
+                              int(getattr(Bitbot_CDO, 'http_pool_size', 4)))
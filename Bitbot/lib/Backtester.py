@@ -0,0 +1,171 @@
+#### Backtester ####
+# This class replays stored candlestick history through a trading policy without contacting Poloniex. Every candle
+# is treated as one trader tick: the candle's closing price is used as the ticker price and the policy receives the
+# same PolicyContext the PairTrader hands it (the candlesticks of the measurement window ending at that candle). Orders are assumed to fill immediately at the closing price minus the trading fee.
+#
+# The candlesticks handed to the policy are a CandleSeries holding the measurement window, as in the TraderThread.
+# Each step appends one candle to it, so a step does not copy the measurement window.
+
+import numpy as np
+from lib.CandleCache import getWindowSeconds
+from lib.CandleSeries import CandleSeries
+from lib.PolicyContext import PolicyContext
+from policy.PolicyTemplate import getPolicyInterface
+
+class NullStatusBus(object):
+    """Stands in for the StatusBus during a backtest. Everything published on it is discarded."""
+
+    def publish(self, key, value):
+        pass
+
+    def remove(self, key):
+        pass
+
+class Backtester(object):
+
+    # Constants (same values as the TraderThread)
+    __BUY_PHASE__ = 0
+    __SELL_PHASE__ = 1
+
+#   __init__
+#       - Parameters:
+#           * (policyClass) A class implementing PolicyTemplate
+#           * (currencyPair) The currency pair the candles belong to e.g. "BTC_XRP"
+#           * (candles) A list of candle dictionaries ordered by date (the format returned by returnChartData), or
+#                       a NumPy array of their rows (see getCandleRows), which is used without being copied
+#           * (candlePeriod) The candlestick period in seconds
+#           * (measurementPeriod) The n number of units used when calculating the Bollinger bands
+#           * (periodUnit) The unit of the measurement period (DAYS, HOURS, MINUTES)
+#           * (fee) The trading fee taken from every order as a fraction (0.002 = 0.2%)
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, policyClass, currencyPair, candles, candlePeriod, measurementPeriod, periodUnit, fee=0.002):
+        self.__policy_class__ = policyClass
+        self.__currency_pair__ = currencyPair
+        self.__candlestick_period__ = int(candlePeriod)
+        self.__measurement_period__ = int(measurementPeriod)
+        self.__period_unit__ = periodUnit
+        self.__fee__ = float(fee)
+        self.__rows__ = candles if isinstance(candles, np.ndarray) else getCandleRows(candles)
+        self.__closes__ = self.__rows__[:, CandleSeries.CLOSE]
+        self.statusBus = NullStatusBus()
+        self.__window_length__ = getWindowLength(self.__measurement_period__, periodUnit, self.__candlestick_period__)
+
+#   run
+#       - Purpose:
+#           Replay the candles through the policy and simulate the buy/sell state machine of the TraderThread. The
+#           account starts with a balance of 1.0 in the principal currency and in the buy phase.
+#       - Returns:
+#           A dictionary containing:
+#               { 'profit' : percent gain of the account value,
+#                 'buys' : number of buy orders,
+#                 'sells' : number of sell orders,
+#                 'winning_sells' : number of sells above the buy price,
+#                 'max_drawdown' : largest percent drop of the account value from a previous high,
+#                 'candles' : number of candles replayed,
+#                 'final_balance' : account value in the principal currency at the last closing price }
+    def run(self):
+        policy = getPolicyInterface(self.__policy_class__)
+        rows = self.__rows__
+        closes = self.__closes__
+        windowLength = self.__window_length__
+        fee = self.__fee__
+        principalBalance = 1.0
+        subjectBalance = 0.0
+        buyPrice = '0.0'
+        sellPrice = '0.0'
+        tradingState = self.__BUY_PHASE__
+        buys = 0
+        sells = 0
+        winningSells = 0
+        peakValue = 1.0
+        maxDrawdown = 0.0
+        accountValue = 1.0
+        ticker = {'last' : '0.0'}
+        priceCharts = {self.__currency_pair__ : ticker}
+        candlesticks = CandleSeries(windowLength)
+        for row in rows[:windowLength-1]:
+            candlesticks.append(row)
+        context = PolicyContext(self.__currency_pair__, self.__candlestick_period__, self.__measurement_period__,
+                                self.__period_unit__, candlesticks, self.statusBus)
+
+        for i in range(windowLength - 1, len(closes)):
+            close = float(closes[i])
+            currentPrice = repr(close)
+            ticker['last'] = currentPrice
+            candlesticks.append(rows[i])
+            context.setTicker(priceCharts, buyPrice, sellPrice)
+            if i == windowLength - 1:
+                policy.cleanUp(context)
+
+            if tradingState == self.__BUY_PHASE__:
+                if policy.shouldBuy(context):
+                    subjectBalance = principalBalance * (1.0 - fee) / close
+                    principalBalance = 0.0
+                    buyPrice = currentPrice
+                    buys += 1
+                    tradingState = self.__SELL_PHASE__
+            elif tradingState == self.__SELL_PHASE__:
+                if policy.shouldSell(context):
+                    principalBalance = subjectBalance * close * (1.0 - fee)
+                    subjectBalance = 0.0
+                    sellPrice = currentPrice
+                    sells += 1
+                    if close > float(buyPrice):
+                        winningSells += 1
+                    policy.cleanUp(context)
+                    tradingState = self.__BUY_PHASE__
+
+            accountValue = principalBalance + subjectBalance * close
+            if accountValue > peakValue:
+                peakValue = accountValue
+            else:
+                drawdown = (1.0 - accountValue / peakValue) * 100.0
+                if drawdown > maxDrawdown:
+                    maxDrawdown = drawdown
+
+        return {'profit' : (accountValue - 1.0) * 100.0,
+                'buys' : buys,
+                'sells' : sells,
+                'winning_sells' : winningSells,
+                'max_drawdown' : maxDrawdown,
+                'candles' : max(len(closes) - windowLength + 1, 0),
+                'final_balance' : accountValue}
+
+# getCandleRows
+#   - Purpose:
+#       Convert a list of candle dictionaries into the array of rows the Backtester replays.
+#   - Returns:
+#       A NumPy array with one row per candle and one column per CandleSeries.FIELDS.
+def getCandleRows(candles):
+    return np.array([[float(candle[field]) for field in CandleSeries.FIELDS] for candle in candles], dtype=float).reshape(-1, len(CandleSeries.FIELDS))
+
+# getWindowLength
+#   - Purpose:
+#       Calculate how many candles the measurement window handed to the policy holds. The first candle the policy is
+#       asked about is the last candle of the first full window.
+#   - Parameters:
+#       * (measurementPeriod) The n number of units used when calculating the Bollinger bands
+#       * (periodUnit) The unit of the measurement period (DAYS, HOURS, MINUTES)
+#       * (candlePeriod) The candlestick period in seconds
+#   - Returns:
+#       (int) The number of candles in the window.
+def getWindowLength(measurementPeriod, periodUnit, candlePeriod):
+    windowSeconds = getWindowSeconds(int(measurementPeriod), periodUnit, int(candlePeriod))
+    if windowSeconds is None:
+        raise ValueError("No such period unit %s" % (periodUnit))
+    return max(int(windowSeconds // int(candlePeriod)), int(measurementPeriod) + 1)
+
+#   formatReport
+#       - Purpose:
+#           Turn the dictionary returned by Backtester.run into printable text.
+#       - Returns:
+#           (str) The report.
+def formatReport(report):
+    return ("Candles replayed : %d\n"
+            "Buys             : %d\n"
+            "Sells            : %d (%d above buy price)\n"
+            "Profit           : %.2f%%\n"
+            "Max drawdown     : %.2f%%\n"
+            "Final balance    : %.8f" % (report['candles'], report['buys'], report['sells'], report['winning_sells'],
+                                         report['profit'], report['max_drawdown'], report['final_balance']))
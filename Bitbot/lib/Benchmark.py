@@ -0,0 +1,148 @@
+#### Benchmark ####
+# Runs the benchmarks of the benchmarks package and saves or compares their results. Every benchmark is a function
+# timed the way timeit does it: the number of calls per repeat is raised until a repeat takes at least minTime
+# seconds, then the repeats are timed with the garbage collector off and the seconds per call are kept.
+#
+# Results are saved as JSON together with the versions they were measured with, so the results of two versions of
+# Bitbot can be compared and a slowdown is seen before it is deployed.
+
+import time, gc, json, statistics, platform, subprocess, datetime, os
+
+class Benchmark(object):
+    """A named function to time. setup is called once before timing and returns the function to call."""
+
+    def __init__(self, name, setup, size=None):
+        self.name = name
+        self.setup = setup
+        self.size = size
+
+    def getKey(self):
+        return self.name if self.size is None else "%s[%s]" % (self.name, self.size)
+
+# measure
+#   - Purpose:
+#       Time a function.
+#   - Parameters:
+#       * (function) The function to call without arguments
+#       * (minTime) The least number of seconds one repeat should take
+#       * (repeat) The number of timed repeats
+#   - Returns:
+#       A dictionary of the best, median and mean seconds per call, their standard deviation, and the calls per
+#       repeat.
+def measure(function, minTime=0.1, repeat=5):
+    number = 1
+    while True:
+        elapsed = __timeCalls__(function, number)
+        if elapsed >= minTime:
+            break
+        # Aim for the minimum time in one more step, growing at least tenfold when the calls are too fast to time
+        number = max(number * 2, int(number * minTime / elapsed * 1.2)) if elapsed > 0 else number * 10
+
+    times = [elapsed / number] + [__timeCalls__(function, number) / number for i in range(1, repeat)]
+    return {'best' : min(times),
+            'median' : statistics.median(times),
+            'mean' : statistics.mean(times),
+            'stdev' : statistics.stdev(times) if len(times) > 1 else 0.0,
+            'number' : number,
+            'repeat' : len(times)}
+
+def __timeCalls__(function, number):
+    gcWasEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for i in range(number):
+            function()
+        return time.perf_counter() - start
+    finally:
+        if gcWasEnabled:
+            gc.enable()
+
+# runBenchmarks
+#   - Purpose:
+#       Set up and time a list of benchmarks.
+#   - Parameters:
+#       * (benchmarks) A list of Benchmark
+#       * (minTime) See measure
+#       * (repeat) See measure
+#       * (report) A function called with the key and result of each benchmark once it is timed, or None
+#   - Returns:
+#       A dictionary of benchmark key -> result.
+def runBenchmarks(benchmarks, minTime=0.1, repeat=5, report=None):
+    results = {}
+    for benchmark in benchmarks:
+        function = benchmark.setup()
+        result = measure(function, minTime, repeat)
+        results[benchmark.getKey()] = result
+        if report is not None:
+            report(benchmark.getKey(), result)
+    return results
+
+# getEnvironment
+#   - Returns:
+#       A dictionary describing what the results were measured with: the date, git commit, Python, NumPy and
+#       pandas versions and the machine.
+def getEnvironment():
+    environment = {'date' : datetime.datetime.now().replace(microsecond=0).isoformat(),
+                   'python' : platform.python_version(),
+                   'machine' : platform.machine(),
+                   'processor' : platform.processor() or platform.machine(),
+                   'system' : platform.system()}
+    try:
+        import numpy, pandas
+        environment['numpy'] = numpy.__version__
+        environment['pandas'] = pandas.__version__
+    except ImportError:
+        pass
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if commit.returncode == 0:
+            environment['commit'] = commit.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return environment
+
+def saveResults(path, results, environment):
+    with open(path, 'w') as f:
+        json.dump({'environment' : environment, 'results' : results}, f, indent=2, sort_keys=True)
+
+def loadResults(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+# compareResults
+#   - Purpose:
+#       Compare the median time per call of the benchmarks found in both results.
+#   - Parameters:
+#       * (baseline) The results to compare against (benchmark key -> result)
+#       * (results) The new results
+#       * (threshold) The fraction a benchmark may be slower by before it counts as a regression (0.1 = 10%)
+#   - Returns:
+#       A list of (key, baseline seconds, new seconds, change as a fraction, regressed) ordered by key.
+def compareResults(baseline, results, threshold=0.1):
+    comparison = []
+    for key in sorted(set(baseline) & set(results)):
+        before = baseline[key]['median']
+        after = results[key]['median']
+        change = (after - before) / before if before > 0 else 0.0
+        comparison.append((key, before, after, change, change > threshold))
+    return comparison
+
+def formatSeconds(seconds):
+    if seconds >= 1.0:
+        return "%.3f s" % (seconds)
+    if seconds >= 1e-3:
+        return "%.3f ms" % (seconds * 1e3)
+    return "%.3f us" % (seconds * 1e6)
+
+def formatResult(key, result):
+    return "{:<48} {:>12} {:>12} {:>8.1f}%".format(key, formatSeconds(result['median']), formatSeconds(result['best']),
+                                                    (result['stdev'] / result['mean'] * 100.0) if result['mean'] else 0.0)
+
+def formatComparison(comparison):
+    lines = ["{:<48} {:>12} {:>12} {:>9}".format('Benchmark', 'Baseline', 'Current', 'Change')]
+    for key, before, after, change, regressed in comparison:
+        lines.append("{:<48} {:>12} {:>12} {:>+8.1f}%{}".format(key, formatSeconds(before), formatSeconds(after),
+                                                                 change * 100.0, '  SLOWER' if regressed else ''))
+    return '\n'.join(lines)
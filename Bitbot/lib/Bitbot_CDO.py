@@ -5,10 +5,43 @@
 
 #api_key = None
 #api_secret = None
+#api_url = None
+#http_connect_timeout = None
+#http_read_timeout = None
+#http_pool_size = None
+#request_rate_limit = None
+#request_burst = None
+#request_reserved_order_tokens = None
+#request_rate_limit_cooldown = None
+#use_asyncio_trader = None
+#enable_push_feed = None
+#push_feed_url = None
+#push_feed_timeout = None
 #action_interval = None
 #bitbot_log = None
+#log_flush_interval = None
+#log_flush_size = None
+#log_max_bytes = None
+#log_backup_count = None
+#log_format = None
+#metrics_port = None
+#metrics_host = None
+#metrics_file = None
+#metrics_file_interval = None
 #policy_file = None
 #crypto_coin = None
+#use_order_book_execution = None
+#order_book_depth = None
+#order_book_max_age = None
+#order_book_max_slippage = None
+#order_poll_interval = None
+#order_poll_max_interval = None
+#account_reconcile_interval = None
+#account_cache_max_age = None
+#ensemble_vote = None
+#ensemble_threshold = None
+#ensemble_timeout = None
+#ensemble_workers = None
 #sell_on_exit = None
 #sell_safety_threshold = None
 #lower_band_buy_proximity = None
@@ -17,3 +50,5 @@
 #measurement_period = None
 #period_unit = None
 #candlestick_period = None
+#candle_cache_dir = None
+#backtest_fee = None
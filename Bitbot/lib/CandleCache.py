@@ -0,0 +1,268 @@
+#### CandleCache ####
+# This class keeps a local copy of the candlestick history returned by poloniex.returnChartData. Candles are stored
+# as full rows (date, open, high, low, close, volume, ...) keyed by currency pair and candle period, both in memory
+# and on disk, so a refresh only has to download the candles that were created since the last stored one and a
+# restart begins with a warm cache.
+#
+# On disk every (currencyPair, candlePeriod) series is a file of JSON lines (one candle per line). New candles are
+# appended to the file. The newest candle from Poloniex is usually still forming, so it is downloaded again on the
+# next refresh and appended a second time; when the file is read the last row for a date wins. The file is compacted
+# when it is loaded and whenever the rows which were replaced outnumber the candles it holds, so a long running
+# trader's file stays within twice the size of its' history.
+#
+# A trader only needs the candles of its' measurement window in memory, so it passes maxCandles and the oldest
+# candles are dropped from memory (not from the file, which Backtest.py replays).
+
+import os, json, bisect, threading
+from lib import Bitbot_CDO
+from lib.CandleSeries import getWindowCandles
+
+# getWindowSeconds
+#   - Purpose:
+#       Calculate how far back the candlestick history handed to a policy reaches. Twice the measurement period is
+#       used so the bands have a full window of history behind their first value.
+#   - Parameters:
+#       * (measurementPeriod) The n number of units used when calculating the Bollinger bands
+#       * (periodUnit) The unit of the measurement period (DAYS, HOURS, MINUTES)
+#       * (candlePeriod) The candlestick period in seconds
+#   - Returns:
+#       (float) The length of the window in seconds or None if the period unit is unknown.
+def getWindowSeconds(measurementPeriod, periodUnit, candlePeriod):
+    if periodUnit == "DAYS":
+        return measurementPeriod * 2 * 86400.0
+    elif periodUnit == "HOURS":
+        return measurementPeriod * 2 * 3600.0
+    elif periodUnit == "MINUTES":
+        return measurementPeriod * 2 * float(candlePeriod)
+    return None
+
+class CandleCache(object):
+
+    __cache_dir__ = './cache'       # Directory holding one file per (currencyPair, candlePeriod) series
+    __poloniexAPI__ = None          # Used to download missing candles. If None the cache works offline.
+
+#   __init__
+#       - Parameters:
+#           * (poloniexAPI) A poloniex class used to download candles or None to only read what is on disk
+#           * (cacheDir) The directory the candle files are kept in
+#           * (maxCandles) The number of the newest candles of a series kept in memory, or None to keep all of them.
+#                          It must cover the longest window the candles are asked for.
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, poloniexAPI, cacheDir=None, maxCandles=None):
+        self.__poloniexAPI__ = poloniexAPI
+        if cacheDir is not None:
+            self.__cache_dir__ = cacheDir
+        self.__max_candles__ = int(maxCandles) if maxCandles is not None else None
+        self.__series__ = {}            # (currencyPair, candlePeriod) -> [dates, rows]
+        self.__file_counts__ = {}       # (currencyPair, candlePeriod) -> [candles in the file, lines in the file]
+        self.__head_complete__ = set()  # Series for which Poloniex has no candles older than the first stored one
+        self.__lock__ = threading.Lock()
+
+#   getCandles
+#       - Purpose:
+#           Return the candles of a currency pair between two dates. Any candles missing from the cache are
+#           downloaded first (only the tail since the last stored candle, or the head if startDate is earlier
+#           than anything stored).
+#       - Parameters:
+#           * (currencyPair) The currency pair e.g. "BTC_XRP"
+#           * (candlePeriod) The candlestick period in seconds (300, 900, 1800, 7200, 14400, 86400)
+#           * (startDate) UNIX timestamp of the first candle wanted
+#           * (endDate) UNIX timestamp of the last candle wanted
+#       - Returns:
+#           A list of candle dictionaries ordered by date, the same format returned by returnChartData.
+    def getCandles(self, currencyPair, candlePeriod, startDate, endDate):
+        candlePeriod = int(candlePeriod)
+        if self.__poloniexAPI__ is not None:
+            for downloadRange in self.getDownloadRanges(currencyPair, candlePeriod, startDate, endDate):
+                history = self.__poloniexAPI__.returnChartData(currencyPair, int(downloadRange[0]), int(downloadRange[1]), candlePeriod)
+                self.addChartData(currencyPair, candlePeriod, downloadRange, history)
+        return self.getStoredCandles(currencyPair, candlePeriod, startDate, endDate)
+
+#   getDownloadRanges
+#       - Purpose:
+#           Work out which candles getCandles would download: only the tail since the last stored candle, or the
+#           head if startDate is earlier than anything stored. The last stored candle is requested again as it may
+#           have still been forming. Callers which fetch the candles themselves (i.e. concurrently) pass each
+#           range and its' returnChartData result to addChartData.
+#       - Returns:
+#           A list of (startDate, endDate, isHead) tuples.
+    def getDownloadRanges(self, currencyPair, candlePeriod, startDate, endDate):
+        candlePeriod = int(candlePeriod)
+        with self.__lock__:
+            dates, rows = self.__getSeries__(currencyPair, candlePeriod)
+            if not dates:
+                return [(startDate, endDate, False)]
+
+            downloadRanges = []
+            if startDate < dates[0] - candlePeriod and (currencyPair, candlePeriod) not in self.__head_complete__:
+                downloadRanges.append((startDate, dates[0] - candlePeriod, True))
+            if dates[-1] <= endDate:
+                downloadRanges.append((dates[-1], endDate, False))
+            return downloadRanges
+
+#   addChartData
+#       - Purpose:
+#           Merge the result of returnChartData for a range returned by getDownloadRanges into the cache.
+#       - Parameters:
+#           * (downloadRange) The (startDate, endDate, isHead) tuple the candles were requested for
+#           * (history) The list returned by returnChartData
+#       - Returns:
+#           (int) The number of candles merged.
+    def addChartData(self, currencyPair, candlePeriod, downloadRange, history):
+        if isinstance(history, dict):
+            raise Exception("returnChartData failed: %s" % (history.get('error', history)))
+
+        # Poloniex answers with a single row dated 0 when there is no data in the range.
+        candlePeriod = int(candlePeriod)
+        history = [row for row in history if int(row['date']) > 0]
+        with self.__lock__:
+            if history:
+                self.__merge__(currencyPair, candlePeriod, history)
+            elif downloadRange[2]:
+                self.__head_complete__.add((currencyPair, candlePeriod))
+        return len(history)
+
+#   getStoredCandles
+#       - Purpose:
+#           Return the stored candles of a currency pair between two dates without contacting Poloniex.
+#       - Returns:
+#           A list of candle dictionaries ordered by date.
+    def getStoredCandles(self, currencyPair, candlePeriod, startDate, endDate):
+        with self.__lock__:
+            dates, rows = self.__getSeries__(currencyPair, int(candlePeriod))
+            first = bisect.bisect_left(dates, startDate)
+            last = bisect.bisect_right(dates, endDate)
+            return rows[first:last]
+
+#   getClosingPrices
+#       - Purpose:
+#           Same as getCandles but only returns the closing prices.
+#       - Returns:
+#           A list of closing prices as floats.
+    def getClosingPrices(self, currencyPair, candlePeriod, startDate, endDate):
+        return [float(row['close']) for row in self.getCandles(currencyPair, candlePeriod, startDate, endDate)]
+
+#   getAllCandles
+#       - Purpose:
+#           Return every stored candle of a series without contacting Poloniex. Used to replay history offline.
+#       - Returns:
+#           A list of candle dictionaries ordered by date.
+    def getAllCandles(self, currencyPair, candlePeriod):
+        with self.__lock__:
+            dates, rows = self.__getSeries__(currencyPair, int(candlePeriod))
+            return list(rows)
+
+#   __merge__
+#       - Purpose:
+#           Insert downloaded rows into the in memory series, replacing rows with the same date, and append them to
+#           the cache file. The file is compacted once more of its' lines are replaced rows than candles.
+    def __merge__(self, currencyPair, candlePeriod, history):
+        dates, rows = self.__getSeries__(currencyPair, candlePeriod)
+        fileCounts = self.__file_counts__[(currencyPair, candlePeriod)]
+        for row in history:
+            date = int(row['date'])
+            row['date'] = date
+            index = bisect.bisect_left(dates, date)
+            if index < len(dates) and dates[index] == date:
+                rows[index] = row
+            else:
+                dates.insert(index, date)
+                rows.insert(index, row)
+                fileCounts[0] += 1
+        self.__trim__(dates, rows)
+
+        path = self.__getPath__(currencyPair, candlePeriod)
+        os.makedirs(self.__cache_dir__, exist_ok=True)
+        with open(path, 'a') as f:
+            for row in history:
+                f.write(json.dumps(row) + '\n')
+        fileCounts[1] += len(history)
+
+        if fileCounts[1] - fileCounts[0] > fileCounts[0]:
+            fileRows, lineCount = self.__read__(path)
+            self.__write__(path, fileRows)
+            fileCounts[:] = [len(fileRows), len(fileRows)]
+
+#   __trim__
+#       - Purpose:
+#           Drop the oldest candles of a series from memory beyond maxCandles.
+    def __trim__(self, dates, rows):
+        if self.__max_candles__ is not None and len(dates) > self.__max_candles__:
+            del dates[:len(dates) - self.__max_candles__]
+            del rows[:len(rows) - self.__max_candles__]
+
+#   __getSeries__
+#       - Purpose:
+#           Return the in memory series for a key, loading it from disk the first time it is used.
+#       - Returns:
+#           A list of [dates, rows] where both lists are ordered by date.
+    def __getSeries__(self, currencyPair, candlePeriod):
+        key = (currencyPair, candlePeriod)
+        if key not in self.__series__:
+            dates, rows = self.__series__[key] = self.__load__(currencyPair, candlePeriod)
+            self.__file_counts__[key] = [len(rows), len(rows)]
+            self.__trim__(dates, rows)
+        return self.__series__[key]
+
+#   __load__
+#       - Purpose:
+#           Read a series from its cache file. If the file contains rows that were later replaced, it is rewritten
+#           so it does not keep growing.
+#       - Returns:
+#           A list of [dates, rows].
+    def __load__(self, currencyPair, candlePeriod):
+        path = self.__getPath__(currencyPair, candlePeriod)
+        rows, lineCount = self.__read__(path)
+        if lineCount > len(rows):
+            self.__write__(path, rows)
+        return [[int(row['date']) for row in rows], rows]
+
+#   __read__
+#       - Purpose:
+#           Read the rows of a cache file. The last row for a date wins.
+#       - Returns:
+#           A tuple of the rows ordered by date and the number of rows read.
+    def __read__(self, path):
+        byDate = {}
+        lineCount = 0
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        # A partially written line from a crash. The candle will be downloaded again.
+                        continue
+                    lineCount += 1
+                    byDate[int(row['date'])] = row
+        return ([byDate[date] for date in sorted(byDate.keys())], lineCount)
+
+#   __write__
+#       - Purpose:
+#           Replace a cache file with the rows given.
+    def __write__(self, path, rows):
+        tempPath = path + '.tmp'
+        with open(tempPath, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+        os.replace(tempPath, path)
+
+#   __getPath__
+#       - Returns:
+#           The cache file path of a series.
+    def __getPath__(self, currencyPair, candlePeriod):
+        return os.path.join(self.__cache_dir__, "%s_%d.jsonl" % (currencyPair, int(candlePeriod)))
+
+# createCandleCache
+#   - Purpose:
+#       Build the CandleCache of a trader from the candle_cache_dir configuration. Only the candles of the measurement
+#       window the PairTraders hand their policies (measurement_period, period_unit and candlestick_period) are kept
+#       in memory.
+def createCandleCache(poloniexAPI):
+    windowSeconds = getWindowSeconds(int(Bitbot_CDO.measurement_period), Bitbot_CDO.period_unit, Bitbot_CDO.candlestick_period)
+    maxCandles = getWindowCandles(windowSeconds, Bitbot_CDO.candlestick_period) if windowSeconds is not None else None
+    return CandleCache(poloniexAPI, getattr(Bitbot_CDO, 'candle_cache_dir', None), maxCandles)
@@ -0,0 +1,198 @@
+#### CandleSeries ####
+# This class holds the most recent candlesticks of a currency pair in preallocated NumPy arrays (date, open, high,
+# low, close and volume). It is a ring buffer of a fixed capacity: appending a candle overwrites the oldest one once
+# the series is full, so the memory used by a pair does not grow however long Bitbot runs.
+#
+# Every candle is written twice, at its' slot and at its' slot plus the capacity. Any window of the newest candles is
+# therefore one contiguous block of the array and getCloses() etc. return views of it without copying.
+#
+# The series behaves like a read-only sequence of closing prices (len, indexing, slicing, iteration and
+# np.asarray), which is what the policies were handed before as a list.
+
+import numpy as np
+
+class CandleSeries(object):
+
+    # Rows of the buffer
+    DATE = 0
+    OPEN = 1
+    HIGH = 2
+    LOW = 3
+    CLOSE = 4
+    VOLUME = 5
+    FIELDS = ('date', 'open', 'high', 'low', 'close', 'volume')
+
+#   __init__
+#       - Parameters:
+#           * (capacity) The number of candles kept. Older candles are dropped.
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, capacity):
+        self.__capacity__ = max(int(capacity), 1)
+        self.__buffer__ = np.zeros((len(self.FIELDS), self.__capacity__ * 2), dtype=float)
+        self.__end__ = 0            # Slot the next candle is written to
+        self.__length__ = 0         # Number of candles held
+        self.__version__ = 0        # Changes whenever a candle is added, replaced or dropped
+
+#   update
+#       - Purpose:
+#           Bring the series up to date with a list of candles. Candles older than the newest one held are skipped,
+#           a candle with the same date as the newest one replaces it (it may have still been forming) and newer
+#           candles are appended. Only the tail of the list is read, so handing over the whole history again costs
+#           about as much as the new candles.
+#       - Parameters:
+#           * (candles) A list of candle dictionaries ordered by date (the format returned by returnChartData)
+#       - Returns:
+#           (int) The number of candles appended.
+    def update(self, candles):
+        first = len(candles)
+        if self.__length__ > 0:
+            lastDate = self.getLastDate()
+            while first > 0 and int(candles[first - 1]['date']) >= lastDate:
+                first -= 1
+        else:
+            first = max(first - self.__capacity__, 0)
+
+        appended = 0
+        for candle in candles[first:]:
+            row = (float(candle['date']), float(candle['open']), float(candle['high']), float(candle['low']),
+                   float(candle['close']), float(candle['volume']))
+            if self.__length__ > 0 and row[self.DATE] == self.getLastDate():
+                self.replaceLast(row)
+            else:
+                self.append(row)
+                appended += 1
+        return appended
+
+#   append
+#       - Purpose:
+#           Add a candle in constant time, dropping the oldest one if the series is full.
+#       - Parameters:
+#           * (row) A sequence of (date, open, high, low, close, volume)
+    def append(self, row):
+        end = self.__end__
+        self.__buffer__[:, end] = row
+        self.__buffer__[:, end + self.__capacity__] = row
+        self.__end__ = (end + 1) % self.__capacity__
+        if self.__length__ < self.__capacity__:
+            self.__length__ += 1
+        self.__version__ += 1
+
+#   replaceLast
+#       - Purpose:
+#           Overwrite the newest candle.
+#       - Parameters:
+#           * (row) A sequence of (date, open, high, low, close, volume)
+    def replaceLast(self, row):
+        if self.__length__ == 0:
+            return self.append(row)
+        last = (self.__end__ - 1) % self.__capacity__
+        self.__buffer__[:, last] = row
+        self.__buffer__[:, last + self.__capacity__] = row
+        self.__version__ += 1
+
+#   dropBefore
+#       - Purpose:
+#           Drop the candles older than a date (i.e. the start of the measurement window after Bitbot was stopped
+#           for a while).
+    def dropBefore(self, date):
+        keep = self.__length__ - int(np.searchsorted(self.getDates(), date, side='left'))
+        if keep != self.__length__:
+            self.__length__ = keep
+            self.__version__ += 1
+
+#   copy
+#       - Returns:
+#           A CandleSeries holding the same candles, with the same version, which changes to this one do not affect.
+    def copy(self):
+        copy = CandleSeries.__new__(CandleSeries)
+        copy.__capacity__ = self.__capacity__
+        copy.__buffer__ = self.__buffer__.copy()
+        copy.__end__ = self.__end__
+        copy.__length__ = self.__length__
+        copy.__version__ = self.__version__
+        return copy
+
+    def clear(self):
+        self.__length__ = 0
+        self.__version__ += 1
+
+#   getField
+#       - Purpose:
+#           Return a read-only view of one field of the newest candles, oldest first.
+#       - Parameters:
+#           * (field) The row of the field (CandleSeries.CLOSE etc.)
+#           * (count) The number of candles, or None for all of them
+#       - Returns:
+#           A NumPy array sharing memory with the series. It changes when candles are added, so copy it to keep it.
+    def getField(self, field, count=None):
+        count = self.__length__ if count is None else min(int(count), self.__length__)
+        start = (self.__end__ - count) % self.__capacity__
+        view = self.__buffer__[field, start:start + count]
+        view.flags.writeable = False
+        return view
+
+    def getDates(self, count=None):
+        return self.getField(self.DATE, count)
+
+    def getOpens(self, count=None):
+        return self.getField(self.OPEN, count)
+
+    def getHighs(self, count=None):
+        return self.getField(self.HIGH, count)
+
+    def getLows(self, count=None):
+        return self.getField(self.LOW, count)
+
+    def getCloses(self, count=None):
+        return self.getField(self.CLOSE, count)
+
+    def getVolumes(self, count=None):
+        return self.getField(self.VOLUME, count)
+
+#   getLastDate
+#       - Returns:
+#           (int) The UNIX timestamp of the newest candle, or None if the series is empty.
+    def getLastDate(self):
+        if self.__length__ == 0:
+            return None
+        return int(self.__buffer__[self.DATE, (self.__end__ - 1) % self.__capacity__])
+
+    def getCapacity(self):
+        return self.__capacity__
+
+#   getVersion
+#       - Returns:
+#           (int) A number which changes whenever the candles change, so results calculated from the series can be
+#           cached until it does.
+    def getVersion(self):
+        return self.__version__
+
+    def __len__(self):
+        return self.__length__
+
+    def __getitem__(self, index):
+        return self.getCloses()[index]
+
+    def __iter__(self):
+        return iter(self.getCloses())
+
+    def __array__(self, dtype=None, copy=None):
+        closes = self.getCloses()
+        if copy:
+            return np.array(closes, dtype=dtype)
+        return closes if dtype is None else closes.astype(dtype, copy=False)
+
+    def __repr__(self):
+        return "CandleSeries(%d/%d candles, last %s)" % (self.__length__, self.__capacity__, self.getLastDate())
+
+# getWindowCandles
+#   - Purpose:
+#       Work out how many candles cover a window of time.
+#   - Parameters:
+#       * (windowSeconds) The length of the window in seconds (see CandleCache.getWindowSeconds)
+#       * (candlePeriod) The candlestick period in seconds
+#   - Returns:
+#       (int) The number of candles with a date inside a window of that length.
+def getWindowCandles(windowSeconds, candlePeriod):
+    return int(float(windowSeconds) // int(candlePeriod)) + 1
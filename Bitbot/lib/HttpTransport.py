@@ -0,0 +1,162 @@
+#### HttpTransport ####
+# This class sends the HTTP requests of the poloniex client. Connections to the exchange are kept alive and reused
+# from a small pool so a call does not pay for a new TCP and TLS handshake, and every request has a connect and a
+# read timeout. The base URL is configurable so the client can be pointed at a local stand-in server
+# (http://127.0.0.1:8080) instead of https://poloniex.com.
+
+import http.client, threading, socket, gzip, zlib
+from urllib.parse import urlsplit
+from lib import Bitbot_CDO
+
+class TransportError(Exception):
+    """Raised when the exchange answers with an HTTP error status."""
+
+    def __init__(self, status, reason, body):
+        super(TransportError, self).__init__("HTTP %d %s: %s" % (status, reason, body[:200]))
+        self.status = status
+        self.body = body
+
+class HttpTransport(object):
+
+    # Errors raised when a pooled connection was closed by the server while it sat idle. The request is sent again
+    # on a new connection. Signed requests are resent byte for byte so the exchange rejects the repeated nonce if
+    # the first copy did arrive.
+    __STALE_CONNECTION_ERRORS__ = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                                   ConnectionAbortedError, BrokenPipeError)
+
+#   __init__
+#       - Parameters:
+#           * (baseUrl) Scheme, host and optional port of the exchange (i.e. https://poloniex.com)
+#           * (connectTimeout) Seconds allowed to open a connection
+#           * (readTimeout) Seconds allowed to wait for a response once the request has been sent
+#           * (poolSize) The most idle connections kept open for reuse
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, baseUrl='https://poloniex.com', connectTimeout=5.0, readTimeout=15.0, poolSize=4):
+        url = urlsplit(baseUrl)
+        self.__scheme__ = url.scheme
+        self.__host__ = url.hostname
+        self.__port__ = url.port
+        self.__base_path__ = url.path.rstrip('/')
+        self.__connect_timeout__ = float(connectTimeout)
+        self.__read_timeout__ = float(readTimeout)
+        self.__pool_size__ = int(poolSize)
+        self.__pool__ = []
+        self.__lock__ = threading.Lock()
+
+#   request
+#       - Purpose:
+#           Send a request over a pooled connection and return the response body.
+#       - Parameters:
+#           * (method) 'GET' or 'POST'
+#           * (path) The path and query string (i.e. /public?command=returnTicker)
+#           * (body) The request body as bytes or None
+#           * (headers) A dictionary of extra request headers
+#       - Returns:
+#           (bytes) The decompressed response body.
+    def request(self, method, path, body=None, headers=None):
+        requestHeaders = {'Accept-Encoding' : 'gzip, deflate', 'Connection' : 'keep-alive'}
+        if body is not None:
+            requestHeaders['Content-Type'] = 'application/x-www-form-urlencoded'
+        if headers:
+            requestHeaders.update(headers)
+
+        connection, reused = self.__getConnection__()
+        try:
+            response = self.__send__(connection, method, self.__base_path__ + path, body, requestHeaders)
+        except self.__STALE_CONNECTION_ERRORS__:
+            connection.close()
+            if not reused:
+                raise
+            connection, reused = self.__newConnection__(), False
+            try:
+                response = self.__send__(connection, method, self.__base_path__ + path, body, requestHeaders)
+            except Exception:
+                connection.close()
+                raise
+        except Exception:
+            connection.close()
+            raise
+
+        status, reason, responseBody, willClose = response
+        if willClose:
+            connection.close()
+        else:
+            self.__releaseConnection__(connection)
+
+        if status >= 400:
+            raise TransportError(status, reason, responseBody.decode('utf-8', 'replace'))
+        return responseBody
+
+#   close
+#       - Purpose:
+#           Close every idle connection in the pool.
+    def close(self):
+        with self.__lock__:
+            pool = self.__pool__
+            self.__pool__ = []
+        for connection in pool:
+            connection.close()
+
+#   __send__
+#       - Purpose:
+#           Send one request and read the whole response so the connection can be reused.
+#       - Returns:
+#           A tuple of (status, reason, body, willClose).
+    def __send__(self, connection, method, path, body, headers):
+        if connection.sock is None:
+            self.__connect__(connection)
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        responseBody = response.read()
+
+        encoding = response.getheader('Content-Encoding', '')
+        if encoding == 'gzip':
+            responseBody = gzip.decompress(responseBody)
+        elif encoding == 'deflate':
+            responseBody = zlib.decompress(responseBody)
+        return (response.status, response.reason, responseBody, response.will_close)
+
+#   __connect__
+#       - Purpose:
+#           Open the connection with the connect timeout and then switch the socket to the read timeout. Nagle's
+#           algorithm is disabled so a request written in several pieces is not held back waiting for an ACK.
+    def __connect__(self, connection):
+        connection.timeout = self.__connect_timeout__
+        connection.connect()
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection.sock.settimeout(self.__read_timeout__)
+
+#   __getConnection__
+#       - Returns:
+#           A tuple of (connection, reused). The most recently used idle connection is preferred as it is the least
+#           likely to have been closed by the server.
+    def __getConnection__(self):
+        with self.__lock__:
+            if self.__pool__:
+                return (self.__pool__.pop(), True)
+        return (self.__newConnection__(), False)
+
+    def __newConnection__(self):
+        if self.__scheme__ == 'https':
+            return http.client.HTTPSConnection(self.__host__, self.__port__, timeout=self.__connect_timeout__)
+        return http.client.HTTPConnection(self.__host__, self.__port__, timeout=self.__connect_timeout__)
+
+    def __releaseConnection__(self, connection):
+        with self.__lock__:
+            if len(self.__pool__) < self.__pool_size__:
+                self.__pool__.append(connection)
+                return
+        connection.close()
+
+# createTransport
+#   - Purpose:
+#       Build an HttpTransport from the api_url, http_connect_timeout, http_read_timeout and http_pool_size
+#       configurations. Missing configurations use the defaults.
+#   - Returns:
+#       An HttpTransport.
+def createTransport():
+    return HttpTransport(getattr(Bitbot_CDO, 'api_url', 'https://poloniex.com'),
+                         float(getattr(Bitbot_CDO, 'http_connect_timeout', 5.0)),
+                         float(getattr(Bitbot_CDO, 'http_read_timeout', 15.0)),
+                         int(getattr(Bitbot_CDO, 'http_pool_size', 4)))
@@ -0,0 +1,572 @@
+#### Indicators ####
+# Streaming indicators for policies: a rolling mean/standard deviation, EMA, RSI, MACD and ATR. Each indicator keeps
+# only the state it needs, so adding a candle (append) or changing the one that is still forming (replaceLast) takes
+# constant time however long the window is. update() brings an indicator up to date with a CandleSeries, only adding
+# the candles it has not seen, and returns its' latest value (NaN until enough candles have been seen). A policy gets
+# one kept for its' pair with getIndicator(context, EMA, 20).
+#
+# Every indicator also has a batch function (sma, rollingStd, ema, rsi, macd, atr) which returns the value at every
+# candle of an array at once for warm-ups, backtests and sweeps. The differences and true ranges are computed with
+# NumPy, and the smoothing of EMA, RSI, MACD and ATR runs as one loop over the array with the same arithmetic as the
+# streaming objects, so their values are identical. sma and rollingStd compute each window directly and agree with
+# RollingStats to within rounding (about 1e-11 relative), as its' sums are updated rather than recomputed.
+
+import math, collections
+import numpy as np
+from lib.CandleSeries import CandleSeries
+
+class Indicator(object):
+
+#   __init__
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self):
+        self.__candles__ = None         # The last candlesticks given to update()
+        self.__version__ = None         # The version of the last CandleSeries given to update()
+        self.__last_date__ = None       # The date of the last candle seen
+        self.__first_date__ = None      # The date of the first candle of the last CandleSeries given to update()
+        self.__length__ = 0             # The number of candles given to update() last
+        self.__count__ = 0              # Number of candles appended since the last reset
+        self.__previous__ = None        # The state before the last candle was appended
+
+#   update
+#       - Purpose:
+#           Bring the indicator up to date with the candlesticks. If they have not changed since the previous call
+#           nothing is calculated. If the candles moved forward only the new candles are added. Anything else
+#           (first call, gap larger than the candlesticks, unknown dates, candles dropped from the front of the
+#           series other than those pushed out by the new ones) rebuilds the indicator from them.
+#       - Parameters:
+#           * (candlesticks) A CandleSeries (or a list of closing prices for indicators of the close only) ordered by
+#                            date. The last candle may still be forming, so it is replaced when it is seen again.
+#           * (lastDate) UNIX timestamp of the last candle, or None if unknown.
+#           * (candlePeriod) The candlestick period in seconds.
+#       - Returns:
+#           The value of the indicator (see getValue).
+    def update(self, candlesticks, lastDate=None, candlePeriod=None):
+        # A CandleSeries is updated in place, so it is the same object with a new version when its' candles change
+        isSeries = isinstance(candlesticks, CandleSeries)
+        version = candlesticks.getVersion() if isSeries else None
+        if candlesticks is self.__candles__ and version == self.__version__ and lastDate == self.__last_date__:
+            return self.getValue()
+
+        inputs = self.__getInputs__(candlesticks)
+        length = len(inputs[0])
+        firstDate = float(candlesticks.getDates()[0]) if isSeries and length > 0 else None
+        newCandles = -1
+        if lastDate is not None and self.__last_date__ is not None and candlePeriod and self.__count__ > 0:
+            newCandles = int(round((float(lastDate) - float(self.__last_date__)) / float(candlePeriod)))
+            # The front of the series may only have moved by the candles the new ones pushed out of it. A series
+            # cut short (i.e. by CandleSeries.dropBefore) no longer holds what the indicator was built from.
+            if isSeries:
+                dropped = max(self.__length__ + newCandles - candlesticks.getCapacity(), 0)
+                if length != self.__length__ + newCandles - dropped:
+                    newCandles = -1
+                elif self.__first_date__ is not None and firstDate != self.__first_date__ + dropped * float(candlePeriod):
+                    newCandles = -1
+            elif length != self.__length__ + newCandles and length != self.__length__:
+                newCandles = -1
+
+        if newCandles < 0 or newCandles >= length:
+            self.rebuild(candlesticks)
+        else:
+            # The previous last candle has now closed. Use its' final values before adding the new ones.
+            self.replaceLast(*[values[length-newCandles-1] for values in inputs])
+            for index in range(length-newCandles, length):
+                self.append(*[values[index] for values in inputs])
+
+        self.__candles__ = candlesticks
+        self.__version__ = version
+        self.__last_date__ = lastDate
+        self.__first_date__ = firstDate
+        self.__length__ = length
+        return self.getValue()
+
+#   rebuild
+#       - Purpose:
+#           Discard the state and recalculate the indicator from the candlesticks.
+    def rebuild(self, candlesticks):
+        inputs = self.__getInputs__(candlesticks)
+        self.reset(inputs)
+        for row in zip(*inputs):
+            self.append(*row)
+
+#   reset
+#       - Purpose:
+#           Discard the state. Subclasses clear their own state and call this.
+#       - Parameters:
+#           * (inputs) The inputs the indicator is about to be rebuilt from (see __getInputs__)
+    def reset(self, inputs=()):
+        self.__count__ = 0
+        self.__previous__ = None
+        self.__candles__ = None
+
+#   append
+#       - Purpose:
+#           Add a candle in constant time.
+#       - Parameters:
+#           * (values) The inputs of the candle, e.g. the close (or the high, low and close for ATR)
+    def append(self, *values):
+        self.__previous__ = self.__getState__()
+        self.__step__(*values)
+        self.__count__ += 1
+
+#   replaceLast
+#       - Purpose:
+#           Change the newest candle in constant time by stepping again from the state before it was added.
+    def replaceLast(self, *values):
+        if self.__previous__ is None:
+            return self.append(*values)
+        self.__setState__(self.__previous__)
+        self.__step__(*values)
+
+#   getCount
+#       - Returns:
+#           (int) The number of candles added since the indicator was last reset.
+    def getCount(self):
+        return self.__count__
+
+#   getValue
+#       - Returns:
+#           The latest value of the indicator, NaN until enough candles have been added.
+    def getValue(self):
+        raise NotImplementedError("Indicator function getValue() not implemented")
+
+#   __getInputs__
+#       - Returns:
+#           A list of the sequences the indicator reads from the candlesticks, by default the closing prices.
+    def __getInputs__(self, candlesticks):
+        if isinstance(candlesticks, CandleSeries):
+            return (candlesticks.getCloses(),)
+        return (candlesticks,)
+
+    def __getState__(self):
+        raise NotImplementedError("Indicator function __getState__() not implemented")
+
+    def __setState__(self, state):
+        raise NotImplementedError("Indicator function __setState__() not implemented")
+
+    def __step__(self, *values):
+        raise NotImplementedError("Indicator function __step__() not implemented")
+
+class RollingStats(Indicator):
+    """The mean and sample standard deviation of the last n closing prices (fewer until n have been seen)."""
+
+    __RECALCULATE_INTERVAL__ = 1000     # Number of updates after which the sums are recalculated from the buffer
+
+#   __init__
+#       - Parameters:
+#           * (period) The number of prices in the window
+    def __init__(self, period):
+        Indicator.__init__(self)
+        self.__period__ = int(period)
+        self.__window__ = collections.deque()
+        self.reset()
+
+#   reset
+#       - Purpose:
+#           Clear the window and the running sums. Prices are stored relative to a shift (the first price the window
+#           is rebuilt from) so the sum of squares does not lose precision when the prices are large compared to
+#           their variation.
+    def reset(self, inputs=()):
+        Indicator.reset(self, inputs)
+        closes = inputs[0] if len(inputs) > 0 else ()
+        self.__window__.clear()
+        self.__shift__ = float(closes[0]) if len(closes) > 0 else 0.0
+        self.__sum__ = 0.0
+        self.__sum_squares__ = 0.0
+        self.__updates__ = 0
+
+#   append
+#       - Purpose:
+#           Add a price to the window in constant time, dropping the oldest one if the window is full.
+    def append(self, close):
+        close = float(close) - self.__shift__
+        self.__window__.append(close)
+        self.__sum__ += close
+        self.__sum_squares__ += close * close
+        if len(self.__window__) > self.__period__:
+            oldest = self.__window__.popleft()
+            self.__sum__ -= oldest
+            self.__sum_squares__ -= oldest * oldest
+
+        self.__updates__ += 1
+        if self.__updates__ >= self.__RECALCULATE_INTERVAL__:
+            self.__recalculate__()
+        self.__count__ += 1
+
+#   replaceLast
+#       - Purpose:
+#           Change the newest price in constant time.
+#       - Returns:
+#           (bool) False if the price did not change.
+    def replaceLast(self, close):
+        if len(self.__window__) == 0:
+            self.append(close)
+            return True
+
+        close = float(close) - self.__shift__
+        previous = self.__window__[-1]
+        if close == previous:
+            return False
+        self.__window__[-1] = close
+        self.__sum__ += close - previous
+        self.__sum_squares__ += close * close - previous * previous
+        return True
+
+#   isReady
+#       - Returns:
+#           (bool) True once the window holds period prices.
+    def isReady(self):
+        return len(self.__window__) == self.__period__
+
+#   getSize
+#       - Returns:
+#           (int) The number of prices in the window.
+    def getSize(self):
+        return len(self.__window__)
+
+#   getMean
+#       - Returns:
+#           (float) The mean of the window, NaN if it is empty.
+    def getMean(self):
+        n = len(self.__window__)
+        if n == 0:
+            return math.nan
+        return self.__sum__ / n + self.__shift__
+
+#   getStd
+#       - Parameters:
+#           * (ddof) Delta degrees of freedom, 1 for the sample standard deviation as pandas and ZonePolicy use
+#       - Returns:
+#           (float) The standard deviation of the window, NaN if it holds ddof prices or fewer.
+    def getStd(self, ddof=1):
+        n = len(self.__window__)
+        if n <= ddof:
+            return math.nan
+        mean = self.__sum__ / n
+        return math.sqrt(max((self.__sum_squares__ - self.__sum__ * mean) / (n - ddof), 0.0))
+
+#   getValue
+#       - Returns:
+#           (tuple) The mean and sample standard deviation of the window.
+    def getValue(self):
+        return (self.getMean(), self.getStd())
+
+#   __recalculate__
+#       - Purpose:
+#           Recalculate the running sums from the buffer to remove accumulated rounding error. The prices are also
+#           shifted to the current mean in case the price has drifted far from the previous shift.
+    def __recalculate__(self):
+        mean = math.fsum(self.__window__) / len(self.__window__)
+        self.__window__ = collections.deque(value - mean for value in self.__window__)
+        self.__shift__ += mean
+        self.__sum__ = math.fsum(self.__window__)
+        self.__sum_squares__ = math.fsum(value * value for value in self.__window__)
+        self.__updates__ = 0
+
+class EMA(Indicator):
+    """The exponential moving average of the closing prices, seeded with the mean of the first n prices."""
+
+#   __init__
+#       - Parameters:
+#           * (period) The number of prices of the average. The smoothing factor is 2/(period+1).
+    def __init__(self, period):
+        Indicator.__init__(self)
+        self.__period__ = int(period)
+        self.__alpha__ = 2.0 / (self.__period__ + 1)
+        self.reset()
+
+    def reset(self, inputs=()):
+        Indicator.reset(self, inputs)
+        self.__seen__ = 0
+        self.__total__ = 0.0
+        self.__value__ = math.nan
+
+    def isReady(self):
+        return self.__seen__ >= self.__period__
+
+    def getValue(self):
+        return self.__value__
+
+    def __getState__(self):
+        return (self.__seen__, self.__total__, self.__value__)
+
+    def __setState__(self, state):
+        self.__seen__, self.__total__, self.__value__ = state
+
+    def __step__(self, close):
+        close = float(close)
+        if self.__seen__ < self.__period__:
+            self.__total__ += close
+            if self.__seen__ == self.__period__ - 1:
+                self.__value__ = self.__total__ / self.__period__
+        else:
+            self.__value__ += self.__alpha__ * (close - self.__value__)
+        self.__seen__ += 1
+
+class RSI(Indicator):
+    """Wilder's relative strength index of the closing prices (0 to 100)."""
+
+#   __init__
+#       - Parameters:
+#           * (period) The number of price changes averaged
+    def __init__(self, period=14):
+        Indicator.__init__(self)
+        self.__period__ = int(period)
+        self.reset()
+
+    def reset(self, inputs=()):
+        Indicator.reset(self, inputs)
+        self.__last_close__ = None
+        self.__changes__ = 0
+        self.__gain__ = 0.0             # Sum of the gains until period changes are seen, then the average gain
+        self.__loss__ = 0.0
+
+    def isReady(self):
+        return self.__changes__ >= self.__period__
+
+    def getValue(self):
+        if self.__changes__ < self.__period__:
+            return math.nan
+        return getRelativeStrength(self.__gain__, self.__loss__)
+
+    def __getState__(self):
+        return (self.__last_close__, self.__changes__, self.__gain__, self.__loss__)
+
+    def __setState__(self, state):
+        self.__last_close__, self.__changes__, self.__gain__, self.__loss__ = state
+
+    def __step__(self, close):
+        close = float(close)
+        if self.__last_close__ is not None:
+            change = close - self.__last_close__
+            gain = change if change > 0 else 0.0
+            loss = -change if change < 0 else 0.0
+            self.__changes__ += 1
+            self.__gain__, self.__loss__ = wilderStep(self.__gain__, self.__loss__, gain, loss, self.__changes__, self.__period__)
+        self.__last_close__ = close
+
+class MACD(Indicator):
+    """The moving average convergence/divergence of the closing prices, its' signal line and histogram."""
+
+#   __init__
+#       - Parameters:
+#           * (fast) The period of the fast EMA
+#           * (slow) The period of the slow EMA
+#           * (signal) The period of the EMA of the MACD line
+    def __init__(self, fast=12, slow=26, signal=9):
+        Indicator.__init__(self)
+        self.__fast__ = EMA(fast)
+        self.__slow__ = EMA(slow)
+        self.__signal__ = EMA(signal)
+        self.reset()
+
+    def reset(self, inputs=()):
+        Indicator.reset(self, inputs)
+        self.__fast__.reset()
+        self.__slow__.reset()
+        self.__signal__.reset()
+        self.__macd__ = math.nan
+
+    def isReady(self):
+        return self.__signal__.isReady()
+
+#   getValue
+#       - Returns:
+#           (tuple) The MACD line, the signal line and the histogram (MACD - signal).
+    def getValue(self):
+        signal = self.__signal__.getValue()
+        return (self.__macd__, signal, self.__macd__ - signal)
+
+    def __getState__(self):
+        return (self.__fast__.__getState__(), self.__slow__.__getState__(), self.__signal__.__getState__(), self.__macd__)
+
+    def __setState__(self, state):
+        self.__fast__.__setState__(state[0])
+        self.__slow__.__setState__(state[1])
+        self.__signal__.__setState__(state[2])
+        self.__macd__ = state[3]
+
+    def __step__(self, close):
+        self.__fast__.__step__(close)
+        self.__slow__.__step__(close)
+        if self.__fast__.isReady() and self.__slow__.isReady():
+            self.__macd__ = self.__fast__.getValue() - self.__slow__.getValue()
+            self.__signal__.__step__(self.__macd__)
+
+class ATR(Indicator):
+    """Wilder's average true range of the candles. It needs a CandleSeries for the highs and lows."""
+
+#   __init__
+#       - Parameters:
+#           * (period) The number of true ranges averaged
+    def __init__(self, period=14):
+        Indicator.__init__(self)
+        self.__period__ = int(period)
+        self.reset()
+
+    def reset(self, inputs=()):
+        Indicator.reset(self, inputs)
+        self.__last_close__ = None
+        self.__ranges__ = 0
+        self.__value__ = 0.0            # Sum of the true ranges until period are seen, then the average
+
+    def isReady(self):
+        return self.__ranges__ >= self.__period__
+
+    def getValue(self):
+        if self.__ranges__ < self.__period__:
+            return math.nan
+        return self.__value__
+
+    def __getInputs__(self, candlesticks):
+        return (candlesticks.getHighs(), candlesticks.getLows(), candlesticks.getCloses())
+
+    def __getState__(self):
+        return (self.__last_close__, self.__ranges__, self.__value__)
+
+    def __setState__(self, state):
+        self.__last_close__, self.__ranges__, self.__value__ = state
+
+    def __step__(self, high, low, close):
+        high, low = float(high), float(low)
+        if self.__last_close__ is None:
+            trueRange = high - low
+        else:
+            trueRange = max(high - low, abs(high - self.__last_close__), abs(low - self.__last_close__))
+        self.__ranges__ += 1
+        self.__value__ = wilderStep(self.__value__, 0.0, trueRange, 0.0, self.__ranges__, self.__period__)[0]
+        self.__last_close__ = float(close)
+
+# wilderStep
+#   - Purpose:
+#       Add a value to a pair of Wilder averages (the gains and losses of RSI, or the true ranges of ATR with an unused
+#       second average). Until period values are seen the averages hold the running sums.
+#   - Parameters:
+#       * (first, second) The averages (or sums)
+#       * (firstValue, secondValue) The new values
+#       * (count) The number of values seen including the new one
+#       * (period) The period of the averages
+#   - Returns:
+#       (tuple) The new averages (or sums).
+def wilderStep(first, second, firstValue, secondValue, count, period):
+    if count < period:
+        return (first + firstValue, second + secondValue)
+    if count == period:
+        return ((first + firstValue) / period, (second + secondValue) / period)
+    return ((first * (period - 1) + firstValue) / period, (second * (period - 1) + secondValue) / period)
+
+# getRelativeStrength
+#   - Returns:
+#       (float) The RSI of an average gain and loss, 100 if there were no losses and 50 if the price did not move.
+def getRelativeStrength(gain, loss):
+    if loss == 0.0:
+        return 100.0 if gain > 0.0 else 50.0
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+# getIndicator
+#   - Purpose:
+#       Return the latest value of an indicator of the candlesticks of a PolicyContext. The indicator object is kept
+#       in the indicator cache of the pair, so it is only updated with the candles it has not seen.
+#   - Parameters:
+#       * (context) The PolicyContext of the pair
+#       * (indicatorClass) An Indicator class e.g. EMA
+#       * (params) The parameters of the class e.g. the period
+#   - Returns:
+#       The value of the indicator.
+def getIndicator(context, indicatorClass, *params):
+    name = indicatorClass.__name__
+    with context.indicators.getLock(name, params):
+        indicator = context.indicators.getState(name, params, indicatorClass)
+        return indicator.update(context.candlesticks, context.lastCandleDate, context.candlePeriod)
+
+# sma
+#   - Returns:
+#       (numpy.ndarray) The mean of the n values ending at each value, NaN until n values are seen.
+def sma(values, period):
+    return __rolling__(values, period, lambda windows: windows.mean(axis=1))
+
+# rollingStd
+#   - Returns:
+#       (numpy.ndarray) The standard deviation of the n values ending at each value, NaN until n values are seen.
+def rollingStd(values, period, ddof=1):
+    return __rolling__(values, period, lambda windows: windows.std(axis=1, ddof=ddof) if period > ddof else np.nan)
+
+# ema
+#   - Returns:
+#       (numpy.ndarray) The EMA at each value (see EMA), NaN until n values are seen.
+def ema(values, period):
+    values = np.asarray(values, dtype=float)
+    period = int(period)
+    alpha = 2.0 / (period + 1)
+    result = [math.nan] * len(values)
+    total = 0.0
+    value = math.nan
+    for index, close in enumerate(values.tolist()):
+        if index < period:
+            total += close
+            if index == period - 1:
+                value = total / period
+        else:
+            value += alpha * (close - value)
+        result[index] = value
+    return np.array(result, dtype=float)
+
+# rsi
+#   - Returns:
+#       (numpy.ndarray) The RSI at each closing price (see RSI), NaN until n price changes are seen.
+def rsi(closes, period=14):
+    closes = np.asarray(closes, dtype=float)
+    period = int(period)
+    changes = np.diff(closes)
+    gains = np.where(changes > 0, changes, 0.0).tolist()
+    losses = np.where(changes < 0, -changes, 0.0).tolist()
+    result = [math.nan] * len(closes)
+    gain = loss = 0.0
+    for count in range(1, len(changes) + 1):
+        gain, loss = wilderStep(gain, loss, gains[count-1], losses[count-1], count, period)
+        if count >= period:
+            result[count] = getRelativeStrength(gain, loss)
+    return np.array(result, dtype=float)
+
+# macd
+#   - Returns:
+#       (tuple) Arrays of the MACD line, the signal line and the histogram at each closing price (see MACD).
+def macd(closes, fast=12, slow=26, signal=9):
+    closes = np.asarray(closes, dtype=float)
+    line = ema(closes, fast) - ema(closes, slow)
+    signalLine = np.full(len(closes), np.nan)
+    start = max(int(fast), int(slow)) - 1
+    if start < len(closes):
+        signalLine[start:] = ema(line[start:], signal)
+    return (line, signalLine, line - signalLine)
+
+# atr
+#   - Returns:
+#       (numpy.ndarray) The ATR at each candle (see ATR), NaN until n candles are seen.
+def atr(highs, lows, closes, period=14):
+    highs = np.asarray(highs, dtype=float)
+    lows = np.asarray(lows, dtype=float)
+    closes = np.asarray(closes, dtype=float)
+    period = int(period)
+    trueRanges = highs - lows
+    if len(closes) > 1:
+        trueRanges[1:] = np.maximum(trueRanges[1:], np.maximum(np.abs(highs[1:] - closes[:-1]), np.abs(lows[1:] - closes[:-1])))
+    result = [math.nan] * len(closes)
+    value = 0.0
+    for index, trueRange in enumerate(trueRanges.tolist()):
+        value = wilderStep(value, 0.0, trueRange, 0.0, index + 1, period)[0]
+        if index + 1 >= period:
+            result[index] = value
+    return np.array(result, dtype=float)
+
+# __rolling__
+#   - Purpose:
+#       Apply a reduction to every full window of n values without copying them.
+def __rolling__(values, period, reduce):
+    values = np.asarray(values, dtype=float)
+    period = int(period)
+    result = np.full(len(values), np.nan)
+    if 0 < period <= len(values):
+        result[period-1:] = reduce(np.lib.stride_tricks.sliding_window_view(values, period))
+    return result
@@ -1,14 +1,227 @@
+#### Logger ####
+# Writes to the bitbot log file. Writing a message only puts it in an in-memory buffer; a background thread formats
+# the buffered messages and appends them to the file every log_flush_interval seconds, or as soon as log_flush_size
+# messages are waiting. The file is rotated (bitbot.log -> bitbot.log.1 -> ...) once it grows past log_max_bytes.
+#
+# With log_format=jsonl every line is a JSON object instead of text:
+#
+#   {"timestamp": "2018-01-20T13:45:02.512312", "event": "sell", "pair": "BTC_XRP", "message": "...",
+#    "price": 0.00011, "profit": 2.51}
+#
+# Every Logger writing to the same file shares one buffer and background thread. The buffer is flushed when the
+# program exits.
+
 from lib import Bitbot_CDO
-import datetime
+from lib import Metrics
+import datetime, threading, collections, json, os, time, atexit
 
 class Logger(object):
     """Writes to bitbot log file"""
 
     __log_file__ = './bitbot.log'
 
-    def __init__(self):
-        self.__log_file__ = Bitbot_CDO.bitbot_log
+#   __init__
+#       - Parameters:
+#           * (logFile) The file to write to (default bitbot_log)
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, logFile=None):
+        self.__log_file__ = logFile or Bitbot_CDO.bitbot_log
+        self.__sink__ = getSink(self.__log_file__)
 
+#   writeFile
+#       - Purpose:
+#           Log a text message.
     def writeFile(self, mesg):
-        with open(self.__log_file__, 'a') as f:
-            f.write(str(datetime.datetime.now()) + " " + mesg + '\n')
+        self.__sink__.write(('message', None, mesg, None))
+
+#   writeEvent
+#       - Purpose:
+#           Log a message together with the values tooling may want to read from it. A text log only shows the
+#           message, a JSONL log has every field.
+#       - Parameters:
+#           * (event) The kind of event (i.e. buy, sell, cancel, error, start)
+#           * (mesg) The text message
+#           * (pair) The currency pair the event belongs to, if any
+#           * (fields) Any other values of the event (i.e. price, amount, profit). They must be JSON serializable.
+    def writeEvent(self, event, mesg, pair=None, **fields):
+        self.__sink__.write((event, pair, mesg, fields))
+
+#   flush
+#       - Purpose:
+#           Block until everything logged so far is written to the file.
+    def flush(self):
+        self.__sink__.flush()
+
+class LogSink(threading.Thread):
+    """The buffer and background writer of one log file."""
+
+#   __init__
+#       - Parameters:
+#           * (logFile) The file to write to
+#           * (jsonl) True to write JSON lines instead of text
+#           * (flushInterval) The longest a message waits in the buffer in seconds
+#           * (flushSize) The number of waiting messages which wakes up the writer early
+#           * (maxBytes) The size the file is rotated at (0 never rotates)
+#           * (backupCount) The number of rotated files kept
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, logFile, jsonl=False, flushInterval=1.0, flushSize=256, maxBytes=10485760, backupCount=5):
+        super(LogSink, self).__init__(daemon=True)
+        self.name = "LogSink"
+        self.__log_file__ = logFile
+        self.__jsonl__ = jsonl
+        self.__flush_interval__ = float(flushInterval)
+        self.__flush_size__ = max(int(flushSize), 1)
+        self.__max_bytes__ = int(maxBytes)
+        self.__backup_count__ = int(backupCount)
+        self.__buffer__ = collections.deque()
+        self.__wake__ = threading.Event()
+        self.__dropped__ = 0
+        self.__stopped__ = False
+
+#   write
+#       - Purpose:
+#           Buffer a record of (event, pair, mesg, fields). Only wakes up the writer when the buffer is full.
+    def write(self, record):
+        self.__buffer__.append((time.time(), record))
+        if len(self.__buffer__) >= self.__flush_size__:
+            self.__wake__.set()
+
+#   flush
+#       - Purpose:
+#           Wake up the writer and wait until every record buffered before the call is written.
+    def flush(self, timeout=5.0):
+        if not self.is_alive():
+            return
+        written = threading.Event()
+        self.__buffer__.append((None, written))
+        self.__wake__.set()
+        written.wait(timeout)
+
+#   stop
+#       - Purpose:
+#           Write whatever is left in the buffer and stop the thread.
+    def stop(self):
+        self.__stopped__ = True
+        self.__wake__.set()
+        if self.is_alive():
+            self.join()
+
+    def getDroppedCount(self):
+        return self.__dropped__
+
+#   getMetricSamples
+#       - Returns:
+#           The metrics collector samples of the lines waiting in the buffer and the lines dropped on write errors.
+    def getMetricSamples(self):
+        labels = {'file' : self.__log_file__}
+        return [('bitbot_log_buffered_lines', 'gauge', labels, len(self.__buffer__)),
+                ('bitbot_log_dropped_lines_total', 'counter', labels, self.__dropped__)]
+
+#   run
+#       - Purpose:
+#           The thread entry point. Writes the buffered records whenever woken up or every flush interval.
+    def run(self):
+        while True:
+            self.__wake__.wait(self.__flush_interval__)
+            self.__wake__.clear()
+            self.__writeBuffered__()
+            if self.__stopped__:
+                return
+
+    def __writeBuffered__(self):
+        lines = []
+        flushes = []            # events of flush calls waiting for the records before them
+        try:
+            while True:
+                timestamp, record = self.__buffer__.popleft()
+                if timestamp is None:
+                    flushes.append(record)
+                else:
+                    lines.append(self.__formatRecord__(timestamp, record))
+        except IndexError:
+            pass
+        if lines:
+            data = ''.join(lines)
+            try:
+                self.__rotate__(len(data))
+                with open(self.__log_file__, 'a') as f:
+                    f.write(data)
+            except OSError:
+                self.__dropped__ += len(lines)
+        for written in flushes:
+            written.set()
+
+    def __formatRecord__(self, timestamp, record):
+        event, pair, mesg, fields = record
+        timestamp = datetime.datetime.fromtimestamp(timestamp)
+        if not self.__jsonl__:
+            return "%s %s\n" % (timestamp, mesg)
+        entry = {'timestamp' : timestamp.isoformat(), 'event' : event}
+        if pair is not None:
+            entry['pair'] = pair
+        entry['message'] = mesg
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, default=str) + '\n'
+
+#   __rotate__
+#       - Purpose:
+#           Rotate the log file if writing a number of bytes would grow it past the size limit. Also creates the
+#           directory of the log file if it does not exist yet.
+    def __rotate__(self, size):
+        directory = os.path.dirname(self.__log_file__)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        if self.__max_bytes__ <= 0:
+            return
+        try:
+            currentSize = os.path.getsize(self.__log_file__)
+        except OSError:
+            return
+        if currentSize == 0 or currentSize + size <= self.__max_bytes__:
+            return
+        if self.__backup_count__ <= 0:
+            os.remove(self.__log_file__)
+            return
+        for number in range(self.__backup_count__ - 1, 0, -1):
+            source = "%s.%d" % (self.__log_file__, number)
+            if os.path.exists(source):
+                os.replace(source, "%s.%d" % (self.__log_file__, number + 1))
+        os.replace(self.__log_file__, self.__log_file__ + '.1')
+
+__sinks__ = {}
+__sinks_lock__ = threading.Lock()
+
+# getSink
+#   - Purpose:
+#       Return the LogSink of a log file, starting it from the log_format, log_flush_interval, log_flush_size,
+#       log_max_bytes and log_backup_count configurations the first time the file is used.
+def getSink(logFile):
+    path = os.path.abspath(logFile)
+    with __sinks_lock__:
+        sink = __sinks__.get(path)
+        if sink is None:
+            sink = LogSink(logFile,
+                           getattr(Bitbot_CDO, 'log_format', 'text') == 'jsonl',
+                           float(getattr(Bitbot_CDO, 'log_flush_interval', 1.0)),
+                           int(getattr(Bitbot_CDO, 'log_flush_size', 256)),
+                           int(getattr(Bitbot_CDO, 'log_max_bytes', 10485760)),
+                           int(getattr(Bitbot_CDO, 'log_backup_count', 5)))
+            sink.start()
+            __sinks__[path] = sink
+            Metrics.registry.addCollector(sink.getMetricSamples)
+        return sink
+
+# closeSinks
+#   - Purpose:
+#       Write everything still buffered and stop the background writers. Called when the program exits.
+def closeSinks():
+    with __sinks_lock__:
+        sinks = list(__sinks__.values())
+        __sinks__.clear()
+    for sink in sinks:
+        sink.stop()
+
+atexit.register(closeSinks)
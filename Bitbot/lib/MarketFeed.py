@@ -0,0 +1,168 @@
+#### MarketFeed ####
+# This class implements a thread which follows the ticker channel of the Poloniex push API instead of polling
+# returnTicker. It keeps a copy of the ticker (in the returnTicker format) which is updated as soon as the exchange
+# pushes a change, and wakes up the trader when the last price of one of its' pairs has changed.
+#
+# Poloniex identifies pairs in the push messages by number, so the feed is started with a returnTicker result
+# (which includes the 'id' of every pair). Ticker updates arrive as
+#
+#   [1002, null, [<pair id>, "<last>", "<lowestAsk>", "<highestBid>", "<percentChange>", "<baseVolume>",
+#                 "<quoteVolume>", <isFrozen>, "<high24hr>", "<low24hr>"]]
+#
+# and a heartbeat [1010] is sent every second when nothing else is. If the connection is lost the feed reconnects
+# with a growing delay; the trader polls the ticker while the feed is down.
+
+import threading, json, time
+from lib import Bitbot_CDO
+from lib import WebSocket
+
+class MarketFeed(threading.Thread):
+
+    # Constants
+    TICKER_CHANNEL = 1002
+    HEARTBEAT_CHANNEL = 1010
+    __TICKER_FIELDS__ = ('last', 'lowestAsk', 'highestBid', 'percentChange', 'baseVolume', 'quoteVolume', 'isFrozen',
+                         'high24hr', 'low24hr')
+
+#   __init__
+#       - Parameters:
+#           * (url) The push API URL (i.e. wss://api2.poloniex.com)
+#           * (currencyPairs) The pairs whose price changes wake up waitForUpdate. Every pair is kept up to date.
+#           * (timeout) Seconds without any message (not even a heartbeat) before the connection is considered lost
+#           * (maxReconnectDelay) The longest wait between reconnection attempts in seconds
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, url, currencyPairs, timeout=10.0, maxReconnectDelay=30.0):
+        super(MarketFeed, self).__init__(daemon=True)
+        self.name = "MarketFeed"
+        self.__url__ = url
+        self.__watched__ = set(currencyPairs)
+        self.__timeout__ = float(timeout)
+        self.__max_reconnect_delay__ = float(maxReconnectDelay)
+        self.__condition__ = threading.Condition()
+        self.__price_charts__ = {}
+        self.__pair_ids__ = {}          # pair id -> currency pair
+        self.__changed__ = set()
+        self.__connected__ = False
+        self.__socket__ = None
+        self.__update_count__ = 0
+        self._stop_event = threading.Event()
+
+#   setTicker
+#       - Purpose:
+#           Replace the ticker with a returnTicker result. Used to start the feed and while the feed is down.
+#           Watched pairs whose last price differs from the stored one wake up waitForUpdate.
+    def setTicker(self, priceCharts):
+        with self.__condition__:
+            for currencyPair, row in priceCharts.items():
+                if 'id' in row:
+                    self.__pair_ids__[int(row['id'])] = currencyPair
+                previous = self.__price_charts__.get(currencyPair)
+                self.__price_charts__[currencyPair] = row
+                if currencyPair in self.__watched__ and (previous is None or previous['last'] != row['last']):
+                    self.__changed__.add(currencyPair)
+            if self.__changed__:
+                self.__condition__.notify_all()
+
+#   getPriceCharts
+#       - Returns:
+#           A copy of the current ticker in the returnTicker format. The rows are never modified once stored so
+#           they are shared with the copy.
+    def getPriceCharts(self):
+        with self.__condition__:
+            return dict(self.__price_charts__)
+
+#   waitForUpdate
+#       - Purpose:
+#           Block until the last price of a watched pair changes or the timeout passes.
+#       - Returns:
+#           The set of watched currency pairs whose price changed since the last call (empty on timeout).
+    def waitForUpdate(self, timeout):
+        with self.__condition__:
+            if not self.__changed__:
+                self.__condition__.wait(timeout)
+            changed = self.__changed__
+            self.__changed__ = set()
+            return changed
+
+    def isConnected(self):
+        return self.__connected__
+
+    def getUpdateCount(self):
+        return self.__update_count__
+
+#   stop
+#       - Purpose:
+#           Stop the thread and close the connection.
+    def stop(self):
+        self._stop_event.set()
+        webSocket = self.__socket__
+        if webSocket is not None:
+            webSocket.close()
+        with self.__condition__:
+            self.__condition__.notify_all()
+
+#   run
+#       - Purpose:
+#           The thread entry point. Connects, subscribes to the ticker channel and applies the updates until the
+#           thread is stopped, reconnecting whenever the connection is lost.
+    def run(self):
+        reconnectDelay = 1.0
+        while not self._stop_event.is_set():
+            try:
+                self.__socket__ = WebSocket.connect(self.__url__, self.__timeout__)
+                self.__socket__.settimeout(self.__timeout__)
+                self.__socket__.sendText(json.dumps({'command' : 'subscribe', 'channel' : self.TICKER_CHANNEL}))
+                while not self._stop_event.is_set():
+                    message = self.__socket__.recv()
+                    if message is None:
+                        break
+                    self.__connected__ = True
+                    reconnectDelay = 1.0
+                    self.__handleMessage__(message)
+            except Exception:
+                pass
+            finally:
+                self.__connected__ = False
+                if self.__socket__ is not None:
+                    self.__socket__.close()
+                    self.__socket__ = None
+
+            self._stop_event.wait(reconnectDelay)
+            reconnectDelay = min(reconnectDelay * 2, self.__max_reconnect_delay__)
+
+#   __handleMessage__
+#       - Purpose:
+#           Apply a ticker update. Subscription acknowledgements ([1002, 1]) and heartbeats are ignored.
+    def __handleMessage__(self, message):
+        data = json.loads(message)
+        if not isinstance(data, list) or len(data) < 3 or data[0] != self.TICKER_CHANNEL:
+            return
+        update = data[2]
+        with self.__condition__:
+            currencyPair = self.__pair_ids__.get(int(update[0]))
+            if currencyPair is None:
+                return
+            row = dict(self.__price_charts__.get(currencyPair, {}))
+            row['id'] = int(update[0])
+            for name, value in zip(self.__TICKER_FIELDS__, update[1:]):
+                row[name] = str(value)
+            previous = self.__price_charts__.get(currencyPair)
+            self.__price_charts__[currencyPair] = row
+            self.__update_count__ += 1
+            if currencyPair in self.__watched__ and (previous is None or previous.get('last') != row['last']):
+                self.__changed__.add(currencyPair)
+                self.__condition__.notify_all()
+
+# createMarketFeed
+#   - Purpose:
+#       Build a MarketFeed from the enable_push_feed and push_feed_url configurations.
+#   - Parameters:
+#       * (currencyPairs) The traded currency pairs
+#   - Returns:
+#       A MarketFeed, or None if the push feed is disabled.
+def createMarketFeed(currencyPairs):
+    if getattr(Bitbot_CDO, 'enable_push_feed', 'False') != 'True':
+        return None
+    return MarketFeed(getattr(Bitbot_CDO, 'push_feed_url', 'wss://api2.poloniex.com'), currencyPairs,
+                      float(getattr(Bitbot_CDO, 'push_feed_timeout', 10.0)))
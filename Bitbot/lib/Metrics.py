@@ -0,0 +1,319 @@
+#### Metrics ####
+# Measurements of the running bot: latency histograms of every Poloniex command, the time the policies take to decide,
+# the loop period and tick time of the trader, and gauges such as the requests waiting in the scheduler and the log
+# lines waiting to be written. Everything is kept in the module's registry and can be exported in the Prometheus text
+# format, either served over HTTP (metrics_port) or written to a file every few seconds (metrics_file) for the node
+# exporter's textfile collector.
+#
+# Recording a value takes a short lock and a bisect over the bucket bounds so it can be left on in production.
+# http.server is only imported when the metrics are served.
+
+import threading, time, bisect, os
+from lib import Bitbot_CDO
+
+# Upper bounds in seconds of the latency buckets, from fast local calls to slow exchange requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram(object):
+    """Counts observations in cumulative buckets like a Prometheus histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.__bounds__ = tuple(sorted(buckets))
+        self.__counts__ = [0] * (len(self.__bounds__) + 1)     # the last count is the +Inf bucket
+        self.__sum__ = 0.0
+        self.__count__ = 0
+
+    def observe(self, value):
+        self.__counts__[bisect.bisect_left(self.__bounds__, value)] += 1
+        self.__sum__ += value
+        self.__count__ += 1
+
+#   getSnapshot
+#       - Returns:
+#           A tuple of (buckets, sum, count) where buckets is a list of (upper bound, cumulative count) ending with
+#           the +Inf bucket.
+    def getSnapshot(self):
+        buckets = []
+        cumulative = 0
+        for bound, count in zip(self.__bounds__ + (float('inf'),), self.__counts__):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return (buckets, self.__sum__, self.__count__)
+
+#   getQuantile
+#       - Returns:
+#           The upper bound of the bucket holding the quantile (0 - 1) of the observations, or None if there are none.
+    def getQuantile(self, quantile):
+        buckets, total, count = self.getSnapshot()
+        if count == 0:
+            return None
+        rank = quantile * count
+        for bound, cumulative in buckets:
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+class MetricsRegistry(object):
+
+#   __init__
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self):
+        self.__lock__ = threading.Lock()
+        self.__histograms__ = {}        # name -> {labels : Histogram}
+        self.__counters__ = {}          # name -> {labels : value}
+        self.__gauges__ = {}            # name -> {labels : value}
+        self.__collectors__ = []        # functions returning (name, kind, labels, value) samples when exported
+        self.__help__ = {}
+
+#   observe
+#       - Purpose:
+#           Add an observation (usually seconds) to a histogram.
+#       - Parameters:
+#           * (name) The metric name (i.e. bitbot_api_request_seconds)
+#           * (value) The observed value
+#           * (labels) The label values as keyword arguments (i.e. command='returnTicker')
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.__lock__:
+            series = self.__histograms__.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+#   increment
+#       - Purpose:
+#           Add to a counter.
+    def increment(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.__lock__:
+            series = self.__counters__.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+#   setGauge
+#       - Purpose:
+#           Set the current value of a gauge.
+    def setGauge(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.__lock__:
+            self.__gauges__.setdefault(name, {})[key] = value
+
+#   describe
+#       - Purpose:
+#           Set the help text exported with a metric.
+    def describe(self, name, text):
+        self.__help__[name] = text
+
+#   addCollector
+#       - Purpose:
+#           Register a function read on every export for values kept elsewhere (i.e. the scheduler statistics).
+#       - Parameters:
+#           * (collector) A function returning a list of (name, kind, labels, value) samples where kind is 'counter'
+#                         or 'gauge' and labels is a dictionary
+    def addCollector(self, collector):
+        with self.__lock__:
+            self.__collectors__.append(collector)
+
+#   getHistogram
+#       - Returns:
+#           The histogram of a name and labels or None if nothing was observed yet.
+    def getHistogram(self, name, **labels):
+        with self.__lock__:
+            return self.__histograms__.get(name, {}).get(tuple(sorted(labels.items())))
+
+#   timed
+#       - Purpose:
+#           Time a block of code into a histogram:  with registry.timed('bitbot_tick_seconds'): ...
+    def timed(self, name, **labels):
+        return Timer(self, name, labels)
+
+#   render
+#       - Returns:
+#           (str) Every metric in the Prometheus text exposition format.
+    def render(self):
+        with self.__lock__:
+            histograms = {name : {key : histogram.getSnapshot() for key, histogram in series.items()}
+                          for name, series in self.__histograms__.items()}
+            counters = {name : dict(series) for name, series in self.__counters__.items()}
+            gauges = {name : dict(series) for name, series in self.__gauges__.items()}
+            collectors = list(self.__collectors__)
+
+        for collector in collectors:
+            try:
+                samples = collector()
+            except Exception:
+                continue
+            for name, kind, labels, value in samples:
+                target = counters if kind == 'counter' else gauges
+                target.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+        lines = []
+        for name in sorted(histograms):
+            self.__header__(lines, name, 'histogram')
+            for key, (buckets, total, count) in sorted(histograms[name].items()):
+                for bound, cumulative in buckets:
+                    lines.append('%s_bucket%s %d' % (name, formatLabels(key + (('le', formatValue(bound)),)), cumulative))
+                lines.append('%s_sum%s %s' % (name, formatLabels(key), formatValue(total)))
+                lines.append('%s_count%s %d' % (name, formatLabels(key), count))
+        for kind, metrics in (('counter', counters), ('gauge', gauges)):
+            for name in sorted(metrics):
+                self.__header__(lines, name, kind)
+                for key, value in sorted(metrics[name].items()):
+                    lines.append('%s%s %s' % (name, formatLabels(key), formatValue(value)))
+        return '\n'.join(lines) + '\n'
+
+    def __header__(self, lines, name, kind):
+        if name in self.__help__:
+            lines.append('# HELP %s %s' % (name, self.__help__[name]))
+        lines.append('# TYPE %s %s' % (name, kind))
+
+class Timer(object):
+    """Context manager observing the seconds spent in a block."""
+
+    def __init__(self, registry, name, labels):
+        self.__registry__ = registry
+        self.__metric__ = name
+        self.__labels__ = labels
+
+    def __enter__(self):
+        self.__start__ = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.__registry__.observe(self.__metric__, time.perf_counter() - self.__start__, **self.__labels__)
+        return False
+
+def formatLabels(key):
+    if not key:
+        return ''
+    return '{' + ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                          for name, value in key) + '}'
+
+def formatValue(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+# The registry every part of the bot records into
+registry = MetricsRegistry()
+registry.describe('bitbot_api_request_seconds', 'Time taken by a Poloniex API command, including the wait for the request scheduler.')
+registry.describe('bitbot_api_errors_total', 'Poloniex API commands which raised an error.')
+registry.describe('bitbot_policy_decision_seconds', 'Time taken by a policy shouldBuy/shouldSell call.')
+registry.describe('bitbot_policy_member_seconds', 'Time taken by a policy of an ensemble to answer a call.')
+registry.describe('bitbot_policy_timeouts_total', 'Calls of a policy of an ensemble which were not answered within ensemble_timeout.')
+registry.describe('bitbot_loop_period_seconds', 'Time between the starts of two trader loop iterations.')
+registry.describe('bitbot_tick_seconds', 'Time taken by one trader loop iteration, excluding the sleep.')
+registry.describe('bitbot_startup_seconds', 'Time taken by each step of the last startup, from Bitbot.py starting to the end of the first tick.')
+
+# createMetricsHandler
+#   - Returns:
+#       The request handler class serving the registry of its' server on / and /metrics.
+def createMetricsHandler():
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = self.server.registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+class MetricsExporter(object):
+
+#   __init__
+#       - Parameters:
+#           * (registry) The MetricsRegistry to export
+#           * (port) The port /metrics is served on, or 0 to not serve it
+#           * (host) The address the server listens on
+#           * (path) The file the metrics are written to, or None to not write a file
+#           * (interval) Seconds between writes of the file
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, registry, port=0, host='127.0.0.1', path=None, interval=10.0):
+        self.__registry__ = registry
+        self.__port__ = int(port)
+        self.__host__ = host
+        self.__path__ = path
+        self.__interval__ = float(interval)
+        self.__server__ = None
+        self.__threads__ = []
+        self._stop_event = threading.Event()
+
+#   start
+#       - Purpose:
+#           Start the HTTP server and/or the file writer on daemon threads.
+#       - Returns:
+#           The exporter.
+    def start(self):
+        if self.__port__ > 0:
+            from http.server import ThreadingHTTPServer
+            self.__server__ = ThreadingHTTPServer((self.__host__, self.__port__), createMetricsHandler())
+            self.__server__.daemon_threads = True
+            self.__server__.registry = self.__registry__
+            self.__threads__.append(threading.Thread(target=self.__server__.serve_forever, name="MetricsServer", daemon=True))
+        if self.__path__:
+            self.__threads__.append(threading.Thread(target=self.__writeLoop__, name="MetricsFile", daemon=True))
+        for thread in self.__threads__:
+            thread.start()
+        return self
+
+    def getUrl(self):
+        return 'http://%s:%d/metrics' % (self.__server__.server_address[0], self.__server__.server_address[1])
+
+#   stop
+#       - Purpose:
+#           Stop the server and write the file one last time.
+    def stop(self):
+        self._stop_event.set()
+        if self.__server__ is not None:
+            self.__server__.shutdown()
+            self.__server__.server_close()
+        for thread in self.__threads__:
+            thread.join()
+
+    def __writeLoop__(self):
+        while True:
+            stopped = self._stop_event.wait(self.__interval__)
+            self.writeFile()
+            if stopped:
+                return
+
+#   writeFile
+#       - Purpose:
+#           Write the metrics to the file. The file is replaced in one step so a reader never sees half of it.
+    def writeFile(self):
+        temporary = self.__path__ + '.tmp'
+        try:
+            with open(temporary, 'w') as f:
+                f.write(self.__registry__.render())
+            os.replace(temporary, self.__path__)
+        except OSError:
+            pass
+
+# createMetricsExporter
+#   - Purpose:
+#       Build a MetricsExporter of the registry from the metrics_port, metrics_host, metrics_file and
+#       metrics_file_interval configurations.
+#   - Returns:
+#       A MetricsExporter (not started), or None if neither the port nor the file is configured.
+def createMetricsExporter():
+    port = int(getattr(Bitbot_CDO, 'metrics_port', 0) or 0)
+    path = getattr(Bitbot_CDO, 'metrics_file', '') or None
+    if port <= 0 and path is None:
+        return None
+    return MetricsExporter(registry, port, getattr(Bitbot_CDO, 'metrics_host', '127.0.0.1'), path,
+                           float(getattr(Bitbot_CDO, 'metrics_file_interval', 10.0)))
@@ -0,0 +1,411 @@
+#### Optimizer ####
+# This class searches the bitbot.config parameters of a policy (its' PARAMETER_SPACE, see PolicyTemplate) for the
+# values which would have traded a stored candlestick history best. Every candidate is a set of config values which
+# is run through the Backtester on each fold of a walk-forward split of the history:
+#
+#       | train | train | train | test  |                               fold 1
+#               | train | train | train | test  |                       fold 2
+#                       | train | train | train | test  |               fold 3
+#
+# The blocks start after the longest measurement window of the parameter space, so every candidate has a full window
+# of candles before every block and trades from its' first candle. The candidates are ranked by their mean profit on
+# the train blocks. The test block right after them is only used
+# to report how the candidate did on candles it was not picked on, and the walk-forward profit chains the test
+# profit of the candidate ranked first on each fold's train blocks, which is what re-optimizing before every test
+# block would have made.
+#
+# The backtests run on a process pool using every CPU core. The candles are copied once into shared memory and each
+# process maps them, so a task only carries the candidate's values and the fold it is run on. Candidates are either
+# all run on every fold (random search) or thinned out by successive halving: every candidate is run on the most
+# recent fold, the better 1/eta of them on eta times as many folds and so on until the last ones are run on all of
+# them.
+
+import concurrent.futures, math, os, random
+import numpy as np
+from multiprocessing import shared_memory
+from lib import Bitbot_CDO
+from lib.Backtester import Backtester, getCandleRows, getWindowLength
+from lib.PolicyEnsemble import createPolicy, initializeProcess
+
+# In an optimizer process: the shared candles and what every backtest is run with
+__worker_memory__ = None
+__worker_rows__ = None
+__worker_setup__ = None
+__worker_policy__ = None
+
+class SharedCandles(object):
+    """Candle rows copied into shared memory once so every optimizer process maps them instead of receiving a copy."""
+
+    def __init__(self, rows):
+        self.__memory__ = shared_memory.SharedMemory(create=True, size=max(rows.nbytes, 1))
+        self.__shape__ = rows.shape
+        np.ndarray(rows.shape, dtype=float, buffer=self.__memory__.buf)[:] = rows
+
+    def getName(self):
+        return self.__memory__.name
+
+    def getShape(self):
+        return self.__shape__
+
+    def close(self):
+        self.__memory__.close()
+        self.__memory__.unlink()
+
+class Optimizer(object):
+
+#   __init__
+#       - Parameters:
+#           * (policyFile) The policy module(s) to optimize, in the format of policy_file
+#           * (currencyPair) The currency pair the candles belong to e.g. "BTC_XRP"
+#           * (candles) A list of candle dictionaries ordered by date (the format returned by returnChartData)
+#           * (candlePeriod) The candlestick period in seconds
+#           * (space) The parameter space to search (see PolicyTemplate.PARAMETER_SPACE)
+#           * (folds) The number of walk-forward folds
+#           * (trainBlocks) The number of blocks of candles each fold trains on before its' test block
+#           * (fee) The trading fee taken from every order as a fraction (0.002 = 0.2%)
+#           * (workers) The number of processes (default: one per CPU core)
+#           * (seed) Seed of the random candidates, for repeatable searches
+#       - Purpose:
+#           Initialize the class properties, copy the candles into shared memory and start the processes.
+    def __init__(self, policyFile, currencyPair, candles, candlePeriod, space, folds=4, trainBlocks=3, fee=0.002,
+                 workers=None, seed=None):
+        if not space:
+            raise ValueError("No parameters to optimize for %s" % (policyFile))
+        self.__space__ = space
+        self.__folds__ = int(folds)
+        self.__random__ = random.Random(seed)
+        self.__candidates__ = []        # {'parameters' : {key : value}, 'results' : {fold : {'train', 'test'}}}
+        rows = getCandleRows(candles)
+        self.__splits__ = walkForwardSplits(len(rows), self.__folds__, int(trainBlocks), getMaximumWarmup(space, candlePeriod))
+        self.__candles__ = SharedCandles(rows)
+
+        configuration = dict((key, value) for key, value in vars(Bitbot_CDO).items() if not key.startswith('_') and isinstance(value, str))
+        setup = {'policy_file' : policyFile, 'currency_pair' : currencyPair, 'candle_period' : int(candlePeriod), 'fee' : float(fee)}
+        self.__pool__ = concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=initializeWorker,
+                                                               initargs=(self.__candles__.getName(), self.__candles__.getShape(), configuration, setup))
+
+#   close
+#       - Purpose:
+#           Stop the processes and release the shared memory.
+    def close(self):
+        self.__pool__.shutdown(wait=True, cancel_futures=True)
+        self.__candles__.close()
+
+    def getSplits(self):
+        return self.__splits__
+
+#   randomSearch
+#       - Purpose:
+#           Run a number of random candidates on every fold.
+#       - Parameters:
+#           * (trials) The number of candidates, the first being the values currently in bitbot.config
+#       - Returns:
+#           The ranked results (see getResults).
+    def randomSearch(self, trials):
+        candidates = self.__addCandidates__(trials)
+        self.__evaluate__(candidates, range(0, self.__folds__))
+        return self.getResults()
+
+#   successiveHalving
+#       - Purpose:
+#           Run a number of random candidates on the most recent fold and keep the better 1/eta of them for eta
+#           times as many folds until the remaining candidates have been run on every fold.
+#       - Parameters:
+#           * (trials) The number of candidates, the first being the values currently in bitbot.config
+#           * (eta) The factor the candidates are cut down by (and the folds multiplied by) each round
+#       - Returns:
+#           The ranked results (see getResults).
+    def successiveHalving(self, trials, eta=2):
+        eta = max(int(eta), 2)
+        survivors = self.__addCandidates__(trials)
+        foldCount = 1
+        while True:
+            foldCount = self.__folds__ if len(survivors) <= 1 else min(foldCount, self.__folds__)
+            self.__evaluate__(survivors, range(self.__folds__ - foldCount, self.__folds__))
+            if foldCount == self.__folds__:
+                break
+            survivors = sorted(survivors, key=getTrainProfit, reverse=True)[:max(1, int(math.ceil(len(survivors) / float(eta))))]
+            foldCount *= eta
+        return self.getResults()
+
+#   getResults
+#       - Purpose:
+#           Rank the candidates, those run on the most folds first, then by their mean train profit. A candidate
+#           which replayed no candles on a block is left out.
+#       - Returns:
+#           A list of dictionaries of the candidate's values plus:
+#               { 'folds' : number of folds run,
+#                 'train_profit' : mean percent profit on the train blocks,
+#                 'test_profit' : mean percent profit on the test blocks,
+#                 'max_drawdown' : largest percent drawdown on a test block,
+#                 'trades' : number of sells on the test blocks }
+    def getResults(self):
+        results = []
+        for candidate in sorted(self.__candidates__, key=lambda candidate: (len(candidate['results']), getTrainProfit(candidate)), reverse=True):
+            if not candidate['results'] or not isComplete(candidate):
+                continue
+            tests = [result['test'] for result in candidate['results'].values()]
+            result = dict(candidate['parameters'])
+            result.update({'folds' : len(tests),
+                           'train_profit' : getTrainProfit(candidate),
+                           'test_profit' : sum(test['profit'] for test in tests) / len(tests),
+                           'max_drawdown' : max(test['max_drawdown'] for test in tests),
+                           'trades' : sum(test['sells'] for test in tests)})
+            results.append(result)
+        return results
+
+#   getWalkForward
+#       - Purpose:
+#           Pick the candidate with the best train profit on each fold and chain their test profits.
+#       - Returns:
+#           A tuple of the compounded percent profit of the test blocks and a list of
+#           (fold, candidate values, train profit, test profit) for every fold run.
+    def getWalkForward(self):
+        value = 1.0
+        folds = []
+        for fold in range(0, self.__folds__):
+            candidates = [candidate for candidate in self.__candidates__ if fold in candidate['results'] and isComplete(candidate)]
+            if not candidates:
+                continue
+            best = max(candidates, key=lambda candidate: candidate['results'][fold]['train']['profit'])
+            result = best['results'][fold]
+            value *= 1.0 + result['test']['profit'] / 100.0
+            folds.append((fold, best['parameters'], result['train']['profit'], result['test']['profit']))
+        return ((value - 1.0) * 100.0, folds)
+
+#   __addCandidates__
+#       - Purpose:
+#           Create the candidates of a search: the values in bitbot.config (if they are inside the parameter space)
+#           followed by distinct random values.
+#       - Returns:
+#           The list of new candidates.
+    def __addCandidates__(self, trials):
+        seen = set(tuple(sorted(candidate['parameters'].items())) for candidate in self.__candidates__)
+        candidates = []
+        current = dict((key, getattr(Bitbot_CDO, key)) for key in self.__space__ if hasattr(Bitbot_CDO, key))
+        attempts = 0
+        while len(candidates) < trials and attempts < trials * 10:
+            parameters = current if attempts == 0 and isInSpace(current, self.__space__) else sampleParameters(self.__space__, self.__random__)
+            attempts += 1
+            key = tuple(sorted(parameters.items()))
+            if key in seen:
+                continue
+            seen.add(key)
+            candidates.append({'parameters' : parameters, 'results' : {}})
+        self.__candidates__.extend(candidates)
+        return candidates
+
+#   __evaluate__
+#       - Purpose:
+#           Run the candidates on the folds they have not been run on yet, all at once on the process pool.
+    def __evaluate__(self, candidates, folds):
+        futures = {}
+        for candidate in candidates:
+            for fold in folds:
+                if fold not in candidate['results']:
+                    futures[self.__pool__.submit(evaluateFold, candidate['parameters'], self.__splits__[fold])] = (candidate, fold)
+        for future in concurrent.futures.as_completed(futures):
+            candidate, fold = futures[future]
+            candidate['results'][fold] = future.result()
+
+# walkForwardSplits
+#   - Purpose:
+#       Cut the history after the first warmup candles into folds + trainBlocks blocks of the same length. Fold i
+#       trains on the trainBlocks blocks starting at block i and tests on the block after them. The last test block
+#       takes the candles left over.
+#   - Parameters:
+#       * (candleCount) The number of candles in the history
+#       * (folds) The number of folds
+#       * (trainBlocks) The number of blocks each fold trains on
+#       * (warmup) The number of candles kept before the first block to fill the measurement window
+#   - Returns:
+#       A list of (train start, test start, test end) candle indexes, one per fold.
+def walkForwardSplits(candleCount, folds, trainBlocks, warmup=0):
+    blockLength = (candleCount - warmup) // (folds + trainBlocks)
+    if folds < 1 or trainBlocks < 1 or blockLength < 1:
+        raise ValueError("Not enough candles (%d) for %d folds of %d train blocks after a measurement window of %d candles"
+                         % (candleCount, folds, trainBlocks, warmup))
+    splits = []
+    for fold in range(0, folds):
+        testStart = warmup + (fold + trainBlocks) * blockLength
+        splits.append((warmup + fold * blockLength, testStart, candleCount if fold == folds - 1 else testStart + blockLength))
+    return splits
+
+# getMaximumWarmup
+#   - Purpose:
+#       Find the longest measurement window of a parameter space: the largest measurement_period with the longest
+#       period_unit it may be searched with (or the values in bitbot.config if they are not searched).
+#   - Returns:
+#       (int) The number of candles needed before the first candle a policy is asked about.
+def getMaximumWarmup(space, candlePeriod):
+    values = {}
+    for key in ('measurement_period', 'period_unit'):
+        searched = space.get(key)
+        if searched is None:
+            values[key] = [getattr(Bitbot_CDO, key)]
+        elif isinstance(searched, list):
+            values[key] = searched
+        else:
+            values[key] = [searched[1]]
+    return max(getWindowLength(int(float(measurementPeriod)), periodUnit, candlePeriod) - 1
+               for measurementPeriod in values['measurement_period'] for periodUnit in values['period_unit'])
+
+# isInSpace
+#   - Returns:
+#       (bool) True if every value of a candidate is inside the range or one of the values of its' key.
+def isInSpace(parameters, space):
+    if set(parameters) != set(space):
+        return False
+    for key, values in space.items():
+        if isinstance(values, list):
+            if parameters[key] not in [str(value) for value in values]:
+                return False
+        elif not float(values[0]) <= float(parameters[key]) <= float(values[1]):
+            return False
+    return True
+
+# sampleParameters
+#   - Purpose:
+#       Draw random values from a parameter space. A (low, high) range of ints gives an int, any other range a float
+#       rounded to 4 decimals and a list one of its' values.
+#   - Returns:
+#       A dictionary of key -> value as the string bitbot.config would hold.
+def sampleParameters(space, generator):
+    parameters = {}
+    for key, values in sorted(space.items()):
+        if isinstance(values, list):
+            value = generator.choice(values)
+        elif isinstance(values[0], int) and isinstance(values[1], int):
+            value = generator.randint(values[0], values[1])
+        else:
+            value = round(generator.uniform(float(values[0]), float(values[1])), 4)
+        parameters[key] = str(value)
+    return parameters
+
+# getParameterSpace
+#   - Purpose:
+#       Return the PARAMETER_SPACE of a policy loaded by createPolicy. The space of an ensemble joins those of its'
+#       policies.
+def getParameterSpace(policy):
+    if hasattr(policy, 'getMembers'):
+        space = {}
+        for member in policy.getMembers():
+            space.update(getParameterSpace(member.policy))
+        return space
+    if hasattr(policy, 'getPolicyClass'):
+        policy = policy.getPolicyClass()
+    return dict(getattr(policy, 'PARAMETER_SPACE', {}))
+
+# getTrainProfit
+#   - Returns:
+#       The mean percent profit of a candidate on the train blocks of the folds it was run on, or -inf if it has not
+#       been run or replayed no candles on a block.
+def getTrainProfit(candidate):
+    results = candidate['results'].values()
+    if not results or not isComplete(candidate):
+        return float('-inf')
+    return sum(result['train']['profit'] for result in results) / len(results)
+
+# isComplete
+#   - Returns:
+#       (bool) True if the candidate replayed candles on the train and test block of every fold it was run on.
+def isComplete(candidate):
+    return all(result['train']['candles'] > 0 and result['test']['candles'] > 0 for result in candidate['results'].values())
+
+# initializeWorker
+#   - Purpose:
+#       Copy the configuration into Bitbot_CDO of an optimizer process and map the shared candles.
+def initializeWorker(memoryName, shape, configuration, setup):
+    global __worker_memory__, __worker_rows__, __worker_setup__
+    initializeProcess(configuration)
+    __worker_memory__ = shared_memory.SharedMemory(name=memoryName)
+    __worker_rows__ = np.ndarray(shape, dtype=float, buffer=__worker_memory__.buf)
+    __worker_setup__ = setup
+
+# evaluateFold
+#   - Purpose:
+#       Backtest a candidate on the train and test blocks of a fold in an optimizer process. The candles before each
+#       block fill the policy's measurement window, so trading starts on the first candle of the block. A block with
+#       fewer candles before it than the window is an error (walkForwardSplits leaves room for the longest window).
+#   - Parameters:
+#       * (parameters) The candidate's config values, set in Bitbot_CDO before the backtests
+#       * (split) The (train start, test start, test end) of the fold
+#   - Returns:
+#       A dictionary of the train and test reports (see Backtester.run).
+def evaluateFold(parameters, split):
+    global __worker_policy__
+    for key, value in parameters.items():
+        setattr(Bitbot_CDO, key, value)
+    if __worker_policy__ is None:
+        __worker_policy__ = createPolicy(__worker_setup__['policy_file'], waitForAll=True)
+
+    measurementPeriod = int(Bitbot_CDO.measurement_period)
+    warmup = getWindowLength(measurementPeriod, Bitbot_CDO.period_unit, __worker_setup__['candle_period']) - 1
+    trainStart, testStart, testEnd = split
+    reports = {}
+    for name, start, end in (('train', trainStart, testStart), ('test', testStart, testEnd)):
+        if start < warmup:
+            raise ValueError("The %s block at candle %d has less than the %d candles of the measurement window before it" % (name, start, warmup))
+        backtester = Backtester(__worker_policy__, __worker_setup__['currency_pair'], __worker_rows__[start - warmup:end],
+                                __worker_setup__['candle_period'], measurementPeriod, Bitbot_CDO.period_unit, __worker_setup__['fee'])
+        reports[name] = backtester.run()
+    return reports
+
+# formatTable
+#   - Purpose:
+#       Turn the results of Optimizer.getResults into a printable table.
+def formatTable(results, keys, limit=10):
+    widths = [max(len(key), 8) for key in keys]
+    lines = ["%4s " % ('rank') + ' '.join('%*s' % (width, key) for key, width in zip(keys, widths)) + " %5s %8s %8s %9s %6s" % ('folds', 'train%', 'test%', 'drawdown%', 'sells')]
+    for rank, result in enumerate(results[:limit], 1):
+        lines.append("%4d " % (rank) + ' '.join('%*s' % (width, result[key]) for key, width in zip(keys, widths)) +
+                     " %5d %8.2f %8.2f %9.2f %6d" % (result['folds'], result['train_profit'], result['test_profit'], result['max_drawdown'], result['trades']))
+    return '\n'.join(lines)
+
+# formatConfigSection
+#   - Purpose:
+#       Turn config values into a bitbot.config section.
+def formatConfigSection(section, parameters):
+    return '\n'.join(['[%s]' % (section)] + ['%s=%s' % (key, value) for key, value in sorted(parameters.items())])
+
+# writeConfigSection
+#   - Purpose:
+#       Write config values into bitbot.config keeping its' comments. A key already in the file is changed where it
+#       is, the others are added to the end of the section (which is added to the file, or a new file, if it is
+#       missing).
+#   - Parameters:
+#       * (path) The config file
+#       * (section) The name of the section new keys are added to
+#       * (parameters) A dictionary of key -> value
+def writeConfigSection(path, section, parameters):
+    lines = []
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+
+    parameters = dict((key.lower(), value) for key, value in parameters.items())
+    written = set()
+    currentSection = None
+    sectionEnd = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith('[') and stripped.endswith(']'):
+            currentSection = stripped[1:-1]
+            continue
+        if stripped and not stripped.startswith(('#', ';')) and currentSection == section:
+            sectionEnd = i
+        key = stripped.split('=', 1)[0].strip()
+        if '=' in stripped and not stripped.startswith(('#', ';')) and key.lower() in parameters:
+            lines[i] = '%s=%s' % (key, parameters[key.lower()])
+            written.add(key.lower())
+
+    missing = ['%s=%s' % (key, value) for key, value in sorted(parameters.items()) if key not in written]
+    if missing and sectionEnd is None and section in [line.strip()[1:-1] for line in lines if line.strip().startswith('[')]:
+        sectionEnd = max(i for i, line in enumerate(lines) if line.strip() == '[%s]' % (section))
+    if missing and sectionEnd is None:
+        lines.extend(([''] if lines else []) + ['[%s]' % (section)] + missing)
+    elif missing:
+        lines[sectionEnd+1:sectionEnd+1] = missing
+
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,294 @@
+#### OrderBook ####
+# Prices orders from the depth of the order book instead of the last ticker price. An all-in order at the last price
+# either rests on the book until the price comes back (and the trader waits for it to clear) or, if it is larger
+# than the best level, only part of it fills. With use_order_book_execution enabled the rate of an order is the
+# price of the deepest level the whole order needs, so it fills as soon as it is placed, unless that is more than
+# order_book_max_slippage away from the best price, in which case the order is priced at that limit and the rest
+# waits on the book.
+#
+# The books are kept in an OrderBookCache. A book is downloaded with returnOrderBook (only order_book_depth levels)
+# when it is older than order_book_max_age seconds or the ticker shows a better price than the book has. In between,
+# every ticker removes the levels the market has traded through, and updates from the push API can be applied level
+# by level with applyUpdate.
+
+import bisect, threading, time
+from lib import Bitbot_CDO
+
+class OrderBook(object):
+
+    ASK = 'ask'
+    BID = 'bid'
+
+#   __init__
+#       - Parameters:
+#           * (currencyPair) The currency pair of the book e.g. "BTC_XRP"
+#           * (response) The dictionary returned by returnOrderBook for the pair
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, currencyPair, response):
+        if 'error' in response:
+            raise Exception("returnOrderBook failed: %s" % (response['error']))
+        self.__currency_pair__ = currencyPair
+        # Both sides are kept ordered from the best price outwards. The bid prices are stored negated so both
+        # lists can be searched with bisect.
+        self.__ask_prices__ = []
+        self.__ask_amounts__ = []
+        self.__bid_prices__ = []
+        self.__bid_amounts__ = []
+        for rate, amount in response.get('asks', []):
+            self.applyUpdate(self.ASK, rate, amount)
+        for rate, amount in response.get('bids', []):
+            self.applyUpdate(self.BID, rate, amount)
+        self.__seq__ = int(response.get('seq', 0))
+        self.__frozen__ = str(response.get('isFrozen', '0')) == '1'
+        self.__fetched__ = time.monotonic()
+
+    def getCurrencyPair(self):
+        return self.__currency_pair__
+
+    def getSeq(self):
+        return self.__seq__
+
+    def isFrozen(self):
+        return self.__frozen__
+
+#   getAge
+#       - Returns:
+#           (float) Seconds since the book was downloaded.
+    def getAge(self):
+        return time.monotonic() - self.__fetched__
+
+    def getBestAsk(self):
+        return self.__ask_prices__[0] if self.__ask_prices__ else None
+
+    def getBestBid(self):
+        return -self.__bid_prices__[0] if self.__bid_prices__ else None
+
+#   getLevels
+#       - Returns:
+#           A list of (price, amount) tuples of one side from the best price outwards.
+    def getLevels(self, side):
+        if side == self.ASK:
+            return list(zip(self.__ask_prices__, self.__ask_amounts__))
+        return [(-price, amount) for price, amount in zip(self.__bid_prices__, self.__bid_amounts__)]
+
+#   applyUpdate
+#       - Purpose:
+#           Set the amount at a price level (the push API sends the new total of a level). An amount of 0 removes
+#           the level.
+#       - Parameters:
+#           * (side) OrderBook.ASK or OrderBook.BID
+#           * (rate) The price of the level
+#           * (amount) The amount of the subject currency now offered at the level
+#           * (seq) The sequence number of the update, or None
+    def applyUpdate(self, side, rate, amount, seq=None):
+        prices, amounts = (self.__ask_prices__, self.__ask_amounts__) if side == self.ASK else (self.__bid_prices__, self.__bid_amounts__)
+        key = float(rate) if side == self.ASK else -float(rate)
+        amount = float(amount)
+        index = bisect.bisect_left(prices, key)
+        exists = index < len(prices) and prices[index] == key
+        if amount <= 0:
+            if exists:
+                del prices[index]
+                del amounts[index]
+        elif exists:
+            amounts[index] = amount
+        else:
+            prices.insert(index, key)
+            amounts.insert(index, amount)
+        if seq is not None:
+            self.__seq__ = max(self.__seq__, int(seq))
+
+#   isBehind
+#       - Purpose:
+#           Check whether the ticker shows a better price than the book has, i.e. orders were placed inside the
+#           spread of the book since it was downloaded. The book is downloaded again when it is.
+#       - Parameters:
+#           * (tickerRow) The row of the pair in the dictionary returned by returnTicker
+    def isBehind(self, tickerRow):
+        lowestAsk = tickerRow.get('lowestAsk')
+        highestBid = tickerRow.get('highestBid')
+        if lowestAsk is not None and (not self.__ask_prices__ or float(lowestAsk) < self.__ask_prices__[0]):
+            return True
+        if highestBid is not None and (not self.__bid_prices__ or float(highestBid) > -self.__bid_prices__[0]):
+            return True
+        return False
+
+#   applyTicker
+#       - Purpose:
+#           Remove the levels the market has traded through since the book was downloaded: asks below the lowest
+#           ask of the ticker and bids above its' highest bid.
+#       - Parameters:
+#           * (tickerRow) The row of the pair in the dictionary returned by returnTicker
+    def applyTicker(self, tickerRow):
+        lowestAsk = tickerRow.get('lowestAsk')
+        if lowestAsk is not None:
+            crossed = bisect.bisect_left(self.__ask_prices__, float(lowestAsk))
+            del self.__ask_prices__[:crossed]
+            del self.__ask_amounts__[:crossed]
+        highestBid = tickerRow.get('highestBid')
+        if highestBid is not None:
+            crossed = bisect.bisect_left(self.__bid_prices__, -float(highestBid))
+            del self.__bid_prices__[:crossed]
+            del self.__bid_amounts__[:crossed]
+
+#   estimateBuy
+#       - Purpose:
+#           Work out what spending an amount of the principal currency would buy by taking the asks from the best
+#           price outwards.
+#       - Parameters:
+#           * (spend) The amount of the principal currency (BTC) to spend
+#       - Returns:
+#           A fill estimate (see __estimate__), or None if there are no asks.
+    def estimateBuy(self, spend):
+        return self.__estimate__(self.__ask_prices__, self.__ask_amounts__, 1.0, float(spend), True)
+
+#   estimateSell
+#       - Purpose:
+#           Work out what selling an amount of the subject currency would return by taking the bids from the best
+#           price outwards.
+#       - Parameters:
+#           * (amount) The amount of the subject currency to sell
+#       - Returns:
+#           A fill estimate (see __estimate__), or None if there are no bids.
+    def estimateSell(self, amount):
+        return self.__estimate__(self.__bid_prices__, self.__bid_amounts__, -1.0, float(amount), False)
+
+#   __estimate__
+#       - Returns:
+#           A dictionary containing:
+#               { 'amount' : amount of the subject currency filled,
+#                 'total' : amount of the principal currency paid or received,
+#                 'average' : average price of the fill,
+#                 'best' : best price of the side,
+#                 'worst' : price of the deepest level taken,
+#                 'slippage' : fraction the average price is worse than the best price,
+#                 'complete' : False if the book did not have enough depth to fill everything }
+    def __estimate__(self, prices, amounts, sign, quantity, quantityIsTotal):
+        if not prices:
+            return None
+        filled = 0.0
+        total = 0.0
+        worst = sign * prices[0]
+        remaining = quantity
+        for key, available in zip(prices, amounts):
+            price = sign * key
+            worst = price
+            take = min(available, remaining / price) if quantityIsTotal else min(available, remaining)
+            filled += take
+            total += take * price
+            remaining -= take * price if quantityIsTotal else take
+            if remaining <= quantity * 1e-12:
+                break
+        best = sign * prices[0]
+        average = total / filled if filled > 0 else best
+        return {'amount' : filled,
+                'total' : total,
+                'average' : average,
+                'best' : best,
+                'worst' : worst,
+                'slippage' : abs(average - best) / best,
+                'complete' : remaining <= quantity * 1e-12}
+
+# priceOrder
+#   - Purpose:
+#       Work out the rate and amount of an order which fills straight away against a book. A buy is priced at the
+#       deepest ask the budget reaches and a sell at the deepest bid the amount reaches, but never further than
+#       maxSlippage from the best price. A buy's amount is its' budget at that rate so the exchange can reserve it.
+#   - Parameters:
+#       * (book) An OrderBook
+#       * (command) 'buy' or 'sell'
+#       * (quantity) The BTC to spend when buying, or the amount of the coin to sell
+#       * (maxSlippage) The furthest the rate may be from the best price as a fraction (0.005 = 0.5%)
+#   - Returns:
+#       A tuple of (rate, amount, estimate) where estimate is the fill estimate of the book, or None if the side
+#       of the book is empty.
+def priceOrder(book, command, quantity, maxSlippage):
+    if command == 'buy':
+        estimate = book.estimateBuy(quantity)
+        if estimate is None:
+            return None
+        rate = min(estimate['worst'], estimate['best'] * (1.0 + maxSlippage))
+        return (rate, float(quantity) / rate, estimate)
+    estimate = book.estimateSell(quantity)
+    if estimate is None:
+        return None
+    rate = max(estimate['worst'], estimate['best'] * (1.0 - maxSlippage))
+    return (rate, float(quantity), estimate)
+
+class OrderBookCache(object):
+
+#   __init__
+#       - Parameters:
+#           * (poloniexAPI) A poloniex class used to download the books
+#           * (depth) The number of levels of each side to download
+#           * (maxAge) Seconds a book is used for before it is downloaded again
+#           * (maxSlippage) The furthest an order's rate may be from the best price as a fraction
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, poloniexAPI, depth=20, maxAge=5.0, maxSlippage=0.005):
+        self.__poloniexAPI__ = poloniexAPI
+        self.__depth__ = int(depth)
+        self.__max_age__ = float(maxAge)
+        self.__max_slippage__ = float(maxSlippage)
+        self.__books__ = {}             # currencyPair -> OrderBook
+        self.__lock__ = threading.Lock()
+
+    def getDepth(self):
+        return self.__depth__
+
+    def getMaxSlippage(self):
+        return self.__max_slippage__
+
+#   isStale
+#       - Parameters:
+#           * (currencyPair) The currency pair e.g. "BTC_XRP"
+#           * (tickerRow) The row of the pair in the dictionary returned by returnTicker, or None
+#       - Returns:
+#           (bool) True if the book of a pair is missing, older than the maximum age or behind the ticker.
+    def isStale(self, currencyPair, tickerRow=None):
+        with self.__lock__:
+            book = self.__books__.get(currencyPair)
+            return book is None or book.getAge() > self.__max_age__ or (tickerRow is not None and book.isBehind(tickerRow))
+
+#   refresh
+#       - Purpose:
+#           Download the book of a pair if it is stale. Callers using the asyncio client fetch the book themselves
+#           and pass it to setBook instead.
+    def refresh(self, currencyPair, tickerRow=None):
+        if self.isStale(currencyPair, tickerRow):
+            self.setBook(currencyPair, self.__poloniexAPI__.returnOrderBook(currencyPair, self.__depth__))
+
+    def setBook(self, currencyPair, response):
+        book = OrderBook(currencyPair, response)
+        with self.__lock__:
+            self.__books__[currencyPair] = book
+
+#   getBook
+#       - Purpose:
+#           Return the cached book of a pair with the levels the ticker shows were traded through removed.
+#       - Parameters:
+#           * (currencyPair) The currency pair e.g. "BTC_XRP"
+#           * (tickerRow) The row of the pair in the dictionary returned by returnTicker, or None
+#       - Returns:
+#           An OrderBook, or None if the book has not been downloaded.
+    def getBook(self, currencyPair, tickerRow=None):
+        with self.__lock__:
+            book = self.__books__.get(currencyPair)
+            if book is not None and tickerRow is not None:
+                book.applyTicker(tickerRow)
+        return book
+
+# createOrderBookCache
+#   - Purpose:
+#       Build an OrderBookCache from the use_order_book_execution, order_book_depth, order_book_max_age and
+#       order_book_max_slippage configurations.
+#   - Returns:
+#       An OrderBookCache, or None if use_order_book_execution is not True.
+def createOrderBookCache(poloniexAPI):
+    if getattr(Bitbot_CDO, 'use_order_book_execution', 'False') != 'True':
+        return None
+    return OrderBookCache(poloniexAPI,
+                          int(getattr(Bitbot_CDO, 'order_book_depth', 20)),
+                          float(getattr(Bitbot_CDO, 'order_book_max_age', 5.0)),
+                          float(getattr(Bitbot_CDO, 'order_book_max_slippage', 0.005)))
@@ -0,0 +1,271 @@
+#### OrderTracker ####
+# Follows the orders Bitbot places from their receipts until they have filled or were canceled, instead of fetching
+# the balances and every open order of the account each tick while an order is pending. Only the orders being
+# tracked are polled (returnOrderStatus, and returnOrderTrades once an order has filled or closed). The first check
+# comes order_poll_interval seconds after an order is placed and the wait doubles up to order_poll_max_interval
+# while nothing changes. An order which filled when it was placed (its' receipt lists the trades) is never polled.
+#
+# The balances of the AccountCache are kept up to date from the fills: the balance an order needs is moved to onOrders
+# when it is placed, the fills pay for it and the rest is given back when the order closes. The balances and open
+# orders are reconciled with the exchange every account_reconcile_interval seconds while orders are pending, or when
+# a pending pair has no tracked orders (i.e. in testing mode or after a restart). Fill events from another source
+# (e.g. the account notifications of the push API) can be handed to applyTrades.
+
+import threading, time
+from lib import Bitbot_CDO
+from lib.Amounts import roundAmount, getTradeTotal, getProceeds
+
+class TrackedOrder(object):
+    """An order placed on the exchange which has not finished filling."""
+
+    def __init__(self, orderNumber, currencyPair, command, rate, amount, pollInterval):
+        self.orderNumber = str(orderNumber)
+        self.currencyPair = currencyPair
+        self.command = command
+        self.rate = float(rate)
+        self.amount = float(amount)
+        self.filled = 0.0
+        # The balance the order holds on the exchange: the total of a buy, the coin of a sell
+        self.held = getTradeTotal(self.rate, self.amount) if command == 'buy' else self.amount
+        self.tradeIds = set()
+        self.closed = False
+        self.interval = pollInterval
+        self.nextCheck = time.monotonic() + pollInterval
+
+    def isFilled(self):
+        return self.filled >= self.amount * (1.0 - 1e-9)
+
+    def getRemaining(self):
+        return max(self.amount - self.filled, 0.0)
+
+class OrderTracker(object):
+
+    # Fee assumed for fills whose trade does not state one (the trades of an order receipt)
+    __DEFAULT_FEE__ = 0.002
+
+#   __init__
+#       - Parameters:
+#           * (poloniexAPI) A poloniex class used to poll the orders
+#           * (accountCache) The AccountCache the fills are written through to
+#           * (pollInterval) Seconds before an order is checked the first time
+#           * (maxPollInterval) The longest wait between two checks of an order
+#           * (reconcileInterval) Seconds between reconciliations with the exchange while orders are pending
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, poloniexAPI, accountCache, pollInterval=1.0, maxPollInterval=30.0, reconcileInterval=300.0):
+        self.__poloniexAPI__ = poloniexAPI
+        self.__account_cache__ = accountCache
+        self.__poll_interval__ = float(pollInterval)
+        self.__max_poll_interval__ = float(maxPollInterval)
+        self.__reconcile_interval__ = float(reconcileInterval)
+        self.__lock__ = threading.RLock()
+        self.__orders__ = {}            # order number -> TrackedOrder
+        self.__finished_pairs__ = set() # currency pairs which had an order finish since popFinishedPairs
+        self.__last_reconcile__ = None
+
+#   reconcile
+#       - Purpose:
+#           Bring the tracked orders in line with the open orders fetched from the exchange together with the
+#           balances of the account cache. Tracked orders which are no longer open are dropped (the balances already
+#           include their fills) and open orders which are not tracked (placed before a restart) are tracked from
+#           now on.
+#       - Parameters:
+#           * (openOrders) The dictionary returned by returnOpenOrders('all')
+    def reconcile(self, openOrders):
+        with self.__lock__:
+            openNumbers = set()
+            for currencyPair, orders in openOrders.items():
+                for order in orders:
+                    orderNumber = str(order['orderNumber'])
+                    openNumbers.add(orderNumber)
+                    if orderNumber not in self.__orders__:
+                        self.__orders__[orderNumber] = TrackedOrder(orderNumber, currencyPair, order['type'], order['rate'],
+                                                                    order['amount'], self.__poll_interval__)
+            for orderNumber in list(self.__orders__):
+                if orderNumber not in openNumbers:
+                    del self.__orders__[orderNumber]
+            self.__last_reconcile__ = time.monotonic()
+
+#   needsReconcile
+#       - Returns:
+#           (bool) True if the orders have never been reconciled or were last reconciled too long ago.
+    def needsReconcile(self):
+        with self.__lock__:
+            return self.__last_reconcile__ is None or time.monotonic() - self.__last_reconcile__ >= self.__reconcile_interval__
+
+#   track
+#       - Purpose:
+#           Start following an order from its' receipt. The balance the order needs is moved to onOrders in the
+#           account cache and any trades listed in the receipt are applied.
+#       - Parameters:
+#           * (currencyPair) The currency pair of the order e.g. "BTC_XRP"
+#           * (command) 'buy' or 'sell'
+#           * (rate) The rate of the order
+#           * (amount) The amount of the subject currency of the order
+#           * (receipt) The dictionary returned by buy or sell
+#       - Returns:
+#           (bool) True if the order is still open.
+    def track(self, currencyPair, command, rate, amount, receipt):
+        if 'error' in receipt or 'orderNumber' not in receipt:
+            raise Exception(receipt.get('error', 'The order receipt has no order number'))
+
+        order = TrackedOrder(receipt['orderNumber'], currencyPair, command, rate, amount, self.__poll_interval__)
+        with self.__lock__:
+            principalCurrency, subjectCurrency = currencyPair.split('_')
+            heldCurrency = principalCurrency if command == 'buy' else subjectCurrency
+            self.__account_cache__.adjust(heldCurrency, -order.held, order.held)
+            self.__orders__[order.orderNumber] = order
+            for trade in receipt.get('resultingTrades', []):
+                self.__applyTrade__(order, trade)
+            # An immediate-or-cancel order is closed once its' receipt is returned
+            if order.isFilled() or 'amountUnfilled' in receipt:
+                self.__finish__(order)
+                return False
+        return True
+
+    def hasOpenOrders(self, currencyPair=None):
+        with self.__lock__:
+            return any(currencyPair is None or order.currencyPair == currencyPair for order in self.__orders__.values())
+
+#   isDue
+#       - Returns:
+#           (bool) True if an order is due a check.
+    def isDue(self):
+        now = time.monotonic()
+        with self.__lock__:
+            return any(order.nextCheck <= now for order in self.__orders__.values())
+
+#   getDueOrders
+#       - Purpose:
+#           Return the orders due a check and schedule their next check, doubling the wait each time.
+#       - Returns:
+#           A list of order numbers.
+    def getDueOrders(self):
+        now = time.monotonic()
+        with self.__lock__:
+            due = [order for order in self.__orders__.values() if order.nextCheck <= now]
+            for order in due:
+                order.nextCheck = now + order.interval
+                order.interval = min(order.interval * 2.0, self.__max_poll_interval__)
+            return [order.orderNumber for order in due]
+
+#   applyStatus
+#       - Purpose:
+#           Look at the result of returnOrderStatus for an order.
+#       - Returns:
+#           (bool) True if the order has closed or more of it has filled, so its' trades should be fetched.
+    def applyStatus(self, orderNumber, response):
+        if 'error' in response:
+            raise Exception("returnOrderStatus failed: %s" % (response['error']))
+        with self.__lock__:
+            order = self.__orders__.get(str(orderNumber))
+            if order is None:
+                return False
+            status = response.get('result', {}).get(order.orderNumber) if int(response.get('success', 0)) == 1 else None
+            if status is None:
+                order.closed = True
+                return True
+            remaining = float(status.get('amount', order.getRemaining()))
+            return order.amount - remaining > order.filled + order.amount * 1e-9
+
+#   applyTrades
+#       - Purpose:
+#           Apply the trades of an order (the result of returnOrderTrades, or fill events) to the account cache.
+#           Trades which were already applied are skipped. The order is finished once it has filled or closed.
+#       - Parameters:
+#           * (orderNumber) The order number
+#           * (trades) A list of trade dictionaries, or the error dictionary returned when nothing has filled
+#       - Returns:
+#           The currency pair of the order if it has finished, otherwise None.
+    def applyTrades(self, orderNumber, trades):
+        if isinstance(trades, dict) and not str(trades.get('error', '')).startswith('Order not found'):
+            raise Exception("returnOrderTrades failed: %s" % (trades.get('error', trades)))
+        with self.__lock__:
+            order = self.__orders__.get(str(orderNumber))
+            if order is None:
+                return None
+            if isinstance(trades, list):
+                newTrades = [trade for trade in trades if str(trade.get('tradeID')) not in order.tradeIds]
+                for trade in newTrades:
+                    self.__applyTrade__(order, trade)
+                if newTrades:
+                    # The order is moving, check it again soon
+                    order.interval = self.__poll_interval__
+                    order.nextCheck = time.monotonic() + order.interval
+            if order.closed or order.isFilled():
+                self.__finish__(order)
+                return order.currencyPair
+        return None
+
+#   poll
+#       - Purpose:
+#           Check the orders which are due with the poloniex client. Callers using the asyncio client send the
+#           requests themselves and pass the results to applyStatus and applyTrades.
+    def poll(self):
+        for orderNumber in self.getDueOrders():
+            if self.applyStatus(orderNumber, self.__poloniexAPI__.returnOrderStatus(orderNumber)):
+                self.applyTrades(orderNumber, self.__poloniexAPI__.returnOrderTrades(orderNumber))
+
+#   popFinishedPairs
+#       - Returns:
+#           A set of the currency pairs which had an order finish (when it was placed or when it was polled) since
+#           the last call.
+    def popFinishedPairs(self):
+        with self.__lock__:
+            finished, self.__finished_pairs__ = self.__finished_pairs__, set()
+        return finished
+
+#   getOpenOrders
+#       - Returns:
+#           A dictionary of currency pair -> list of the tracked orders in the format of returnOpenOrders('all').
+    def getOpenOrders(self):
+        openOrders = {}
+        with self.__lock__:
+            for order in self.__orders__.values():
+                openOrders.setdefault(order.currencyPair, []).append({'orderNumber' : order.orderNumber, 'type' : order.command,
+                                                                      'rate' : '%.8f' % (order.rate),
+                                                                      'amount' : '%.8f' % (order.getRemaining())})
+        return openOrders
+
+#   __applyTrade__
+#       - Purpose:
+#           Move the balances for one fill of an order, rounded as the exchange rounds them (see Amounts). A buy
+#           pays the trade total out of what was held for it at the order rate and receives the coin less the fee. A
+#           sell pays the coin held for it and receives the total less the fee.
+    def __applyTrade__(self, order, trade):
+        amount = float(trade['amount'])
+        total = float(trade['total'])
+        fee = float(trade.get('fee', self.__DEFAULT_FEE__))
+        principalCurrency, subjectCurrency = order.currencyPair.split('_')
+        if order.command == 'buy':
+            released = min(getTradeTotal(order.rate, amount), order.held)
+            self.__account_cache__.adjust(principalCurrency, released - total, -released)
+            self.__account_cache__.adjust(subjectCurrency, getProceeds(amount, fee))
+        else:
+            released = min(amount, order.held)
+            self.__account_cache__.adjust(subjectCurrency, amount - released, -released)
+            self.__account_cache__.adjust(principalCurrency, getProceeds(total, fee))
+        order.held = roundAmount(order.held - released)
+        order.filled += amount
+        order.tradeIds.add(str(trade.get('tradeID')))
+
+#   __finish__
+#       - Purpose:
+#           Stop tracking an order and give back what is still held for its' unfilled part.
+    def __finish__(self, order):
+        principalCurrency, subjectCurrency = order.currencyPair.split('_')
+        heldCurrency = principalCurrency if order.command == 'buy' else subjectCurrency
+        self.__account_cache__.adjust(heldCurrency, order.held, -order.held)
+        order.held = 0.0
+        self.__orders__.pop(order.orderNumber, None)
+        self.__finished_pairs__.add(order.currencyPair)
+
+# createOrderTracker
+#   - Purpose:
+#       Build an OrderTracker from the order_poll_interval, order_poll_max_interval and account_reconcile_interval
+#       configurations.
+def createOrderTracker(poloniexAPI, accountCache):
+    return OrderTracker(poloniexAPI, accountCache,
+                        float(getattr(Bitbot_CDO, 'order_poll_interval', 1.0)),
+                        float(getattr(Bitbot_CDO, 'order_poll_max_interval', 30.0)),
+                        float(getattr(Bitbot_CDO, 'account_reconcile_interval', 300.0)))
@@ -0,0 +1,345 @@
+#### PairTrader ####
+# This class holds the trading state of one currency pair (BTC_<coin>) and makes its' buy/sell decisions with its'
+# own policy class. It does not fetch any market data itself: the trader thread fetches the ticker and the account
+# state once per interval for every pair and hands them to each PairTrader. A tick is split into steps (refresh the
+# candlesticks, decide, place the order, publish the status) so the AsyncTraderThread can send the requests of every
+# pair concurrently between the steps.
+
+import datetime, time
+from lib import Bitbot_CDO
+from lib import Metrics
+from lib.Amounts import floorAmount
+from lib.CandleCache import getWindowSeconds
+from lib.CandleSeries import CandleSeries, getWindowCandles
+from lib.OrderBook import priceOrder
+from lib.PolicyContext import PolicyContext
+from policy.PolicyTemplate import getPolicyInterface
+
+class PairTrader(object):
+
+    # Constants
+    __BUY_PHASE__ = 0
+    __SELL_PHASE__ = 1
+    __ACCOUNTS_EMPTY__ = 2
+
+    # Attributes
+    __principalCurrency__ = 'BTC'
+
+#    __init__
+#       - Parameters:
+#           * (subjectCurrency) The cryptocurrency traded against BTC (i.e. XRP)
+#           * (policyClass) The policy class making the buy/sell decisions for this pair
+#           * (trader) The TraderThread which owns this pair. Its' poloniex API, candle cache, logger and status
+#                      bus are shared by all pairs.
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, subjectCurrency, policyClass, trader):
+        self.__subjectCurrency__ = subjectCurrency
+        self.__currencyPair__ = self.__principalCurrency__ + '_' + subjectCurrency
+        self.__policy_class__ = policyClass
+        self.__policy__ = getPolicyInterface(policyClass)
+        self.__trader__ = trader
+        self.__poloniexAPI__ = trader.getPoloniexAPI()
+        self.__candleCache__ = trader.getCandleCache()
+        self.__order_books__ = trader.getOrderBooks()
+        self.__account_cache__ = trader.getAccountCache()
+        self.__order_tracker__ = trader.getOrderTracker()
+        self.__Logger__ = trader.getLogger()
+        self.__profiler__ = trader.getProfiler()
+        self.statusBus = trader.statusBus
+        self.__request_interval__ = int(Bitbot_CDO.action_interval)
+        self.__measurement_period__ = int(Bitbot_CDO.measurement_period)
+        self.__candlestick_period__ = Bitbot_CDO.candlestick_period
+        self.__period_unit__ = Bitbot_CDO.period_unit
+
+        # The candlesticks of the measurement window. The series holds exactly as many candles as the window.
+        windowSeconds = getWindowSeconds(self.__measurement_period__, self.__period_unit__, self.__candlestick_period__)
+        self.__candlesticks__ = CandleSeries(getWindowCandles(windowSeconds or 0, self.__candlestick_period__))
+        self.__next_candle_refresh__ = 0.0
+        self.__buy_price__ = '0.0'
+        self.__sell_price__ = '0.0'
+        self.__current_price__ = '0.0'
+        self.__trading_state__ = self.__ACCOUNTS_EMPTY__
+        self.__orders_are_pending__ = False
+        self.__status__ = ""
+        # The context handed to the policy, refreshed every tick
+        self.__context__ = PolicyContext(self.__currencyPair__, self.__candlestick_period__, self.__measurement_period__,
+                                         self.__period_unit__, self.__candlesticks__, self.statusBus)
+        self.__order_estimate__ = None      # Fill estimate of the order book for the order being placed
+
+    def getCurrencyPair(self):
+        return self.__currencyPair__
+
+    def getSubjectCurrency(self):
+        return self.__subjectCurrency__
+
+    def getTradingState(self):
+        return self.__trading_state__
+
+    def ordersArePending(self):
+        return self.__orders_are_pending__
+
+#   updateState
+#       - Purpose:
+#           Decide whether this pair should be selling or buying and whether it has open orders, based on the
+#           account balances and open orders fetched by the TraderThread. The order may fail so this is important
+#           so the pair does not move on to the next state if the previous state was never finished.
+#       - Parameters:
+#           * (accountBalances) The dictionary returned by returnBalances
+#           * (openOrders) The dictionary returned by returnOpenOrders('all') (currency pair -> list of orders)
+    def updateState(self, accountBalances, openOrders):
+        previousState = self.__trading_state__
+        wasPending = self.__orders_are_pending__
+
+        # Is based on which account has the highest balance.
+        balancePrincipal = float(accountBalances[self.__principalCurrency__])
+        balanceSubject = float(accountBalances[self.__subjectCurrency__])
+        if balancePrincipal > 0.0 and balancePrincipal > balanceSubject:
+            self.__trading_state__ = self.__BUY_PHASE__
+        elif balanceSubject > 0.0 and balanceSubject > balancePrincipal:
+            self.__trading_state__ = self.__SELL_PHASE__
+        else:
+            self.__trading_state__ = self.__ACCOUNTS_EMPTY__
+
+        self.__orders_are_pending__ = bool(openOrders.get(self.__currencyPair__))
+        if wasPending and not self.__orders_are_pending__ and self.__trading_state__ == previousState:
+            self.__Logger__.writeEvent('cancel', "%s Order was canceled." % (self.__currencyPair__), self.__currencyPair__)
+
+#   tick
+#       - Purpose:
+#           Consult the policy with the latest ticker price and place an order if it says to. This is the blocking
+#           version used by the TraderThread. The AsyncTraderThread runs the same steps (refresh the candlesticks,
+#           decide, place the order, publish the status) itself so the requests of every pair can be sent together.
+#       - Parameters:
+#           * (priceCharts) The dictionary returned by returnTicker
+#           * (allocation) The fraction of the available BTC balance this pair may spend when buying
+    def tick(self, priceCharts, allocation=1.0):
+        # Only calculate bands when the candlestick period time interval has passed (ex. 5 minutes)
+        if self.candlesAreDue():
+            self.startCandleRefresh()
+            try:
+                with self.__profiler__.phase('candle refresh'):
+                    startDate, endDate = self.getCandleRange()
+                    self.setCandleSticks(self.__candleCache__.getCandles(self.__currencyPair__, self.__candlestick_period__, startDate, endDate))
+            except Exception as e:
+                self.reportError('Error retrieving %s candlesticks: %s' % (self.__currencyPair__, str(e)))
+                return
+
+        action = self.decide(priceCharts)
+        if action is not None:
+            try:
+                if not bool(Bitbot_CDO.testing_mode):
+                    with self.__profiler__.phase('order submission'):
+                        self.refreshOrderBook(priceCharts)
+                        command, currencyPair, rate, amount, immediateOrCancel = self.getOrder(priceCharts, self.__account_cache__.getCompleteBalances(), allocation)
+                        receipt = getattr(self.__poloniexAPI__, command)(currencyPair, rate, amount, immediateOrCancel=immediateOrCancel)
+                        self.__order_tracker__.track(currencyPair, command, rate, amount, receipt)
+            except Exception as e:
+                self.orderFailed(action, e)
+                return
+            self.orderPlaced(action)
+
+        with self.__profiler__.phase('status publish'):
+            self.publishStatus()
+
+#   candlesAreDue
+#       - Purpose:
+#           Check whether the candlestick period has passed since the last refresh. Asking does not change anything,
+#           the timer only moves when a refresh starts (see startCandleRefresh).
+#       - Returns:
+#           (bool) True if the candlesticks should be refreshed now.
+    def candlesAreDue(self):
+        return time.monotonic() >= self.__next_candle_refresh__
+
+#   startCandleRefresh
+#       - Purpose:
+#           Note that a refresh of the candlesticks has started. If it fails it is tried again after the action
+#           interval; if it succeeds setCandleSticks waits for the next candle instead.
+    def startCandleRefresh(self):
+        self.__next_candle_refresh__ = time.monotonic() + self.__request_interval__
+
+#   getCandleRange
+#       - Purpose:
+#           Return the dates of the candlesticks to refresh. The history handed to the policy reaches back twice
+#           the measurement period so the bands have a full window of history behind their first value. Once the
+#           series holds candles of the window only the newest one (which may have still been forming) and the
+#           candles after it are needed.
+#       - Returns:
+#           A tuple of (startDate, endDate) UNIX timestamps.
+    def getCandleRange(self):
+        windowSeconds = getWindowSeconds(self.__measurement_period__, self.__period_unit__, self.__candlestick_period__)
+        if windowSeconds is None:
+            raise Exception("No Such Period Unit %s" % (self.__period_unit__))
+
+        endDate = datetime.datetime.now()
+        startDate = (endDate - datetime.timedelta(seconds=windowSeconds)).timestamp()
+        lastDate = self.__candlesticks__.getLastDate()
+        if lastDate is not None and lastDate >= startDate:
+            startDate = lastDate
+        return (startDate, endDate.timestamp())
+
+#   setCandleSticks
+#       - Purpose:
+#           Add the refreshed candlesticks to the series, drop the candles which have left the measurement window
+#           and restart the refresh timer.
+#       - Parameters:
+#           * (history) A list of candle dictionaries ordered by date covering getCandleRange
+    def setCandleSticks(self, history):
+        self.__candlesticks__.update(history)
+        windowSeconds = getWindowSeconds(self.__measurement_period__, self.__period_unit__, self.__candlestick_period__)
+        self.__candlesticks__.dropBefore(time.time() - windowSeconds)
+        self.__next_candle_refresh__ = time.monotonic() + int(self.__candlestick_period__)
+
+#   decide
+#       - Purpose:
+#           Consult the policy with the latest ticker price and update the status message.
+#       - Parameters:
+#           * (priceCharts) The dictionary returned by returnTicker
+#       - Returns:
+#           __BUY_PHASE__ or __SELL_PHASE__ if the policy says to place an order, otherwise None.
+    def decide(self, priceCharts):
+        currentPrice = priceCharts[self.__currencyPair__]['last']
+        self.__current_price__ = currentPrice
+
+        # If the trader starts in the sell state, use the current price as the buy price.
+        if self.__buy_price__ == '0.0':
+            self.__buy_price__ = currentPrice
+
+        with self.__profiler__.phase('args build'):
+            self.__context__.setTicker(priceCharts, self.__buy_price__, self.__sell_price__)
+
+        # If orders are pending, wait until they clear. The trader thread follows the orders with its' order
+        # tracker and calls updateState which will also update the trading state once they have.
+        if self.__orders_are_pending__:
+            self.__status__ = "Waiting for orders to clear"
+
+        # Do this when looking to buy
+        elif self.__trading_state__ == self.__BUY_PHASE__:
+            self.__status__ = "Looking to Buy"
+            with self.__profiler__.phase('policy decision'), \
+                 Metrics.registry.timed('bitbot_policy_decision_seconds', policy=self.__policy_class__.__name__,
+                                        pair=self.__currencyPair__, phase='buy'):
+                shouldBuy = self.__policy__.shouldBuy(self.__context__)
+            if shouldBuy:
+                return self.__BUY_PHASE__
+
+        # Do this when looking to sell
+        elif self.__trading_state__ == self.__SELL_PHASE__:
+            self.__status__ = "Looking to Sell (Bought at %s)" % (self.__buy_price__)
+            with self.__profiler__.phase('policy decision'), \
+                 Metrics.registry.timed('bitbot_policy_decision_seconds', policy=self.__policy_class__.__name__,
+                                        pair=self.__currencyPair__, phase='sell'):
+                shouldSell = self.__policy__.shouldSell(self.__context__)
+            if shouldSell:
+                return self.__SELL_PHASE__
+
+        else:
+            self.__status__ = "Account Balance is Empty"
+        return None
+
+#   getOrder
+#       - Purpose:
+#           Work out the order for an action returned by decide. Buying spends as much of the BTC as the pair was
+#           allocated and selling sells all of the coin (all in), both at the last ticker price.
+#       - Parameters:
+#           * (priceCharts) The dictionary returned by returnTicker
+#           * (completeBalances) The dictionary returned by returnCompleteBalances
+#           * (allocation) The fraction of the available BTC to spend. When several pairs are looking to buy the
+#                          balance is split evenly between them.
+#       - Returns:
+#           A tuple of (command, currencyPair, rate, amount, immediateOrCancel) where command is the name of the
+#           poloniex method placing the order ('buy' or 'sell'). With order book execution the rate is worked out
+#           by OrderBook.priceOrder from the cached book of the pair. A buy's rate and amount are rounded down to 8
+#           decimals so the order never costs more than the BTC allocated.
+#       - NOTE:
+#           Orders will likely not be instant which needs to be accounted for after the order is placed.
+#           If the order has not cleared and the bot wants to sell then the sell must be delayed or the order
+#           must be canceled and the bot will look to buy again.
+    def getOrder(self, priceCharts, completeBalances, allocation=1.0):
+        immediateOrCancel = bool(Bitbot_CDO.use_immediate_or_cancel_orders)
+        subjectCurrencyCost = priceCharts[self.__currencyPair__]['last']
+        if self.__trading_state__ == self.__BUY_PHASE__:
+            command = 'buy'
+            quantity = float(completeBalances[self.__principalCurrency__]['available']) * allocation
+            rate, amount = subjectCurrencyCost, '%.8f' % (floorAmount(quantity / float(subjectCurrencyCost)))
+        else:
+            command = 'sell'
+            quantity = float(completeBalances[self.__subjectCurrency__]['available'])
+            rate, amount = subjectCurrencyCost, completeBalances[self.__subjectCurrency__]['available']
+
+        # Price the order from the depth of the book so it fills straight away
+        self.__order_estimate__ = None
+        book = self.__order_books__.getBook(self.__currencyPair__, priceCharts[self.__currencyPair__]) if self.__order_books__ is not None else None
+        if book is not None and not book.isFrozen():
+            pricedOrder = priceOrder(book, command, quantity, self.__order_books__.getMaxSlippage())
+            if pricedOrder is not None:
+                bookRate, bookAmount, self.__order_estimate__ = pricedOrder
+                if command == 'buy':
+                    # Rounding the rate or the amount up could cost more than the BTC available
+                    rate = '%.8f' % (floorAmount(bookRate))
+                    amount = '%.8f' % (floorAmount(quantity / float(rate)))
+                else:
+                    rate = '%.8f' % (bookRate)
+        return (command, self.__currencyPair__, rate, amount, immediateOrCancel)
+
+#   refreshOrderBook
+#       - Purpose:
+#           Download the order book of this pair if order book execution is enabled and the cached book is too old
+#           or behind the ticker. If it cannot be downloaded the order is priced at the last price.
+    def refreshOrderBook(self, priceCharts):
+        if self.__order_books__ is None:
+            return
+        try:
+            self.__order_books__.refresh(self.__currencyPair__, priceCharts[self.__currencyPair__])
+        except Exception as e:
+            self.reportError('Error retrieving %s order book: %s' % (self.__currencyPair__, str(e)))
+
+#   orderPlaced
+#       - Purpose:
+#           Record an order placed for an action returned by decide and wait for it to clear.
+    def orderPlaced(self, action):
+        # The fill the order book led us to expect is logged with the order
+        estimate = {}
+        if self.__order_estimate__ is not None:
+            estimate = {'expectedPrice' : self.__order_estimate__['average'], 'slippage' : self.__order_estimate__['slippage']}
+            self.__order_estimate__ = None
+
+        if action == self.__BUY_PHASE__:
+            self.__buy_price__ = self.__current_price__
+            self.__status__ = "Buying at %s" % (self.__buy_price__)
+            self.__Logger__.writeEvent('buy', "%s Bought at %s" % (self.__currencyPair__, self.__buy_price__), self.__currencyPair__,
+                                       price=float(self.__buy_price__), **estimate)
+        else:
+            self.__sell_price__ = self.__current_price__
+            profitPercent = (float(self.__sell_price__)/float(self.__buy_price__) * 100.0) - 100.0
+            self.__status__ = "Selling at %s\t\tProfit : %f%%" % (self.__sell_price__, profitPercent)
+            self.__Logger__.writeEvent('sell', "%s Sold at %s\tProfit : %f%%" % (self.__currencyPair__, self.__sell_price__, profitPercent),
+                                       self.__currencyPair__, price=float(self.__sell_price__), buyPrice=float(self.__buy_price__),
+                                       profit=profitPercent, **estimate)
+            self.__policy__.cleanUp(self.__context__)
+        self.__orders_are_pending__ = True
+
+#   orderFailed
+#       - Purpose:
+#           Report an order that could not be placed. The pair stays in the same state and tries again with the
+#           balances fetched again, in case the cached ones were wrong.
+    def orderFailed(self, action, error):
+        self.__account_cache__.invalidate()
+        verb = 'buying' if action == self.__BUY_PHASE__ else 'selling'
+        self.statusBus.publish("Error", 'Tried %s %s but call failed: %s' % (verb, self.__currencyPair__, str(error)))
+        self.__Logger__.writeEvent('error', "Error Tried %s %s but call failed: %s" % (verb, self.__currencyPair__, str(error)),
+                                   self.__currencyPair__)
+
+#   reportError
+#       - Purpose:
+#           Publish an error on the status bus and write it to the log.
+    def reportError(self, mesg):
+        self.statusBus.publish("Error", mesg)
+        self.__Logger__.writeEvent('error', mesg, self.__currencyPair__)
+
+#   publishStatus
+#       - Purpose:
+#           Publish the status message and ticker price of this pair on the status bus.
+    def publishStatus(self):
+        self.statusBus.publish("%s Status" % (self.__subjectCurrency__), self.__status__)
+        self.statusBus.publish("%s Ticker Price" % (self.__subjectCurrency__), self.__current_price__ + " " + self.__principalCurrency__)
@@ -0,0 +1,186 @@
+#### ParameterSweep ####
+# This class evaluates a grid of BollingerPolicy parameters over the same candlestick history in one pass. It gives
+# the same results as running the Backtester with BollingerPolicy once per combination, but:
+#
+#   - The SMA and Bollinger bands (and their amplified gradients) are calculated once per measurement period for
+#     the whole history with NumPy.
+#   - The remaining parameters (sell_safety_threshold, upper_band_sma_minimum_gradient and
+#     lower_band_sma_minimum_gradient) only change the buy/sell decisions, so every combination is a column of the
+#     state arrays and each candle is one set of array operations across the whole grid.
+
+import itertools
+import numpy as np
+from lib.CandleCache import getWindowSeconds
+
+# amplifyGradients
+#   - Purpose:
+#       Array version of BollingerPolicy.__amplifyGradient__. Scales every gradient by 10 for each leading zero after
+#       the decimal point, plus one.
+#   - Parameters:
+#       * (gradients) A NumPy array of gradients.
+#   - Returns:
+#       A NumPy array of amplified gradients.
+def amplifyGradients(gradients):
+    magnitude = np.abs(gradients)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        numLeadingZeroes = np.ceil(np.log10(np.where(magnitude > 0, magnitude, 1.0)))
+    amplified = np.where(numLeadingZeroes > 0, gradients, gradients * np.power(10.0, 1 - numLeadingZeroes))
+    return np.where(magnitude > 0, amplified, 0.0)
+
+class ParameterSweep(object):
+
+#   __init__
+#       - Parameters:
+#           * (candles) A list of candle dictionaries ordered by date (the format returned by returnChartData)
+#           * (candlePeriod) The candlestick period in seconds
+#           * (periodUnit) The unit of the measurement period (DAYS, HOURS, MINUTES)
+#           * (fee) The trading fee taken from every order as a fraction (0.002 = 0.2%)
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, candles, candlePeriod, periodUnit, fee=0.002):
+        self.__closes__ = np.array([float(candle['close']) for candle in candles], dtype=float)
+        self.__candlestick_period__ = int(candlePeriod)
+        self.__period_unit__ = periodUnit
+        self.__fee__ = float(fee)
+
+#   run
+#       - Purpose:
+#           Evaluate every combination of the given parameter values.
+#       - Parameters:
+#           * (measurementPeriods) A list of measurement_period values
+#           * (sellSafetyThresholds) A list of sell_safety_threshold values
+#           * (upperGradients) A list of upper_band_sma_minimum_gradient values
+#           * (lowerGradients) A list of lower_band_sma_minimum_gradient values
+#       - Returns:
+#           A list of result dictionaries ordered by profit (best first). Each contains the four parameters and
+#           the keys returned by Backtester.run.
+    def run(self, measurementPeriods, sellSafetyThresholds, upperGradients, lowerGradients):
+        results = []
+        grid = list(itertools.product(sellSafetyThresholds, upperGradients, lowerGradients))
+        for measurementPeriod in measurementPeriods:
+            results.extend(self.__runMeasurementPeriod__(int(measurementPeriod), grid))
+        results.sort(key=lambda result: result['profit'], reverse=True)
+        return results
+
+#   __getBands__
+#       - Purpose:
+#           Calculate the amplified gradients BollingerPolicy uses for every candle. Entry i uses the bands of the
+#           window ending at candle i and the one before it.
+#       - Returns:
+#           A tuple of (upperbandGradient, lowerbandGradient, smaGradient) arrays the same length as the closes.
+#           Entries without two full windows behind them are NaN.
+    def __getBands__(self, measurementPeriod):
+        closes = self.__closes__
+        windows = np.lib.stride_tricks.sliding_window_view(closes, measurementPeriod)
+        sma = np.full(len(closes), np.nan)
+        std = np.full(len(closes), np.nan)
+        sma[measurementPeriod-1:] = windows.mean(axis=1)
+        std[measurementPeriod-1:] = windows.std(axis=1, ddof=1)
+        upperband = sma + (std * 2)
+        lowerband = sma - (std * 2)
+
+        gradients = []
+        for band in (upperband, lowerband, sma):
+            gradient = np.full(len(closes), np.nan)
+            gradient[1:] = amplifyGradients(band[1:] - band[:-1])
+            gradients.append(gradient)
+        return tuple(gradients)
+
+#   __runMeasurementPeriod__
+#       - Purpose:
+#           Simulate the buy/sell state machine of the Backtester for every combination in the grid that shares a
+#           measurement period.
+#       - Returns:
+#           A list of result dictionaries in grid order.
+    def __runMeasurementPeriod__(self, measurementPeriod, grid):
+        closes = self.__closes__
+        fee = self.__fee__
+        windowSeconds = getWindowSeconds(measurementPeriod, self.__period_unit__, self.__candlestick_period__)
+        if windowSeconds is None:
+            raise ValueError("No such period unit %s" % (self.__period_unit__))
+        windowLength = max(int(windowSeconds // self.__candlestick_period__), measurementPeriod + 1)
+        upperbandGradients, lowerbandGradients, smaGradients = self.__getBands__(measurementPeriod)
+
+        size = len(grid)
+        sellSafety = np.array([combination[0] for combination in grid], dtype=float)
+        upperMinimum = np.array([combination[1] for combination in grid], dtype=float)
+        lowerMinimum = np.array([combination[2] for combination in grid], dtype=float)
+
+        holding = np.zeros(size, dtype=bool)
+        principalBalance = np.ones(size)
+        subjectBalance = np.zeros(size)
+        buyPrice = np.ones(size)
+        highestPrice = np.zeros(size)
+        buys = np.zeros(size, dtype=np.int64)
+        sells = np.zeros(size, dtype=np.int64)
+        winningSells = np.zeros(size, dtype=np.int64)
+        peakValue = np.ones(size)
+        maxDrawdown = np.zeros(size)
+        accountValue = np.ones(size)
+
+        for i in range(windowLength - 1, len(closes)):
+            close = closes[i]
+            upperbandGradient = upperbandGradients[i]
+            lowerbandGradient = lowerbandGradients[i]
+            smaGradient = smaGradients[i]
+
+            # shouldSell for the combinations holding the coin
+            highestPrice = np.where(holding, np.maximum(highestPrice, close), highestPrice)
+            differenceFromBuy = ((close / buyPrice * 100.0)) - 100
+            with np.errstate(divide='ignore', invalid='ignore'):
+                differenceFromHighest = 100.0 - ((close / highestPrice) * 100.0)
+            selling = holding & ((differenceFromBuy <= -sellSafety) |
+                                 (differenceFromHighest >= sellSafety) |
+                                 ((lowerbandGradient <= lowerMinimum) & (smaGradient <= lowerMinimum)))
+
+            # shouldBuy for the others
+            buying = ~holding & (upperbandGradient >= upperMinimum) & (smaGradient >= upperMinimum)
+
+            if buying.any():
+                subjectBalance = np.where(buying, principalBalance * (1.0 - fee) / close, subjectBalance)
+                principalBalance = np.where(buying, 0.0, principalBalance)
+                buyPrice = np.where(buying, close, buyPrice)
+                buys += buying
+            if selling.any():
+                principalBalance = np.where(selling, subjectBalance * close * (1.0 - fee), principalBalance)
+                subjectBalance = np.where(selling, 0.0, subjectBalance)
+                sells += selling
+                winningSells += selling & (close > buyPrice)
+                highestPrice = np.where(selling, 0.0, highestPrice)
+            holding = (holding | buying) & ~selling
+
+            accountValue = principalBalance + subjectBalance * close
+            np.maximum(peakValue, accountValue, out=peakValue)
+            np.maximum(maxDrawdown, (1.0 - accountValue / peakValue) * 100.0, out=maxDrawdown)
+
+        results = []
+        for g in range(0, size):
+            results.append({'measurement_period' : measurementPeriod,
+                            'sell_safety_threshold' : grid[g][0],
+                            'upper_band_sma_minimum_gradient' : grid[g][1],
+                            'lower_band_sma_minimum_gradient' : grid[g][2],
+                            'profit' : float((accountValue[g] - 1.0) * 100.0),
+                            'buys' : int(buys[g]),
+                            'sells' : int(sells[g]),
+                            'winning_sells' : int(winningSells[g]),
+                            'max_drawdown' : float(maxDrawdown[g]),
+                            'candles' : max(len(closes) - windowLength + 1, 0),
+                            'final_balance' : float(accountValue[g])})
+        return results
+
+#   formatTable
+#       - Purpose:
+#           Turn the results of ParameterSweep.run into a printable ranked table.
+#       - Parameters:
+#           * (results) The list returned by ParameterSweep.run
+#           * (limit) How many rows to include
+#       - Returns:
+#           (str) The table.
+def formatTable(results, limit=20):
+    lines = ["%4s %6s %8s %8s %8s %10s %6s %6s %9s" % ('rank', 'period', 'safety', 'upper', 'lower', 'profit%', 'buys', 'sells', 'drawdown%')]
+    for rank, result in enumerate(results[:limit], 1):
+        lines.append("%4d %6d %8.3f %8.3f %8.3f %10.2f %6d %6d %9.2f" % (rank, result['measurement_period'],
+                     result['sell_safety_threshold'], result['upper_band_sma_minimum_gradient'],
+                     result['lower_band_sma_minimum_gradient'], result['profit'], result['buys'], result['sells'],
+                     result['max_drawdown']))
+    return '\n'.join(lines)
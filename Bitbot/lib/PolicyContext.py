@@ -0,0 +1,250 @@
+#### PolicyContext ####
+# The object handed to the shouldBuy/shouldSell/cleanUp functions of a version 2 policy (see PolicyTemplateV2). Each
+# PairTrader (and the Backtester) keeps one context per pair and refreshes it every tick instead of building a new
+# dictionary of strings, so the prices arrive as floats and nothing is allocated per tick.
+#
+# The context carries an IndicatorCache shared by every policy of the pair. An indicator computed through it is
+# remembered until the candlesticks change, so shouldBuy and shouldSell of the same tick, the ticks between two
+# candles, or several policies trading the same pair never compute the same bands twice. Each indicator has a lock of
+# its' own which is held while it is computed, so the policies of a PolicyEnsemble evaluated on several threads share
+# the cache safely, and pointing the cache at the candlesticks of a new tick never waits for a computation.
+
+import threading
+
+class IndicatorCache(object):
+
+#   __init__
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self):
+        self.__lock__ = threading.Lock()    # Held only while the dictionaries are read or changed
+        self.__candlesticks__ = None
+        self.__stamp__ = None           # (last candle date, series version) the values were computed for
+        self.__values__ = {}            # (indicator, params) -> value computed for the stamp
+        self.__states__ = {}            # (indicator, params) -> object kept across candles
+        self.__key_locks__ = {}         # (indicator, params) -> lock held while it is computed or updated
+        self.__hits__ = 0
+        self.__misses__ = 0
+
+#   setCandles
+#       - Purpose:
+#           Point the cache at the candlesticks of the current tick. The values are forgotten when the date of the
+#           newest candle or the version of the series has changed (the newest candle may still be forming, so it
+#           can change without its' date changing). An indicator still being computed for the previous candlesticks
+#           is not waited for, and is not kept when it finishes.
+#       - Parameters:
+#           * (candlesticks) The CandleSeries of the pair
+    def setCandles(self, candlesticks):
+        stamp = (candlesticks.getLastDate(), candlesticks.getVersion())
+        with self.__lock__:
+            if candlesticks is not self.__candlesticks__ or stamp != self.__stamp__:
+                self.__candlesticks__ = candlesticks
+                self.__stamp__ = stamp
+                self.__values__.clear()
+
+#   get
+#       - Purpose:
+#           Return an indicator of the candlesticks, computing it only the first time it is asked for since the
+#           candlesticks changed.
+#       - Parameters:
+#           * (indicator) A name for the indicator e.g. 'bollinger'
+#           * (params) A tuple of the parameters of the indicator. They are part of the key.
+#           * (compute) A function called as compute(candlesticks, *params) returning the indicator
+#       - Returns:
+#           The value returned by compute. It is shared, so it must not be modified.
+    def get(self, indicator, params, compute):
+        with self.__lock__:
+            candlesticks, stamp = self.__candlesticks__, self.__stamp__
+        return self.getFor(candlesticks, stamp, indicator, params, compute)
+
+#   getFor
+#       - Purpose:
+#           Return an indicator of given candlesticks (i.e. a copy taken for a policy running on another thread).
+#           The value is shared with the cache only while the cache is at the same stamp, so a call which is still
+#           running when the next tick arrives neither reads nor leaves behind values of other candlesticks.
+#       - Parameters:
+#           * (candlesticks) The candlesticks to compute the indicator of
+#           * (stamp) Their (last candle date, series version)
+#           * (indicator), (params), (compute) As for get
+#       - Returns:
+#           The value returned by compute.
+    def getFor(self, candlesticks, stamp, indicator, params, compute):
+        key = (indicator, params)
+        with self.__lock__:
+            if stamp == self.__stamp__ and key in self.__values__:
+                self.__hits__ += 1
+                return self.__values__[key]
+            self.__misses__ += 1
+            keyLock = self.__getKeyLock__(key)
+        with keyLock:
+            # Another policy may have computed it while this one waited for the lock
+            with self.__lock__:
+                if stamp == self.__stamp__ and key in self.__values__:
+                    return self.__values__[key]
+            value = compute(candlesticks, *params)
+            with self.__lock__:
+                if stamp == self.__stamp__:
+                    self.__values__[key] = value
+            return value
+
+#   getState
+#       - Purpose:
+#           Return an object kept for the pair across candles, i.e. an incremental indicator which is updated with
+#           the new candles instead of being recomputed.
+#       - Parameters:
+#           * (indicator) A name for the object
+#           * (params) A tuple of parameters, part of the key and passed to the factory
+#           * (factory) A function called as factory(*params) the first time to create the object
+    def getState(self, indicator, params, factory):
+        key = (indicator, params)
+        with self.__lock__:
+            state = self.__states__.get(key)
+            if state is None:
+                state = self.__states__[key] = factory(*params)
+            return state
+
+#   getLock
+#       - Parameters:
+#           * (indicator), (params) The key of an object returned by getState
+#       - Returns:
+#           The lock of that object, to hold while updating it as other policies may use it.
+    def getLock(self, indicator, params):
+        with self.__lock__:
+            return self.__getKeyLock__((indicator, params))
+
+#   getStats
+#       - Returns:
+#           A tuple of (hits, misses) of get.
+    def getStats(self):
+        return (self.__hits__, self.__misses__)
+
+    def __getKeyLock__(self, key):
+        keyLock = self.__key_locks__.get(key)
+        if keyLock is None:
+            keyLock = self.__key_locks__[key] = threading.Lock()
+        return keyLock
+
+class IndicatorView(object):
+    """The IndicatorCache of a pair seen from a copy of its' candlesticks (see PolicyContext.copy)."""
+
+    def __init__(self, cache, candlesticks):
+        self.__cache__ = cache
+        self.__candlesticks__ = candlesticks
+        self.__stamp__ = (candlesticks.getLastDate(), candlesticks.getVersion())
+
+    def get(self, indicator, params, compute):
+        return self.__cache__.getFor(self.__candlesticks__, self.__stamp__, indicator, params, compute)
+
+    def getState(self, indicator, params, factory):
+        return self.__cache__.getState(indicator, params, factory)
+
+    def getLock(self, indicator, params):
+        return self.__cache__.getLock(indicator, params)
+
+    def getStats(self):
+        return self.__cache__.getStats()
+
+class PolicyContext(object):
+    """The state of one pair handed to a version 2 policy. The prices are floats; buyPrice is 0.0 until bought."""
+
+    __slots__ = ('currencyPair', 'candlePeriod', 'measurementPeriod', 'periodUnit', 'statusBus', 'candlesticks',
+                 'lastCandleDate', 'indicators', 'priceCharts', 'price', 'lowestAsk', 'highestBid', 'buyPrice',
+                 'sellPrice', '__prices__', '__args__')
+
+#   __init__
+#       - Parameters:
+#           * (currencyPair) The currency pair e.g. "BTC_XRP"
+#           * (candlePeriod) The candlestick period in seconds
+#           * (measurementPeriod) The n number of units of the measurement window
+#           * (periodUnit) The unit of the measurement period (DAYS, HOURS, MINUTES)
+#           * (candlesticks) The CandleSeries of the pair. It is updated in place.
+#           * (statusBus) The StatusBus the policy may publish on
+#           * (indicators) The IndicatorCache of the pair, or None to create one
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, currencyPair, candlePeriod, measurementPeriod, periodUnit, candlesticks, statusBus, indicators=None):
+        self.currencyPair = currencyPair
+        self.candlePeriod = int(candlePeriod)
+        self.measurementPeriod = int(measurementPeriod)
+        self.periodUnit = periodUnit
+        self.candlesticks = candlesticks
+        self.statusBus = statusBus
+        self.indicators = indicators if indicators is not None else IndicatorCache()
+        self.lastCandleDate = None
+        self.priceCharts = None
+        self.price = self.lowestAsk = self.highestBid = 0.0
+        self.buyPrice = self.sellPrice = 0.0
+        self.__prices__ = ('0.0', '0.0')
+        self.__args__ = None
+
+#   setTicker
+#       - Purpose:
+#           Refresh the context for a tick: parse the ticker row of the pair and the buy/sell prices and point the
+#           indicator cache at the current candlesticks.
+#       - Parameters:
+#           * (priceCharts) The dictionary returned by returnTicker
+#           * (buyPrice) The price the coin was bought at, as a string
+#           * (sellPrice) The price the coin was last sold at, as a string
+    def setTicker(self, priceCharts, buyPrice, sellPrice):
+        row = priceCharts[self.currencyPair]
+        self.priceCharts = priceCharts
+        self.price = float(row['last'])
+        self.lowestAsk = float(row.get('lowestAsk', self.price))
+        self.highestBid = float(row.get('highestBid', self.price))
+        self.buyPrice = float(buyPrice)
+        self.sellPrice = float(sellPrice)
+        self.__prices__ = (buyPrice, sellPrice)
+        self.lastCandleDate = self.candlesticks.getLastDate()
+        self.indicators.setCandles(self.candlesticks)
+        self.__args__ = None
+
+#   getArgs
+#       - Purpose:
+#           Build the dictionary a version 1 policy receives (see PolicyTemplate.shouldBuy). It is built once per
+#           tick, only if a version 1 policy asks for it.
+    def getArgs(self):
+        if self.__args__ is None:
+            self.__args__ = {'candle_period' : self.candlePeriod,
+                             'measurement_period' : self.measurementPeriod,
+                             'period_unit' : self.periodUnit,
+                             'currencyPair' : self.currencyPair,
+                             'statusBus' : self.statusBus,
+                             'candlesticks' : self.candlesticks,
+                             'lastCandleDate' : self.lastCandleDate,
+                             'priceCharts' : self.priceCharts,
+                             'sellPrice' : self.__prices__[1],
+                             'buyPrice': self.__prices__[0]}
+        return self.__args__
+
+#   copy
+#       - Purpose:
+#           Copy the context for a policy evaluated on another thread. The candlesticks are copied and the indicators
+#           are those of the copy, so a call still running when the next tick updates the context keeps seeing the
+#           candles it was asked about.
+#       - Returns:
+#           A PolicyContext sharing the status bus and indicator cache of this one.
+    def copy(self):
+        copy = PolicyContext.__new__(PolicyContext)
+        for name in PolicyContext.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.candlesticks = self.candlesticks.copy()
+        copy.indicators = IndicatorView(self.indicators, copy.candlesticks)
+        copy.__args__ = None
+        return copy
+
+#   snapshot
+#       - Purpose:
+#           Copy the context for a policy evaluated in another process. The status bus and indicator cache are left
+#           out (the process has its' own) and only the ticker row of the pair is kept.
+#       - Returns:
+#           A PolicyContext which can be pickled.
+    def snapshot(self):
+        snapshot = PolicyContext.__new__(PolicyContext)
+        for name in PolicyContext.__slots__:
+            setattr(snapshot, name, getattr(self, name))
+        snapshot.statusBus = None
+        snapshot.indicators = None
+        if self.priceCharts is not None:
+            snapshot.priceCharts = {self.currencyPair : self.priceCharts[self.currencyPair]}
+        snapshot.__args__ = None
+        return snapshot
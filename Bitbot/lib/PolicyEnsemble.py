@@ -0,0 +1,295 @@
+#### PolicyEnsemble ####
+# Lets a pair be traded by several policies at once. List them in policy_file (or policy_file_<coin>) separated by
+# commas, each optionally followed by a weight (i.e. policy_file=policy.ZonePolicy:2,policy.BollingerPolicy). Every
+# tick all of the policies are asked on the same PolicyContext at the same time and their answers are combined by
+# ensemble_vote:
+#
+#       any         buy/sell if any policy says to
+#       all         buy/sell only if every policy says to
+#       majority    buy/sell if the policies saying to hold more than half of the weight
+#       weighted    buy/sell if the policies saying to hold at least ensemble_threshold of the weight
+#
+# A policy runs on a thread pool shared by every pair (ensemble_workers threads), which suits policies spending their
+# time in NumPy as it releases the GIL while it calculates. It is handed a copy of the context with the candlesticks
+# of the tick, so a call which answers late never sees the candles of the next one. A policy spending its' time in
+# Python code can set POLICY_EXECUTOR = 'process' to be run in a process of its' own instead. It is then handed a
+# copy of the context and keeps its' own indicator cache in that process, and what it publishes on the status bus is
+# published by the trader when it answers.
+#
+# The policies have ensemble_timeout seconds to answer. A policy which has not answered (or raised an exception) does
+# not vote, which counts against buying or selling, and it is skipped until its' late call has finished so one slow
+# policy cannot stall the tick or pile up calls. The Backtester waits for every policy instead, as its' result should
+# not depend on how busy the machine was.
+
+import concurrent.futures, threading, time
+from lib import Bitbot_CDO, Metrics
+from lib.PolicyContext import IndicatorCache
+from policy.PolicyTemplate import loadPolicyClass, getPolicyInterface
+
+# The thread pool shared by the ensembles of every pair and the process pool of each policy run in a process
+__thread_pool__ = None
+__process_pools__ = {}
+__pools_lock__ = threading.Lock()
+
+# In a policy process: the policy interfaces and the indicator cache of each pair
+__worker_policies__ = {}
+__worker_caches__ = {}
+
+class RecordingStatusBus(object):
+    """Stands in for the StatusBus in a policy process. What is published is sent back and published by the trader."""
+
+    def __init__(self):
+        self.__messages__ = []
+
+    def publish(self, key, value):
+        self.__messages__.append((key, value))
+
+    def remove(self, key):
+        self.__messages__.append((key, None))
+
+    def getMessages(self):
+        return self.__messages__
+
+class EnsembleMember(object):
+    """One policy of an ensemble: its' interface, weight and executor, and its' call if it has not finished."""
+
+    def __init__(self, policyFile, policyClass, weight=1.0):
+        self.policyFile = policyFile
+        self.name = policyClass.__name__
+        self.policy = getPolicyInterface(policyClass)
+        self.weight = float(weight)
+        self.executor = getattr(policyClass, 'POLICY_EXECUTOR', 'thread')
+        self.pending = None
+
+class PolicyEnsemble(object):
+
+    # The ensemble is called with a PolicyContext like a version 2 policy
+    POLICY_VERSION = 2
+    VOTE_RULES = ('any', 'all', 'majority', 'weighted')
+
+#   __init__
+#       - Parameters:
+#           * (members) A list of EnsembleMember
+#           * (vote) The rule combining the answers (see VOTE_RULES)
+#           * (threshold) The share of the weight needed to buy/sell with the weighted rule
+#           * (timeout) Seconds the policies have to answer, or None to wait for every one of them
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, members, vote='majority', threshold=0.5, timeout=1.0):
+        if vote not in self.VOTE_RULES:
+            raise ValueError("Unknown ensemble_vote %s (expected one of %s)" % (vote, ', '.join(self.VOTE_RULES)))
+        self.__members__ = members
+        self.__vote__ = vote
+        self.__threshold__ = float(threshold)
+        self.__timeout__ = float(timeout) if timeout is not None else None
+        # Named like a policy class for the metrics and backtest reports
+        self.__name__ = 'PolicyEnsemble(%s)' % ('+'.join(member.name for member in members))
+
+    def getMembers(self):
+        return self.__members__
+
+    def shouldBuy(self, context):
+        return self.__decide__('shouldBuy', context)
+
+    def shouldSell(self, context):
+        return self.__decide__('shouldSell', context)
+
+#   cleanUp
+#       - Purpose:
+#           Call cleanUp of every policy, waiting up to the timeout for them.
+    def cleanUp(self, context):
+        self.__collect__('cleanUp', context, self.__submit__('cleanUp', context, force=True))
+
+#   __decide__
+#       - Purpose:
+#           Ask every policy at once and combine their answers. The votes are published under '<pair> Votes'.
+#       - Returns:
+#           (bool) The decision of the ensemble.
+    def __decide__(self, function, context):
+        votes = self.__collect__(function, context, self.__submit__(function, context))
+        weights = [member.weight for member in self.__members__]
+        decision = combineVotes(votes, weights, self.__vote__, self.__threshold__)
+        context.statusBus.publish(context.currencyPair + ' Votes', ' '.join('%s:%s' % (member.name, '-' if vote is None else ('yes' if vote else 'no'))
+                                                                           for member, vote in zip(self.__members__, votes)))
+        return decision
+
+#   __submit__
+#       - Purpose:
+#           Start the call of every policy on its' executor. A policy whose previous call is still running is skipped
+#           unless forced. Without a timeout no call is left running, so the policies on threads are handed the
+#           context itself rather than a copy.
+#       - Returns:
+#           A list of a future (or None if skipped) per policy.
+    def __submit__(self, function, context, force=False):
+        snapshot = copy = None
+        futures = []
+        for member in self.__members__:
+            if not force and member.pending is not None and not member.pending.done():
+                futures.append(None)
+                continue
+            if member.executor == 'process':
+                if snapshot is None:
+                    snapshot = context.snapshot()
+                future = getProcessPool(member.policyFile).submit(evaluateInProcess, member.policyFile, function, snapshot)
+            else:
+                if copy is None:
+                    copy = context.copy() if self.__timeout__ is not None else context
+                future = getThreadPool().submit(evaluate, member.policy, function, copy)
+            member.pending = future
+            futures.append(future)
+        return futures
+
+#   __collect__
+#       - Purpose:
+#           Wait for the answers until the timeout (or for all of them without one). The messages of policies run in a process are published.
+#       - Returns:
+#           A list of the answer of every policy, None for those which did not answer.
+    def __collect__(self, function, context, futures):
+        deadline = time.monotonic() + self.__timeout__ if self.__timeout__ is not None else None
+        answers = []
+        for member, future in zip(self.__members__, futures):
+            if future is None:
+                Metrics.registry.increment('bitbot_policy_timeouts_total', policy=member.name, pair=context.currencyPair)
+                answers.append(None)
+                continue
+            try:
+                answer, messages, elapsed = future.result(timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+            except concurrent.futures.TimeoutError:
+                Metrics.registry.increment('bitbot_policy_timeouts_total', policy=member.name, pair=context.currencyPair)
+                context.statusBus.publish("Error", "Policy %s did not answer %s within %.2f seconds" % (member.name, function, self.__timeout__))
+                answers.append(None)
+                continue
+            except Exception as e:
+                context.statusBus.publish("Error", "Policy %s failed in %s: %s" % (member.name, function, str(e)))
+                answers.append(None)
+                continue
+            for key, value in messages:
+                if value is None:
+                    context.statusBus.remove(key)
+                else:
+                    context.statusBus.publish(key, value)
+            Metrics.registry.observe('bitbot_policy_member_seconds', elapsed, policy=member.name, pair=context.currencyPair)
+            answers.append(answer)
+        return answers
+
+# combineVotes
+#   - Purpose:
+#       Combine the answers of the policies of an ensemble. A policy which did not answer does not vote, which counts
+#       against the decision.
+#   - Parameters:
+#       * (votes) The answer of every policy (True, False or None)
+#       * (weights) The weight of every policy
+#       * (rule) The rule (any, all, majority or weighted)
+#       * (threshold) The share of the weight needed with the weighted rule
+#   - Returns:
+#       (bool) The decision.
+def combineVotes(votes, weights, rule, threshold=0.5):
+    if rule == 'any':
+        return any(vote for vote in votes)
+    if rule == 'all':
+        return len(votes) > 0 and all(vote for vote in votes)
+    totalWeight = sum(weights)
+    yesWeight = sum(weight for vote, weight in zip(votes, weights) if vote)
+    if totalWeight <= 0:
+        return False
+    if rule == 'majority':
+        return yesWeight > totalWeight / 2.0
+    return yesWeight >= totalWeight * threshold
+
+# evaluate
+#   - Purpose:
+#       Call a function of a policy on a thread of the pool.
+#   - Returns:
+#       A tuple of the answer, the messages to publish (none, the policy publishes itself) and the time it took.
+def evaluate(policy, function, context):
+    start = time.perf_counter()
+    answer = getattr(policy, function)(context)
+    return (answer, (), time.perf_counter() - start)
+
+# evaluateInProcess
+#   - Purpose:
+#       Call a function of a policy in its' process with a snapshot of the context. The process keeps an indicator
+#       cache for each pair so incremental indicators carry on from the previous call.
+#   - Returns:
+#       A tuple of the answer, the messages the policy published and the time it took.
+def evaluateInProcess(policyFile, function, context):
+    start = time.perf_counter()
+    policy = __worker_policies__.get(policyFile)
+    if policy is None:
+        policy = __worker_policies__[policyFile] = getPolicyInterface(loadPolicyClass(policyFile))
+    indicators = __worker_caches__.get(context.currencyPair)
+    if indicators is None:
+        indicators = __worker_caches__[context.currencyPair] = IndicatorCache()
+    indicators.setCandles(context.candlesticks)
+    context.indicators = indicators
+    context.statusBus = RecordingStatusBus()
+    answer = getattr(policy, function)(context)
+    return (answer, context.statusBus.getMessages(), time.perf_counter() - start)
+
+# getThreadPool
+#   - Returns:
+#       The thread pool of ensemble_workers threads shared by the ensembles of every pair.
+def getThreadPool():
+    global __thread_pool__
+    with __pools_lock__:
+        if __thread_pool__ is None:
+            __thread_pool__ = concurrent.futures.ThreadPoolExecutor(max_workers=int(getattr(Bitbot_CDO, 'ensemble_workers', 4)),
+                                                                    thread_name_prefix='policy')
+        return __thread_pool__
+
+# getProcessPool
+#   - Purpose:
+#       Return the process of a policy, started with a copy of the configuration the first time. Each policy has
+#       one process so the state it keeps between calls is always in the process it is called in.
+def getProcessPool(policyFile):
+    with __pools_lock__:
+        pool = __process_pools__.get(policyFile)
+        if pool is None:
+            configuration = dict((key, value) for key, value in vars(Bitbot_CDO).items() if not key.startswith('_') and isinstance(value, str))
+            pool = __process_pools__[policyFile] = concurrent.futures.ProcessPoolExecutor(max_workers=1, initializer=initializeProcess,
+                                                                                       initargs=(configuration,))
+        return pool
+
+# initializeProcess
+#   - Purpose:
+#       Copy the configuration into Bitbot_CDO of a policy process (it is not read from bitbot.config when the
+#       process is spawned rather than forked).
+def initializeProcess(configuration):
+    for key, value in configuration.items():
+        setattr(Bitbot_CDO, key, value)
+
+# shutdownPools
+#   - Purpose:
+#       Stop the thread pool and the policy processes without waiting for calls which are still running.
+def shutdownPools():
+    global __thread_pool__
+    with __pools_lock__:
+        pools = list(__process_pools__.values())
+        if __thread_pool__ is not None:
+            pools.append(__thread_pool__)
+        __thread_pool__ = None
+        __process_pools__.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# createPolicy
+#   - Purpose:
+#       Load the policy of a policy_file setting: the policy class if one policy is listed, otherwise a
+#       PolicyEnsemble of the policies configured with ensemble_vote, ensemble_threshold and ensemble_timeout.
+#   - Parameters:
+#       * (policyFile) A comma separated list of policy modules, each optionally followed by :weight
+#       * (waitForAll) Wait for every policy of an ensemble rather than ensemble_timeout (for the Backtester)
+#   - Returns:
+#       A policy class or a PolicyEnsemble, both of which PairTrader and Backtester accept.
+def createPolicy(policyFile, waitForAll=False):
+    entries = [entry.strip() for entry in policyFile.split(',') if entry.strip()]
+    if len(entries) == 1 and ':' not in entries[0]:
+        return loadPolicyClass(entries[0])
+
+    members = []
+    for entry in entries:
+        policyModule, separator, weight = entry.partition(':')
+        policyModule = policyModule.strip()
+        members.append(EnsembleMember(policyModule, loadPolicyClass(policyModule), float(weight) if separator else 1.0))
+    return PolicyEnsemble(members, getattr(Bitbot_CDO, 'ensemble_vote', 'majority'), getattr(Bitbot_CDO, 'ensemble_threshold', 0.5),
+                          None if waitForAll else getattr(Bitbot_CDO, 'ensemble_timeout', 1.0))
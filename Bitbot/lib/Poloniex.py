@@ -1,17 +1,28 @@
 import urllib
 from urllib.parse import urlencode
-from urllib.request import urlopen
 import json
 import time
 import hmac,hashlib
+import threading
+from lib.HttpTransport import HttpTransport
+from lib import Metrics
 
 def createTimeStamp(datestr, format="%Y-%m-%d %H:%M:%S"):
     return time.mktime(time.strptime(datestr, format))
 
 class poloniex:
-    def __init__(self, APIKey, Secret):
+    # Commands sent unsigned to the public API
+    PUBLIC_COMMANDS = ("returnTicker", "return24Volume", "returnOrderBook", "returnMarketTradeHistory", "returnChartData")
+
+    # The transport keeps the connections to the exchange alive between calls. Pass a transport pointed at another
+    # base URL to use a local stand-in server. The optional RequestScheduler decides when each request may be sent.
+    def __init__(self, APIKey, Secret, transport=None, scheduler=None):
         self.APIKey = APIKey
         self.Secret = Secret
+        self.transport = transport if transport is not None else HttpTransport()
+        self.scheduler = scheduler
+        self.last_nonce = 0
+        self.nonce_lock = threading.Lock()
 
     def post_process(self, before):
         after = before
@@ -19,31 +30,32 @@ class poloniex:
         # Add timestamps if there isnt one but is a datetime
         if('return' in after):
             if(isinstance(after['return'], list)):
-                for x in xrange(0, len(after['return'])):
+                for x in range(0, len(after['return'])):
                     if(isinstance(after['return'][x], dict)):
                         if('datetime' in after['return'][x] and 'timestamp' not in after['return'][x]):
                             after['return'][x]['timestamp'] = float(createTimeStamp(after['return'][x]['datetime']))
                             
         return after
 
-    def api_query(self, command, req={}):
+    # Builds the HTTP request for a command.
+    # Outputs:
+    # (method, path, body, headers)
+    def build_request(self, command, req=None):
+        req = dict(req) if req else {}
 
         if(command == "returnTicker" or command == "return24Volume"):
-            ret = urllib.request.urlopen(urllib.request.Request('https://poloniex.com/public?command=' + command))
-            return json.loads(ret.read().decode('utf-8'))
+            return ('GET', '/public?command=' + command, None, None)
         elif(command == "returnOrderBook"):
-            ret = urllib.request.urlopen(urllib.request.Request('https://poloniex.com/public?command=' + command + '&currencyPair=' + str(req['currencyPair'])))
-            return json.loads(ret.read().decode('utf-8'))
+            depth = '&depth=' + str(req['depth']) if req.get('depth') else ''
+            return ('GET', '/public?command=' + command + '&currencyPair=' + str(req['currencyPair']) + depth, None, None)
         elif(command == "returnMarketTradeHistory"):
-            ret = urllib.request.urlopen(urllib.request.Request('https://poloniex.com/public?command=' + "returnTradeHistory" + '&currencyPair=' + str(req['currencyPair'])))
-            return json.loads(ret.read().decode('utf-8'))
+            return ('GET', '/public?command=' + "returnTradeHistory" + '&currencyPair=' + str(req['currencyPair']), None, None)
         elif(command == "returnChartData"):
-            ret = urllib.request.urlopen(urllib.request.Request('https://poloniex.com/public?command=' + command + '&currencyPair=' + str(req['currencyPair'])
-                + '&start=' + str(req['start']) + '&end=' + str(req['end']) + '&period=' + str(req['period'])))
-            return json.loads(ret.read().decode('utf-8'))
+            return ('GET', '/public?command=' + command + '&currencyPair=' + str(req['currencyPair'])
+                + '&start=' + str(req['start']) + '&end=' + str(req['end']) + '&period=' + str(req['period']), None, None)
         else:
             req['command'] = command
-            req['nonce'] = int(time.time()*1000)
+            req['nonce'] = self.next_nonce()
             post_data = urllib.parse.urlencode(req)
             post_data = str(post_data).encode('utf-8')
             encoded_sign = str(self.Secret).encode('utf-8')
@@ -53,10 +65,46 @@ class poloniex:
                 'Sign': sign,
                 'Key': self.APIKey
             }
+            return ('POST', '/tradingApi', post_data, headers)
+
+    # Returns a nonce greater than every nonce handed out before. The exchange rejects a signed request whose nonce is
+    # not greater than the last one it saw, and two requests signed within the same millisecond would share one.
+    def next_nonce(self):
+        with self.nonce_lock:
+            self.last_nonce = max(int(time.time()*1000), self.last_nonce + 1)
+            return self.last_nonce
+
+    # Decodes the response body of a command.
+    def parse_response(self, command, body):
+        jsonRet = json.loads(body.decode('utf-8'))
+        if(command in self.PUBLIC_COMMANDS):
+            return jsonRet
+        return self.post_process(jsonRet)
 
-            ret = urllib.request.urlopen(urllib.request.Request('https://poloniex.com/tradingApi', post_data, headers))
-            jsonRet = json.loads(ret.read().decode('utf-8'))
-            return self.post_process(jsonRet)
+    # Sends a command (through the scheduler if there is one). The time it took is recorded in the metrics.
+    def api_query(self, command, req=None):
+        start = time.perf_counter()
+        try:
+            if self.scheduler is not None:
+                response = self.scheduler.call(command, req, lambda: self.send_query(command, req))
+            else:
+                response = self.send_query(command, req)
+        except Exception:
+            self.record_query(command, start, None)
+            raise
+        self.record_query(command, start, response)
+        return response
+
+    # Records the time taken by a command and counts it as an error if it raised or the exchange returned an error.
+    def record_query(self, command, start, response):
+        Metrics.registry.observe('bitbot_api_request_seconds', time.perf_counter() - start, command=command)
+        if response is None or (isinstance(response, dict) and 'error' in response):
+            Metrics.registry.increment('bitbot_api_errors_total', command=command)
+
+    # Sends one request and decodes its' response.
+    def send_query(self, command, req=None):
+        method, path, body, headers = self.build_request(command, req)
+        return self.parse_response(command, self.transport.request(method, path, body, headers))
 
 
     def returnTicker(self):
@@ -65,8 +113,11 @@ class poloniex:
     def return24Volume(self):
         return self.api_query("return24Volume")
 
-    def returnOrderBook (self, currencyPair):
-        return self.api_query("returnOrderBook", {'currencyPair': currencyPair})
+    # Returns the asks and bids of a market. Only the best depth levels of each side are sent if depth is given.
+    # Outputs:
+    # {"asks":[["0.00007600","1164"], ... ], "bids":[["0.00006901","200"], ... ], "isFrozen":"0", "seq":18849}
+    def returnOrderBook (self, currencyPair, depth=None):
+        return self.api_query("returnOrderBook", {'currencyPair': currencyPair, 'depth': depth})
 
     def returnMarketTradeHistory (self, currencyPair):
         return self.api_query("returnMarketTradeHistory", {'currencyPair': currencyPair})
@@ -105,6 +156,26 @@ class poloniex:
     def returnTradeHistory(self,currencyPair):
         return self.api_query('returnTradeHistory',{"currencyPair":currencyPair})
 
+    # Returns the status of an open order. Orders which have filled or were canceled are not found.
+    # Inputs:
+    # orderNumber   The order number
+    # Outputs:
+    # {"success":1,"result":{"<orderNumber>":{"status":"Open","rate":"0.00003","amount":"100","currencyPair":"BTC_XRP",
+    #  "date":"2018-10-17 17:04:50","total":"0.003","type":"buy","startingAmount":"100"}}}
+    # {"success":0,"result":{"error":"Order not found, or you are not the person who placed it."}}
+    def returnOrderStatus(self, orderNumber):
+        return self.api_query('returnOrderStatus',{"orderNumber":orderNumber})
+
+    # Returns all trades involving a given order. The fee is the fraction of the trade taken by the exchange.
+    # Inputs:
+    # orderNumber   The order number
+    # Outputs:
+    # [{"globalTradeID":"394127362","tradeID":"13536351","currencyPair":"BTC_XRP","type":"buy","rate":"0.00003",
+    #   "amount":"100","total":"0.003","fee":"0.00200000","date":"2018-10-17 17:04:50"}, ... ]
+    # {"error":"Order not found, or you are not the person who placed it."} if nothing of the order has filled
+    def returnOrderTrades(self, orderNumber):
+        return self.api_query('returnOrderTrades',{"orderNumber":orderNumber})
+
     # Places a buy order in a given market. Required POST parameters are "currencyPair", "rate", and "amount". If successful, the method will return the order number.
     # Inputs:
     # currencyPair  The curreny pair
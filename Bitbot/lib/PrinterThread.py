@@ -1,19 +1,20 @@
 #### PrinterThread ####
 # This class runs as a thread and is responsible for printing any of the program's information to the screen.
-# Any other threads can send data to the printQueue as a key pair (key, value) and the printer will print the key
-# as a header and print the value[s] underneath it. 
+# Any other threads can publish data on the StatusBus as a key pair (key, value) and the printer will print the key
+# as a header and print the value[s] underneath it. The screen is only repainted when data arrives and only the lines
+# that changed are redrawn. Lines past the end of the pad are not printed.
 #
 # Issues:
-#   - Currently the screen buffer is small and will cause the program to crash if too many lines are printed.
 #   - Currently only works on Windows machines.
 
-import time, threading, sys, curses, os, collections
+import time, threading, sys, os, collections
 
 class PrinterThread(threading.Thread):
 
     __print_dictionary__ = collections.OrderedDict()    # Dictionary will contain what to print
-    __print_update_interval__ = 0.5                       # How often the screen will be updated in seconds
+    __print_update_interval__ = 0.5                       # Longest wait for new data before checking the stop event
     __SCREEN_LINES__ = 20
+    __PAD_LINES__ = 200                 # Room for the status lines of several traded pairs
     __SCREEN_COLS__ = 90
     __KEY_UP__ = 72                     # OS specific key codes
     __KEY_DOWN__ = 80
@@ -24,21 +25,16 @@ class PrinterThread(threading.Thread):
 #       - Parameters:
 #           * (threadID) Number identifying this thread
 #           * (name) Name identifying this thread
-#           * (queue) The queue shared among other threads which this thread will read from
-#           * (queueLock) A lock on the printQueue to prevent others from using it when it is being read from
-#           * (removeQueue) A queue used to remove entries from the print dictionary. Another thread can put a 
-#                           key into this thread and the Printer will remove that key from the dictionary.
-#           * (removeQueueLock) A lock on the removeQueue to prevent others from using it.
+#           * (statusBus) The StatusBus shared among the threads. This thread subscribes to it and prints every
+#                         key published on it until the key is removed.
 #       - Purpose:
 #           Initialize the class properties.
-    def __init__(self, threadID, name, queue, queueLock, removeQueue, removeQueueLock):
+    def __init__(self, threadID, name, statusBus):
        super(PrinterThread, self).__init__()
        self.threadID = threadID
        self.name = name
-       self.printQueue = queue
-       self.queueLock = queueLock
-       self.removeQueue = removeQueue
-       self.removeQueueLock = removeQueueLock
+       self.statusBus = statusBus
+       self.__subscription__ = statusBus.subscribe()
        self._stop_event = threading.Event()
 
 #   stop
@@ -82,49 +78,13 @@ class PrinterThread(threading.Thread):
 #   run
 #       - Purpose:
 #           The thread entry point which will run indefinetly and take care of printing any information to the screen.
+#           The thread sleeps until something is published on the status bus, then takes every key that changed
+#           since it last looked (only the newest value of each key is kept by the bus) and repaints only the screen
+#           lines that changed.
     def run(self):
 
-        ## printScreen
-        ##      - Parameters:
-        ##          * (stdscr) A curses screen object
-        ##      - Purpose: Handles putting the dictionary contents on the screen
-        def printScreen(self, stdscr):
-            nonlocal scroll
-            cursorPosition = 0
-
-            # Iterate through the dictionary and print all key value pairs
-            for key in self.__print_dictionary__.keys():
-                try:
-                    value = self.__print_dictionary__[key]
-                except:
-                    # If the value is not found we may have removed it so continue to next.
-                    continue
-                value_type = type(value)
-             
-                # If the key is the 'ticker balances' then only print the tickers with a balance
-                if key == self.TICKER_KEY:
-                    stdscr.addstr(cursorPosition, 0, key + ":")
-                    cursorPosition += 1
-                    for k in value.keys():
-
-                        # Ignore tickers without a balance
-                        if not float(value[k]) > 0.0:
-                            continue
-                        stdscr.addstr(cursorPosition, 4, "{:6} : {:.5f}".format(k, float(value[k])))
-                        cursorPosition += 1   
-                elif value_type == dict:
-                    for k in value.keys():
-                        stdscr.addstr(cursorPosition, 4, "{}: {}".format(str(k), str(value[k])))
-                        cursorPosition += 1
-                else:
-                    stdscr.addstr(cursorPosition, 0, "{}: {}".format(key, self.__print_dictionary__[key]))
-                    cursorPosition += 1
-            # End for
-            stdscr.refresh(scroll, 0, 0, 0, self.__SCREEN_LINES__, self.__SCREEN_COLS__)
-        # End printScreen
-
-
-        # Begin run() main
+        # Begin run() main. curses is imported here so the trader can use the keys above without it.
+        import curses
         stdscr = curses.initscr()
         stdscr.scrollok(True)
         stdscr.nodelay(1)
@@ -133,46 +93,73 @@ class PrinterThread(threading.Thread):
 
         # A pad was created earlier to allow for scrolling but as the bot does not currently support
         # this the pad is not needed. Pad will probably be removed later.
-        scroll = 0      
-        pad = curses.newpad(curses.LINES-1, curses.COLS-1)   
-        pad = curses.newpad(self.__SCREEN_LINES__, self.__SCREEN_COLS__)
+        scroll = 0
+        pad = curses.newpad(self.__PAD_LINES__, self.__SCREEN_COLS__)
         pad.refresh(scroll, 0, 0, 0, self.__SCREEN_LINES__, self.__SCREEN_COLS__)
         pad.scrollok(1)
         pad.idlok(1)
         self.pad = pad
         self.stdscrn = stdscr
 
+        renderedKeys = {}       # key -> the lines it was last rendered as
+        screenLines = []        # the lines currently on the pad
+
         while True:
 
             # Check if this thread is flagged to quit
             if self._stop_event.is_set():
+                self.__subscription__.close()
                 curses.endwin()
                 return 0
 
-            # Get any data updates from the shared queue and add it to the print dictionary
-            self.queueLock.acquire()
-            if not self.printQueue.empty():
-                keyPair = self.printQueue.get()  
-                self.queueLock.release()
-                key = keyPair[0]
-                value = keyPair[1]
+            # Wait for changes (the timeout lets the thread notice the stop event). Removed keys are also removed
+            # from the print dictionary.
+            updates, removals = self.__subscription__.wait(self.__print_update_interval__)
+            if not updates and not removals:
+                continue
+
+            for key, value in updates.items():
                 self.__print_dictionary__[key] = value
-            else:
-                self.queueLock.release()
-
-            # Check if the remove queue has entries and if so get those entries and use them to remove
-            # values from the print dictionary.
-            self.removeQueueLock.acquire()
-            if not self.removeQueue.empty():
-                key = self.removeQueue.get()
-                self.__print_dictionary__.pop(key)
-                self.removeQueueLock.release()
-            else:
-                self.removeQueueLock.release()
-
-            # Update the screen
-            pad.clear()
-            printScreen(self, pad)
-            time.sleep(self.__print_update_interval__)
+                renderedKeys[key] = self.__renderKey__(key, value)
+            for key in removals:
+                self.__print_dictionary__.pop(key, None)
+                renderedKeys.pop(key, None)
+
+            # Repaint the lines that differ from what is on the pad
+            newLines = []
+            for key in self.__print_dictionary__.keys():
+                newLines.extend(renderedKeys[key])
+            newLines = newLines[:self.__PAD_LINES__]
+            for lineNumber in range(0, max(len(newLines), len(screenLines))):
+                line = newLines[lineNumber] if lineNumber < len(newLines) else None
+                if lineNumber < len(screenLines) and screenLines[lineNumber] == line:
+                    continue
+                pad.move(lineNumber, 0)
+                pad.clrtoeol()
+                if line is not None:
+                    pad.addstr(lineNumber, line[0], line[1])
+            screenLines = newLines
+            pad.refresh(scroll, 0, 0, 0, self.__SCREEN_LINES__, self.__SCREEN_COLS__)
         # End while
 
+#   __renderKey__
+#       - Purpose:
+#           Turn one entry of the print dictionary into screen lines. The 'ticker balances' only list the coins
+#           with a balance, other dictionaries list their items and anything else is printed as "key: value".
+#       - Returns:
+#           A list of (column, text) tuples. Text is cut to the width of the pad.
+    def __renderKey__(self, key, value):
+        lines = []
+        if key == self.TICKER_KEY:
+            lines.append((0, key + ":"))
+            for k in value.keys():
+                # Ignore tickers without a balance
+                if not float(value[k]) > 0.0:
+                    continue
+                lines.append((4, "{:6} : {:.5f}".format(k, float(value[k]))))
+        elif type(value) == dict:
+            for k in value.keys():
+                lines.append((4, "{}: {}".format(str(k), str(value[k]))))
+        else:
+            lines.append((0, "{}: {}".format(key, value)))
+        return [(column, text.expandtabs()[:self.__SCREEN_COLS__ - column - 1]) for column, text in lines]
@@ -0,0 +1,220 @@
+#### Profiler ####
+# Times the phases of the trader loop (ticker fetch, candle refresh, args build, policy decision, state check, order
+# submission, status publish and sleep) when Bitbot is started with --profile, and can run cProfile over the first
+# few ticks. A report of where the time of a tick goes is written when Bitbot shuts down.
+#
+# Timing a phase costs two perf_counter calls. Without --profile the trader uses the NullProfiler whose phases do
+# nothing.
+#
+# Every start is also timed by a StartupTimer, from the first line of Bitbot.py to the end of the first tick, and the
+# time of each step (imports, configuration, exchange client, ..., first tick) is logged, published on the status bus
+# and kept in the bitbot_startup_seconds gauge.
+
+import time, threading, datetime, os
+
+class PhaseTimer(object):
+    """Context manager adding the time spent in a block to a phase of a Profiler."""
+
+    def __init__(self, profiler, name):
+        self.__profiler__ = profiler
+        self.__phase__ = name
+
+    def __enter__(self):
+        self.__start__ = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.__profiler__.record(self.__phase__, time.perf_counter() - self.__start__)
+        return False
+
+class Profiler(object):
+
+    # Phase reported as the sleep between ticks
+    SLEEP_PHASE = 'sleep'
+
+#   __init__
+#       - Parameters:
+#           * (profileTicks) The number of ticks cProfile runs for (0 only times the phases)
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, profileTicks=0):
+        self.__lock__ = threading.Lock()
+        self.__phases__ = {}            # name -> [count, total seconds, longest seconds]
+        self.__order__ = []             # phase names in the order they were first seen
+        self.__ticks__ = 0
+        self.__tick_time__ = 0.0
+        self.__longest_tick__ = 0.0
+        self.__tick_start__ = None
+        self.__tick_sleep__ = 0.0       # seconds slept during the current tick, which do not count as tick time
+        self.__profile_ticks__ = int(profileTicks)
+        self.__profiled_ticks__ = 0
+        self.__cprofile__ = None
+        if self.__profile_ticks__ > 0:
+            import cProfile
+            self.__cprofile__ = cProfile.Profile()
+        self.__profiling__ = False
+        self.__started__ = datetime.datetime.now()
+
+#   phase
+#       - Purpose:
+#           Time a phase:  with profiler.phase('ticker fetch'): ...
+    def phase(self, name):
+        return PhaseTimer(self, name)
+
+#   record
+#       - Purpose:
+#           Add the seconds spent in a phase.
+    def record(self, name, seconds):
+        with self.__lock__:
+            entry = self.__phases__.get(name)
+            if entry is None:
+                entry = self.__phases__[name] = [0, 0.0, 0.0]
+                self.__order__.append(name)
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+            if name == self.SLEEP_PHASE and self.__tick_start__ is not None:
+                self.__tick_sleep__ += seconds
+
+#   startTick / endTick
+#       - Purpose:
+#           Mark the start and end of a tick (the work of one loop iteration). Time spent in the sleep phase
+#           during a tick is not counted as tick time. cProfile runs between them for the first profileTicks ticks.
+#           Both must be called from the trader thread.
+    def startTick(self):
+        self.__tick_start__ = time.perf_counter()
+        self.__tick_sleep__ = 0.0
+        if self.__cprofile__ is not None and self.__profiled_ticks__ < self.__profile_ticks__:
+            self.__cprofile__.enable()
+            self.__profiling__ = True
+
+    def endTick(self):
+        if self.__profiling__:
+            self.__cprofile__.disable()
+            self.__profiling__ = False
+            self.__profiled_ticks__ += 1
+        if self.__tick_start__ is None:
+            return
+        seconds = time.perf_counter() - self.__tick_start__ - self.__tick_sleep__
+        self.__tick_start__ = None
+        with self.__lock__:
+            self.__ticks__ += 1
+            self.__tick_time__ += seconds
+            self.__longest_tick__ = max(self.__longest_tick__, seconds)
+
+#   getReport
+#       - Returns:
+#           (str) A table of the count, total, mean and longest time of every phase and its' share of the tick time,
+#           followed by the cProfile statistics if cProfile ran.
+    def getReport(self, limit=40):
+        with self.__lock__:
+            phases = [(name, list(self.__phases__[name])) for name in self.__order__]
+            ticks, tickTime, longestTick = self.__ticks__, self.__tick_time__, self.__longest_tick__
+
+        lines = ["Bitbot profile (%s - %s)" % (self.__started__.replace(microsecond=0), datetime.datetime.now().replace(microsecond=0)),
+                 "Ticks: %d   Mean tick: %.3f ms   Longest tick: %.3f ms" % (ticks, (tickTime / ticks * 1000.0) if ticks else 0.0, longestTick * 1000.0),
+                 "",
+                 "{:<20} {:>8} {:>12} {:>12} {:>12} {:>8}".format('Phase', 'Count', 'Total (s)', 'Mean (ms)', 'Max (ms)', '% tick')]
+        for name, (count, total, longest) in phases:
+            share = '' if name == self.SLEEP_PHASE or tickTime == 0 else '%.1f' % (total / tickTime * 100.0)
+            lines.append("{:<20} {:>8d} {:>12.3f} {:>12.3f} {:>12.3f} {:>8}".format(name, count, total, total / count * 1000.0,
+                                                                                 longest * 1000.0, share))
+
+        if self.__cprofile__ is not None and self.__profiled_ticks__ > 0:
+            import io, pstats
+            stream = io.StringIO()
+            stats = pstats.Stats(self.__cprofile__, stream=stream)
+            stats.sort_stats('cumulative').print_stats(limit)
+            lines.extend(["", "cProfile of the first %d ticks:" % (self.__profiled_ticks__), stream.getvalue()])
+        return '\n'.join(lines) + '\n'
+
+#   writeReport
+#       - Purpose:
+#           Write the report to a file, creating its' directory if needed.
+    def writeReport(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(self.getReport())
+
+class NullPhase(object):
+    """A phase which is not timed."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+class NullProfiler(object):
+    """Stands in for the Profiler when Bitbot is not profiling. Nothing is timed."""
+
+    __null_phase__ = NullPhase()
+
+    def phase(self, name):
+        return self.__null_phase__
+
+    def record(self, name, seconds):
+        pass
+
+    def startTick(self):
+        pass
+
+    def endTick(self):
+        pass
+
+class StartupTimer(object):
+    """Times the steps of Bitbot's startup. Each mark ends the step started by the previous one."""
+
+    def __init__(self, startTime=None):
+        self.__lock__ = threading.Lock()
+        self.__start__ = startTime if startTime is not None else time.perf_counter()
+        self.__last__ = self.__start__
+        self.__steps__ = []             # (name, seconds) in the order they ended
+        self.__finished__ = False
+
+    def mark(self, name):
+        with self.__lock__:
+            if self.__finished__:
+                return
+            now = time.perf_counter()
+            self.__steps__.append((name, now - self.__last__))
+            self.__last__ = now
+
+#   finish
+#       - Purpose:
+#           End the last step of the startup. Later marks are ignored.
+#       - Returns:
+#           (bool) True the first time, so the caller reporting the startup does so once.
+    def finish(self, name):
+        self.mark(name)
+        with self.__lock__:
+            if self.__finished__:
+                return False
+            self.__finished__ = True
+            return True
+
+    def getSteps(self):
+        with self.__lock__:
+            return list(self.__steps__)
+
+    def getTotal(self):
+        with self.__lock__:
+            return self.__last__ - self.__start__
+
+#   getReport
+#       - Returns:
+#           (str) The total startup time followed by the time of every step.
+    def getReport(self):
+        return "Started in %.3f s (%s)" % (self.getTotal(), ', '.join('%s %.3f s' % (name, seconds) for name, seconds in self.getSteps()))
+
+class NullStartupTimer(object):
+    """Stands in for the StartupTimer when the trader is not started by Bitbot.py. Nothing is timed."""
+
+    def mark(self, name):
+        pass
+
+    def finish(self, name):
+        return False
@@ -0,0 +1,294 @@
+#### RequestScheduler ####
+# This class sits in front of the poloniex client and decides when each request may be sent:
+#
+#   - A token bucket keeps the requests within a budget of requests per second (Poloniex allows about 6) with a
+#     small burst allowance.
+#   - Orders (buy, sell, cancelOrder, moveOrder) have a priority lane. Market data requests wait while an order is
+#     waiting and may not use the last reserved tokens of the bucket, so an order never queues behind a burst of
+#     ticker or candlestick refreshes.
+#   - Identical market data reads that are already in flight are coalesced: a caller asking for the same command
+#     with the same parameters waits for the request that was already sent and gets the same response (which must
+#     not be modified). Reads of the account (balances, open orders, order status) are never coalesced, as a read
+#     sent before the caller's own order was placed would answer without it.
+#   - When the exchange answers that the rate limit was exceeded, the bucket is emptied and nothing is sent for a
+#     cool down period.
+#
+# The requests are sent by the callers' own threads (call) or coroutines (callAsync); the scheduler only holds
+# them back until they may go. asyncio is imported by the coroutines, so the threaded trader never loads it.
+
+import threading, time
+from concurrent.futures import Future
+from lib import Bitbot_CDO
+from lib import Metrics
+from lib.HttpTransport import TransportError
+
+class RequestScheduler(object):
+
+    # Lanes
+    ORDER_LANE = 0
+    DATA_LANE = 1
+
+    # Commands placing or removing orders, sent on the priority lane and never coalesced
+    ORDER_COMMANDS = ('buy', 'sell', 'cancelOrder', 'moveOrder')
+
+    # Public market data commands which can share an in-flight response
+    READ_COMMANDS = ('returnTicker', 'return24Volume', 'returnOrderBook', 'returnMarketTradeHistory', 'returnChartData')
+
+#   __init__
+#       - Parameters:
+#           * (requestsPerSecond) The sustained request budget
+#           * (burst) The most requests that can be sent at once after a quiet period
+#           * (reservedOrderTokens) Tokens of the bucket only orders may use
+#           * (rateLimitCooldown) Seconds nothing is sent after the exchange reports the rate limit was exceeded
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, requestsPerSecond=6.0, burst=6, reservedOrderTokens=1, rateLimitCooldown=1.0):
+        self.__rate__ = float(requestsPerSecond)
+        self.__burst__ = max(float(burst), 1.0)
+        self.__reserved__ = min(float(reservedOrderTokens), self.__burst__ - 1.0)
+        self.__cooldown__ = float(rateLimitCooldown)
+        self.__tokens__ = self.__burst__
+        self.__last_refill__ = time.monotonic()
+        self.__paused_until__ = 0.0
+        self.__orders_waiting__ = 0
+        self.__lock__ = threading.Lock()
+        self.__in_flight__ = {}         # coalescing key -> Future of the request already sent by a thread
+        self.__in_flight_async__ = {}   # coalescing key -> asyncio Future of the request already sent by a coroutine
+        self.__stats__ = {'order_requests' : 0, 'data_requests' : 0, 'coalesced' : 0, 'rate_limited' : 0,
+                          'order_wait' : 0.0, 'data_wait' : 0.0}
+
+#   call
+#       - Purpose:
+#           Send a request from a thread once the scheduler allows it, or share the response of an identical read
+#           already in flight.
+#       - Parameters:
+#           * (command) The API command
+#           * (req) The command parameters
+#           * (send) A function sending the request and returning the decoded response
+#       - Returns:
+#           The decoded response.
+    def call(self, command, req, send):
+        key = self.__getKey__(command, req)
+        if key is None:
+            return self.__send__(command, send)
+
+        with self.__lock__:
+            future = self.__in_flight__.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__in_flight__[key] = future
+            else:
+                self.__stats__['coalesced'] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            response = self.__send__(command, send)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.__lock__:
+                del self.__in_flight__[key]
+
+#   callAsync
+#       - Purpose:
+#           The coroutine version of call for the asyncio client.
+#       - Parameters:
+#           * (send) A function returning a coroutine which sends the request and returns the decoded response
+    async def callAsync(self, command, req, send):
+        import asyncio
+        key = self.__getKey__(command, req)
+        if key is None:
+            return await self.__sendAsync__(command, send)
+
+        future = self.__in_flight_async__.get(key)
+        if future is not None:
+            with self.__lock__:
+                self.__stats__['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.__in_flight_async__[key] = future
+        try:
+            response = await self.__sendAsync__(command, send)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting on the future, which is fine
+            future.exception()
+            raise
+        finally:
+            del self.__in_flight_async__[key]
+
+#   getStats
+#       - Returns:
+#           A dictionary of the requests sent per lane, the responses shared by coalescing, the number of rate
+#           limit responses and the total seconds requests waited per lane.
+    def getStats(self):
+        with self.__lock__:
+            return dict(self.__stats__)
+
+#   getMetricSamples
+#       - Purpose:
+#           The metrics collector of the scheduler (see Metrics.MetricsRegistry.addCollector).
+#       - Returns:
+#           A list of (name, kind, labels, value) samples of the statistics, the orders waiting for a token and the
+#           reads in flight.
+    def getMetricSamples(self):
+        with self.__lock__:
+            stats = dict(self.__stats__)
+            ordersWaiting = self.__orders_waiting__
+            inFlight = len(self.__in_flight__) + len(self.__in_flight_async__)
+        return [('bitbot_scheduler_requests_total', 'counter', {'lane' : 'order'}, stats['order_requests']),
+                ('bitbot_scheduler_requests_total', 'counter', {'lane' : 'data'}, stats['data_requests']),
+                ('bitbot_scheduler_wait_seconds_total', 'counter', {'lane' : 'order'}, stats['order_wait']),
+                ('bitbot_scheduler_wait_seconds_total', 'counter', {'lane' : 'data'}, stats['data_wait']),
+                ('bitbot_scheduler_coalesced_total', 'counter', {}, stats['coalesced']),
+                ('bitbot_scheduler_rate_limited_total', 'counter', {}, stats['rate_limited']),
+                ('bitbot_scheduler_orders_waiting', 'gauge', {}, ordersWaiting),
+                ('bitbot_scheduler_reads_in_flight', 'gauge', {}, inFlight)]
+
+    def __send__(self, command, send):
+        lane = self.ORDER_LANE if command in self.ORDER_COMMANDS else self.DATA_LANE
+        waited = self.__acquire__(lane)
+        self.__count__(lane, waited)
+        try:
+            response = send()
+        except TransportError as e:
+            self.__checkError__(e)
+            raise
+        self.__checkResponse__(response)
+        return response
+
+    async def __sendAsync__(self, command, send):
+        import asyncio
+        lane = self.ORDER_LANE if command in self.ORDER_COMMANDS else self.DATA_LANE
+        start = time.monotonic()
+        if lane == self.ORDER_LANE:
+            with self.__lock__:
+                self.__orders_waiting__ += 1
+        try:
+            delay = self.__tryAcquire__(lane)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self.__tryAcquire__(lane)
+        finally:
+            if lane == self.ORDER_LANE:
+                with self.__lock__:
+                    self.__orders_waiting__ -= 1
+        self.__count__(lane, time.monotonic() - start)
+
+        try:
+            response = await send()
+        except TransportError as e:
+            self.__checkError__(e)
+            raise
+        self.__checkResponse__(response)
+        return response
+
+#   __acquire__
+#       - Purpose:
+#           Block the calling thread until its' lane may send a request.
+#       - Returns:
+#           (float) The seconds waited.
+    def __acquire__(self, lane):
+        start = time.monotonic()
+        if lane == self.ORDER_LANE:
+            with self.__lock__:
+                self.__orders_waiting__ += 1
+        try:
+            delay = self.__tryAcquire__(lane)
+            while delay > 0:
+                time.sleep(delay)
+                delay = self.__tryAcquire__(lane)
+        finally:
+            if lane == self.ORDER_LANE:
+                with self.__lock__:
+                    self.__orders_waiting__ -= 1
+        return time.monotonic() - start
+
+#   __tryAcquire__
+#       - Purpose:
+#           Take a token for a request if the lane may use one now.
+#       - Returns:
+#           (float) 0 if a token was taken, otherwise the seconds to wait before trying again.
+    def __tryAcquire__(self, lane):
+        with self.__lock__:
+            now = time.monotonic()
+            self.__tokens__ = min(self.__burst__, self.__tokens__ + (now - self.__last_refill__) * self.__rate__)
+            self.__last_refill__ = now
+            if now < self.__paused_until__:
+                return self.__paused_until__ - now
+
+            if lane == self.ORDER_LANE:
+                needed = 1.0
+            elif self.__orders_waiting__ > 0:
+                return 1.0 / self.__rate__
+            else:
+                needed = 1.0 + self.__reserved__
+
+            if self.__tokens__ >= needed:
+                self.__tokens__ -= 1.0
+                return 0.0
+            return (needed - self.__tokens__) / self.__rate__
+
+#   __checkError__ / __checkResponse__
+#       - Purpose:
+#           Pause the requests if the exchange answered that the rate limit was exceeded (HTTP 429 or an error
+#           message in the response).
+    def __checkError__(self, error):
+        if error.status == 429:
+            self.__penalize__()
+
+    def __checkResponse__(self, response):
+        if isinstance(response, dict) and 'Please do not make more than' in str(response.get('error', '')):
+            self.__penalize__()
+
+#   __penalize__
+#       - Purpose:
+#           Empty the bucket and send nothing for the cool down period after the exchange reported the rate limit
+#           was exceeded.
+    def __penalize__(self):
+        with self.__lock__:
+            self.__tokens__ = 0.0
+            self.__paused_until__ = time.monotonic() + self.__cooldown__
+            self.__stats__['rate_limited'] += 1
+
+    def __count__(self, lane, waited):
+        with self.__lock__:
+            if lane == self.ORDER_LANE:
+                self.__stats__['order_requests'] += 1
+                self.__stats__['order_wait'] += waited
+            else:
+                self.__stats__['data_requests'] += 1
+                self.__stats__['data_wait'] += waited
+
+#   __getKey__
+#       - Returns:
+#           The key identifying identical reads, or None if the command must not be coalesced.
+    def __getKey__(self, command, req):
+        if command not in self.READ_COMMANDS:
+            return None
+        return (command, tuple(sorted((name, str(value)) for name, value in (req or {}).items())))
+
+# createRequestScheduler
+#   - Purpose:
+#       Build a RequestScheduler from the request_rate_limit, request_burst, request_reserved_order_tokens and
+#       request_rate_limit_cooldown configurations.
+#   - Returns:
+#       A RequestScheduler, or None if request_rate_limit is 0. Its' statistics are added to the metrics.
+def createRequestScheduler():
+    requestsPerSecond = float(getattr(Bitbot_CDO, 'request_rate_limit', 6.0))
+    if requestsPerSecond <= 0:
+        return None
+    scheduler = RequestScheduler(requestsPerSecond,
+                                 float(getattr(Bitbot_CDO, 'request_burst', 6)),
+                                 float(getattr(Bitbot_CDO, 'request_reserved_order_tokens', 1)),
+                                 float(getattr(Bitbot_CDO, 'request_rate_limit_cooldown', 1.0)))
+    Metrics.registry.addCollector(scheduler.getMetricSamples)
+    return scheduler
@@ -0,0 +1,118 @@
+#### RollingBollinger ####
+# This class calculates the SMA and Bollinger bands of a price series incrementally. The last n closing prices are
+# kept by a RollingStats (see Indicators) along with a running sum and sum of squares so adding a candle only costs the
+# removal of the oldest price and the addition of the newest one. The results are the same as
+#
+#       sma = pd.DataFrame(closes).rolling(window=n).mean()
+#       std = pd.DataFrame(closes).rolling(window=n).std()
+#       upperband = sma + (std * 2)
+#       lowerband = sma - (std * 2)
+#
+# but only the most recent band values are kept (see bandHistory).
+
+import collections
+from lib.Indicators import Indicator, RollingStats
+
+class RollingBollinger(Indicator):
+
+#   __init__
+#       - Parameters:
+#           * (period) An int dictating the size of the rolling window.
+#           * (bandHistory) How many of the most recent band values to keep.
+#           * (multiplier) The number of standard deviations between the SMA and each band.
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, period, bandHistory=2, multiplier=2.0):
+        Indicator.__init__(self)
+        self.__period__ = int(period)
+        self.__multiplier__ = float(multiplier)
+        self.__stats__ = RollingStats(self.__period__)
+        self.__sma__ = collections.deque(maxlen=bandHistory)
+        self.__upperband__ = collections.deque(maxlen=bandHistory)
+        self.__lowerband__ = collections.deque(maxlen=bandHistory)
+        self.__bands__ = None           # Cached result of getBands()
+
+#   update
+#       - Purpose:
+#           Bring the bands up to date with a list of closing prices. If the list and last candle date have not
+#           changed since the previous call the cached bands are returned. If the candles moved forward only the
+#           new candles are added. Anything else (first call, gap larger than the list, unknown dates) rebuilds
+#           the window from the list.
+#       - Parameters:
+#           * (closes) A list of closing prices (or a CandleSeries) ordered by date. The last one may belong to a
+#                      candle that is still forming, so it is replaced when the same candle is seen again.
+#           * (lastDate) UNIX timestamp of the last candle in closes, or None if unknown.
+#           * (candlePeriod) The candlestick period in seconds.
+#       - Returns:
+#           A dictionary of sma and Bollinger bands (see getBands).
+    def update(self, closes, lastDate=None, candlePeriod=None):
+        return Indicator.update(self, closes, lastDate, candlePeriod)
+
+#   reset
+#       - Purpose:
+#           Discard the window and the bands before they are recalculated from a list of closing prices.
+    def reset(self, inputs=()):
+        Indicator.reset(self, inputs)
+        self.__stats__.reset(inputs)
+        self.__sma__.clear()
+        self.__upperband__.clear()
+        self.__lowerband__.clear()
+        self.__bands__ = None
+
+#   append
+#       - Purpose:
+#           Add a closing price to the window in constant time, dropping the oldest one if the window is full.
+#       - Parameters:
+#           * (close) The closing price of the new candle.
+    def append(self, close):
+        self.__stats__.append(close)
+        self.__count__ += 1
+        if self.__stats__.isReady():
+            sma, upperband, lowerband = self.__calculate__()
+            self.__sma__.append(sma)
+            self.__upperband__.append(upperband)
+            self.__lowerband__.append(lowerband)
+        self.__bands__ = None
+
+#   replaceLast
+#       - Purpose:
+#           Change the closing price of the newest candle in constant time.
+#       - Parameters:
+#           * (close) The new closing price.
+    def replaceLast(self, close):
+        if self.__stats__.getSize() == 0:
+            self.append(close)
+            return
+        if not self.__stats__.replaceLast(close):
+            return
+
+        if self.__stats__.isReady():
+            sma, upperband, lowerband = self.__calculate__()
+            self.__sma__[-1] = sma
+            self.__upperband__[-1] = upperband
+            self.__lowerband__[-1] = lowerband
+        self.__bands__ = None
+
+#   getBands
+#       - Purpose:
+#           Return the most recent SMA and band values.
+#       - Returns:
+#           A dictionary of sma and Bollinger bands in the same format as BollingerPolicy.__getBollingerBands__
+#           except only the last values are included.
+    def getBands(self):
+        if self.__bands__ is None:
+            self.__bands__ = {'sma' : list(self.__sma__),
+                              'upperband' : list(self.__upperband__),
+                              'lowerband' : list(self.__lowerband__)}
+        return self.__bands__
+
+    def getValue(self):
+        return self.getBands()
+
+#   __calculate__
+#       - Returns:
+#           A tuple of (sma, upperband, lowerband) for the current full window.
+    def __calculate__(self):
+        sma = self.__stats__.getMean()
+        std = self.__stats__.getStd()
+        return (sma, sma + std * self.__multiplier__, sma - std * self.__multiplier__)
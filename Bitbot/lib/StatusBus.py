@@ -0,0 +1,114 @@
+#### StatusBus ####
+# This class holds the status the threads want shown (account balance, pair status, errors, ...) as (key, value)
+# entries. Publishing only replaces the value of the key under a short lock so a publisher never waits on a reader,
+# and a key published many times before anyone reads it costs nothing more than the last value.
+#
+# Readers either take a snapshot of every entry or subscribe. A subscription remembers which keys changed or were
+# removed since it last looked, so several readers (the curses printer, a headless sink, metrics) can follow the same
+# status at their own pace.
+
+import threading, collections
+
+class StatusBus(object):
+
+#   __init__
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self):
+        self.__condition__ = threading.Condition()
+        self.__entries__ = collections.OrderedDict()     # key -> last published value, in the order first published
+        self.__subscriptions__ = []
+
+#   publish
+#       - Purpose:
+#           Set the value of a key. Replaces any value not yet read by the subscribers. Publishing the value the key
+#           already has does not wake the subscribers.
+#       - Parameters:
+#           * (key) The name of the entry
+#           * (value) The value to show. It must not be modified after it is published.
+    def publish(self, key, value):
+        with self.__condition__:
+            if key in self.__entries__ and self.__entries__[key] == value:
+                return
+            self.__entries__[key] = value
+            for subscription in self.__subscriptions__:
+                subscription.__dirty__.add(key)
+            self.__condition__.notify_all()
+
+#   remove
+#       - Purpose:
+#           Remove a key. Removing a key which is not present does nothing.
+    def remove(self, key):
+        with self.__condition__:
+            if self.__entries__.pop(key, None) is None:
+                return
+            for subscription in self.__subscriptions__:
+                subscription.__dirty__.add(key)
+            self.__condition__.notify_all()
+
+#   snapshot
+#       - Returns:
+#           A copy of every entry as an OrderedDict.
+    def snapshot(self):
+        with self.__condition__:
+            return collections.OrderedDict(self.__entries__)
+
+#   get
+#       - Returns:
+#           The value of a key or the default if it is not present.
+    def get(self, key, default=None):
+        with self.__condition__:
+            return self.__entries__.get(key, default)
+
+#   subscribe
+#       - Purpose:
+#           Start following the changes of the bus. Every entry already present counts as changed.
+#       - Returns:
+#           A Subscription.
+    def subscribe(self):
+        with self.__condition__:
+            subscription = Subscription(self)
+            subscription.__dirty__.update(self.__entries__.keys())
+            self.__subscriptions__.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self.__condition__:
+            if subscription in self.__subscriptions__:
+                self.__subscriptions__.remove(subscription)
+            self.__condition__.notify_all()
+
+#   __collect__
+#       - Purpose:
+#           Wait until a subscription has changes or the timeout passes and hand them over.
+#       - Returns:
+#           A tuple of (updates, removals) where updates is an OrderedDict of the changed entries (in bus order) and
+#           removals is a list of the removed keys.
+    def __collect__(self, subscription, timeout):
+        with self.__condition__:
+            if not subscription.__dirty__ and timeout != 0:
+                self.__condition__.wait_for(lambda: subscription.__dirty__ or subscription not in self.__subscriptions__,
+                                            timeout)
+            dirty = subscription.__dirty__
+            subscription.__dirty__ = set()
+            updates = collections.OrderedDict((key, value) for key, value in self.__entries__.items() if key in dirty)
+            removals = [key for key in dirty if key not in self.__entries__]
+            return (updates, removals)
+
+class Subscription(object):
+    """The changes of a StatusBus not yet read by one reader."""
+
+    def __init__(self, bus):
+        self.__bus__ = bus
+        self.__dirty__ = set()      # keys changed or removed since the last wait, guarded by the bus
+
+#   wait
+#       - Purpose:
+#           Block until a key changes or the timeout passes (a timeout of 0 does not block).
+#       - Returns:
+#           A tuple of (updates, removals), both empty on timeout.
+    def wait(self, timeout=None):
+        return self.__bus__.__collect__(self, timeout)
+
+    def close(self):
+        self.__bus__.unsubscribe(self)
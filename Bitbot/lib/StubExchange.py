@@ -0,0 +1,694 @@
+#### StubExchange ####
+# A local stand-in for the Poloniex API so the poloniex client and the trader threads can be run and benchmarked
+# without the real exchange or a network connection. It implements the public commands (returnTicker,
+# returnChartData, returnOrderBook) and the trading API commands the bot uses (returnBalances, returnOpenOrders,
+# returnCompleteBalances, returnOrderStatus, returnOrderTrades, buy, sell, cancelOrder), checks the HMAC signature and nonce of every signed request the
+# way Poloniex does, and can add latency and errors to the responses.
+#
+# Market data is synthetic unless a fixtures file is given. The synthetic data is generated from a seed so every run
+# is the same: the ticker of each pair follows a random walk that moves one step per returnTicker request (or per
+# call to StubMarket.step) and every candle is a function of its' pair and date. A fixtures file (see
+# recordFixtures) holds a recorded ticker, balances and candles which are served instead.
+#
+# Run it as a server from the Bitbot directory and set api_url=http://127.0.0.1:8080 in bitbot.config:
+#
+#   python3 -m lib.StubExchange --port 8080 --latency 0.05 --jitter 0.02 --error-rate 0.01
+#
+# or serve a StubMarket in process with LoopbackTransport (no sockets at all). With --feed-port the ticker is also
+# published on a local copy of the push API (set enable_push_feed=True and push_feed_url=ws://127.0.0.1:8081).
+
+import json, time, math, random, threading, hmac, hashlib, zlib, argparse, socket
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from lib.HttpTransport import TransportError
+from lib import WebSocket
+from lib.Amounts import roundAmount, getTradeTotal, getProceeds
+
+class StubMarket(object):
+
+    # Synthetic pairs and their starting prices in BTC
+    __DEFAULT_PRICES__ = {'BTC_XRP' : 0.00008, 'BTC_ETH' : 0.032, 'BTC_LTC' : 0.0095, 'BTC_XMR' : 0.0165,
+                          'BTC_DASH' : 0.0185, 'BTC_STR' : 0.000035, 'BTC_DOGE' : 0.0000004, 'BTC_BCH' : 0.075}
+
+#   __init__
+#       - Parameters:
+#           * (apiKey) The API key signed requests must carry
+#           * (apiSecret) The secret signed requests must be signed with
+#           * (fixtures) Path of a fixtures file written by recordFixtures or None for synthetic data
+#           * (seed) Seed of the synthetic data and of the injected latency/errors
+#           * (latency) Seconds added to every response
+#           * (jitter) Up to this many seconds are randomly added on top of the latency
+#           * (errorRate) Fraction of requests answered with errorStatus instead of their result
+#           * (errorStatus) The HTTP status of injected errors (i.e. 503, 429)
+#           * (fee) The trading fee taken from filled orders as a fraction
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, apiKey='API_KEY', apiSecret='API_SECRET', fixtures=None, seed=0, latency=0.0, jitter=0.0,
+                 errorRate=0.0, errorStatus=503, fee=0.002):
+        self.__api_key__ = apiKey
+        self.__api_secret__ = str(apiSecret).encode('utf-8')
+        self.__seed__ = int(seed)
+        self.__latency__ = float(latency)
+        self.__jitter__ = float(jitter)
+        self.__error_rate__ = float(errorRate)
+        self.__error_status__ = int(errorStatus)
+        self.__fee__ = float(fee)
+        self.__random__ = random.Random(self.__seed__)
+        self.__lock__ = threading.Lock()
+        self.__last_nonce__ = 0
+        self.__order_number__ = 100000
+        self.__trade_id__ = 1
+        self.__seq__ = 1                # Sequence number of the order books, increased by every step
+        self.__open_orders__ = {}       # currency pair -> list of open order dictionaries
+        self.__order_trades__ = {}      # order number -> list of the trades of the order
+        self.__chart_data__ = {}        # (currency pair, period) -> list of recorded candles
+        self.__request_count__ = {}     # command -> number of requests served
+
+        if fixtures is not None:
+            with open(fixtures, 'r') as f:
+                data = json.load(f)
+            self.__ticker__ = data['ticker']
+            self.__balances__ = dict((coin, float(amount)) for coin, amount in data.get('balances', {'BTC' : 1.0}).items())
+            for currencyPair, periods in data.get('chartData', {}).items():
+                for period, candles in periods.items():
+                    self.__chart_data__[(currencyPair, int(period))] = candles
+        else:
+            self.__ticker__ = {}
+            for pairId, (currencyPair, price) in enumerate(sorted(self.__DEFAULT_PRICES__.items()), 1):
+                self.__ticker__[currencyPair] = self.__makeTickerRow__(pairId, price, price)
+            self.__balances__ = {'BTC' : 1.0}
+
+        for currencyPair in self.__ticker__:
+            self.__balances__.setdefault(currencyPair.split('_')[1], 0.0)
+            self.__open_orders__[currencyPair] = []
+        self.__balances__.setdefault('BTC', 0.0)
+
+    def getTicker(self):
+        with self.__lock__:
+            return json.loads(json.dumps(self.__ticker__))
+
+    def getRequestCount(self, command=None):
+        with self.__lock__:
+            if command is None:
+                return sum(self.__request_count__.values())
+            return self.__request_count__.get(command, 0)
+
+#   setBalance
+#       - Purpose:
+#           Set the available balance of a currency (i.e. to start a test in the sell phase).
+    def setBalance(self, currency, amount):
+        with self.__lock__:
+            self.__balances__[currency] = float(amount)
+
+#   step
+#       - Purpose:
+#           Move the price of every pair one step along its' random walk and fill the open orders the new price
+#           crosses.
+#       - Returns:
+#           A list of the currency pairs whose price changed.
+    def step(self):
+        with self.__lock__:
+            return self.__step__()
+
+#   handle
+#       - Purpose:
+#           Answer one HTTP request the way Poloniex would.
+#       - Parameters:
+#           * (method) 'GET' or 'POST'
+#           * (path) The path and query string (i.e. /public?command=returnTicker)
+#           * (body) The request body as bytes or None
+#           * (headers) A dictionary of request headers
+#       - Returns:
+#           A tuple of (status, body) where body is bytes.
+    def handle(self, method, path, body=None, headers=None):
+        delay = self.__latency__
+        with self.__lock__:
+            if self.__jitter__ > 0:
+                delay += self.__random__.uniform(0, self.__jitter__)
+            injectError = self.__error_rate__ > 0 and self.__random__.random() < self.__error_rate__
+        if delay > 0:
+            time.sleep(delay)
+        if injectError:
+            return (self.__error_status__, b'{"error":"Injected error."}')
+
+        url = urlsplit(path)
+        try:
+            if method == 'GET' and url.path.endswith('/public'):
+                query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+                status, result = self.__handlePublic__(query)
+            elif method == 'POST' and url.path.endswith('/tradingApi'):
+                status, result = self.__handlePrivate__(body or b'', dict((key.lower(), value) for key, value in (headers or {}).items()))
+            else:
+                status, result = (404, {'error' : 'Invalid path.'})
+        except (KeyError, ValueError) as e:
+            status, result = (200, {'error' : 'Invalid parameters: %s' % (str(e))})
+
+        # The ticker may be stepped by another request while it is encoded
+        with self.__lock__:
+            return (status, json.dumps(result).encode('utf-8'))
+
+#   __handlePublic__
+#       - Returns:
+#           A tuple of (status, result).
+    def __handlePublic__(self, query):
+        command = query.get('command')
+        with self.__lock__:
+            self.__request_count__[command] = self.__request_count__.get(command, 0) + 1
+            if command == 'returnTicker':
+                self.__step__()
+                return (200, self.__ticker__)
+            elif command == 'returnChartData':
+                currencyPair = query['currencyPair']
+                if currencyPair not in self.__ticker__:
+                    return (200, {'error' : 'Invalid currency pair.'})
+                return (200, self.__getChartData__(currencyPair, int(query['period']), int(query['start']), int(query['end'])))
+            elif command == 'returnOrderBook':
+                currencyPair = query['currencyPair']
+                if currencyPair not in self.__ticker__:
+                    return (200, {'error' : 'Invalid currency pair.'})
+                return (200, self.__getOrderBook__(currencyPair, int(query.get('depth', 50))))
+        return (200, {'error' : 'Invalid command.'})
+
+#   __handlePrivate__
+#       - Purpose:
+#           Check the key, signature and nonce of a trading API request and run its' command.
+#       - Returns:
+#           A tuple of (status, result).
+    def __handlePrivate__(self, body, headers):
+        if headers.get('key') != self.__api_key__:
+            return (403, {'error' : 'Invalid API key/secret pair.'})
+        sign = hmac.new(self.__api_secret__, body, hashlib.sha512).hexdigest()
+        if not hmac.compare_digest(sign, headers.get('sign', '')):
+            return (403, {'error' : 'Invalid API key/secret pair.'})
+
+        req = dict((key, values[0]) for key, values in parse_qs(body.decode('utf-8')).items())
+        command = req.get('command')
+        with self.__lock__:
+            self.__request_count__[command] = self.__request_count__.get(command, 0) + 1
+            nonce = int(req.get('nonce', 0))
+            if nonce <= self.__last_nonce__:
+                return (200, {'error' : 'Nonce must be greater than %d. You provided %d.' % (self.__last_nonce__, nonce)})
+            self.__last_nonce__ = nonce
+
+            if command == 'returnBalances':
+                return (200, dict((coin, '%.8f' % (amount)) for coin, amount in self.__balances__.items()))
+            elif command == 'returnCompleteBalances':
+                return (200, self.__getCompleteBalances__())
+            elif command == 'returnOpenOrders':
+                if req['currencyPair'] == 'all':
+                    return (200, dict((pair, [self.__formatOrder__(order) for order in orders]) for pair, orders in self.__open_orders__.items()))
+                return (200, [self.__formatOrder__(order) for order in self.__open_orders__.get(req['currencyPair'], [])])
+            elif command == 'returnOrderStatus':
+                return (200, self.__getOrderStatus__(str(req['orderNumber'])))
+            elif command == 'returnOrderTrades':
+                trades = self.__order_trades__.get(str(req['orderNumber']))
+                if not trades:
+                    return (200, {'error' : 'Order not found, or you are not the person who placed it.'})
+                return (200, trades)
+            elif command in ('buy', 'sell'):
+                return (200, self.__placeOrder__(command, req))
+            elif command == 'cancelOrder':
+                return (200, self.__cancelOrder__(req))
+        return (200, {'error' : 'Invalid command.'})
+
+#   __placeOrder__
+#       - Purpose:
+#           Place a buy or sell order. The order fills straight away if its' rate crosses the last price, otherwise
+#           it waits on the book (or is canceled if it is immediate-or-cancel).
+#       - Returns:
+#           The order receipt in the Poloniex format.
+    def __placeOrder__(self, orderType, req):
+        currencyPair = req['currencyPair']
+        if currencyPair not in self.__ticker__:
+            return {'error' : 'Invalid currency pair.'}
+        rate = float(req['rate'])
+        amount = float(req['amount'])
+        if rate <= 0 or amount <= 0:
+            return {'error' : 'Total must be at least 0.0001.'}
+
+        principalCurrency, subjectCurrency = currencyPair.split('_')
+        if orderType == 'buy' and self.__balances__[principalCurrency] < getTradeTotal(rate, amount) - 1e-12:
+            return {'error' : 'Not enough %s.' % (principalCurrency)}
+        if orderType == 'sell' and self.__balances__[subjectCurrency] < amount - 1e-12:
+            return {'error' : 'Not enough %s.' % (subjectCurrency)}
+
+        self.__order_number__ += 1
+        order = {'orderNumber' : str(self.__order_number__), 'type' : orderType, 'currencyPair' : currencyPair,
+                 'rate' : rate, 'amount' : amount, 'date' : time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())}
+        last = float(self.__ticker__[currencyPair]['last'])
+        if (orderType == 'buy' and rate >= last) or (orderType == 'sell' and rate <= last):
+            trade = self.__fill__(order)
+            return {'orderNumber' : order['orderNumber'], 'resultingTrades' : [trade]}
+        if req.get('immediateOrCancel') == '1':
+            return {'orderNumber' : order['orderNumber'], 'resultingTrades' : [], 'amountUnfilled' : '%.8f' % (amount)}
+
+        # Reserve the balance until the order fills or is canceled
+        if orderType == 'buy':
+            self.__balances__[principalCurrency] -= getTradeTotal(rate, amount)
+        else:
+            self.__balances__[subjectCurrency] -= amount
+        self.__open_orders__[currencyPair].append(order)
+        return {'orderNumber' : order['orderNumber'], 'resultingTrades' : []}
+
+    def __getOrderStatus__(self, orderNumber):
+        for orders in self.__open_orders__.values():
+            for order in orders:
+                if order['orderNumber'] == orderNumber:
+                    status = self.__formatOrder__(order)
+                    status.update({'status' : 'Open', 'currencyPair' : order['currencyPair'], 'startingAmount' : status['amount']})
+                    del status['orderNumber']
+                    return {'success' : 1, 'result' : {orderNumber : status}}
+        return {'success' : 0, 'result' : {'error' : 'Order not found, or you are not the person who placed it.'}}
+
+    def __cancelOrder__(self, req):
+        orders = self.__open_orders__.get(req['currencyPair'], [])
+        for order in orders:
+            if order['orderNumber'] == str(req['orderNumber']):
+                orders.remove(order)
+                principalCurrency, subjectCurrency = order['currencyPair'].split('_')
+                if order['type'] == 'buy':
+                    self.__balances__[principalCurrency] += getTradeTotal(order['rate'], order['amount'])
+                else:
+                    self.__balances__[subjectCurrency] += order['amount']
+                return {'success' : 1}
+        return {'success' : 0, 'error' : 'Invalid order number, or you are not the person who placed the order.'}
+
+#   __fill__
+#       - Purpose:
+#           Fill an order at its' rate and move the balances. The fee is taken from what is received, which is
+#           rounded down to 8 decimals (see Amounts.getProceeds).
+#       - Returns:
+#           The trade dictionary in the Poloniex format.
+    def __fill__(self, order, reserved=False):
+        principalCurrency, subjectCurrency = order['currencyPair'].split('_')
+        total = getTradeTotal(order['rate'], order['amount'])
+        if order['type'] == 'buy':
+            if not reserved:
+                self.__balances__[principalCurrency] -= total
+            self.__balances__[subjectCurrency] += getProceeds(order['amount'], self.__fee__)
+        else:
+            if not reserved:
+                self.__balances__[subjectCurrency] -= order['amount']
+            self.__balances__[principalCurrency] += getProceeds(total, self.__fee__)
+        # The exchange keeps balances to 8 decimals, so the balance it reports can always be sold in full
+        for currency in (principalCurrency, subjectCurrency):
+            self.__balances__[currency] = roundAmount(self.__balances__[currency])
+        self.__trade_id__ += 1
+        trade = {'amount' : '%.8f' % (order['amount']), 'date' : time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+                 'rate' : '%.8f' % (order['rate']), 'total' : '%.8f' % (total), 'tradeID' : str(self.__trade_id__),
+                 'type' : order['type']}
+        self.__order_trades__.setdefault(order['orderNumber'], []).append(dict(trade, globalTradeID=str(self.__trade_id__ + 100000000),
+                                                                                currencyPair=order['currencyPair'], fee='%.8f' % (self.__fee__)))
+        return trade
+
+#   __step__
+#       - Purpose:
+#           See step. Must be called with the lock held.
+    def __step__(self):
+        self.__seq__ += 1
+        changed = []
+        for currencyPair, row in self.__ticker__.items():
+            last = float(row['last'])
+            price = last * math.exp(self.__random__.gauss(0.0, 0.001))
+            newRow = self.__makeTickerRow__(row.get('id', 0), price, float(row.get('open', last)))
+            if newRow['last'] != row['last']:
+                changed.append(currencyPair)
+            row.update(newRow)
+
+            # Fill the resting orders the new price crosses
+            for order in list(self.__open_orders__[currencyPair]):
+                if (order['type'] == 'buy' and price <= order['rate']) or (order['type'] == 'sell' and price >= order['rate']):
+                    self.__open_orders__[currencyPair].remove(order)
+                    self.__fill__(order, reserved=True)
+        return changed
+
+#   __getOrderBook__
+#       - Purpose:
+#           Generate the order book of a pair around its' lowest ask and highest bid. Each level is 0.05% further
+#           from the spread and offers an amount between 0.2 and 2 BTC worth of the coin, the same for the same
+#           pair and sequence number. Must be called with the lock held.
+#       - Returns:
+#           The order book in the returnOrderBook format.
+    def __getOrderBook__(self, currencyPair, depth):
+        row = self.__ticker__[currencyPair]
+        noise = random.Random(zlib.crc32(("%s_%d_%d" % (currencyPair, self.__seq__, self.__seed__)).encode('utf-8')))
+        lowestAsk = float(row['lowestAsk'])
+        highestBid = float(row['highestBid'])
+        asks = []
+        bids = []
+        for level in range(0, max(depth, 1)):
+            askPrice = lowestAsk * (1.0 + 0.0005 * level)
+            bidPrice = highestBid * (1.0 - 0.0005 * level)
+            asks.append(['%.8f' % (askPrice), '%.8f' % (noise.uniform(0.2, 2.0) / askPrice)])
+            bids.append(['%.8f' % (bidPrice), '%.8f' % (noise.uniform(0.2, 2.0) / bidPrice)])
+        return {'asks' : asks, 'bids' : bids, 'isFrozen' : row.get('isFrozen', '0'), 'seq' : self.__seq__}
+
+    def __makeTickerRow__(self, pairId, price, openPrice):
+        spread = price * 0.0005
+        return {'id' : pairId, 'last' : '%.8f' % (price), 'lowestAsk' : '%.8f' % (price + spread),
+                'highestBid' : '%.8f' % (price - spread), 'percentChange' : '%.8f' % (price / openPrice - 1.0),
+                'baseVolume' : '120.00000000', 'quoteVolume' : '%.8f' % (120.0 / price), 'isFrozen' : '0',
+                'high24hr' : '%.8f' % (max(price, openPrice)), 'low24hr' : '%.8f' % (min(price, openPrice)),
+                'open' : '%.8f' % (openPrice)}
+
+    def __getCompleteBalances__(self):
+        onOrders = {}
+        for orders in self.__open_orders__.values():
+            for order in orders:
+                principalCurrency, subjectCurrency = order['currencyPair'].split('_')
+                if order['type'] == 'buy':
+                    onOrders[principalCurrency] = onOrders.get(principalCurrency, 0.0) + order['rate'] * order['amount']
+                else:
+                    onOrders[subjectCurrency] = onOrders.get(subjectCurrency, 0.0) + order['amount']
+
+        completeBalances = {}
+        for coin, amount in self.__balances__.items():
+            total = amount + onOrders.get(coin, 0.0)
+            price = 1.0 if coin == 'BTC' else float(self.__ticker__.get('BTC_' + coin, {'last' : 0.0})['last'])
+            completeBalances[coin] = {'available' : '%.8f' % (amount), 'onOrders' : '%.8f' % (onOrders.get(coin, 0.0)),
+                                      'btcValue' : '%.8f' % (total * price)}
+        return completeBalances
+
+    def __formatOrder__(self, order):
+        return {'orderNumber' : order['orderNumber'], 'type' : order['type'], 'rate' : '%.8f' % (order['rate']),
+                'amount' : '%.8f' % (order['amount']), 'total' : '%.8f' % (order['rate'] * order['amount']),
+                'date' : order['date']}
+
+#   __getChartData__
+#       - Purpose:
+#           Return the recorded candles of a range, or synthetic ones if none were recorded. Candles newer than
+#           the present are never returned.
+#       - Returns:
+#           A list of candles in the returnChartData format. Poloniex answers a range without candles with a
+#           single row dated 0.
+    def __getChartData__(self, currencyPair, period, startDate, endDate):
+        endDate = min(endDate, int(time.time()))
+        if (currencyPair, period) in self.__chart_data__:
+            candles = [candle for candle in self.__chart_data__[(currencyPair, period)] if startDate <= int(candle['date']) <= endDate]
+        else:
+            firstDate = ((startDate + period - 1) // period) * period
+            candles = [self.__makeCandle__(currencyPair, period, date) for date in range(firstDate, endDate + 1, period)]
+        if not candles:
+            return [{'date' : 0, 'high' : 0, 'low' : 0, 'open' : 0, 'close' : 0, 'volume' : 0, 'quoteVolume' : 0, 'weightedAverage' : 0}]
+        return candles
+
+#   __makeCandle__
+#       - Purpose:
+#           Generate the synthetic candle of a pair at a date. The price drifts around the starting price of the
+#           pair in slow waves with some noise, so the same date always gives the same candle.
+    def __makeCandle__(self, currencyPair, period, date):
+        basePrice = self.__DEFAULT_PRICES__.get(currencyPair, float(self.__ticker__[currencyPair].get('open', 0.0001)))
+        noise = random.Random(zlib.crc32(("%s_%d_%d" % (currencyPair, date, self.__seed__)).encode('utf-8')))
+
+        def priceAt(when):
+            return basePrice * math.exp(0.04 * math.sin(when / 259200.0) + 0.015 * math.sin(when / 21600.0 + zlib.crc32(currencyPair.encode('utf-8'))))
+
+        openPrice = priceAt(date)
+        close = priceAt(date + period) * math.exp(noise.gauss(0.0, 0.002))
+        high = max(openPrice, close) * (1.0 + abs(noise.gauss(0.0, 0.001)))
+        low = min(openPrice, close) * (1.0 - abs(noise.gauss(0.0, 0.001)))
+        volume = noise.uniform(0.5, 5.0)
+        return {'date' : date, 'high' : high, 'low' : low, 'open' : openPrice, 'close' : close, 'volume' : volume,
+                'quoteVolume' : volume / close, 'weightedAverage' : (high + low + close) / 3.0}
+
+class StubExchangeHandler(BaseHTTPRequestHandler):
+
+    # Keep connections alive like the real exchange and answer without waiting for Nagle's algorithm
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.__respond__(self.server.market.handle('GET', self.path, None, dict(self.headers.items())))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.__respond__(self.server.market.handle('POST', self.path, body, dict(self.headers.items())))
+
+    def __respond__(self, response):
+        status, body = response
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubExchangeServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+#   __init__
+#       - Parameters:
+#           * (market) The StubMarket answering the requests
+#           * (host) The address to listen on
+#           * (port) The port to listen on. 0 picks a free port.
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, market, host='127.0.0.1', port=0):
+        super(StubExchangeServer, self).__init__((host, int(port)), StubExchangeHandler)
+        self.market = market
+        self.__thread__ = None
+
+#   getUrl
+#       - Returns:
+#           The base URL to use as api_url (i.e. http://127.0.0.1:8080).
+    def getUrl(self):
+        return 'http://%s:%d' % (self.server_address[0], self.server_address[1])
+
+#   start
+#       - Purpose:
+#           Serve requests from a background thread.
+    def start(self):
+        self.__thread__ = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread__.start()
+        return self
+
+#   stop
+#       - Purpose:
+#           Stop serving and close the listening socket.
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.__thread__ is not None:
+            self.__thread__.join()
+
+class StubFeedServer(object):
+    """Publishes the ticker of a StubMarket on a local copy of the Poloniex push API ticker channel."""
+
+#   __init__
+#       - Parameters:
+#           * (market) The StubMarket whose ticker is published
+#           * (host) The address to listen on
+#           * (port) The port to listen on. 0 picks a free port.
+#           * (interval) Seconds between steps of the market. Only the pairs whose ticker changed are published.
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, market, host='127.0.0.1', port=0, interval=1.0):
+        self.__market__ = market
+        self.__interval__ = float(interval)
+        self.__listener__ = socket.create_server((host, int(port)))
+        self.__clients__ = []
+        self.__lock__ = threading.Lock()
+        self.__stop_event__ = threading.Event()
+        self.__threads__ = []
+
+#   getUrl
+#       - Returns:
+#           The URL to use as push_feed_url (i.e. ws://127.0.0.1:8081).
+    def getUrl(self):
+        address = self.__listener__.getsockname()
+        return 'ws://%s:%d' % (address[0], address[1])
+
+#   start
+#       - Purpose:
+#           Accept subscribers and publish from background threads.
+    def start(self):
+        for target in (self.__acceptLoop__, self.__publishLoop__):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.__threads__.append(thread)
+        return self
+
+#   stop
+#       - Purpose:
+#           Stop publishing and close every connection.
+    def stop(self):
+        self.__stop_event__.set()
+        self.__listener__.close()
+        with self.__lock__:
+            clients = self.__clients__
+            self.__clients__ = []
+        for client in clients:
+            client.close()
+        for thread in self.__threads__:
+            thread.join()
+        self.__listener__.close()
+
+#   publish
+#       - Purpose:
+#           Send the ticker of some pairs to every subscriber straight away.
+    def publish(self, currencyPairs):
+        ticker = self.__market__.getTicker()
+        messages = []
+        for currencyPair in currencyPairs:
+            row = ticker[currencyPair]
+            messages.append(json.dumps([1002, None, [row['id'], row['last'], row['lowestAsk'], row['highestBid'],
+                                                     row['percentChange'], row['baseVolume'], row['quoteVolume'],
+                                                     int(row['isFrozen']), row['high24hr'], row['low24hr']]]))
+        self.__broadcast__(messages)
+
+    def __broadcast__(self, messages):
+        with self.__lock__:
+            clients = list(self.__clients__)
+        for client in clients:
+            try:
+                for message in messages:
+                    client.sendText(message)
+            except (OSError, WebSocket.WebSocketError):
+                with self.__lock__:
+                    if client in self.__clients__:
+                        self.__clients__.remove(client)
+                client.close()
+
+    def __acceptLoop__(self):
+        # Closing the listening socket does not wake up accept, so it waits in short steps instead
+        self.__listener__.settimeout(0.5)
+        while not self.__stop_event__.is_set():
+            try:
+                sock, address = self.__listener__.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            sock.settimeout(None)
+            threading.Thread(target=self.__serveClient__, args=(sock,), daemon=True).start()
+
+#   __serveClient__
+#       - Purpose:
+#           Complete the handshake and add the connection as a subscriber once it subscribes to the ticker channel.
+    def __serveClient__(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            client = WebSocket.accept(sock)
+            while not self.__stop_event__.is_set():
+                message = client.recv()
+                if message is None:
+                    break
+                request = json.loads(message)
+                if request.get('command') == 'subscribe' and int(request.get('channel', 0)) == 1002:
+                    client.sendText(json.dumps([1002, 1]))
+                    with self.__lock__:
+                        self.__clients__.append(client)
+        except (OSError, ValueError, WebSocket.WebSocketError):
+            sock.close()
+
+#   __publishLoop__
+#       - Purpose:
+#           Step the market every interval and publish the pairs that changed. A heartbeat is sent when nothing
+#           has been published for a second.
+    def __publishLoop__(self):
+        lastSent = time.monotonic()
+        nextStep = time.monotonic() + self.__interval__
+        while not self.__stop_event__.wait(max(0.0, min(nextStep, lastSent + 1.0) - time.monotonic())):
+            now = time.monotonic()
+            if now >= nextStep:
+                nextStep += self.__interval__
+                changed = self.__market__.step()
+                if changed:
+                    self.publish(changed)
+                    lastSent = now
+            if now - lastSent >= 1.0:
+                self.__broadcast__([json.dumps([1010])])
+                lastSent = now
+
+class LoopbackTransport(object):
+    """Hands the requests of a poloniex client straight to a StubMarket without any sockets."""
+
+    def __init__(self, market):
+        self.__market__ = market
+
+    def request(self, method, path, body=None, headers=None):
+        status, responseBody = self.__market__.handle(method, path, body, headers)
+        if status >= 400:
+            raise TransportError(status, 'Error', responseBody.decode('utf-8', 'replace'))
+        return responseBody
+
+    def close(self):
+        pass
+
+# recordFixtures
+#   - Purpose:
+#       Save the current ticker and the candles of some pairs from an exchange to a fixtures file StubMarket can
+#       serve.
+#   - Parameters:
+#       * (poloniexAPI) A poloniex class connected to the exchange to record
+#       * (currencyPairs) The currency pairs whose candles are recorded
+#       * (candlePeriod) The candlestick period in seconds
+#       * (startDate) UNIX timestamp of the first candle
+#       * (endDate) UNIX timestamp of the last candle
+#       * (path) The fixtures file to write
+def recordFixtures(poloniexAPI, currencyPairs, candlePeriod, startDate, endDate, path):
+    chartData = {}
+    for currencyPair in currencyPairs:
+        candles = poloniexAPI.returnChartData(currencyPair, int(startDate), int(endDate), int(candlePeriod))
+        if isinstance(candles, dict):
+            raise Exception("returnChartData failed: %s" % (candles.get('error', candles)))
+        chartData[currencyPair] = {str(int(candlePeriod)) : [candle for candle in candles if int(candle['date']) > 0]}
+
+    ticker = poloniexAPI.returnTicker()
+    fixtures = {'ticker' : dict((currencyPair, ticker[currencyPair]) for currencyPair in currencyPairs),
+                'balances' : {'BTC' : '1.00000000'},
+                'chartData' : chartData}
+    with open(path, 'w') as f:
+        json.dump(fixtures, f)
+
+# Begin main
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Poloniex API.")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    parser.add_argument('--port', default=8080, type=int, help="Port to listen on")
+    parser.add_argument('--key', default='API_KEY', help="The API key signed requests must use (as api_key in bitbot.config)")
+    parser.add_argument('--secret', default='API_SECRET', help="The API secret signed requests must use (as api_secret in bitbot.config)")
+    parser.add_argument('--fixtures', default=None, help="Serve the data of a fixtures file instead of synthetic data")
+    parser.add_argument('--seed', default=0, type=int, help="Seed of the synthetic data and injected latency/errors")
+    parser.add_argument('--latency', default=0.0, type=float, help="Seconds added to every response")
+    parser.add_argument('--jitter', default=0.0, type=float, help="Up to this many seconds are randomly added to the latency")
+    parser.add_argument('--error-rate', default=0.0, type=float, help="Fraction of requests answered with an error")
+    parser.add_argument('--error-status', default=503, type=int, help="HTTP status of injected errors")
+    parser.add_argument('--feed-port', default=None, type=int, help="Also publish the ticker on a push feed on this port")
+    parser.add_argument('--feed-interval', default=1.0, type=float, help="Seconds between ticker changes on the push feed")
+    parser.add_argument('--record', default=None, help="Record a fixtures file from Poloniex to this path and exit")
+    parser.add_argument('--pairs', default='BTC_XRP', help="Comma separated currency pairs to record")
+    parser.add_argument('--period', default=300, type=int, help="Candlestick period to record")
+    parser.add_argument('--days', default=7, type=float, help="Days of candles to record")
+    options = parser.parse_args()
+
+    if options.record:
+        from lib.Poloniex import poloniex
+        endDate = time.time()
+        recordFixtures(poloniex(options.key, options.secret), options.pairs.split(','), options.period,
+                       endDate - options.days * 86400, endDate, options.record)
+        print("Recorded %s" % (options.record))
+        return 0
+
+    market = StubMarket(options.key, options.secret, options.fixtures, options.seed, options.latency, options.jitter,
+                        options.error_rate, options.error_status)
+    server = StubExchangeServer(market, options.host, options.port)
+    print("Stub exchange listening on %s (Ctrl+C to stop)" % (server.getUrl()))
+    feedServer = None
+    if options.feed_port is not None:
+        feedServer = StubFeedServer(market, options.host, options.feed_port, options.feed_interval).start()
+        print("Stub push feed listening on %s" % (feedServer.getUrl()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    if feedServer is not None:
+        feedServer.stop()
+    server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    main()
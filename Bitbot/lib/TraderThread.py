@@ -1,12 +1,26 @@
 #### TraderThread ####
-# This class implements a thread which monitors the prices of a cryptocurrency via Poloniex. The trader decides its' 
-# trading policy from the Bitbot_CDO and makes its' buy/sell decisions from the corresponding policy class. Any 
-# information printed is sent to the printer thread via the printQueue.
+# This class implements a thread which monitors the prices of one or more cryptocurrencies via Poloniex. Every coin
+# listed in crypto_coin is traded against BTC by its' own PairTrader, which decides its' trading policy from the
+# Bitbot_CDO and makes its' buy/sell decisions from the corresponding policy class. The ticker (which contains every
+# market) is fetched once per interval and shared by all of the pairs. The account balances are held by an
+# AccountCache and the orders placed are followed by an OrderTracker which writes their fills through to it, so the
+# account state is only fetched at the start and when it has to be reconciled. With the push feed
+# enabled the ticker is not polled: the pairs are consulted as soon as the exchange pushes a change of their price.
+# Any information printed is published on the status bus, which the printer thread follows.
 
 import threading, time, datetime
 from lib.PrinterThread import PrinterThread
 from lib import Bitbot_CDO
+from lib import Metrics
 from lib.Logger import Logger
+from lib.Profiler import NullProfiler, NullStartupTimer
+from lib.CandleCache import createCandleCache
+from lib.OrderBook import createOrderBookCache
+from lib.OrderTracker import createOrderTracker
+from lib.AccountCache import createAccountCache
+from lib.PairTrader import PairTrader
+from lib.MarketFeed import createMarketFeed
+from lib.PolicyEnsemble import createPolicy
 
 class TraderThread(threading.Thread):
 
@@ -19,93 +33,117 @@ class TraderThread(threading.Thread):
     __request_interval__ = 5.0      # How often the thread will call the PoloniexAPI
     __poloniexAPI__ = None
     __Logger__ = None
-    __measurement_period__ = None   # The n number of units used when calculating the Bollinger bands (20-day, 50-hour, etc.)
-    __candlestick_period__ = None
-    __period_unit__ = None          # The unit of measurement when calculating the Bollinger bands (days, hours, minutes)
-    __orders_are_pending__ = False  # Indicates if orders have not cleared yet
-    __policy_class__ = None
-    __subjectCurrency__ = None
+    __candleCache__ = None          # Local store of the candlestick history so only new candles are downloaded
+    __order_books__ = None          # OrderBookCache pricing the orders, or None to order at the last price
+    __account_cache__ = None        # AccountCache holding the balances of the account
+    __order_tracker__ = None        # OrderTracker following the placed orders
+    __pair_traders__ = None         # One PairTrader per traded coin
+    __market_feed__ = None          # MarketFeed pushing ticker changes, or None to poll the ticker
+    __follows_push_feed__ = True    # Whether run() can follow a MarketFeed (the AsyncTraderThread cannot)
+    __profiler__ = None             # Profiler timing the phases of a tick (NullProfiler unless profiling)
+    __startup__ = None              # StartupTimer reported after the first tick (NullStartupTimer if not timed)
     __principalCurrency__ = 'BTC'
 
 #    __init__
-#       - Parameters:   
+#       - Parameters:
 #           * (threadID) Number identifying this thread
 #           * (name) Name identifying this thread
-#           * (printQueue) The shared queue among the threads used to send printable objects to the printer thread
-#           * (printQueueLock) A lock on the printQueue to prevent others from using it when it is being written to
-#           * (removeQueue) A queue used to remove entries from the Trader thread dictionary. Put a key that is 
-#                           already present in the dictionary into the queue to remove it.
-#           * (removeQueueLock) A lock on the removeQueue to prevent others from using it.
+#           * (statusBus) The StatusBus shared among the threads on which the printable status is published
 #           * (poloniexAPI) A poloniex class that already contains the API credentials
-#       - Purpose:  
+#           * (profiler) A Profiler timing the phases of every tick, or None to not profile
+#           * (startup) The StartupTimer of Bitbot.py, reported after the first tick, or None to not report it
+#       - Purpose:
 #           Initialize the class properties.
-    def __init__(self, threadID, name, printQueue, printQueueLock, removeQueue, removeQueueLock, poloniexAPI):
+    def __init__(self, threadID, name, statusBus, poloniexAPI, profiler=None, startup=None):
        super(TraderThread, self).__init__()
        self._stop_event = threading.Event()
        self.threadID = threadID
        self.name = name
-       self.printQueue = printQueue
-       self.printQueueLock = printQueueLock
-       self.removeQueue = removeQueue
-       self.removeQueueLock = removeQueueLock
+       self.statusBus = statusBus
        self.__poloniexAPI__ = poloniexAPI
+       self.__profiler__ = profiler if profiler is not None else NullProfiler()
+       self.__startup__ = startup if startup is not None else NullStartupTimer()
        self.__Logger__ = Logger()
-       self.__Logger__.writeFile("########## %s ##########" % (datetime.datetime.now()))
+       self.__Logger__.writeEvent('start', "########## %s ##########" % (datetime.datetime.now()))
        self.__request_interval__ = int(Bitbot_CDO.action_interval)
-       self.__measurement_period__ = int(Bitbot_CDO.measurement_period)
-       self.__candlestick_period__ = Bitbot_CDO.candlestick_period
-       self.__period_unit__ = Bitbot_CDO.period_unit
-       self.__subjectCurrency__ = Bitbot_CDO.crypto_coin
-
-       # Load custom trading policy class
-       try:
-           policyModuleName = Bitbot_CDO.policy_file
-           policyClassName = policyModuleName.split('.')[-1]
-           policyModule = __import__(policyModuleName, fromlist=[policyClassName])
-           self.__policy_class__ = getattr(policyModule, policyClassName)
-       except Exception as e:
-            #print("Error loading trading policy. Not such policy %s\n%s" % (Bitbot_CDO.policy_file, str(e)))
-            self.printQueueLock.acquire()
-            self.printQueue.put(("Error", "Error loading trading policy. Not such policy %s\n%s" % (Bitbot_CDO.policy_file, str(e))))
-            self.printQueueLock.release()
-            return 3
+       self.__candleCache__ = createCandleCache(poloniexAPI)
+       self.__order_books__ = createOrderBookCache(poloniexAPI)
+       self.__account_cache__ = createAccountCache(poloniexAPI)
+       self.__order_tracker__ = createOrderTracker(poloniexAPI, self.__account_cache__)
+       self.__pair_traders__ = []
+
+       # Load custom trading policy class of each coin. A coin can use a different policy than policy_file by
+       # setting policy_file_<coin> (i.e. policy_file_xrp=policy.ZonePolicy). Several policies listed together are
+       # traded as a PolicyEnsemble.
+       for subjectCurrency in getSubjectCurrencies():
+           policyFile = getattr(Bitbot_CDO, 'policy_file_' + subjectCurrency.lower(), Bitbot_CDO.policy_file)
+           try:
+               policyClass = createPolicy(policyFile)
+           except Exception as e:
+               #print("Error loading trading policy. Not such policy %s\n%s" % (policyFile, str(e)))
+               self.statusBus.publish("Error", "Error loading trading policy. Not such policy %s\n%s" % (policyFile, str(e)))
+               continue
+           self.__pair_traders__.append(PairTrader(subjectCurrency, policyClass, self))
+
+       # Follow the push feed instead of polling the ticker if it is enabled
+       if self.__follows_push_feed__:
+           self.__market_feed__ = createMarketFeed([pairTrader.getCurrencyPair() for pairTrader in self.__pair_traders__])
+       elif getattr(Bitbot_CDO, 'enable_push_feed', 'False') == 'True':
+           self.statusBus.publish("Error", "enable_push_feed is not supported by the %s, the ticker is polled every action_interval" % (type(self).__name__))
+
+    def getPoloniexAPI(self):
+        return self.__poloniexAPI__
+
+    def getCandleCache(self):
+        return self.__candleCache__
+
+    def getOrderBooks(self):
+        return self.__order_books__
+
+    def getAccountCache(self):
+        return self.__account_cache__
+
+    def getOrderTracker(self):
+        return self.__order_tracker__
+
+    def getLogger(self):
+        return self.__Logger__
+
+    def getProfiler(self):
+        return self.__profiler__
 
 #   stop
 #       - Purpose:
-#           Set a threading event to stop notify this thread to stop.           
+#           Set a threading event to stop notify this thread to stop.
     def stop(self):
         self._stop_event.set()
 
 #   run
 #       - Purpose:
-#           The thread entry point which will run indefinetly and take care of getting poloniex prices and consulting 
-#           the trader policy on buy/sell conditions.
+#           The thread entry point which will run indefinetly and take care of getting poloniex prices and consulting
+#           the trader policy of every pair on buy/sell conditions.
     def run(self):
 
         print('Trader running...')
         startTime = datetime.datetime.now().replace(microsecond=0)
-        statusMesg = ""
-        candlesticks = []
-        recalculateCandlesticksCountDown = 0
-        buyPrice = '0.0'
-        sellPrice = '0.0'
-        currentPrice = '0.0'
         accountBalances = {}
-        ordersArePending = False
-        tradingState = self.__ACCOUNTS_EMPTY__
 
-        # Check user account balances and determine whether to start by selling or buying. Check if there are open orders.
+        # Check user account balances and determine whether each pair starts by selling or buying. Check if there are open orders.
         try:
-            tradingState, ordersArePending, accountBalances = self.__checkState__()
-            time.sleep(2)
+            accountBalances = self.__checkState__()
         except Exception as e:
             #print("Error connecting to Poloniex account: %s" % (str(e)))
-            self.printQueueLock.acquire()
-            self.printQueue.put(("Error", "Error connecting to Poloniex account: %s" % (str(e))))
-            self.printQueueLock.release()
+            self.statusBus.publish("Error", "Error connecting to Poloniex account: %s" % (str(e)))
             return 4
 
+        self.statusBus.publish("Coin", ', '.join([pairTrader.getSubjectCurrency() for pairTrader in self.__pair_traders__]))
+        self.__startup__.mark('account state')
+
+        if self.__market_feed__ is not None:
+            return self.__runPushFeed__(startTime, accountBalances)
+
         # Begin main loop
+        loopStart = None
         while True:
 
             # Check if the stop event is set and if so exit
@@ -113,242 +151,257 @@ class TraderThread(threading.Thread):
                 # Do stuff
                 return 0
 
-            # Get current bands and ticker price
+            # Record how long the previous iteration took including the sleep (the interval plus any drift)
+            previousStart, loopStart = loopStart, time.monotonic()
+            if previousStart is not None:
+                Metrics.registry.observe('bitbot_loop_period_seconds', loopStart - previousStart)
+            self.__profiler__.startTick()
+
+            # Get the ticker price of every market. One request serves all of the pairs.
+            priceCharts = None
             try:
-                priceCharts = self.__poloniexAPI__.returnTicker()   
-                currentPrice = priceCharts[self.__principalCurrency__+'_'+self.__subjectCurrency__]['last']
-                # If the trader starts in the sell state, use the current price as the buy price.
-                if buyPrice == '0.0':
-                    buyPrice = currentPrice
-
-                # Only calculate bands when the candlestick period time interval has passed (ex. 5 minutes)
-                recalculateCandlesticksCountDown = recalculateCandlesticksCountDown - self.__request_interval__
-                if recalculateCandlesticksCountDown <= 0:
-                    candlesticks = self.__getCandleSticks__()
-                    recalculateCandlesticksCountDown = int(self.__candlestick_period__)#/2
+                with self.__profiler__.phase('ticker fetch'):
+                    priceCharts = self.__poloniexAPI__.returnTicker()
             except Exception as e:
-                self.printQueueLock.acquire()
-                self.printQueue.put(("Error", 'Error retrieving poloniex ticker feed: %s' % (str(e))))
-                self.printQueueLock.release()
-                self.__Logger__.writeFile("Error", 'Error retrieving poloniex ticker feed: %s' %(str(e)))
-                continue
-
-            args = self.__buildArgs__(priceCharts, sellPrice, buyPrice, candlesticks)
-
-            # If orders are pending, wait until they clear
-            if ordersArePending:
-                statusMesg = "Waiting for orders to clear"
-                try:
-                    # If checkState returns ordersArePending as true, the loop will continue until
-                    # they have cleared. Once they have cleared, the checkState function will have 
-                    # also updated the trading state. The order may fail so this is important so 
-                    # the bot does not move on to the next state if the previous state was never 
-                    # finished. The account balances display is also updated.
-                    previousState = tradingState
-                    tradingState, ordersArePending, accountBalances = self.__checkState__()
-                    if not ordersArePending and tradingState == previousState:
-                        self.__Logger__.writeFile("Order was canceled.")
-                    time.sleep(2)
-                except Exception as e:
-                    self.printQueueLock.acquire()
-                    self.printQueue.put(("Error", 'Error retrieving open orders: %s' % (str(e))))
-                    self.printQueueLock.release()
-                    self.__Logger__.writeFile("Error", 'Error retrieving open orders: %s' % (str(e)))
-                    continue
-
-            # Do this when looking to buy
-            elif tradingState == self.__BUY_PHASE__:
-                statusMesg = "Looking to Buy"
-                if self.__policy_class__.shouldBuy(args):
-                    # Try buying
-                    try:
-                        if not bool(Bitbot_CDO.testing_mode):
-                            self.__buyAllIn__(priceCharts)
-                        pass
-                    except Exception as e:
-                        self.printQueueLock.acquire()
-                        self.printQueue.put(("Error", 'Tried buying but call failed: %s' % (str(e))))
-                        self.printQueueLock.release()
-                        self.__Logger__.writeFile("Error Tried buying but call failed: %s" % (str(e)))
-                        continue
-                    buyPrice = currentPrice
-                    statusMesg = "Buying at %s" % (buyPrice)
-                    self.__Logger__.writeFile("Bought at %s" % (buyPrice))
-                    ordersArePending = True                 
-
-            # Do this when looking to sell 
-            elif tradingState == self.__SELL_PHASE__:
-                statusMesg = "Looking to Sell (Bought at %s)" % (buyPrice)          
-                if self.__policy_class__.shouldSell(args):
-                    # Try selling
+                self.statusBus.publish("Error", 'Error retrieving poloniex ticker feed: %s' % (str(e)))
+                self.__Logger__.writeEvent('error', 'Error retrieving poloniex ticker feed: %s' % (str(e)))
+
+            if priceCharts is not None:
+                # If orders are pending, check whether they have cleared. The account balances display is also updated.
+                if any(pairTrader.ordersArePending() for pairTrader in self.__pair_traders__):
                     try:
-                        if not bool(Bitbot_CDO.testing_mode):
-                            self.__sellAllIn__(priceCharts)
-                        pass
+                        with self.__profiler__.phase('state check'):
+                            accountBalances = self.__updateOrders__()
                     except Exception as e:
-                        self.printQueueLock.acquire()
-                        self.printQueue.put(("Error", 'Tried selling but call failed: %s' % (str(e))))
-                        self.printQueueLock.release()
-                        self.__Logger__.writeFile("Error Tried selling but call failed: %s" % (str(e)))
-                        continue
-                    sellPrice = currentPrice
-                    profitPercent = (float(sellPrice)/float(buyPrice) * 100.0) - 100.0
-                    statusMesg = "Selling at %s\t\tProfit : %f%%" % (sellPrice, profitPercent)
-                    self.__Logger__.writeFile("Sold at %s\tProfit : %f%%" % (sellPrice, profitPercent))
-                    self.__policy_class__.cleanUp(args)
-                    ordersArePending = True                  
-
-            else:
-                    statusMesg = "Account Balance is Empty"     
-
-            # Send status to printer thread
-            self.printQueueLock.acquire()
-            self.printQueue.put(("Coin", self.__subjectCurrency__))
-            self.printQueue.put(("Status", statusMesg))
-            self.printQueue.put((PrinterThread.TICKER_KEY, accountBalances))
-            self.printQueue.put(("Ticker Price", currentPrice + " " + self.__principalCurrency__))
-            self.printQueueLock.release()
+                        self.statusBus.publish("Error", 'Error retrieving open orders: %s' % (str(e)))
+                        self.__Logger__.writeEvent('error', 'Error retrieving open orders: %s' % (str(e)))
+
+                self.__tickPairs__(priceCharts, self.__pair_traders__)
+                accountBalances = self.__account_cache__.getBalances() or accountBalances
+
+                # Publish the balances for the printer thread
+                with self.__profiler__.phase('status publish'):
+                    self.statusBus.publish(PrinterThread.TICKER_KEY, accountBalances)
+            Metrics.registry.observe('bitbot_tick_seconds', time.monotonic() - loopStart)
+            self.__profiler__.endTick()
+            self.__reportStartup__()
 
             # Use a loop to sleep instead so the sleep times are shorter. This allows the thread
-            # to quit sleeping when the user wants to quit the program.
+            # to quit sleeping when the user wants to quit the program. Orders due a check are polled in between
+            # so a fill is noticed before the next tick.
             for i in range(0, self.__request_interval__):
                 if self._stop_event.is_set():
                     # Do stuff
                     return 0
                 uptime = datetime.datetime.now().replace(microsecond=0) - startTime
-                self.printQueueLock.acquire()
-                self.printQueue.put(("Uptime", uptime))
-                self.printQueueLock.release()
-                time.sleep(1)
+                self.statusBus.publish("Uptime", uptime)
+                if self.__order_tracker__.isDue():
+                    try:
+                        with self.__profiler__.phase('state check'):
+                            accountBalances = self.__updateOrders__()
+                        self.statusBus.publish(PrinterThread.TICKER_KEY, accountBalances)
+                    except Exception as e:
+                        self.__Logger__.writeEvent('error', 'Error retrieving open orders: %s' % (str(e)))
+                with self.__profiler__.phase('sleep'):
+                    time.sleep(1)
 
-#   __checkState__
-#       - Purpose:
-#           Check whether bot should be selling or buying.
-#       - Return:
-#           (int) 0 : BUY PHASE
-#           (int) 1 : SELL_PHASE
-#           (int) 2 : ACCOUNTS_EMPTY
-    def __checkState__(self):
-        state = self.__ACCOUNTS_EMPTY__
-        openOrdersStatus = False
-
-        # Check if should be buying or selling.
-        # Is based on which account has the highest balance.
-        accountBalances = self.__poloniexAPI__.returnBalances()
-        balancePrincipal = float(accountBalances['BTC'])
-        balanceSubject = float(accountBalances[self.__subjectCurrency__])
-        if balancePrincipal > 0.0 and balancePrincipal > balanceSubject:
-            state = self.__BUY_PHASE__
-        elif balanceSubject > 0.0 and balanceSubject > balancePrincipal:
-            state = self.__SELL_PHASE__
-        else:
-            state = self.__ACCOUNTS_EMPTY__
-        
-        # Check if there are any open order for the key pair.
-        openOrders = self.__poloniexAPI__.returnOpenOrders('BTC_'+self.__subjectCurrency__)
-        if bool(openOrders):
-            openOrdersStatus = True
-        return (state, openOrdersStatus, accountBalances)
-
-#   __buyAllIn__
+#   __runPushFeed__
 #       - Purpose:
-#           Submit a purchase order for as much of a particular currency as the user can provide (all in).
-#       - Parameters:
-#           * (currentPrice) A string representation of a number indicating the current ticker price.
+#           The main loop used when the push feed is enabled. Instead of polling the ticker every interval, the
+#           thread waits for the feed to report a price change of a traded pair and only consults the policies of
+#           the pairs whose price changed (or whose candlesticks are due a refresh). The order tracker is polled
+#           while orders are pending. If the feed is down, the ticker is polled every interval and
+#           handed to the feed.
 #       - Returns:
-#           An order receipt dictionary containing the order number.
-#       - NOTE:
-#           Orders will likely not be instant which needs to be accounted for after this function is called.
-#           A the order has not cleared and the bot wants to sell then the sell must be delayed or the order 
-#           must be canceled and the bot will look to buy again.
-#
-#           Add check if no balances are available and throw exception. Need to create custom exception.
-    def __buyAllIn__(self, priceCharts):
-        tradableBalance = self.__poloniexAPI__.returnCompleteBalances()
-        subjectCurrencyCost = priceCharts['BTC_'+self.__subjectCurrency__]['last']
-        amount = float(tradableBalance['BTC']['available']) / float(subjectCurrencyCost)
-        if bool(Bitbot_CDO.use_immediate_or_cancel_orders):
-            orderReceipt = self.__poloniexAPI__.buy('BTC_'+self.__subjectCurrency__, subjectCurrencyCost, str(amount), immediateOrCancel=True)
-        else:
-            orderReceipt = self.__poloniexAPI__.buy('BTC_'+self.__subjectCurrency__, subjectCurrencyCost, str(amount))
-        return orderReceipt
-
-#   __sellAllIn__
+#           0 when the thread is stopped.
+    def __runPushFeed__(self, startTime, accountBalances):
+        try:
+            self.__market_feed__.setTicker(self.__poloniexAPI__.returnTicker())
+            self.__market_feed__.waitForUpdate(0)
+        except Exception as e:
+            self.statusBus.publish("Error", 'Error retrieving poloniex ticker feed: %s' % (str(e)))
+            self.__Logger__.writeEvent('error', 'Error retrieving poloniex ticker feed: %s' % (str(e)))
+        self.__market_feed__.start()
+
+        # Every pair is consulted once at the start
+        changed = set(pairTrader.getCurrencyPair() for pairTrader in self.__pair_traders__)
+        lastPoll = lastStateCheck = lastUptime = time.monotonic()
+
+        try:
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+
+                # Fall back on polling while the feed is disconnected
+                if not self.__market_feed__.isConnected() and now - lastPoll >= self.__request_interval__:
+                    lastPoll = now
+                    try:
+                        with self.__profiler__.phase('ticker fetch'):
+                            self.__market_feed__.setTicker(self.__poloniexAPI__.returnTicker())
+                        changed |= self.__market_feed__.waitForUpdate(0)
+                    except Exception as e:
+                        self.__Logger__.writeEvent('error', 'Error retrieving poloniex ticker feed: %s' % (str(e)))
+
+                # If orders are pending, check whether they have cleared every interval.
+                pendingPairs = [pairTrader for pairTrader in self.__pair_traders__ if pairTrader.ordersArePending()]
+                if pendingPairs and (self.__order_tracker__.isDue() or now - lastStateCheck >= self.__request_interval__):
+                    lastStateCheck = now
+                    try:
+                        with self.__profiler__.phase('state check'):
+                            accountBalances = self.__updateOrders__()
+                        changed |= set(pairTrader.getCurrencyPair() for pairTrader in pendingPairs if not pairTrader.ordersArePending())
+                    except Exception as e:
+                        self.statusBus.publish("Error", 'Error retrieving open orders: %s' % (str(e)))
+                        self.__Logger__.writeEvent('error', 'Error retrieving open orders: %s' % (str(e)))
+
+                pairTraders = [pairTrader for pairTrader in self.__pair_traders__
+                               if pairTrader.getCurrencyPair() in changed or pairTrader.candlesAreDue()]
+                if pairTraders:
+                    self.__profiler__.startTick()
+                    self.__tickPairs__(self.__market_feed__.getPriceCharts(), pairTraders)
+                    accountBalances = self.__account_cache__.getBalances() or accountBalances
+                    with self.__profiler__.phase('status publish'):
+                        self.statusBus.publish(PrinterThread.TICKER_KEY, accountBalances)
+                    Metrics.registry.observe('bitbot_tick_seconds', time.monotonic() - now)
+                    self.__profiler__.endTick()
+                    self.__reportStartup__()
+
+                if now - lastUptime >= 1.0:
+                    lastUptime = now
+                    uptime = datetime.datetime.now().replace(microsecond=0) - startTime
+                    self.statusBus.publish("Uptime", uptime)
+
+                # Sleep until a traded pair's price changes. Short waits let the thread notice the stop event.
+                with self.__profiler__.phase('sleep'):
+                    changed = self.__market_feed__.waitForUpdate(1.0)
+        finally:
+            self.__market_feed__.stop()
+        return 0
+
+#   __reportStartup__
+#       - Purpose:
+#           End the startup with the first tick and report how long each step took: it is logged, published on the
+#           status bus and set in the bitbot_startup_seconds gauge. Later calls do nothing.
+    def __reportStartup__(self):
+        if not self.__startup__.finish('first tick'):
+            return
+        report = self.__startup__.getReport()
+        self.__Logger__.writeEvent('startup', report, seconds=self.__startup__.getTotal(), steps=dict(self.__startup__.getSteps()))
+        self.statusBus.publish("Startup", report)
+        for name, seconds in self.__startup__.getSteps():
+            Metrics.registry.setGauge('bitbot_startup_seconds', seconds, step=name)
+        Metrics.registry.setGauge('bitbot_startup_seconds', self.__startup__.getTotal(), step='total')
+
+#   __tickPairs__
 #       - Purpose:
-#           Submit a sell order for as much of a particular currency as the user can provide (all in).
+#           Let some of the pairs consult their policy with the latest ticker.
 #       - Parameters:
-#           * (currentPrice) A string representation of a number indicating the current ticker price.
+#           * (priceCharts) The dictionary returned by returnTicker
+#           * (pairTraders) The PairTraders to tick
+    def __tickPairs__(self, priceCharts, pairTraders):
+        # The available BTC is split evenly between the pairs that are looking to buy. A buy placed by one pair has
+        # already been taken from the balance when the next one ticks, so each pair's allocation is worked out from
+        # the balance left when it ticks, to the same share of the balance the tick started with.
+        buyingPairs = self.__getBuyingPairs__()
+        tickAvailable = self.__getAvailable__()
+
+        for pairTrader in pairTraders:
+            allocation = getAllocations(buyingPairs, tickAvailable, self.__getAvailable__()).get(pairTrader, 1.0)
+            try:
+                pairTrader.tick(priceCharts, allocation)
+            except Exception as e:
+                self.statusBus.publish("Error", 'Error trading %s: %s' % (pairTrader.getCurrencyPair(), str(e)))
+                self.__Logger__.writeEvent('error', 'Error trading %s: %s' % (pairTrader.getCurrencyPair(), str(e)), pairTrader.getCurrencyPair())
+            # An order which filled when it was placed changes the state of the pairs ticked after it
+            self.__updatePairs__()
+
+#   __getBuyingPairs__
 #       - Returns:
-#           An order receipt dictionary containing the order number.
-#       - NOTE:
-#           Orders will likely not be instant which needs to be accounted for after this function is called.
-#           A the order has not cleared and the bot wants to buy then the buy must be delayed or the order 
-#           must be canceled and the bot will look to sell again.
-#   
-#           Add check if no balances are available and throw exception. Need to create custom exception.
-    def __sellAllIn__(self, priceCharts):
-        tradableBalance = self.__poloniexAPI__.returnCompleteBalances()
-        subjectCurrencyCost = priceCharts['BTC_'+self.__subjectCurrency__]['last']
-        amount = tradableBalance[self.__subjectCurrency__]['available']
-        if bool(Bitbot_CDO.use_immediate_or_cancel_orders):
-            orderReceipt = self.__poloniexAPI__.sell('BTC_'+self.__subjectCurrency__, subjectCurrencyCost, str(amount), immediateOrCancel=True)
-        else:
-            orderReceipt = self.__poloniexAPI__.sell('BTC_'+self.__subjectCurrency__, subjectCurrencyCost, str(amount))
-        return orderReceipt
-
-    # __getCandleSticks__
-    #   - Purpose:
-    #       Build a poloniex API query and return the resulting candlestick closing history.
-    #   - Returns:
-    #       Candlestick closing prices, as string representation, at the specified interval in the config. (A list of closing prices as floats).
-    def __getCandleSticks__(self):
-        startDate = None
-        endDate = datetime.datetime.now()
-        if self.__period_unit__ == "DAYS": 
-            startDate = (endDate - datetime.timedelta(days=self.__measurement_period__ * 2)).timestamp()
-        elif self.__period_unit__ == "HOURS":
-            # Calculation needs fixed like minutes
-            startDate = (endDate - datetime.timedelta(hours=self.__measurement_period__ * 2)).timestamp()
-        elif self.__period_unit__ == "MINUTES":
-            startDate = (endDate - datetime.timedelta(minutes=self.__measurement_period__ * (2*(int(self.__candlestick_period__)/60)))).timestamp()
-        else:
-            self.printQueueLock.acquire()
-            self.printQueue.put(("Error", "No Such Period Unit %s".format(self.__period_unit__)))
-            self.printQueueLock.release()
-            #print("No such period unit %s" % (self.__period_unit__))
-            return None
-
-        endDate = endDate.timestamp()
-        history = self.__poloniexAPI__.returnChartData(self.__principalCurrency__+'_'+self.__subjectCurrency__, startDate, endDate, self.__candlestick_period__)
-        closing_history = []
-
-        for item in history:
-            closing_history.append(item['close'])
-
-        return closing_history
-
-    # __buildArgs__
-    #   - Purpose:
-    #       Build a dictionary of arguments to be passed to a policy class.
-    #   - Parameters:
-    #       (priceCharts) A dictionary of all current crypto prices and volume data sorted by currency pair.
-    #       (sellPrice) The price at which the bot last sold its' crypto.
-    #       (buyPrice) The price at which the bot last bought its' crypto.
-    #       (candlesticks) An array of candlestick data containing the closing prices of the selected crypto
-    #                      at the selected candlestick period/interval.
-    #   - Returns:
-    #       A dictionary of relevent cryptocurrency data that is to be passed to the policy class.
-    def __buildArgs__(self, priceCharts, sellPrice, buyPrice, candlesticks):
-        args = {'candle_period' : self.__candlestick_period__,
-                'measurement_period' : self.__measurement_period__,
-                'period_unit' : self.__period_unit__,
-                'currencyPair' : self.__principalCurrency__+'_'+self.__subjectCurrency__,
-                'printQueue' : self.printQueue,
-                'printQueueLock' : self.printQueueLock,
-                'removeQueue' : self.removeQueue,
-                'removeQueueLock' : self.removeQueueLock,
-                'candlesticks' : candlesticks,
-                'priceCharts' : priceCharts,
-                'sellPrice' : sellPrice,
-                'buyPrice': buyPrice}
-        return args
+#           The pairs looking to buy without an order pending, in the order they are ticked.
+    def __getBuyingPairs__(self):
+        return [pairTrader for pairTrader in self.__pair_traders__
+                if pairTrader.getTradingState() == self.__BUY_PHASE__ and not pairTrader.ordersArePending()]
+
+#   __getAvailable__
+#       - Returns:
+#           The available BTC of the account cache.
+    def __getAvailable__(self):
+        return float(self.__account_cache__.getBalances()[self.__principalCurrency__])
+
+#   __updateOrders__
+#       - Purpose:
+#           Check whether the pending orders have cleared. The orders of the tracker which are due a check are
+#           polled and the pairs whose orders finished update their state from the tracked balances. The whole
+#           account state is only fetched when __stateCheckIsDue__.
+#       - Return:
+#           The account balances dictionary.
+    def __updateOrders__(self):
+        if self.__stateCheckIsDue__():
+            return self.__checkState__()
+        self.__order_tracker__.poll()
+        self.__updatePairs__()
+        return self.__account_cache__.getBalances()
+
+#   __stateCheckIsDue__
+#       - Purpose:
+#           Check whether the account state has to be fetched instead of polling the tracked orders: the tracker is
+#           due a reconciliation, or a pending pair has no tracked orders (in testing mode no orders are placed,
+#           and orders placed before a restart are only adopted by a reconciliation).
+    def __stateCheckIsDue__(self):
+        orderTracker = self.__order_tracker__
+        return orderTracker.needsReconcile() or any(pairTrader.ordersArePending() and not orderTracker.hasOpenOrders(pairTrader.getCurrencyPair())
+                                                    for pairTrader in self.__pair_traders__)
+
+#   __updatePairs__
+#       - Purpose:
+#           Once a tracked order has finished, update the state of every pair from the balances of the account
+#           cache (as __checkState__ does from the fetched ones), since the balance an order spent or received
+#           decides what the other pairs can do too.
+    def __updatePairs__(self):
+        if not self.__order_tracker__.popFinishedPairs():
+            return
+        accountBalances = self.__account_cache__.getBalances()
+        openOrders = self.__order_tracker__.getOpenOrders()
+        for pairTrader in self.__pair_traders__:
+            pairTrader.updateState(accountBalances, openOrders)
+
+#   __checkState__
+#       - Purpose:
+#           Fetch the account balances and the open orders of every market once and let each pair decide whether
+#           it should be selling or buying and whether its' orders have cleared. The balances are fetched into the
+#           account cache and the order tracker is reconciled with the open orders.
+#       - Return:
+#           The account balances dictionary in the format of returnBalances.
+    def __checkState__(self):
+        self.__account_cache__.refresh(force=True)
+        accountBalances = self.__account_cache__.getBalances()
+        openOrders = self.__poloniexAPI__.returnOpenOrders('all')
+        self.__order_tracker__.reconcile(openOrders)
+        for pairTrader in self.__pair_traders__:
+            pairTrader.updateState(accountBalances, openOrders)
+        return accountBalances
+
+# getSubjectCurrencies
+#   - Purpose:
+#       Read the list of coins to trade from crypto_coin, which holds one coin or a comma separated list
+#       (i.e. XRP,ETH,LTC).
+#   - Returns:
+#       A list of currency names.
+def getSubjectCurrencies():
+    return [coin.strip() for coin in Bitbot_CDO.crypto_coin.split(',') if coin.strip()]
+
+# getAllocations
+#   - Purpose:
+#       Split the available BTC evenly between the pairs looking to buy. The BTC not committed to orders when the
+#       tick started is shared between the buying pairs with no order pending, so each gets the same amount whether
+#       the pairs before it bought or not; the shares are given as fractions of the balance available now.
+#   - Parameters:
+#       * (buyingPairs) The pairs looking to buy without an order pending
+#       * (tickAvailable) The available BTC when the tick started
+#       * (available) The available BTC now, after the buys placed so far this tick
+#   - Returns:
+#       A dictionary of the fraction of the available balance each pair of buyingPairs may spend.
+def getAllocations(buyingPairs, tickAvailable, available):
+    if available <= 0.0:
+        return dict((pairTrader, 1.0) for pairTrader in buyingPairs)
+    share = tickAvailable / len(buyingPairs) if buyingPairs else available
+    return dict((pairTrader, min(1.0, share / available)) for pairTrader in buyingPairs)
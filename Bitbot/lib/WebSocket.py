@@ -0,0 +1,214 @@
+#### WebSocket ####
+# A small WebSocket (RFC 6455) connection over a blocking socket, enough to follow the Poloniex push API and to
+# serve the local stand-in feed. Only text messages are used. Pings are answered automatically and fragmented
+# messages are joined.
+
+import socket, ssl, os, base64, hashlib, struct
+from urllib.parse import urlsplit
+
+__GUID__ = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+class WebSocketError(Exception):
+    """Raised when the handshake fails or the other side breaks the protocol."""
+
+class WebSocket(object):
+
+    # Opcodes
+    __CONTINUATION__ = 0x0
+    __TEXT__ = 0x1
+    __BINARY__ = 0x2
+    __CLOSE__ = 0x8
+    __PING__ = 0x9
+    __PONG__ = 0xA
+
+#   __init__
+#       - Parameters:
+#           * (sock) A connected socket which has completed the opening handshake
+#           * (mask) True on the client side. Frames sent by a client must be masked, frames sent by a server must not.
+#           * (buffered) Bytes already read from the socket after the handshake
+#       - Purpose:
+#           Initialize the class properties.
+    def __init__(self, sock, mask, buffered=b''):
+        self.__socket__ = sock
+        self.__mask__ = mask
+        self.__buffer__ = bytearray(buffered)
+        self.__closed__ = False
+
+    def settimeout(self, timeout):
+        self.__socket__.settimeout(timeout)
+
+#   sendText
+#       - Purpose:
+#           Send a text message.
+    def sendText(self, text):
+        self.__sendFrame__(self.__TEXT__, text.encode('utf-8'))
+
+#   recv
+#       - Purpose:
+#           Wait for the next text or binary message.
+#       - Returns:
+#           (str) The message, or None once the connection is closed.
+    def recv(self):
+        message = bytearray()
+        messageType = None
+        while not self.__closed__:
+            fin, opcode, payload = self.__recvFrame__()
+            if opcode == self.__PING__:
+                self.__sendFrame__(self.__PONG__, payload)
+            elif opcode == self.__PONG__:
+                continue
+            elif opcode == self.__CLOSE__:
+                if not self.__closed__:
+                    try:
+                        self.__sendFrame__(self.__CLOSE__, payload[:2])
+                    except OSError:
+                        pass
+                self.close()
+                return None
+            else:
+                if opcode != self.__CONTINUATION__:
+                    messageType = opcode
+                message.extend(payload)
+                if fin:
+                    return message.decode('utf-8') if messageType == self.__TEXT__ else bytes(message)
+        return None
+
+#   close
+#       - Purpose:
+#           Send a close frame (if the connection is still open) and close the socket.
+    def close(self):
+        if self.__closed__:
+            return
+        self.__closed__ = True
+        try:
+            self.__sendFrame__(self.__CLOSE__, struct.pack('!H', 1000), force=True)
+        except OSError:
+            pass
+        try:
+            self.__socket__.close()
+        except OSError:
+            pass
+
+    def __sendFrame__(self, opcode, payload, force=False):
+        if self.__closed__ and not force:
+            raise WebSocketError("The connection is closed")
+        length = len(payload)
+        maskBit = 0x80 if self.__mask__ else 0
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, maskBit | length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, maskBit | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, maskBit | 127, length)
+        if self.__mask__:
+            maskKey = os.urandom(4)
+            header += maskKey
+            payload = applyMask(payload, maskKey)
+        self.__socket__.sendall(header + payload)
+
+    def __recvFrame__(self):
+        first, second = self.__recvExactly__(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self.__recvExactly__(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.__recvExactly__(8))[0]
+        maskKey = self.__recvExactly__(4) if second & 0x80 else None
+        payload = self.__recvExactly__(length)
+        if maskKey is not None:
+            payload = applyMask(payload, maskKey)
+        return (bool(first & 0x80), first & 0x0F, payload)
+
+    def __recvExactly__(self, size):
+        while len(self.__buffer__) < size:
+            data = self.__socket__.recv(max(65536, size - len(self.__buffer__)))
+            if not data:
+                raise ConnectionResetError("Connection closed by the other side")
+            self.__buffer__.extend(data)
+        data = bytes(self.__buffer__[:size])
+        del self.__buffer__[:size]
+        return data
+
+# applyMask
+#   - Purpose:
+#       XOR a payload with a 4 byte masking key (masking and unmasking are the same operation).
+def applyMask(payload, maskKey):
+    if not payload:
+        return b''
+    repeated = (maskKey * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+
+# connect
+#   - Purpose:
+#       Open a client connection to a ws:// or wss:// URL.
+#   - Parameters:
+#       * (url) The WebSocket URL (i.e. wss://api2.poloniex.com)
+#       * (timeout) Seconds allowed to connect and complete the handshake
+#   - Returns:
+#       A WebSocket.
+def connect(url, timeout=10.0):
+    parts = urlsplit(url)
+    secure = parts.scheme == 'wss'
+    port = parts.port or (443 if secure else 80)
+    sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        request = ("GET %s HTTP/1.1\r\nHost: %s\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                   "Sec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\n\r\n" % (path, parts.hostname, key))
+        sock.sendall(request.encode('latin-1'))
+
+        headers, buffered = __readHeaders__(sock)
+        statusLine = headers.pop('', '')
+        if ' 101 ' not in statusLine + ' ':
+            raise WebSocketError("Handshake failed: %s" % (statusLine))
+        if headers.get('sec-websocket-accept') != __acceptKey__(key):
+            raise WebSocketError("Handshake failed: bad Sec-WebSocket-Accept")
+    except Exception:
+        sock.close()
+        raise
+    return WebSocket(sock, True, buffered)
+
+# accept
+#   - Purpose:
+#       Complete the server side of the opening handshake on an accepted socket.
+#   - Returns:
+#       A WebSocket.
+def accept(sock):
+    headers, buffered = __readHeaders__(sock)
+    key = headers.get('sec-websocket-key')
+    if key is None or headers.get('upgrade', '').lower() != 'websocket':
+        sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        raise WebSocketError("Not a WebSocket handshake")
+    response = ("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                "Sec-WebSocket-Accept: %s\r\n\r\n" % (__acceptKey__(key)))
+    sock.sendall(response.encode('latin-1'))
+    return WebSocket(sock, False, buffered)
+
+def __acceptKey__(key):
+    return base64.b64encode(hashlib.sha1((key + __GUID__).encode('ascii')).digest()).decode('ascii')
+
+# __readHeaders__
+#   - Returns:
+#       A tuple of (headers, buffered) where headers maps lower case names to values (the request or status line
+#       is under '') and buffered holds any bytes read past the end of the headers.
+def __readHeaders__(sock):
+    data = b''
+    while b'\r\n\r\n' not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise WebSocketError("Connection closed during the handshake")
+        data += chunk
+        if len(data) > 65536:
+            raise WebSocketError("Handshake headers too long")
+    head, buffered = data.split(b'\r\n\r\n', 1)
+    lines = head.decode('latin-1').split('\r\n')
+    headers = {'' : lines[0]}
+    for line in lines[1:]:
+        name, separator, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return (headers, buffered)
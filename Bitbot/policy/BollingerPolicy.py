@@ -4,59 +4,47 @@
 # not to buy a coin at the current price.
 
 import math
-import pandas as pd
-import numpy as np
 from lib import Bitbot_CDO
-from policy.PolicyTemplate import PolicyTemplate
+from lib.Indicators import getIndicator
+from lib.RollingBollinger import RollingBollinger
+from policy.PolicyTemplate import PolicyTemplateV2
 
-class BollingerPolicy(PolicyTemplate):
+class BollingerPolicy(PolicyTemplateV2):
 
-    __HighestPrice__ = 0.0
+    __HighestPrice__ = {}       # currencyPair -> highest price reached since buying
+
+    PARAMETER_SPACE = {'measurement_period' : (10, 60),
+                       'sell_safety_threshold' : (0.2, 3.0),
+                       'upper_band_sma_minimum_gradient' : (0.0, 1.0),
+                       'lower_band_sma_minimum_gradient' : (-0.5, 0.5)}
 
     # shouldBuy
     #   - Purpose:  
     #       Determine whether to buy a cryptocurrency at the current price.
     #   - Parameters:
-    #       * (args) A dictionary passed from the TraderThread containing:
-    #           { 'candle_period' : self.__candlestick_period__,
-    #            'measurement_period' : self.__measurement_period__,
-    #            'period_unit' : self.__period_unit__,
-    #            'currency' : self.__currency__,
-    #            'candlesticks' : candlesticks,
-    #            'priceCharts' : priceCharts,
-    #            'sellPrice' : sellPrice,
-    #            'buyPrice': buyPrice }
+    #       * (context) The PolicyContext of the pair (see PolicyTemplateV2.shouldBuy)
     #   - Returns: 
     #       (boolean) Value indicating whether to buy: [True = 'yes'] [False = 'no']
-    def shouldBuy(args):
-        bollingerBands = BollingerPolicy.__getBollingerBands__(args['candlesticks'], args['measurement_period'])
-        currencyPair = args['currencyPair']
-        currentPrice = args['priceCharts'][currencyPair]['last']
-        printQueue = args['printQueue']
-        printQueueLock = args['printQueueLock']
-        removeQueue = args['removeQueue']
-        removeQueue = args['removeQueueLock']
-
-        priceOverBandPercentage = (float(currentPrice)/float(bollingerBands['lowerband'][-1])*100.0) - 100
+    def shouldBuy(context):
+        bollingerBands = BollingerPolicy.__getRollingBands__(context)
+        currencyPair = context.currencyPair
+        currentPrice = context.price
+        statusBus = context.statusBus
+
+        priceOverBandPercentage = (currentPrice/float(bollingerBands['lowerband'][-1])*100.0) - 100
         lowerbandGradient = BollingerPolicy.__amplifyGradient__(float(bollingerBands['lowerband'][-1])-float(bollingerBands['lowerband'][-2]))
         upperbandGradient = BollingerPolicy.__amplifyGradient__(float(bollingerBands['upperband'][-1])-float(bollingerBands['upperband'][-2]))
         smaGradient = BollingerPolicy.__amplifyGradient__(float(bollingerBands['sma'][-1])-float(bollingerBands['sma'][-2]))
 
-        printQueueLock.acquire()
-        printQueue.put(('Info', 'pobp : %f\tlbg : %f\tubg : %f' % (priceOverBandPercentage, lowerbandGradient, upperbandGradient)))
-        printQueueLock.release()
+        statusBus.publish(currencyPair + ' Info', 'pobp : %f\tlbg : %f\tubg : %f' % (priceOverBandPercentage, lowerbandGradient, upperbandGradient))
 
         # Check if price is certain percent above lowerband and lowerband slope is not negative
         #if (priceOverBandPercentage <= float(Bitbot_CDO.lower_band_buy_proximity)) and (lowerbandGradient >= float(Bitbot_CDO.lower_band_sma_minimum_gradient)):
-        #    printQueueLock.acquire()
-        #    printQueue.put(('Reason', 'Buying for reason (pobp : %.2f) (lbg : %.2f)' % (priceOverBandPercentage, lowerbandGradient)))
-        #    printQueueLock.release()
+        #    statusBus.publish(currencyPair + ' Reason', 'Buying for reason (pobp : %.2f) (lbg : %.2f)' % (priceOverBandPercentage, lowerbandGradient))
         #    return True
         # Check if upperband slope is positive and sma band slope is positive indicating uptrend
         if (upperbandGradient >= float(Bitbot_CDO.upper_band_sma_minimum_gradient)) and (smaGradient >= float(Bitbot_CDO.upper_band_sma_minimum_gradient)):
-            printQueueLock.acquire()
-            printQueue.put(('Reason', 'Buying for reason (ubg : %.2f) (smag : %.2f)' % (upperbandGradient, smaGradient)))
-            printQueueLock.release()
+            statusBus.publish(currencyPair + ' Reason', 'Buying for reason (ubg : %.2f) (smag : %.2f)' % (upperbandGradient, smaGradient))
             return True
 
         return False
@@ -65,57 +53,39 @@ class BollingerPolicy(PolicyTemplate):
     #   - Purpose:  
     #       Determine whether to sell a cryptocurrency at the current price.
     #   - Parameters:
-    #       * (args) A dictionary passed from the TraderThread containing:
-    #           { 'candle_period' : self.__candlestick_period__,
-    #            'measurement_period' : self.__measurement_period__,
-    #            'period_unit' : self.__period_unit__,
-    #            'currency' : self.__currency__,
-    #            'candlesticks' : candlesticks,
-    #            'priceCharts' : priceCharts,
-    #            'sellPrice' : sellPrice,
-    #            'buyPrice': buyPrice }
+    #       * (context) The PolicyContext of the pair (see PolicyTemplateV2.shouldBuy)
     #   - Returns: 
     #       (boolean) Value indicating whether to sell: [True = 'yes'] [False = 'no']
-    def shouldSell(args):
-        bollingerBands = BollingerPolicy.__getBollingerBands__(args['candlesticks'], args['measurement_period'])
-        currencyPair = args['currencyPair']
-        currentPrice = args['priceCharts'][currencyPair]['last']
-        buyPrice = args['buyPrice']
-        printQueue = args['printQueue']
-        printQueueLock = args['printQueueLock']
-        removeQueue = args['removeQueue']
-        removeQueue = args['removeQueueLock']
-
-        currentPrice = float(currentPrice)
-        if currentPrice > BollingerPolicy.__HighestPrice__:
-            BollingerPolicy.__HighestPrice__ = currentPrice
-
-        currentDifferenceFromBuy = (((float(currentPrice)/float(buyPrice)*100.0))-100)
-        currentDifferenceFromHighest = (100.0-((currentPrice/BollingerPolicy.__HighestPrice__)*100.0))
+    def shouldSell(context):
+        bollingerBands = BollingerPolicy.__getRollingBands__(context)
+        currencyPair = context.currencyPair
+        currentPrice = context.price
+        buyPrice = context.buyPrice
+        statusBus = context.statusBus
+
+        highestPrice = BollingerPolicy.__HighestPrice__.get(currencyPair, 0.0)
+        if currentPrice > highestPrice:
+            highestPrice = currentPrice
+            BollingerPolicy.__HighestPrice__[currencyPair] = highestPrice
+
+        currentDifferenceFromBuy = (((currentPrice/buyPrice*100.0))-100)
+        currentDifferenceFromHighest = (100.0-((currentPrice/highestPrice)*100.0))
         lowerbandGradient = BollingerPolicy.__amplifyGradient__(float(bollingerBands['lowerband'][-1])-float(bollingerBands['lowerband'][-2]))
         smaGradient = BollingerPolicy.__amplifyGradient__(float(bollingerBands['sma'][-1])-float(bollingerBands['sma'][-2]))
 
-        printQueueLock.acquire()
-        printQueue.put(('Info', 'cdb : %f\tlbg : %f\tsma : %f' % (currentDifferenceFromBuy, lowerbandGradient, smaGradient)))
-        printQueueLock.release()
+        statusBus.publish(currencyPair + ' Info', 'cdb : %f\tlbg : %f\tsma : %f' % (currentDifferenceFromBuy, lowerbandGradient, smaGradient))
 
         # If the current price is a certain percentage below the buy price, sell.
         if currentDifferenceFromBuy <= (-1.0 * float(Bitbot_CDO.sell_safety_threshold)):
-            printQueueLock.acquire()
-            printQueue.put(('Reason', 'Selling for reason (buyDif : %.2f)' % (currentDifferenceFromBuy)))
-            printQueueLock.release()
+            statusBus.publish(currencyPair + ' Reason', 'Selling for reason (buyDif : %.2f)' % (currentDifferenceFromBuy))
             return True
         # If the current price is a certain percentage below the highest gain price, sell.
         elif currentDifferenceFromHighest >= float(Bitbot_CDO.sell_safety_threshold):
-            printQueueLock.acquire()
-            printQueue.put(('Reason', 'Selling for reason (highDif : %.2f)' % (currentDifferenceFromHighest)))
-            printQueueLock.release()
+            statusBus.publish(currencyPair + ' Reason', 'Selling for reason (highDif : %.2f)' % (currentDifferenceFromHighest))
             return True
         # Check if slope of SMA and lower are negative indicating downtrend
         elif (lowerbandGradient <= float(Bitbot_CDO.lower_band_sma_minimum_gradient)) and (smaGradient <= float(Bitbot_CDO.lower_band_sma_minimum_gradient)):
-            printQueueLock.acquire()
-            printQueue.put(('Reason', 'Selling for reason (lbg : %.2f) (smag : %.2f)' % (lowerbandGradient, smaGradient)))
-            printQueueLock.release()
+            statusBus.publish(currencyPair + ' Reason', 'Selling for reason (lbg : %.2f) (smag : %.2f)' % (lowerbandGradient, smaGradient))
             return True
 
         return False
@@ -124,8 +94,20 @@ class BollingerPolicy(PolicyTemplate):
     #       - Purpose:
     #           The policy keeps track of the highest price reached when looking to sell. This should
     #           be cleared (set to 0) after selling.
-    def cleanUp(args):
-        BollingerPolicy.__HighestPrice__ = 0.0
+    def cleanUp(context):
+        BollingerPolicy.__HighestPrice__[context.currencyPair] = 0.0
+
+    # __getRollingBands__
+    #   - Purpose:
+    #       Returns the sma and Bollinger bands of the candlesticks of the context using a RollingBollinger kept in
+    #       the indicator cache of the pair. The bands are only recalculated when new candlesticks arrive, and then
+    #       only for the new candlesticks, so shouldBuy/shouldSell can be called every tick.
+    #   - Parameters:
+    #       * (context) The PolicyContext of the pair.
+    #   - Returns:
+    #       A dictionary of the latest sma and Bollinger band values.
+    def __getRollingBands__(context):
+        return getIndicator(context, RollingBollinger, context.measurementPeriod)
 
     # __getBollingerBands__
     #   - Purpose:  
@@ -137,6 +119,9 @@ class BollingerPolicy(PolicyTemplate):
     #       A dictionary of sma and Bollinger bands
     def __getBollingerBands__(dataset, period):
 
+        # pandas is only imported by this helper (the trader uses __getRollingBands__) so starting Bitbot does not
+        # wait on it
+        import pandas as pd
         dataframe = pd.DataFrame(dataset)
         sma = dataframe.rolling(window=period).mean()
         std = dataframe.rolling(window=period).std()
@@ -172,6 +157,9 @@ class BollingerPolicy(PolicyTemplate):
     #       (float) The amplified gradient
     def __amplifyGradient__(gradient):
         amplifier = 1
+        # A flat band has no leading zeroes to count (and log10(0) is undefined).
+        if gradient == 0:
+            return 0.0
         # Taking the log of a negative number causes an exception. Take the log of the positive of the number.
         numLeadingZeroes = math.ceil(math.log10(abs(gradient)))
 
@@ -1,9 +1,48 @@
 #### PolicyTemplate ####
 # This class acts as an interface/abstract class for implementing a trading policy.
 # A custom trading policy must inheret this class and implement the specified functions to work.
+#
+# There are two versions of the interface. A policy inheriting PolicyTemplate (version 1) is handed a dictionary of
+# arguments built for it every tick. A policy inheriting PolicyTemplateV2 (version 2) is handed the PolicyContext of
+# the pair instead: the prices are already floats and indicators computed through context.indicators are shared
+# between shouldBuy, shouldSell and any other policy of the pair until the candlesticks change. The trader calls
+# every policy through getPolicyInterface, which wraps version 1 policies in a LegacyPolicyAdapter.
+
+# loadPolicyClass
+#   - Purpose:
+#       Import a policy module and return the policy class with the same name as the module.
+#   - Parameters:
+#       * (policyModuleName) The package and module name of the policy (i.e. policy.BollingerPolicy)
+#   - Returns:
+#       The policy class.
+def loadPolicyClass(policyModuleName):
+    policyClassName = policyModuleName.split('.')[-1]
+    policyModule = __import__(policyModuleName, fromlist=[policyClassName])
+    return getattr(policyModule, policyClassName)
+
+# getPolicyInterface
+#   - Purpose:
+#       Return the object the trader calls shouldBuy/shouldSell/cleanUp on with a PolicyContext.
+#   - Parameters:
+#       * (policyClass) A policy class (version 1 or 2)
+#   - Returns:
+#       The class itself for a version 2 policy, otherwise a LegacyPolicyAdapter of it.
+def getPolicyInterface(policyClass):
+    if getattr(policyClass, 'POLICY_VERSION', 1) >= 2:
+        return policyClass
+    return LegacyPolicyAdapter(policyClass)
 
 class PolicyTemplate(object):
 
+    # The version of the interface the policy implements
+    POLICY_VERSION = 1
+    # Where the policy is run when it is part of a PolicyEnsemble: 'thread' for policies spending their time in NumPy,
+    # 'process' for policies spending their time in Python code
+    POLICY_EXECUTOR = 'thread'
+    # The bitbot.config keys Optimize.py may tune and the values it searches: (low, high) for a range (integers if
+    # both are ints) or a list of the values to choose from, i.e. {'measurement_period' : (10, 60)}
+    PARAMETER_SPACE = {}
+
     # shouldBuy
     #   - Purpose:  
     #       Determine whether to buy a cryptocurrency at the current price.
@@ -13,11 +52,14 @@ class PolicyTemplate(object):
     #            'measurement_period' : self.__measurement_period__,    
     #            'period_unit' : self.__period_unit__,                  
     #            'currency' : self.__currency__,                        
-    #            'candlesticks' : candlesticks,                     (list)
+    #            'statusBus' : statusBus,                           (StatusBus)
+    #            'candlesticks' : candlesticks,                     (CandleSeries)
     #            'priceCharts' : priceCharts,                       (list)    
     #            'sellPrice' : sellPrice,
     #            'buyPrice': buyPrice }
     #          All dictionary items are represented as strings
+    #          The candlesticks act as a list of the closing prices. getOpens(), getHighs(), getLows(),
+    #          getVolumes() and getDates() return the other fields as NumPy arrays.
     #   - Returns: 
     #       (boolean) Value indicating whether to buy: [True = 'yes'] [False = 'no']
     def shouldBuy(args):
@@ -32,11 +74,14 @@ class PolicyTemplate(object):
     #            'measurement_period' : self.__measurement_period__,    
     #            'period_unit' : self.__period_unit__,                  
     #            'currency' : self.__currency__,                        
-    #            'candlesticks' : candlesticks,                     (list)
+    #            'statusBus' : statusBus,                           (StatusBus)
+    #            'candlesticks' : candlesticks,                     (CandleSeries)
     #            'priceCharts' : priceCharts,                       (list)    
     #            'sellPrice' : sellPrice,
     #            'buyPrice': buyPrice }
     #          All dictionary items are represented as strings
+    #          The candlesticks act as a list of the closing prices. getOpens(), getHighs(), getLows(),
+    #          getVolumes() and getDates() return the other fields as NumPy arrays.
     #   - Returns: 
     #       (boolean) Value indicating whether to sell: [True = 'yes'] [False = 'no']
     def shouldSell(args):
@@ -49,20 +94,77 @@ class PolicyTemplate(object):
     def cleanUp(args):
         raise NotImplementedError("Policy function cleanUp() not implemented")
 
-    # __getBollingerBands__
-    #   - Purpose:  
-    #       Calculates Bollinger bands based on a dataset of the price history of a coin and returns a dictionary 
-    #       containing the sma, upper Bollinger band, and lower Bollinger band.
+    # publishStatus
+    #   - Purpose:
+    #       Publish a message on the status bus passed in args['statusBus'], or remove the key if there is no message.
     #   - Parameters:
-    #       * (period) An int dictating the size of the rolling window on the array.
-    #   - Returns: 
-    #       A dictionary of sma and Bollinger bands
-    def sendToQueue(self, queue, lock, key, mesg=None):
-        lock.acquire()
-        if not mesg == None:
-            queue.put((key, mesg))
+    #       * (statusBus) The StatusBus from args['statusBus']
+    #       * (key) The name the message is shown under
+    #       * (mesg) The message, or None to remove the key
+    def publishStatus(statusBus, key, mesg=None):
+        if mesg is None:
+            statusBus.remove(key)
         else:
-            queue.put(key)
-        lock.acquire()
-            
+            statusBus.publish(key, mesg)
+
+class PolicyTemplateV2(PolicyTemplate):
+
+    POLICY_VERSION = 2
+
+    # shouldBuy
+    #   - Purpose:
+    #       Determine whether to buy a cryptocurrency at the current price.
+    #   - Parameters:
+    #       * (context) The PolicyContext of the pair:
+    #           context.currencyPair                    (str)
+    #           context.candlePeriod                    (int, seconds)
+    #           context.measurementPeriod               (int)
+    #           context.periodUnit                      (str)
+    #           context.candlesticks                    (CandleSeries)
+    #           context.lastCandleDate                  (int, UNIX timestamp of the newest candle)
+    #           context.price, lowestAsk, highestBid    (float, from the ticker)
+    #           context.buyPrice, sellPrice             (float, 0.0 until the first order)
+    #           context.statusBus                       (StatusBus)
+    #           context.indicators                      (IndicatorCache)
+    #          Compute indicators with context.indicators.get(name, params, compute) so they are computed once per
+    #          candle for every policy of the pair.
+    #   - Returns:
+    #       (boolean) Value indicating whether to buy: [True = 'yes'] [False = 'no']
+    def shouldBuy(context):
+        raise NotImplementedError("Policy function shouldBuy() not implemented")
+
+    # shouldSell
+    #   - Purpose:
+    #       Determine whether to sell a cryptocurrency at the current price.
+    #   - Parameters:
+    #       * (context) The PolicyContext of the pair (see shouldBuy)
+    #   - Returns:
+    #       (boolean) Value indicating whether to sell: [True = 'yes'] [False = 'no']
+    def shouldSell(context):
+        raise NotImplementedError("Policy function shouldSell() not implemented")
+
+    #   cleanUp
+    #       - Purpose:
+    #           Clear the state the policy keeps for a position after selling.
+    def cleanUp(context):
+        raise NotImplementedError("Policy function cleanUp() not implemented")
+
+class LegacyPolicyAdapter(object):
+    """Calls a version 1 policy, which expects the args dictionary, with a PolicyContext."""
+
+    POLICY_VERSION = 2
+
+    def __init__(self, policyClass):
+        self.__policy_class__ = policyClass
+
+    def getPolicyClass(self):
+        return self.__policy_class__
+
+    def shouldBuy(self, context):
+        return self.__policy_class__.shouldBuy(context.getArgs())
+
+    def shouldSell(self, context):
+        return self.__policy_class__.shouldSell(context.getArgs())
 
+    def cleanUp(self, context):
+        return self.__policy_class__.cleanUp(context.getArgs())
@@ -3,56 +3,43 @@
 # to buy/sell if the current price is one of the outer zones.
 
 import math
-import pandas as pd
-import numpy as np
 from lib import Bitbot_CDO
-from policy.PolicyTemplate import PolicyTemplate
+from lib.Indicators import RollingStats, getIndicator
+from policy.PolicyTemplate import PolicyTemplateV2
 
-class ZonePolicy(PolicyTemplate):
+class ZonePolicy(PolicyTemplateV2):
+
+    PARAMETER_SPACE = {'measurement_period' : (10, 60),
+                       'red_zone_height' : (0.2, 2.0),
+                       'red_zone_threshold' : (0.0, 1.0)}
 
     # shouldBuy
     #   - Purpose:  
     #       Determine whether to buy a cryptocurrency at the current price.
     #   - Parameters:
-    #       * (args) A dictionary passed from the TraderThread containing:
-    #           { 'candle_period' : self.__candlestick_period__,
-    #            'measurement_period' : self.__measurement_period__,
-    #            'period_unit' : self.__period_unit__,
-    #            'currency' : self.__currency__,
-    #            'candlesticks' : candlesticks,
-    #            'priceCharts' : priceCharts,
-    #            'sellPrice' : sellPrice,
-    #            'buyPrice': buyPrice }
+    #       * (context) The PolicyContext of the pair (see PolicyTemplateV2.shouldBuy)
     #   - Returns: 
     #       (boolean) Value indicating whether to buy: [True = 'yes'] [False = 'no']
-    def shouldBuy(args):
-        currencyPair = args['currencyPair']
-        currentPrice = args['priceCharts'][currencyPair]['last']
-        candlesticks = args['candlesticks']
-        printQueue = args['printQueue']
-        printQueueLock = args['printQueueLock']
-        removeQueue = args['removeQueue']
-        removeQueue = args['removeQueueLock']
+    def shouldBuy(context):
+        currencyPair = context.currencyPair
+        currentPrice = context.price
+        statusBus = context.statusBus
 
-        dataframe = pd.DataFrame(candlesticks)
-        mean = dataframe.mean().values
-        std = dataframe.std().values
+        mean, std = getIndicator(context, RollingStats, context.candlesticks.getCapacity())
 
         upperbox_floor = mean + std
         upperbox_ceil = upperbox_floor + (std * float(Bitbot_CDO.red_zone_height))
         lowerbox_ceil = mean - std
         lowerbox_floor = lowerbox_ceil - (std * float(Bitbot_CDO.red_zone_height))
 
-        printQueueLock.acquire()
-        printQueue.put(('uf', upperbox_floor))
-        printQueue.put(('lc', lowerbox_ceil))
-        printQueue.put(('ut', upperbox_floor + ((upperbox_ceil - upperbox_floor) * float(Bitbot_CDO.red_zone_threshold))))
-        printQueue.put(('lt', lowerbox_ceil - ((lowerbox_ceil - lowerbox_floor) * float(Bitbot_CDO.red_zone_threshold))))
-        printQueueLock.release()
+        statusBus.publish(currencyPair + ' uf', upperbox_floor)
+        statusBus.publish(currencyPair + ' lc', lowerbox_ceil)
+        statusBus.publish(currencyPair + ' ut', upperbox_floor + ((upperbox_ceil - upperbox_floor) * float(Bitbot_CDO.red_zone_threshold)))
+        statusBus.publish(currencyPair + ' lt', lowerbox_ceil - ((lowerbox_ceil - lowerbox_floor) * float(Bitbot_CDO.red_zone_threshold)))
 
-        if float(currentPrice) >= upperbox_floor + ((upperbox_ceil - upperbox_floor) * float(Bitbot_CDO.red_zone_threshold)):
+        if currentPrice >= upperbox_floor + ((upperbox_ceil - upperbox_floor) * float(Bitbot_CDO.red_zone_threshold)):
             return True
-        if float(currentPrice) <= lowerbox_ceil - ((lowerbox_ceil - lowerbox_floor) * float(Bitbot_CDO.red_zone_threshold)):
+        if currentPrice <= lowerbox_ceil - ((lowerbox_ceil - lowerbox_floor) * float(Bitbot_CDO.red_zone_threshold)):
             return True
 
         return False
@@ -61,18 +48,10 @@ class ZonePolicy(PolicyTemplate):
     #   - Purpose:  
     #       Determine whether to sell a cryptocurrency at the current price.
     #   - Parameters:
-    #       * (args) A dictionary passed from the TraderThread containing:
-    #           { 'candle_period' : self.__candlestick_period__,
-    #            'measurement_period' : self.__measurement_period__,
-    #            'period_unit' : self.__period_unit__,
-    #            'currency' : self.__currency__,
-    #            'candlesticks' : candlesticks,
-    #            'priceCharts' : priceCharts,
-    #            'sellPrice' : sellPrice,
-    #            'buyPrice': buyPrice }
+    #       * (context) The PolicyContext of the pair (see PolicyTemplateV2.shouldBuy)
     #   - Returns: 
     #       (boolean) Value indicating whether to sell: [True = 'yes'] [False = 'no']
-    def shouldSell(args):
+    def shouldSell(context):
         return True
         raise NotImplementedError("Policy function shouldSell() not implemented")
 
@@ -80,22 +59,7 @@ class ZonePolicy(PolicyTemplate):
     #       - Purpose:
     #           The policy keeps track of the highest price reached when looking to sell. This should
     #           be cleared (set to 0) after selling.
-    def cleanUp(args):
+    def cleanUp(context):
         return
         raise NotImplementedError("Policy function cleanUp() not implemented")
 
-    # __getBollingerBands__
-    #   - Purpose:  
-    #       Calculates Bollinger bands based on a dataset of the price history of a coin and returns a dictionary 
-    #       containing the sma, upper Bollinger band, and lower Bollinger band.
-    #   - Parameters:
-    #       * (period) An int dictating the size of the rolling window on the array.
-    #   - Returns: 
-    #       A dictionary of sma and Bollinger bands
-    def sendToQueue(queue, lock, key, mesg=None):
-        lock.acquire()
-        if not mesg == None:
-            queue.put((key, mesg))
-        else:
-            queue.put(key)
-        lock.acquire()
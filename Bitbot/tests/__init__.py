@@ -0,0 +1,6 @@
+#### tests ####
+# The unit tests of Bitbot, one module per module of lib (test_<Module>.py). They use the standard unittest module
+# and the stub exchange, so they need no network or account. Run them from the Bitbot directory:
+#
+#   python3 -m unittest discover -s tests -t .
+#   python3 -m pytest tests
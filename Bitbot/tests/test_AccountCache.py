@@ -0,0 +1,77 @@
+#### test_AccountCache ####
+# Checks that the balances the OrderTracker writes through to the AccountCache stay equal to the balances of the
+# stub exchange, to the satoshi, over buys and sells which fill when placed, orders which rest on the book and fill
+# later, and orders which are canceled.
+
+import unittest
+from lib.AccountCache import AccountCache
+from lib.Amounts import floorAmount
+from lib.OrderTracker import OrderTracker
+from lib.Poloniex import poloniex
+from lib.StubExchange import StubMarket, LoopbackTransport
+
+class AccountCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.market = StubMarket(seed=3)
+        self.api = poloniex('API_KEY', 'API_SECRET', LoopbackTransport(self.market))
+        self.cache = AccountCache(self.api)
+        self.cache.refresh(force=True)
+        self.tracker = OrderTracker(self.api, self.cache, pollInterval=0.0, maxPollInterval=0.0)
+
+    def assertMatchesExchange(self):
+        exchange = self.api.returnCompleteBalances()
+        cached = self.cache.peekCompleteBalances()
+        for currency in ('BTC', 'XRP', 'ETH'):
+            self.assertEqual(cached[currency]['available'], exchange[currency]['available'], currency)
+            self.assertEqual(cached[currency]['onOrders'], exchange[currency]['onOrders'], currency)
+
+    def place(self, command, currencyPair, rate, amount, immediateOrCancel=False):
+        rate, amount = '%.8f' % (floorAmount(rate)), '%.8f' % (floorAmount(amount))
+        receipt = getattr(self.api, command)(currencyPair, rate, amount, immediateOrCancel=immediateOrCancel)
+        self.tracker.track(currencyPair, command, rate, amount, receipt)
+        return receipt
+
+    def getLast(self, currencyPair):
+        return float(self.api.returnTicker()[currencyPair]['last'])
+
+    def getAvailable(self, currency):
+        return float(self.cache.getBalances()[currency])
+
+    def test_fills_when_placed(self):
+        for currencyPair in ('BTC_XRP', 'BTC_ETH') * 10:
+            currency = currencyPair.split('_')[1]
+            rate = self.getLast(currencyPair)
+            self.place('buy', currencyPair, rate, self.getAvailable('BTC') / 2.0 / rate)
+            self.assertMatchesExchange()
+            self.market.step()
+            self.place('sell', currencyPair, self.getLast(currencyPair), self.getAvailable(currency))
+            self.assertMatchesExchange()
+        self.assertEqual(self.cache.getBalances()['XRP'], '0.00000000')
+
+    def test_resting_order_fills_later(self):
+        rate = self.getLast('BTC_XRP') * 0.999
+        receipt = self.place('buy', 'BTC_XRP', rate, 0.3 / rate)
+        self.assertEqual(receipt['resultingTrades'], [])
+        self.assertTrue(self.tracker.hasOpenOrders('BTC_XRP'))
+        self.assertMatchesExchange()
+        for step in range(2000):
+            self.market.step()
+            self.tracker.poll()
+            if not self.tracker.hasOpenOrders():
+                break
+        self.assertFalse(self.tracker.hasOpenOrders())
+        self.assertMatchesExchange()
+
+    def test_canceled_order_gives_back_what_it_held(self):
+        rate = self.getLast('BTC_ETH') * 0.9
+        receipt = self.place('buy', 'BTC_ETH', rate, 0.123456 / rate)
+        self.assertMatchesExchange()
+        self.api.cancel('BTC_ETH', receipt['orderNumber'])
+        self.tracker.poll()
+        self.assertFalse(self.tracker.hasOpenOrders())
+        self.assertMatchesExchange()
+        self.assertEqual(self.cache.getBalances()['BTC'], '1.00000000')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#### test_Backtester ####
+# Replays a small fixed set of candles through policies which buy and sell at known prices and checks the fills,
+# the fees, the drawdown and the window of candles the policy is handed.
+
+import unittest
+from lib.Backtester import Backtester, getCandleRows, getWindowLength, formatReport
+from policy.PolicyTemplate import PolicyTemplateV2
+
+PERIOD = 300
+START = 1500000000
+CLOSES = [1.0, 1.0, 1.0, 1.0, 2.0, 3.0, 4.0, 2.5, 1.0]
+
+def makeCandles(closes):
+    return [{'date' : START + index * PERIOD, 'open' : close, 'high' : close, 'low' : close, 'close' : close, 'volume' : 1.0}
+            for index, close in enumerate(closes)]
+
+class TradeAtPolicy(PolicyTemplateV2):
+    """Buys at 2.0 and sells at 4.0, recording what it is handed."""
+    seen = []
+    cleanUps = 0
+    def shouldBuy(context):
+        TradeAtPolicy.seen.append((context.lastCandleDate, len(context.candlesticks), context.price))
+        return context.price == 2.0
+    def shouldSell(context):
+        TradeAtPolicy.seen.append((context.lastCandleDate, len(context.candlesticks), context.price))
+        return context.price == 4.0
+    def cleanUp(context):
+        TradeAtPolicy.cleanUps += 1
+
+class LosingPolicy(PolicyTemplateV2):
+    """Buys at 3.0 and sells at 1.0."""
+    def shouldBuy(context): return context.price == 3.0
+    def shouldSell(context): return context.price == 1.0
+    def cleanUp(context): pass
+
+class BacktesterTests(unittest.TestCase):
+
+    def setUp(self):
+        TradeAtPolicy.seen = []
+        TradeAtPolicy.cleanUps = 0
+
+    def test_window_length(self):
+        # Twice the measurement period of 300 second candles, at least measurementPeriod + 1 candles
+        self.assertEqual(getWindowLength(2, 'MINUTES', PERIOD), 4)
+        self.assertEqual(getWindowLength(1, 'HOURS', PERIOD), 24)
+        self.assertEqual(getWindowLength(10, 'MINUTES', 86400), 20)
+        self.assertRaises(ValueError, getWindowLength, 2, 'WEEKS', PERIOD)
+
+    def test_winning_trade(self):
+        report = Backtester(TradeAtPolicy, 'BTC_XRP', makeCandles(CLOSES), PERIOD, 2, 'MINUTES', fee=0.002).run()
+        # Bought 0.998 / 2.0 coins at 2.0, sold them at 4.0 less the fee
+        finalBalance = 0.998 / 2.0 * 4.0 * 0.998
+        self.assertEqual((report['buys'], report['sells'], report['winning_sells'], report['candles']), (1, 1, 1, 6))
+        self.assertAlmostEqual(report['final_balance'], finalBalance, places=12)
+        self.assertAlmostEqual(report['profit'], (finalBalance - 1.0) * 100.0, places=10)
+        # The fee of the buy is the only drop below the starting balance
+        self.assertAlmostEqual(report['max_drawdown'], 0.2, places=10)
+
+        # The policy is asked from the last candle of the first full window, with a window of 4 candles
+        self.assertEqual(TradeAtPolicy.seen[0], (START + 3 * PERIOD, 4, 1.0))
+        self.assertEqual([date for date, length, price in TradeAtPolicy.seen], [START + index * PERIOD for index in range(3, 9)])
+        self.assertEqual(set(length for date, length, price in TradeAtPolicy.seen), {4})
+        # cleanUp is called before the first candle and after the sell
+        self.assertEqual(TradeAtPolicy.cleanUps, 2)
+
+    def test_losing_trade(self):
+        report = Backtester(LosingPolicy, 'BTC_XRP', makeCandles(CLOSES), PERIOD, 2, 'MINUTES', fee=0.0025).run()
+        finalBalance = 0.9975 / 3.0 * 1.0 * 0.9975
+        self.assertEqual((report['buys'], report['sells'], report['winning_sells']), (1, 1, 0))
+        self.assertAlmostEqual(report['final_balance'], finalBalance, places=12)
+        # The drawdown is measured from the high of the open position at 4.0
+        self.assertAlmostEqual(report['max_drawdown'], (1.0 - finalBalance / (0.9975 / 3.0 * 4.0)) * 100.0, places=10)
+
+    def test_open_position_is_valued_at_the_last_close(self):
+        report = Backtester(TradeAtPolicy, 'BTC_XRP', makeCandles(CLOSES[:6]), PERIOD, 2, 'MINUTES', fee=0.0).run()
+        self.assertEqual((report['buys'], report['sells']), (1, 0))
+        self.assertAlmostEqual(report['final_balance'], 1.5, places=12)
+        self.assertIn('Buys             : 1', formatReport(report))
+
+    def test_rows_and_dictionaries_give_the_same_result(self):
+        candles = makeCandles(CLOSES)
+        self.assertEqual(Backtester(TradeAtPolicy, 'BTC_XRP', getCandleRows(candles), PERIOD, 2, 'MINUTES').run(),
+                         Backtester(TradeAtPolicy, 'BTC_XRP', candles, PERIOD, 2, 'MINUTES').run())
+
+    def test_fewer_candles_than_the_window(self):
+        report = Backtester(TradeAtPolicy, 'BTC_XRP', makeCandles(CLOSES[:3]), PERIOD, 2, 'MINUTES').run()
+        self.assertEqual((report['buys'], report['candles'], report['profit']), (0, 0, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
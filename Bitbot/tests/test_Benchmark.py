@@ -0,0 +1,66 @@
+#### test_Benchmark ####
+# Checks the benchmark suite: the --verify checks hold, every benchmark can be set up and called once, and the timing
+# and comparison of results report what they should.
+
+import unittest, os, tempfile
+from lib import Bitbot_CDO
+from lib.Benchmark import Benchmark, measure, runBenchmarks, saveResults, loadResults, compareResults
+from benchmarks import getBenchmarks, getChecks
+from Bitbot import getConfigurations
+
+SIZES = [100]
+
+def makeResult(median):
+    return {'best' : median, 'median' : median, 'mean' : median, 'stdev' : 0.0, 'number' : 1, 'repeat' : 1}
+
+class BenchmarkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = dict(vars(Bitbot_CDO))
+        # The policies are benchmarked with the settings of bitbot.config, as Benchmark.py does
+        getConfigurations()
+
+    def tearDown(self):
+        for name in [name for name in vars(Bitbot_CDO) if name not in self.saved]:
+            delattr(Bitbot_CDO, name)
+        for name, value in self.saved.items():
+            if not name.startswith('__'):
+                setattr(Bitbot_CDO, name, value)
+
+    def test_checks_hold(self):
+        checks = getChecks(SIZES)
+        self.assertTrue(checks)
+        for name, check, tolerance in checks:
+            self.assertLessEqual(check(), tolerance, name)
+
+    def test_benchmarks_run(self):
+        benchmarks = getBenchmarks(SIZES)
+        self.assertEqual(len(set(benchmark.getKey() for benchmark in benchmarks)), len(benchmarks))
+        for benchmark in benchmarks:
+            benchmark.setup()()
+
+    def test_measure(self):
+        calls = []
+        result = measure(lambda: calls.append(None), minTime=0.001, repeat=3)
+        self.assertEqual(result['repeat'], 3)
+        # The repeats are timed with the number of calls found while calibrating
+        self.assertGreaterEqual(len(calls), result['number'] * 3)
+        self.assertLessEqual(result['best'], result['median'])
+
+    def test_compare_results(self):
+        baseline = {'a' : makeResult(1.0), 'b' : makeResult(2.0), 'gone' : makeResult(1.0)}
+        results = {'a' : makeResult(1.05), 'b' : makeResult(3.0), 'new' : makeResult(1.0)}
+        comparison = compareResults(baseline, results, threshold=0.1)
+        self.assertEqual([(key, regressed) for key, before, after, change, regressed in comparison], [('a', False), ('b', True)])
+        self.assertAlmostEqual(comparison[1][3], 0.5)
+
+    def test_save_and_load(self):
+        results = runBenchmarks([Benchmark('noop', lambda: (lambda: None), size=10)], minTime=0.001, repeat=2)
+        self.assertEqual(list(results), ['noop[10]'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            saveResults(path, results, {'python' : '3'})
+            self.assertEqual(loadResults(path), {'environment' : {'python' : '3'}, 'results' : results})
+
+if __name__ == '__main__':
+    unittest.main()
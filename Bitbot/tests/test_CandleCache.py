@@ -0,0 +1,77 @@
+#### test_CandleCache ####
+# Checks that refreshing the forming candle over and over does not grow the cache file without bound, that a cache
+# loaded from the file sees the last version of every candle, and that maxCandles only limits the candles kept in
+# memory. The cache works offline: the candles are handed to addChartData as returnChartData would return them.
+
+import os, shutil, tempfile, unittest
+from lib.CandleCache import CandleCache
+
+PERIOD = 300
+START = 1500000000
+
+def makeCandle(index, close):
+    return {'date' : START + index * PERIOD, 'open' : 1.0, 'high' : 2.0, 'low' : 0.5, 'close' : close, 'volume' : 1.0}
+
+class CandleCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir)
+
+    def getLineCount(self):
+        with open(os.path.join(self.cacheDir, 'BTC_XRP_%d.jsonl' % (PERIOD))) as f:
+            return sum(1 for line in f)
+
+    # Refresh like a trader: every call downloads the newest stored candle again together with the new ones
+    def refresh(self, cache, last, count):
+        history = [makeCandle(index, float(index) + 0.5) for index in range(max(last - 1, 0), last)]
+        history.append(makeCandle(last, float(count)))
+        cache.addChartData('BTC_XRP', PERIOD, (history[0]['date'], history[-1]['date'], False), history)
+
+    def test_file_is_compacted(self):
+        cache = CandleCache(None, self.cacheDir)
+        cache.addChartData('BTC_XRP', PERIOD, (START, START + 49 * PERIOD, False), [makeCandle(index, float(index) + 0.5) for index in range(50)])
+        count = 0
+        for last in range(50, 60):
+            # The candle is still forming for a while before the next one starts
+            for tick in range(30):
+                count += 1
+                self.refresh(cache, last, count)
+                self.assertLessEqual(self.getLineCount(), 2 * (last + 1) + 2)
+        self.assertEqual(len(cache.getAllCandles('BTC_XRP', PERIOD)), 60)
+
+        # A new cache reads the last version of every candle and rewrites the file without the replaced rows
+        candles = CandleCache(None, self.cacheDir).getAllCandles('BTC_XRP', PERIOD)
+        self.assertEqual(candles, cache.getAllCandles('BTC_XRP', PERIOD))
+        self.assertEqual([candle['date'] for candle in candles], [START + index * PERIOD for index in range(60)])
+        self.assertEqual(candles[-1]['close'], float(count))
+        self.assertEqual(candles[-2]['close'], 58.5)
+        self.assertEqual(self.getLineCount(), 60)
+
+    def test_max_candles(self):
+        cache = CandleCache(None, self.cacheDir, maxCandles=20)
+        cache.addChartData('BTC_XRP', PERIOD, (START, START + 49 * PERIOD, False), [makeCandle(index, float(index)) for index in range(50)])
+        for last in range(50, 80):
+            self.refresh(cache, last, last)
+        candles = cache.getAllCandles('BTC_XRP', PERIOD)
+        self.assertEqual([candle['date'] for candle in candles], [START + index * PERIOD for index in range(60, 80)])
+
+        # The window of the newest 20 candles is served from memory without downloading the head again
+        endDate = START + 79 * PERIOD + 100
+        self.assertEqual(cache.getDownloadRanges('BTC_XRP', PERIOD, endDate - 19 * PERIOD, endDate), [(START + 79 * PERIOD, endDate, False)])
+
+        # The file keeps the whole history, and a capped cache loading it only the newest candles
+        self.assertEqual(len(CandleCache(None, self.cacheDir).getAllCandles('BTC_XRP', PERIOD)), 80)
+        self.assertEqual(CandleCache(None, self.cacheDir, maxCandles=20).getAllCandles('BTC_XRP', PERIOD), candles)
+
+    def test_partial_line(self):
+        cache = CandleCache(None, self.cacheDir)
+        cache.addChartData('BTC_XRP', PERIOD, (START, START + 9 * PERIOD, False), [makeCandle(index, 1.0) for index in range(10)])
+        with open(os.path.join(self.cacheDir, 'BTC_XRP_%d.jsonl' % (PERIOD)), 'a') as f:
+            f.write('{"date": %d, "op' % (START + 10 * PERIOD))
+        self.assertEqual(len(CandleCache(None, self.cacheDir).getAllCandles('BTC_XRP', PERIOD)), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#### test_CandleSeries ####
+# Checks the ring buffer of CandleSeries: the candles once it has wrapped around, the views of the newest candles
+# (contiguous, read-only and sharing memory with the series), replacing the forming candle, update from lists of
+# candle dictionaries, dropBefore, copy and the version which changes with every change.
+
+import unittest
+import numpy as np
+from lib.CandleSeries import CandleSeries, getWindowCandles
+
+PERIOD = 300
+
+def makeRow(index):
+    return (float(index * PERIOD), index + 0.1, index + 0.2, index + 0.3, float(index), float(index * 10))
+
+def makeCandle(index, close=None):
+    return {'date' : index * PERIOD, 'open' : index + 0.1, 'high' : index + 0.2, 'low' : index + 0.3,
+            'close' : float(index) if close is None else close, 'volume' : float(index * 10)}
+
+class CandleSeriesTests(unittest.TestCase):
+
+    def test_wraparound(self):
+        series = CandleSeries(5)
+        for index in range(3):
+            series.append(makeRow(index))
+        self.assertEqual(list(series.getCloses()), [0.0, 1.0, 2.0])
+        # Every number of candles appended, the views hold the newest candles oldest first
+        for index in range(3, 23):
+            series.append(makeRow(index))
+            self.assertEqual(len(series), min(index + 1, 5))
+            self.assertEqual(list(series.getCloses()), [float(close) for close in range(max(index - 4, 0), index + 1)])
+            self.assertEqual(list(series.getDates(2)), [(index - 1) * PERIOD, index * PERIOD])
+            self.assertEqual(series.getLastDate(), index * PERIOD)
+        self.assertEqual(list(series.getHighs()), [index + 0.2 for index in range(18, 23)])
+        self.assertEqual(list(series.getVolumes(1)), [220.0])
+
+    def test_views(self):
+        series = CandleSeries(4)
+        for index in range(7):
+            series.append(makeRow(index))
+        closes = series.getCloses()
+        self.assertTrue(closes.flags['C_CONTIGUOUS'])
+        self.assertFalse(closes.flags.writeable)
+        self.assertTrue(np.shares_memory(closes, series.getField(CandleSeries.CLOSE)))
+        self.assertRaises(ValueError, closes.__setitem__, 0, 1.0)
+        # Asking for more candles than are held gives all of them
+        self.assertEqual(len(series.getCloses(100)), 4)
+        # The series reads like the sequence of its' closing prices
+        self.assertEqual(series[-1], 6.0)
+        self.assertEqual(list(series[1:3]), [4.0, 5.0])
+        self.assertEqual(list(series), [3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(np.asarray(series).tolist(), [3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(float(np.mean(series)), 4.5)
+
+    def test_replace_last(self):
+        series = CandleSeries(3)
+        for index in range(4):
+            series.append(makeRow(index))
+        version = series.getVersion()
+        series.replaceLast((3 * PERIOD, 0.0, 0.0, 0.0, 9.0, 0.0))
+        self.assertEqual(list(series.getCloses()), [1.0, 2.0, 9.0])
+        self.assertNotEqual(series.getVersion(), version)
+        # The candle which wrapped around is written at both of its' slots
+        series.append(makeRow(4))
+        self.assertEqual(list(series.getCloses()), [2.0, 9.0, 4.0])
+
+    def test_update(self):
+        series = CandleSeries(10)
+        self.assertEqual(series.update([makeCandle(index) for index in range(15)]), 10)
+        self.assertEqual(list(series.getCloses()), [float(index) for index in range(5, 15)])
+        # The whole history again with the forming candle changed and one new candle
+        history = [makeCandle(index) for index in range(14)] + [makeCandle(14, 20.0), makeCandle(15)]
+        self.assertEqual(series.update(history), 1)
+        self.assertEqual(list(series.getCloses(3)), [13.0, 20.0, 15.0])
+        version = series.getVersion()
+        self.assertEqual(series.update([]), 0)
+        self.assertEqual(series.getVersion(), version)
+
+    def test_drop_before_and_copy(self):
+        series = CandleSeries(6)
+        for index in range(9):
+            series.append(makeRow(index))
+        copy = series.copy()
+        version = series.getVersion()
+        series.dropBefore(6 * PERIOD)
+        self.assertEqual(list(series.getCloses()), [6.0, 7.0, 8.0])
+        self.assertNotEqual(series.getVersion(), version)
+        # Nothing older is left, so dropping again changes nothing
+        version = series.getVersion()
+        series.dropBefore(6 * PERIOD)
+        self.assertEqual(series.getVersion(), version)
+        # The copy keeps what the series held and is not changed by it
+        series.append(makeRow(9))
+        self.assertEqual(list(copy.getCloses()), [3.0, 4.0, 5.0, 6.0, 7.0, 8.0])
+        self.assertEqual(list(series.getCloses()), [6.0, 7.0, 8.0, 9.0])
+        series.clear()
+        self.assertEqual(len(series), 0)
+        self.assertIsNone(series.getLastDate())
+
+    def test_window_candles(self):
+        self.assertEqual(getWindowCandles(3000, PERIOD), 11)
+        self.assertEqual(getWindowCandles(3100, PERIOD), 11)
+        self.assertEqual(getWindowCandles(0, PERIOD), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#### test_Indicators ####
+# Checks the streaming indicators against their batch functions candle by candle, including candles which are still
+# forming when they are first seen, and that an indicator is rebuilt when its' CandleSeries is cut short with
+# dropBefore. EMA, RSI, MACD and ATR must give identical values; RollingStats updates its' sums rather than
+# recomputing each window, so it only has to agree with sma and rollingStd to within rounding.
+
+import math, unittest
+import numpy as np
+from lib.CandleSeries import CandleSeries
+from lib.Indicators import RollingStats, EMA, RSI, MACD, ATR, sma, rollingStd, ema, rsi, macd, atr
+
+PERIOD = 300
+
+# makeCandles
+#   - Returns:
+#       A list of (date, open, high, low, close, volume) rows of a seeded random walk.
+def makeCandles(count, seed=5):
+    rng = np.random.default_rng(seed)
+    closes = 0.05 * np.exp(np.cumsum(rng.normal(0.0, 0.01, count)))
+    rows = []
+    for index, close in enumerate(closes.tolist()):
+        spread = close * rng.uniform(0.001, 0.02)
+        rows.append((1500000000.0 + index * PERIOD, close, close + spread, close - spread * rng.uniform(0.5, 1.5), close, 1.0))
+    return rows
+
+class IndicatorParityTests(unittest.TestCase):
+
+    # Stream the candles through the indicator, each one first seen while forming, and compare it with the batch
+    # function on the candles of the series after every update.
+    def assertParity(self, indicator, batch, compare, count=400, capacity=1000):
+        series = CandleSeries(capacity)
+        for row in makeCandles(count):
+            forming = row[:4] + (row[4] * 1.003,) + row[5:]
+            series.append(forming)
+            indicator.update(series, series.getLastDate(), PERIOD)
+            series.replaceLast(row)
+            compare(indicator.update(series, series.getLastDate(), PERIOD), batch(series), len(series))
+
+    def assertSame(self, value, expected, length):
+        if math.isnan(expected):
+            self.assertTrue(math.isnan(value), length)
+        else:
+            self.assertEqual(value, expected, length)
+
+    def assertClose(self, value, expected, length):
+        if math.isnan(expected):
+            self.assertTrue(math.isnan(value), length)
+        else:
+            self.assertLessEqual(abs(value - expected), 1e-9 * abs(expected), length)
+
+    def test_ema(self):
+        self.assertParity(EMA(20), lambda series: ema(series.getCloses(), 20)[-1], self.assertSame)
+
+    def test_rsi(self):
+        self.assertParity(RSI(14), lambda series: rsi(series.getCloses(), 14)[-1], self.assertSame)
+
+    def test_macd(self):
+        def compare(value, expected, length):
+            for index in range(3):
+                self.assertSame(value[index], expected[index][-1], length)
+        self.assertParity(MACD(12, 26, 9), lambda series: macd(series.getCloses(), 12, 26, 9), compare)
+
+    def test_atr(self):
+        self.assertParity(ATR(14), lambda series: atr(series.getHighs(), series.getLows(), series.getCloses(), 14)[-1], self.assertSame)
+
+    def test_rolling_stats(self):
+        # The window is full after 30 candles; fewer than 30 have no batch value
+        def compare(value, expected, length):
+            if length >= 30:
+                self.assertClose(value[0], expected[0], length)
+                self.assertClose(value[1], expected[1], length)
+        # Past the recalculation interval of the sums, with a window which wraps around the series
+        self.assertParity(RollingStats(30), lambda series: (sma(series.getCloses(), 30)[-1], rollingStd(series.getCloses(), 30)[-1]),
+                          compare, count=2500, capacity=100)
+
+class IndicatorRebuildTests(unittest.TestCase):
+
+    def assertSame(self, value, expected):
+        if math.isnan(expected):
+            self.assertTrue(math.isnan(value))
+        else:
+            self.assertEqual(value, expected)
+
+    def test_rebuild_after_drop_before(self):
+        series = CandleSeries(10)
+        stats, average = RollingStats(10), EMA(4)
+        dropped = 0
+        for index, row in enumerate(makeCandles(60)):
+            series.append(row)
+            if index % 7 == 3:
+                series.dropBefore(series.getDates()[0] + PERIOD * (1 + index % 2))
+                dropped += 1
+            closes = np.array(series.getCloses())
+            mean, std = stats.update(series, series.getLastDate(), PERIOD)
+            self.assertAlmostEqual(mean, closes.mean(), delta=1e-12)
+            if len(closes) > 1:
+                self.assertAlmostEqual(std, closes.std(ddof=1), delta=1e-12)
+            # The EMA holds no window, so after a drop it only matches the batch EMA of the series if it was rebuilt
+            value = average.update(series, series.getLastDate(), PERIOD)
+            if index % 7 == 3:
+                self.assertSame(value, ema(closes, 4)[-1])
+        self.assertGreater(dropped, 0)
+
+    def test_rebuild_after_gap(self):
+        # A gap larger than the series rebuilds the indicator from the candles held
+        rows = makeCandles(50)
+        series = CandleSeries(10)
+        average = EMA(4)
+        for row in rows[:20]:
+            series.append(row)
+            average.update(series, series.getLastDate(), PERIOD)
+        for row in rows[35:]:
+            series.append(row)
+        self.assertEqual(average.update(series, series.getLastDate(), PERIOD), ema(series.getCloses(), 4)[-1])
+
+if __name__ == '__main__':
+    unittest.main()
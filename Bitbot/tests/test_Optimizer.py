@@ -0,0 +1,111 @@
+#### test_Optimizer ####
+# Checks the edges of the walk-forward blocks: they start after the longest measurement window of the parameter
+# space, the last test block takes the candles left over, and a fold replays every candle of its' train and test
+# blocks with the window filled from the candles before them. Candidates which replayed no candles on a block are not
+# ranked.
+
+import unittest
+import numpy as np
+from lib import Bitbot_CDO, Optimizer
+from lib.Backtester import getCandleRows
+from lib.Optimizer import SharedCandles, walkForwardSplits, getMaximumWarmup, isInSpace, isComplete, getTrainProfit, initializeWorker, evaluateFold
+
+PERIOD = 300
+SETTINGS = ('measurement_period', 'period_unit', 'sell_safety_threshold', 'upper_band_sma_minimum_gradient', 'lower_band_sma_minimum_gradient')
+
+def makeCandles(count, seed=2):
+    rng = np.random.default_rng(seed)
+    closes = 0.0001 * np.exp(np.cumsum(rng.normal(0.0, 0.004, count)))
+    return [{'date' : 1500000000 + index * PERIOD, 'open' : close, 'high' : close, 'low' : close, 'close' : close, 'volume' : 1.0}
+            for index, close in enumerate(closes.tolist())]
+
+class OptimizerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = dict((name, getattr(Bitbot_CDO, name, None)) for name in SETTINGS)
+        Bitbot_CDO.measurement_period = '20'
+        Bitbot_CDO.period_unit = 'MINUTES'
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            if value is None:
+                if hasattr(Bitbot_CDO, name):
+                    delattr(Bitbot_CDO, name)
+            else:
+                setattr(Bitbot_CDO, name, value)
+
+    def test_walk_forward_splits(self):
+        self.assertEqual(walkForwardSplits(100, 2, 3, 10), [(10, 64, 82), (28, 82, 100)])
+        # The candles which do not make a whole block go to the last test block
+        self.assertEqual(walkForwardSplits(104, 2, 3, 10)[-1], (28, 82, 104))
+        for candleCount, folds, trainBlocks, warmup in ((1000, 4, 3, 119), (57, 1, 1, 0), (500, 5, 2, 31)):
+            splits = walkForwardSplits(candleCount, folds, trainBlocks, warmup)
+            blockLength = (candleCount - warmup) // (folds + trainBlocks)
+            self.assertEqual(len(splits), folds)
+            self.assertEqual(splits[0][0], warmup)
+            self.assertEqual(splits[-1][2], candleCount)
+            for fold, (trainStart, testStart, testEnd) in enumerate(splits):
+                self.assertEqual(testStart - trainStart, trainBlocks * blockLength)
+                self.assertGreater(testEnd, testStart)
+                if fold > 0:
+                    self.assertEqual(trainStart, splits[fold - 1][0] + blockLength)
+                    self.assertEqual(testStart, splits[fold - 1][2])
+
+    def test_not_enough_candles(self):
+        self.assertRaises(ValueError, walkForwardSplits, 14, 2, 3, 10)
+        self.assertRaises(ValueError, walkForwardSplits, 100, 0, 3)
+        self.assertRaises(ValueError, walkForwardSplits, 100, 2, 0)
+        self.assertEqual(len(walkForwardSplits(15, 2, 3, 10)), 2)
+
+    def test_maximum_warmup(self):
+        # Twice the longest measurement period of 300 second candles, less the candle the policy is first asked about
+        self.assertEqual(getMaximumWarmup({'measurement_period' : (10, 60)}, PERIOD), 119)
+        self.assertEqual(getMaximumWarmup({'measurement_period' : [10, 30, 15]}, PERIOD), 59)
+        self.assertEqual(getMaximumWarmup({'measurement_period' : (10, 60), 'period_unit' : ['MINUTES', 'HOURS']}, PERIOD), 1439)
+        # A parameter which is not searched has its' bitbot.config value
+        self.assertEqual(getMaximumWarmup({'sell_safety_threshold' : (0.2, 3.0)}, PERIOD), 39)
+
+    def test_is_in_space(self):
+        space = {'measurement_period' : (10, 60), 'period_unit' : ['MINUTES', 'HOURS']}
+        self.assertTrue(isInSpace({'measurement_period' : '60', 'period_unit' : 'HOURS'}, space))
+        self.assertFalse(isInSpace({'measurement_period' : '61', 'period_unit' : 'HOURS'}, space))
+        self.assertFalse(isInSpace({'measurement_period' : '20', 'period_unit' : 'DAYS'}, space))
+        self.assertFalse(isInSpace({'measurement_period' : '20'}, space))
+
+    def test_empty_blocks_are_not_ranked(self):
+        report = lambda candles, profit: {'candles' : candles, 'profit' : profit}
+        complete = {'parameters' : {}, 'results' : {0 : {'train' : report(10, 2.0), 'test' : report(5, 1.0)},
+                                                    1 : {'train' : report(10, 4.0), 'test' : report(5, 1.0)}}}
+        empty = {'parameters' : {}, 'results' : {0 : {'train' : report(10, 9.0), 'test' : report(0, 0.0)}}}
+        self.assertTrue(isComplete(complete))
+        self.assertEqual(getTrainProfit(complete), 3.0)
+        self.assertFalse(isComplete(empty))
+        self.assertEqual(getTrainProfit(empty), float('-inf'))
+        self.assertEqual(getTrainProfit({'parameters' : {}, 'results' : {}}), float('-inf'))
+
+    def test_fold_replays_every_candle_of_its_blocks(self):
+        space = {'measurement_period' : (10, 30)}
+        rows = getCandleRows(makeCandles(400))
+        warmup = getMaximumWarmup(space, PERIOD)
+        splits = walkForwardSplits(len(rows), 3, 2, warmup)
+        candles = SharedCandles(rows)
+        try:
+            configuration = dict((key, value) for key, value in vars(Bitbot_CDO).items() if not key.startswith('_') and isinstance(value, str))
+            initializeWorker(candles.getName(), candles.getShape(), configuration,
+                             {'policy_file' : 'policy.BollingerPolicy', 'currency_pair' : 'BTC_XRP', 'candle_period' : PERIOD, 'fee' : 0.002})
+            parameters = {'sell_safety_threshold' : '1.0', 'upper_band_sma_minimum_gradient' : '0.1', 'lower_band_sma_minimum_gradient' : '0.0'}
+            for measurementPeriod in ('10', '30'):
+                parameters['measurement_period'] = measurementPeriod
+                for trainStart, testStart, testEnd in splits:
+                    reports = evaluateFold(parameters, (trainStart, testStart, testEnd))
+                    self.assertEqual(reports['train']['candles'], testStart - trainStart)
+                    self.assertEqual(reports['test']['candles'], testEnd - testStart)
+            # A block with less than the window before it is an error rather than a short block
+            self.assertRaises(ValueError, evaluateFold, parameters, (warmup - 1, splits[0][1], splits[0][2]))
+        finally:
+            Optimizer.__worker_memory__.close()
+            Optimizer.__worker_memory__ = Optimizer.__worker_rows__ = Optimizer.__worker_setup__ = Optimizer.__worker_policy__ = None
+            candles.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#### test_OrderTracker ####
+# Checks how the OrderTracker follows an order from the results of returnOrderStatus and returnOrderTrades: fills
+# which come in parts, orders which were canceled, orders which filled before they were polled (they are no longer
+# found) and reconciliations with the open orders of the exchange. The balances are written through to an
+# AccountCache which is never fetched.
+
+import unittest
+from lib.AccountCache import AccountCache
+from lib.OrderTracker import OrderTracker
+
+NOT_FOUND = 'Order not found, or you are not the person who placed it.'
+
+def getStatus(orderNumber, remaining):
+    return {'success' : 1, 'result' : {orderNumber : {'status' : 'Partially filled', 'amount' : '%.8f' % (remaining)}}}
+
+def getTrade(tradeID, rate, amount, fee=0.002):
+    return {'tradeID' : tradeID, 'rate' : '%.8f' % (rate), 'amount' : '%.8f' % (amount),
+            'total' : '%.8f' % (rate * amount), 'fee' : '%.8f' % (fee)}
+
+class OrderTrackerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AccountCache(None)
+        self.cache.setCompleteBalances({'BTC' : {'available' : '1.00000000', 'onOrders' : '0.00000000', 'btcValue' : '1.00000000'},
+                                        'XRP' : {'available' : '500.00000000', 'onOrders' : '0.00000000', 'btcValue' : '0.05000000'}})
+        self.tracker = OrderTracker(None, self.cache, pollInterval=0.0, maxPollInterval=0.0)
+
+    def getBalance(self, currency):
+        balance = self.cache.peekCompleteBalances()[currency]
+        return balance['available'], balance['onOrders']
+
+    def test_buy_fills_in_parts(self):
+        self.assertTrue(self.tracker.track('BTC_XRP', 'buy', '0.00010000', '1000.00000000', {'orderNumber' : 7, 'resultingTrades' : []}))
+        self.assertEqual(self.getBalance('BTC'), ('0.90000000', '0.10000000'))
+
+        # Nothing has filled: the trades are not fetched
+        self.assertFalse(self.tracker.applyStatus('7', getStatus('7', 1000.0)))
+        self.assertTrue(self.tracker.applyStatus('7', getStatus('7', 600.0)))
+        first = [getTrade(1, 0.0001, 400.0)]
+        self.assertIsNone(self.tracker.applyTrades('7', first))
+        self.assertEqual(self.getBalance('BTC'), ('0.90000000', '0.06000000'))
+        self.assertEqual(self.getBalance('XRP'), ('899.20000000', '0.00000000'))
+        self.assertEqual(self.tracker.getOpenOrders()['BTC_XRP'][0]['amount'], '600.00000000')
+
+        # Trades which were already applied are skipped, the rest fill the order
+        self.assertFalse(self.tracker.applyStatus('7', getStatus('7', 600.0)))
+        self.assertEqual(self.tracker.applyTrades('7', first + [getTrade(2, 0.0001, 600.0)]), 'BTC_XRP')
+        self.assertEqual(self.getBalance('BTC'), ('0.90000000', '0.00000000'))
+        self.assertEqual(self.getBalance('XRP'), ('1498.00000000', '0.00000000'))
+        self.assertFalse(self.tracker.hasOpenOrders())
+        self.assertEqual(self.tracker.popFinishedPairs(), {'BTC_XRP'})
+
+    def test_buy_filled_below_its_rate(self):
+        # A buy which fills below its' rate gives back the difference to the available balance
+        self.tracker.track('BTC_XRP', 'buy', '0.00010000', '1000.00000000', {'orderNumber' : 8, 'resultingTrades' : []})
+        self.assertEqual(self.tracker.applyTrades('8', [getTrade(1, 0.00009, 1000.0)]), 'BTC_XRP')
+        self.assertEqual(self.getBalance('BTC'), ('0.91000000', '0.00000000'))
+
+    def test_sell_fills_in_parts(self):
+        self.tracker.track('BTC_XRP', 'sell', '0.00010000', '500.00000000', {'orderNumber' : 9, 'resultingTrades' : [getTrade(1, 0.0001, 100.0)]})
+        self.assertEqual(self.getBalance('XRP'), ('0.00000000', '400.00000000'))
+        self.assertEqual(self.getBalance('BTC'), ('1.00998000', '0.00000000'))
+        self.assertTrue(self.tracker.applyStatus('9', getStatus('9', 150.0)))
+        self.assertIsNone(self.tracker.applyTrades('9', [getTrade(2, 0.0001, 250.0)]))
+        self.assertEqual(self.getBalance('XRP'), ('0.00000000', '150.00000000'))
+        self.assertEqual(self.getBalance('BTC'), ('1.03493000', '0.00000000'))
+
+    def test_canceled_order(self):
+        self.tracker.track('BTC_XRP', 'buy', '0.00010000', '1000.00000000', {'orderNumber' : 10, 'resultingTrades' : []})
+        self.tracker.applyTrades('10', [getTrade(1, 0.0001, 250.0)])
+
+        # A canceled order is no longer found: what is still held for it is given back
+        self.assertTrue(self.tracker.applyStatus('10', {'success' : 0, 'result' : {'error' : NOT_FOUND}}))
+        self.assertEqual(self.tracker.applyTrades('10', [getTrade(1, 0.0001, 250.0)]), 'BTC_XRP')
+        self.assertEqual(self.getBalance('BTC'), ('0.97500000', '0.00000000'))
+        self.assertEqual(self.getBalance('XRP'), ('749.50000000', '0.00000000'))
+        self.assertFalse(self.tracker.hasOpenOrders())
+
+    def test_canceled_before_any_fill(self):
+        self.tracker.track('BTC_XRP', 'sell', '0.00020000', '500.00000000', {'orderNumber' : 11, 'resultingTrades' : []})
+        self.assertTrue(self.tracker.applyStatus('11', {'success' : 0, 'result' : {'error' : NOT_FOUND}}))
+        self.assertEqual(self.tracker.applyTrades('11', {'error' : NOT_FOUND}), 'BTC_XRP')
+        self.assertEqual(self.getBalance('XRP'), ('500.00000000', '0.00000000'))
+
+    def test_not_found_after_it_filled(self):
+        # The order filled between two polls so its' status is no longer found, its' trades are
+        self.tracker.track('BTC_XRP', 'buy', '0.00010000', '1000.00000000', {'orderNumber' : 12, 'resultingTrades' : []})
+        self.assertTrue(self.tracker.applyStatus('12', {'success' : 0, 'result' : {'error' : NOT_FOUND}}))
+        self.assertEqual(self.tracker.applyTrades('12', [getTrade(1, 0.0001, 700.0), getTrade(2, 0.0001, 300.0)]), 'BTC_XRP')
+        self.assertEqual(self.getBalance('BTC'), ('0.90000000', '0.00000000'))
+        self.assertEqual(self.getBalance('XRP'), ('1498.00000000', '0.00000000'))
+
+    def test_errors(self):
+        self.tracker.track('BTC_XRP', 'buy', '0.00010000', '1000.00000000', {'orderNumber' : 13, 'resultingTrades' : []})
+        self.assertRaises(Exception, self.tracker.applyStatus, '13', {'error' : 'Nonce must be greater than 1.'})
+        self.assertRaises(Exception, self.tracker.applyTrades, '13', {'error' : 'Nonce must be greater than 1.'})
+        self.assertRaises(Exception, self.tracker.track, 'BTC_XRP', 'buy', '0.00010000', '1.00000000', {'error' : 'Not enough BTC.'})
+        self.assertTrue(self.tracker.hasOpenOrders('BTC_XRP'))
+
+        # Orders which are not tracked are ignored
+        self.assertFalse(self.tracker.applyStatus('99', getStatus('99', 0.0)))
+        self.assertIsNone(self.tracker.applyTrades('99', [getTrade(1, 0.0001, 1.0)]))
+
+    def test_reconcile(self):
+        self.tracker.track('BTC_XRP', 'buy', '0.00010000', '1000.00000000', {'orderNumber' : 14, 'resultingTrades' : []})
+        self.tracker.track('BTC_XRP', 'sell', '0.00020000', '100.00000000', {'orderNumber' : 15, 'resultingTrades' : []})
+        self.assertTrue(self.tracker.needsReconcile())
+
+        # Order 14 is no longer open on the exchange and is dropped, order 16 was placed before a restart
+        self.tracker.reconcile({'BTC_XRP' : [{'orderNumber' : '15', 'type' : 'sell', 'rate' : '0.00020000', 'amount' : '100.00000000'}],
+                                'BTC_ETH' : [{'orderNumber' : '16', 'type' : 'buy', 'rate' : '0.03000000', 'amount' : '1.00000000'}]})
+        self.assertFalse(self.tracker.needsReconcile())
+        openOrders = self.tracker.getOpenOrders()
+        self.assertEqual([order['orderNumber'] for order in openOrders['BTC_XRP']], ['15'])
+        self.assertEqual([order['orderNumber'] for order in openOrders['BTC_ETH']], ['16'])
+        self.assertIsNone(self.tracker.applyTrades('14', [getTrade(1, 0.0001, 1000.0)]))
+
+        self.tracker.reconcile({})
+        self.assertFalse(self.tracker.hasOpenOrders())
+        self.assertEqual(self.tracker.popFinishedPairs(), set())
+
+if __name__ == '__main__':
+    unittest.main()
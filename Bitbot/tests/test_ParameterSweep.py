@@ -0,0 +1,63 @@
+#### test_ParameterSweep ####
+# Checks that every combination of a ParameterSweep gives the result of running the Backtester with BollingerPolicy
+# and the same parameters on the same seeded candles.
+
+import unittest
+import numpy as np
+from lib import Bitbot_CDO
+from lib.Backtester import Backtester
+from lib.ParameterSweep import ParameterSweep, amplifyGradients
+from policy.BollingerPolicy import BollingerPolicy
+
+PERIOD = 300
+PARAMETERS = ('measurement_period', 'sell_safety_threshold', 'upper_band_sma_minimum_gradient', 'lower_band_sma_minimum_gradient')
+
+def makeCandles(count, seed=11):
+    rng = np.random.default_rng(seed)
+    closes = 0.0001 * np.exp(np.cumsum(rng.normal(0.0, 0.004, count)))
+    return [{'date' : 1500000000 + index * PERIOD, 'open' : close, 'high' : close, 'low' : close, 'close' : close, 'volume' : 1.0}
+            for index, close in enumerate(closes.tolist())]
+
+class ParameterSweepTests(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = dict((name, getattr(Bitbot_CDO, name, None)) for name in PARAMETERS)
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            if value is None:
+                if hasattr(Bitbot_CDO, name):
+                    delattr(Bitbot_CDO, name)
+            else:
+                setattr(Bitbot_CDO, name, value)
+
+    def runBacktest(self, candles, result):
+        for name in PARAMETERS:
+            setattr(Bitbot_CDO, name, str(result[name]))
+        return Backtester(BollingerPolicy, 'BTC_XRP', candles, PERIOD, result['measurement_period'], 'MINUTES').run()
+
+    def test_matches_the_backtester(self):
+        candles = makeCandles(500)
+        results = ParameterSweep(candles, PERIOD, 'MINUTES').run([10, 20], [0.5, 2.0], [0.0, 0.5], [-0.2, 0.1])
+        self.assertEqual(len(results), 16)
+        self.assertGreater(sum(result['buys'] for result in results), 0)
+        for result in results:
+            report = self.runBacktest(candles, result)
+            parameters = tuple(result[name] for name in PARAMETERS)
+            for key in ('buys', 'sells', 'winning_sells', 'candles'):
+                self.assertEqual(report[key], result[key], (parameters, key))
+            for key in ('profit', 'max_drawdown', 'final_balance'):
+                self.assertAlmostEqual(report[key], result[key], delta=1e-9, msg=(parameters, key))
+
+    def test_ordered_by_profit(self):
+        results = ParameterSweep(makeCandles(300), PERIOD, 'MINUTES').run([10], [0.5, 1.0, 2.0], [0.0], [0.0])
+        self.assertEqual([result['profit'] for result in results], sorted((result['profit'] for result in results), reverse=True))
+
+    def test_amplify_gradients(self):
+        # As BollingerPolicy.__amplifyGradient__, element by element
+        gradients = np.array([0.0, 0.5, -0.5, 0.00012, -0.0034, 12.0])
+        expected = [BollingerPolicy.__amplifyGradient__(float(gradient)) for gradient in gradients]
+        self.assertEqual(amplifyGradients(gradients).tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#### test_PolicyContext ####
+# Checks the IndicatorCache shared by the policies of a pair: a value is computed once per candle for every policy,
+# it is computed again when the candles change, each indicator has a lock of its' own so a slow one holds up neither
+# the others nor the next tick, and copies of the context used on other threads see the candles they were asked about.
+
+import threading, unittest
+from lib.CandleSeries import CandleSeries
+from lib.Indicators import EMA, getIndicator, ema
+from lib.PolicyContext import IndicatorCache, PolicyContext
+from lib.StatusBus import StatusBus
+
+def makeContext():
+    candlesticks = CandleSeries(50)
+    for index in range(50):
+        candlesticks.append((index * 300.0, 1.0, 1.0, 1.0, 1.0 + index * 0.01, 0.0))
+    context = PolicyContext('BTC_XRP', 300, 25, 'MINUTES', candlesticks, StatusBus())
+    context.setTicker({'BTC_XRP' : {'last' : '1.5'}}, '0.0', '0.0')
+    return context
+
+class IndicatorCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.context = makeContext()
+        self.calls = []
+
+    def compute(self, candlesticks, period):
+        self.calls.append(period)
+        return float(candlesticks.getCloses(period).mean())
+
+    def test_computed_once_per_candle(self):
+        indicators = self.context.indicators
+        # shouldBuy and shouldSell of two policies of the pair during one tick
+        values = [indicators.get('mean', (20,), self.compute) for call in range(4)]
+        self.assertEqual(self.calls, [20])
+        self.assertEqual(len(set(values)), 1)
+        self.assertEqual(indicators.getStats(), (3, 1))
+        # Other parameters are another indicator
+        indicators.get('mean', (10,), self.compute)
+        self.assertEqual(self.calls, [20, 10])
+
+        # A tick without a new candle keeps the values
+        self.context.setTicker({'BTC_XRP' : {'last' : '1.6'}}, '0.0', '0.0')
+        indicators.get('mean', (20,), self.compute)
+        self.assertEqual(self.calls, [20, 10])
+
+        # The forming candle changed, then a new candle
+        self.context.candlesticks.replaceLast((49 * 300.0, 1.0, 1.0, 1.0, 3.0, 0.0))
+        self.context.setTicker({'BTC_XRP' : {'last' : '1.6'}}, '0.0', '0.0')
+        self.assertNotEqual(indicators.get('mean', (20,), self.compute), values[0])
+        self.context.candlesticks.append((50 * 300.0, 1.0, 1.0, 1.0, 2.0, 0.0))
+        self.context.setTicker({'BTC_XRP' : {'last' : '1.6'}}, '0.0', '0.0')
+        indicators.get('mean', (20,), self.compute)
+        self.assertEqual(self.calls, [20, 10, 20, 20])
+
+    def test_state_is_shared(self):
+        indicators = self.context.indicators
+        first = indicators.getState('ema', (5,), EMA)
+        self.assertIs(indicators.getState('ema', (5,), EMA), first)
+        self.assertIsNot(indicators.getState('ema', (6,), EMA), first)
+        self.assertIs(indicators.getLock('ema', (5,)), indicators.getLock('ema', (5,)))
+        self.assertIsNot(indicators.getLock('ema', (5,)), indicators.getLock('ema', (6,)))
+        self.assertEqual(getIndicator(self.context, EMA, 5), ema(self.context.candlesticks.getCloses(), 5)[-1])
+
+    def test_same_indicator_waits_for_the_computation(self):
+        indicators = self.context.indicators
+        started, release = threading.Event(), threading.Event()
+        def slow(candlesticks, period):
+            self.calls.append(period)
+            started.set()
+            release.wait(5.0)
+            return 'slow'
+        results = []
+        first = threading.Thread(target=lambda: results.append(indicators.get('slow', (1,), slow)))
+        first.start()
+        started.wait(5.0)
+        second = threading.Thread(target=lambda: results.append(indicators.get('slow', (1,), slow)))
+        second.start()
+        second.join(0.1)
+        self.assertTrue(second.is_alive())
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(results, ['slow', 'slow'])
+        self.assertEqual(self.calls, [1])
+
+    def test_slow_indicator_holds_up_nothing_else(self):
+        # A policy of an ensemble is handed a copy of the context on its' thread
+        indicators, copy = self.context.indicators, self.context.copy()
+        started, release = threading.Event(), threading.Event()
+        def slow(candlesticks, period):
+            started.set()
+            release.wait(5.0)
+            return candlesticks.getLastDate()
+        results = []
+        thread = threading.Thread(target=lambda: results.append(copy.indicators.get('slow', (1,), slow)))
+        thread.start()
+        started.wait(5.0)
+        try:
+            # Other indicators and the next tick do not wait for it
+            indicators.get('mean', (20,), self.compute)
+            self.context.candlesticks.append((50 * 300.0, 1.0, 1.0, 1.0, 2.0, 0.0))
+            self.context.setTicker({'BTC_XRP' : {'last' : '1.6'}}, '0.0', '0.0')
+            self.assertTrue(thread.is_alive())
+        finally:
+            release.set()
+            thread.join()
+        # The value of the previous candles is not kept for the new ones
+        self.assertEqual(results, [49 * 300])
+        self.assertEqual(indicators.get('slow', (1,), lambda candlesticks, period: candlesticks.getLastDate()), 50 * 300)
+
+    def test_copies_see_their_candles(self):
+        copy = self.context.copy()
+        # While the candles are the same the copy shares the values of the cache
+        self.assertEqual(copy.indicators.get('mean', (20,), self.compute), self.context.indicators.get('mean', (20,), self.compute))
+        self.assertEqual(self.calls, [20])
+
+        self.context.candlesticks.append((50 * 300.0, 1.0, 1.0, 1.0, 9.0, 0.0))
+        self.context.setTicker({'BTC_XRP' : {'last' : '1.6'}}, '0.0', '0.0')
+        self.assertEqual(copy.indicators.get('last', (), lambda candlesticks: candlesticks.getLastDate()), 49 * 300)
+        self.assertEqual(self.context.indicators.get('last', (), lambda candlesticks: candlesticks.getLastDate()), 50 * 300)
+        self.assertEqual(copy.candlesticks.getLastDate(), 49 * 300)
+
+    def test_set_candles(self):
+        indicators = IndicatorCache()
+        first, second = CandleSeries(5), CandleSeries(5)
+        first.append((0.0, 1.0, 1.0, 1.0, 1.0, 0.0))
+        second.append((0.0, 1.0, 1.0, 1.0, 2.0, 0.0))
+        indicators.setCandles(first)
+        self.assertEqual(indicators.get('close', (), lambda candlesticks: candlesticks[-1]), 1.0)
+        # Other candlesticks with the same date and version are not mistaken for the first ones
+        indicators.setCandles(second)
+        self.assertEqual(indicators.get('close', (), lambda candlesticks: candlesticks[-1]), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
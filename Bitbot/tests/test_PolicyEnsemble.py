@@ -0,0 +1,132 @@
+#### test_PolicyEnsemble ####
+# Checks how the answers of the policies of an ensemble are combined (ties, weights and policies which did not
+# answer), that a policy which does not answer within the timeout does not vote, and that an ensemble waiting for
+# every policy (as Backtest.py and Optimize.py create it) gives the same backtest as its' slow policy on its' own.
+
+import time, unittest
+from lib.Backtester import Backtester
+from lib.CandleSeries import CandleSeries
+from lib.PolicyContext import PolicyContext
+from lib.PolicyEnsemble import EnsembleMember, PolicyEnsemble, combineVotes, createPolicy, shutdownPools
+from lib.StatusBus import StatusBus
+from policy.PolicyTemplate import PolicyTemplateV2
+
+class YesPolicy(PolicyTemplateV2):
+    def shouldBuy(context): return True
+    def shouldSell(context): return True
+    def cleanUp(context): pass
+
+class NoPolicy(PolicyTemplateV2):
+    def shouldBuy(context): return False
+    def shouldSell(context): return False
+    def cleanUp(context): pass
+
+class SlowPolicy(PolicyTemplateV2):
+    """Answers like YesPolicy, a while after it is asked."""
+    DELAY = 0.3
+    def shouldBuy(context):
+        time.sleep(SlowPolicy.DELAY)
+        return True
+    def shouldSell(context):
+        time.sleep(SlowPolicy.DELAY)
+        return True
+    def cleanUp(context): pass
+
+class SlowTrendPolicy(PolicyTemplateV2):
+    """Buys after a rise and sells after a fall of the closing price, a while after it is asked."""
+    def shouldBuy(context):
+        time.sleep(0.002)
+        closes = context.candlesticks.getCloses(2)
+        return len(closes) == 2 and closes[1] > closes[0]
+    def shouldSell(context):
+        time.sleep(0.002)
+        closes = context.candlesticks.getCloses(2)
+        return len(closes) == 2 and closes[1] < closes[0]
+    def cleanUp(context): pass
+
+def makeEnsemble(policyClasses, vote='majority', threshold=0.5, timeout=1.0, weights=None):
+    weights = weights or [1.0] * len(policyClasses)
+    return PolicyEnsemble([EnsembleMember(policyClass.__name__, policyClass, weight) for policyClass, weight in zip(policyClasses, weights)],
+                          vote, threshold, timeout)
+
+def makeContext(statusBus):
+    candlesticks = CandleSeries(10)
+    for index in range(10):
+        candlesticks.append((index * 300.0, 1.0, 1.0, 1.0, 1.0 + index * 0.01, 0.0))
+    context = PolicyContext('BTC_XRP', 300, 10, 'MINUTES', candlesticks, statusBus)
+    context.setTicker({'BTC_XRP' : {'last' : '1.09'}}, '0.0', '0.0')
+    return context
+
+class CombineVotesTests(unittest.TestCase):
+
+    def test_any_and_all(self):
+        self.assertTrue(combineVotes([False, None, True], [1, 1, 1], 'any'))
+        self.assertFalse(combineVotes([False, None], [1, 1], 'any'))
+        self.assertTrue(combineVotes([True, True], [1, 1], 'all'))
+        self.assertFalse(combineVotes([True, None], [1, 1], 'all'))
+        self.assertFalse(combineVotes([], [], 'all'))
+
+    def test_majority_ties(self):
+        # Half of the weight is not a majority
+        self.assertFalse(combineVotes([True, False], [1, 1], 'majority'))
+        self.assertFalse(combineVotes([True, True, False, False], [1, 1, 1, 1], 'majority'))
+        self.assertTrue(combineVotes([True, True, False], [1, 1, 1], 'majority'))
+
+    def test_weights(self):
+        self.assertTrue(combineVotes([True, False, False], [3, 1, 1], 'majority'))
+        self.assertFalse(combineVotes([False, True, True], [3, 1, 1], 'majority'))
+        # The weighted rule buys at the threshold exactly
+        self.assertTrue(combineVotes([True, False], [1, 1], 'weighted', 0.5))
+        self.assertFalse(combineVotes([True, False, False], [1, 1, 1], 'weighted', 0.5))
+        self.assertTrue(combineVotes([False, True, True], [2, 1, 1], 'weighted', 0.5))
+        self.assertFalse(combineVotes([True, True], [0, 0], 'weighted', 0.5))
+
+    def test_missing_votes_count_against(self):
+        self.assertTrue(combineVotes([True, True, False], [1, 1, 1], 'majority'))
+        self.assertFalse(combineVotes([True, None, False], [1, 1, 1], 'majority'))
+        self.assertFalse(combineVotes([True, None], [1, 1], 'weighted', 0.75))
+
+class PolicyEnsembleTests(unittest.TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdownPools()
+
+    def test_unknown_rule(self):
+        self.assertRaises(ValueError, makeEnsemble, [YesPolicy], 'unanimous')
+
+    def test_timed_out_member_does_not_vote(self):
+        statusBus = StatusBus()
+        context = makeContext(statusBus)
+        ensemble = makeEnsemble([YesPolicy, NoPolicy, SlowPolicy], timeout=0.05)
+        self.assertFalse(ensemble.shouldBuy(context))
+        self.assertEqual(statusBus.get('BTC_XRP Votes'), 'YesPolicy:yes NoPolicy:no SlowPolicy:-')
+        self.assertIn('SlowPolicy did not answer', statusBus.get('Error'))
+
+        # The late call is still running so the policy is skipped rather than asked again
+        self.assertFalse(ensemble.shouldBuy(context))
+        self.assertEqual(statusBus.get('BTC_XRP Votes'), 'YesPolicy:yes NoPolicy:no SlowPolicy:-')
+        time.sleep(SlowPolicy.DELAY)
+
+    def test_waits_for_every_member(self):
+        statusBus = StatusBus()
+        context = makeContext(statusBus)
+        ensemble = makeEnsemble([YesPolicy, NoPolicy, SlowPolicy], timeout=None)
+        self.assertTrue(ensemble.shouldBuy(context))
+        self.assertEqual(statusBus.get('BTC_XRP Votes'), 'YesPolicy:yes NoPolicy:no SlowPolicy:yes')
+
+    def test_create_policy_waits_for_all_in_backtests(self):
+        self.assertIsNone(createPolicy('policy.ZonePolicy, policy.BollingerPolicy', waitForAll=True).__timeout__)
+        self.assertIsNotNone(createPolicy('policy.ZonePolicy, policy.BollingerPolicy').__timeout__)
+
+    def test_backtest_waits_for_every_member(self):
+        candles = [{'date' : 1500000000 + index * 300, 'open' : 1.0, 'high' : 1.0, 'low' : 1.0, 'volume' : 0.0,
+                    'close' : 1.0 + 0.01 * ((index * 7) % 5)} for index in range(80)]
+        expected = Backtester(SlowTrendPolicy, 'BTC_XRP', candles, 300, 10, 'MINUTES').run()
+        self.assertGreater(expected['buys'], 0)
+        for run in range(2):
+            ensemble = makeEnsemble([SlowTrendPolicy, NoPolicy], 'any', timeout=None)
+            self.assertEqual(Backtester(ensemble, 'BTC_XRP', candles, 300, 10, 'MINUTES').run(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
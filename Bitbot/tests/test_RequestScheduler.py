@@ -0,0 +1,77 @@
+#### test_RequestScheduler ####
+# Checks which requests the RequestScheduler coalesces: identical market data reads in flight at the same time share
+# one request, while reads of the account and orders are always sent, so a caller never gets an account read which
+# was sent before its' own order.
+
+import asyncio, threading, unittest
+from lib.RequestScheduler import RequestScheduler
+
+class RequestSchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = RequestScheduler(requestsPerSecond=1000.0, burst=100)
+
+    # Send the same request from two threads while the first one is in flight
+    def sendTwice(self, command, req):
+        started, release = threading.Event(), threading.Event()
+        sent = []
+        def send():
+            sent.append(command)
+            started.set()
+            release.wait(5.0)
+            return {'sent' : len(sent)}
+        responses = []
+        first = threading.Thread(target=lambda: responses.append(self.scheduler.call(command, req, send)))
+        first.start()
+        started.wait(5.0)
+        second = threading.Thread(target=lambda: responses.append(self.scheduler.call(command, req, send)))
+        second.start()
+        second.join(0.2)
+        release.set()
+        first.join()
+        second.join()
+        return len(sent), responses
+
+    def test_market_data_is_coalesced(self):
+        sent, responses = self.sendTwice('returnOrderBook', {'currencyPair' : 'BTC_XRP', 'depth' : 20})
+        self.assertEqual(sent, 1)
+        self.assertEqual(responses, [{'sent' : 1}, {'sent' : 1}])
+        self.assertEqual(self.scheduler.getStats()['coalesced'], 1)
+
+    def test_account_reads_are_not_coalesced(self):
+        for command in ('returnBalances', 'returnCompleteBalances', 'returnOpenOrders', 'returnOrderStatus', 'returnOrderTrades'):
+            sent, responses = self.sendTwice(command, {'orderNumber' : '1'})
+            self.assertEqual(sent, 2, command)
+        self.assertEqual(self.scheduler.getStats()['coalesced'], 0)
+
+    def test_orders_are_not_coalesced(self):
+        sent, responses = self.sendTwice('buy', {'currencyPair' : 'BTC_XRP', 'rate' : '0.0001', 'amount' : '1'})
+        self.assertEqual(sent, 2)
+        self.assertEqual(self.scheduler.getStats()['order_requests'], 2)
+
+    def test_different_parameters_are_not_coalesced(self):
+        release = threading.Event()
+        def send():
+            release.wait(0.1)
+            return {}
+        thread = threading.Thread(target=self.scheduler.call, args=('returnChartData', {'currencyPair' : 'BTC_XRP'}, send))
+        thread.start()
+        self.scheduler.call('returnChartData', {'currencyPair' : 'BTC_ETH'}, send)
+        release.set()
+        thread.join()
+        self.assertEqual(self.scheduler.getStats()['data_requests'], 2)
+
+    def test_async_account_reads_are_not_coalesced(self):
+        async def run(command):
+            async def send():
+                await asyncio.sleep(0.01)
+                return {}
+            await asyncio.gather(self.scheduler.callAsync(command, {}, send), self.scheduler.callAsync(command, {}, send))
+        asyncio.run(run('returnTicker'))
+        self.assertEqual(self.scheduler.getStats()['coalesced'], 1)
+        asyncio.run(run('returnCompleteBalances'))
+        self.assertEqual(self.scheduler.getStats()['coalesced'], 1)
+        self.assertEqual(self.scheduler.getStats()['data_requests'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
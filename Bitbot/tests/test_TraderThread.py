@@ -0,0 +1,54 @@
+#### test_TraderThread ####
+# Checks that getAllocations gives every pair looking to buy the same share of the BTC the tick started with,
+# whether the pairs ticked before it bought or not, both when the orders are placed one after another (the
+# TraderThread) and at once from one copy of the balances (the AsyncTraderThread).
+
+import unittest
+from lib.TraderThread import getAllocations
+
+class GetAllocationsTests(unittest.TestCase):
+
+    # Tick the buying pairs one after another as __tickPairs__ does, taking each buy from the balance
+    def spend(self, buyingPairs, buyers, tickAvailable):
+        available, spent = tickAvailable, {}
+        for pairTrader in buyingPairs:
+            allocation = getAllocations(buyingPairs, tickAvailable, available)[pairTrader]
+            if pairTrader in buyers:
+                spent[pairTrader] = available * allocation
+                available -= spent[pairTrader]
+        return spent, available
+
+    def test_even_shares_of_one_copy(self):
+        self.assertEqual(getAllocations(['A', 'B'], 1.0, 1.0), {'A': 0.5, 'B': 0.5})
+        self.assertEqual(getAllocations(['A', 'B', 'C', 'D'], 2.0, 2.0), {'A': 0.25, 'B': 0.25, 'C': 0.25, 'D': 0.25})
+
+    def test_one_buying_pair_spends_everything(self):
+        self.assertEqual(getAllocations(['A'], 1.0, 1.0), {'A': 1.0})
+
+    def test_pairs_which_do_not_buy(self):
+        # Neither the pairs after a pair which did not buy nor the last buyer get more than their share
+        self.assertEqual(getAllocations(['A', 'B'], 1.0, 1.0)['B'], 0.5)
+        spent, available = self.spend(['A', 'B', 'C'], {'B', 'C'}, 1.0)
+        self.assertAlmostEqual(spent['B'], 1.0 / 3.0)
+        self.assertAlmostEqual(spent['C'], 1.0 / 3.0)
+        self.assertAlmostEqual(available, 1.0 / 3.0)
+
+    def test_every_pair_buys_in_turn(self):
+        spent, available = self.spend(['A', 'B', 'C'], {'A', 'B', 'C'}, 0.9)
+        for pairTrader in 'ABC':
+            self.assertAlmostEqual(spent[pairTrader], 0.3)
+        self.assertAlmostEqual(available, 0.0)
+
+    def test_later_ticks_keep_the_share(self):
+        # Once A has an order pending it is no longer a buying pair, and the BTC left is B's and C's share
+        self.assertEqual(getAllocations(['B', 'C'], 2.0 / 3.0, 2.0 / 3.0), {'B': 0.5, 'C': 0.5})
+        spent, available = self.spend(['B', 'C'], {'C'}, 2.0 / 3.0)
+        self.assertAlmostEqual(spent['C'], 1.0 / 3.0)
+
+    def test_never_more_than_the_balance(self):
+        # When less BTC is left than a share (i.e. after a refresh of the balances) the pair spends what is left
+        self.assertEqual(getAllocations(['A', 'B'], 1.0, 0.25), {'A': 1.0, 'B': 1.0})
+        self.assertEqual(getAllocations(['A', 'B'], 1.0, 0.0), {'A': 1.0, 'B': 1.0})
+
+if __name__ == '__main__':
+    unittest.main()